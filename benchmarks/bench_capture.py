@@ -0,0 +1,123 @@
+"""Benchmark for session captures (fr_uploader.capture).
+
+Writes a synthetic capture of --mb megabytes in chunks like the reader
+thread produces, then measures opening it (index load and rebuild), random
+seeks by time and by stream position, and a full-speed replay through the
+text decoder and line timestamper. It fails (exit status 1) if the replayed
+stream differs from what was written or a seek lands on the wrong frame.
+
+    python benchmarks/bench_capture.py [--mb 200] [--chunk 512] [--seeks 1000] [--keep]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fr_uploader.capture import CaptureReplay, SessionCapture, SessionRecorder  # noqa: E402
+from fr_uploader.formatting import TextDecoder  # noqa: E402
+from fr_uploader.timestamps import LineTimestamper, SessionClock, TimestampFormatter  # noqa: E402
+
+STEP_NS = 50_000  # Simulated time between chunks
+
+
+def chunk(i, size):
+    line = f"seq={i} temp={20 + i % 150 / 10:.1f} C state=RUN\n".encode()
+    return (line * (size // len(line) + 1))[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, default=200, help="capture size in MB")
+    parser.add_argument("--chunk", type=int, default=512, help="bytes per frame")
+    parser.add_argument("--seeks", type=int, default=1000)
+    parser.add_argument("--keep", action="store_true", help="keep the capture file")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="frcap-"), "bench.frcap")
+    frames = int(args.mb * 1e6) // args.chunk
+    problems = []
+
+    began = time.perf_counter()
+    recorder = SessionRecorder(path, clock=SessionClock(perf_ns=0))  # Stamps are i * STEP_NS
+    for i in range(frames):
+        recorder.write(chunk(i, args.chunk), stamp=i * STEP_NS)
+    recorder.close()
+    write_s = time.perf_counter() - began
+    print(f"write:  {frames:,} frames, {recorder.bytes_written / 1e6:.0f} MB in {write_s:.2f} s "
+          f"({recorder.bytes_written / 1e6 / write_s:.0f} MB/s)")
+
+    began = time.perf_counter()
+    capture = SessionCapture(path)
+    open_s = time.perf_counter() - began
+    os.remove(path + ".idx")
+    began = time.perf_counter()
+    rebuilt = SessionCapture(path)
+    rebuild_s = time.perf_counter() - began
+    if rebuilt.index != capture.index:
+        problems.append("rebuilt index differs from the saved one")
+    rebuilt.close()
+    print(f"open:   {open_s * 1000:.1f} ms with index ({len(capture.index):,} entries), "
+          f"{rebuild_s * 1000:.0f} ms rebuilding it")
+    if capture.frame_count != frames:
+        problems.append(f"capture has {capture.frame_count} of {frames} frames")
+
+    rng = random.Random(1)
+    latencies = []
+    for _ in range(args.seeks):
+        i = rng.randrange(frames)
+        t = time.perf_counter()
+        offset = capture.seek_time(i * STEP_NS + STEP_NS // 2)
+        latencies.append(time.perf_counter() - t)
+        _, time_ns, _ = next(capture.frames(offset))
+        if time_ns != i * STEP_NS:
+            problems.append(f"seek to frame {i} landed at {time_ns // STEP_NS}")
+        t = time.perf_counter()
+        offset = capture.seek_position(i * args.chunk)
+        latencies.append(time.perf_counter() - t)
+        _, time_ns, _ = next(capture.frames(offset))
+        if time_ns != i * STEP_NS:
+            problems.append(f"seek to byte {i * args.chunk} landed at frame {time_ns // STEP_NS}")
+    latencies.sort()
+    print(f"seek:   {len(latencies):,} seeks, median {latencies[len(latencies) // 2] * 1e6:.0f} us, "
+          f"max {latencies[-1] * 1e6:.0f} us")
+
+    decoder = TextDecoder()
+    timestamper = LineTimestamper(TimestampFormatter(capture.clock()))
+    replay = CaptureReplay(capture, speed=None)
+    replayed = 0
+    mismatched = 0
+    began = time.perf_counter()
+    while not replay.done:
+        for time_ns, data in replay.due():
+            if data != chunk(time_ns // STEP_NS, args.chunk):
+                mismatched += 1
+            timestamper.stamp(decoder.decode(data), time_ns)
+            replayed += len(data)
+    replay_s = time.perf_counter() - began
+    print(f"replay: {replayed / 1e6:.0f} MB in {replay_s:.2f} s ({replayed / 1e6 / replay_s:.0f} MB/s) "
+          f"through decoder and timestamper")
+    if mismatched:
+        problems.append(f"{mismatched} replayed frames differ from what was written")
+    if replayed != recorder.bytes_written:
+        problems.append(f"replayed {replayed} of {recorder.bytes_written} bytes")
+    capture.close()
+
+    if args.keep:
+        print(f"kept {path}")
+    else:
+        for name in (path, path + ".idx"):
+            if os.path.exists(name):
+                os.remove(name)
+        os.rmdir(os.path.dirname(path))
+    for problem in problems[:20]:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
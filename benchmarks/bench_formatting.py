@@ -0,0 +1,92 @@
+"""Micro-benchmarks for the serial view formatters on a 1 MB capture.
+
+Compares the old per-byte f-string hex formatting and per-chunk UTF-8
+decoding in SerialMonitor.process_data with fr_uploader.formatting.
+
+    python benchmarks/bench_formatting.py [--size 1048576] [--chunk 4096]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fr_uploader.formatting import HexFormatter, TextDecoder, hex_bytes  # noqa: E402
+
+
+def make_text_capture(size):
+    line = "[ 1234.567] temp=23.4°C current=1.20A état=RUN ✓\n".encode("utf-8")
+    return (line * (size // len(line) + 1))[:size]
+
+
+def chunks(data, chunk_size):
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+
+def old_hex(parts):
+    return [" ".join([f"{x:02X}" for x in part]) for part in parts]
+
+
+def new_hex(parts):
+    return [hex_bytes(part) for part in parts]
+
+
+def naive_xxd(parts):
+    out = []
+    offset = 0
+    for part in parts:
+        for start in range(0, len(part), 16):
+            row = part[start:start + 16]
+            hex_part = " ".join(
+                "".join(f"{b:02x}" for b in row[i:i + 2]) for i in range(0, len(row), 2)
+            )
+            ascii_part = "".join(chr(b) if 32 <= b < 127 else "." for b in row)
+            out.append(f"{offset + start:08x}: {hex_part:<39}  {ascii_part}\n")
+        offset += len(part)
+    return out
+
+
+def new_xxd(parts):
+    formatter = HexFormatter(layout="xxd")
+    return [formatter.format(part) for part in parts]
+
+
+def old_text(parts):
+    return [part.decode("utf-8", errors="replace") for part in parts]
+
+
+def new_text(parts):
+    decoder = TextDecoder()
+    return [decoder.decode(part) for part in parts] + [decoder.flush()]
+
+
+def bench(name, func, parts, size, repeat):
+    best = min(timeit.repeat(lambda: func(parts), number=1, repeat=repeat))
+    print(f"{name:>22}: {best * 1000:9.2f} ms  {size / best / 1e6:9.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1 << 20)
+    parser.add_argument("--chunk", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    binary = chunks(os.urandom(args.size), args.chunk)
+    text = chunks(make_text_capture(args.size), args.chunk)
+
+    bench("hex (old f-strings)", old_hex, binary, args.size, args.repeat)
+    bench("hex (bytes.hex)", new_hex, binary, args.size, args.repeat)
+    bench("xxd (per-byte)", naive_xxd, binary, args.size, args.repeat)
+    bench("xxd (hex_dump)", new_xxd, binary, args.size, args.repeat)
+    bench("text (per-chunk)", old_text, text, args.size, args.repeat)
+    bench("text (incremental)", new_text, text, args.size, args.repeat)
+
+    split_chars = sum(part.count("�") for part in old_text(text))
+    kept_chars = sum(part.count("�") for part in new_text(text))
+    print(f"replacement chars from split sequences: per-chunk={split_chars} incremental={kept_chars}")
+
+
+if __name__ == "__main__":
+    main()
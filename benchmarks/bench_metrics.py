@@ -0,0 +1,94 @@
+"""Metrics overhead benchmark: what the instrumentation costs per call.
+
+Times the recording calls used in the hot paths (timer(), count() and
+set()) with the registry disabled, as it is by default, and enabled,
+against an empty loop, then the exports of a registry filled like a
+running station. It fails (exit status 1) if a disabled call costs more
+than --max-disabled-ns or an enabled timer more than --max-enabled-ns.
+
+    python benchmarks/bench_metrics.py [--calls 200000] [--max-disabled-ns 1000] [--max-enabled-ns 10000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fr_uploader.metrics import MetricsRegistry  # noqa: E402
+
+
+def per_call_ns(function, calls):
+    started = time.perf_counter()
+    function(calls)
+    return (time.perf_counter() - started) * 1e9 / calls
+
+
+def empty(calls):
+    for _ in range(calls):
+        pass
+
+
+def make_loops(registry):
+    def timed(calls):
+        for _ in range(calls):
+            with registry.timer("serial_process_seconds"):
+                pass
+
+    def counted(calls):
+        for _ in range(calls):
+            registry.count("serial_bytes_in_total", 64)
+
+    def gauged(calls):
+        for _ in range(calls):
+            registry.set("serial_reader_backlog_bytes", 128, port="COM3")
+
+    return {"timer": timed, "count": counted, "set (labelled)": gauged}
+
+
+def measure(registry, calls, baseline):
+    """{call: ns per call above the empty loop}, best of three."""
+    return {
+        name: max(0.0, min(per_call_ns(loop, calls) for _ in range(3)) - baseline)
+        for name, loop in make_loops(registry).items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--max-disabled-ns", type=float, default=1000)
+    parser.add_argument("--max-enabled-ns", type=float, default=10000)
+    args = parser.parse_args()
+    problems = []
+
+    baseline = min(per_call_ns(empty, args.calls) for _ in range(3))
+    registry = MetricsRegistry()
+    disabled = measure(registry, args.calls, baseline)
+    registry.enabled = True
+    enabled = measure(registry, args.calls, baseline)
+    for name in disabled:
+        print(f"{name:<15} disabled {disabled[name]:7.0f} ns  enabled {enabled[name]:7.0f} ns")
+        if disabled[name] > args.max_disabled_ns:
+            problems.append(f"disabled {name} costs {disabled[name]:.0f} ns per call")
+    if enabled["timer"] > args.max_enabled_ns:
+        problems.append(f"enabled timer costs {enabled['timer']:.0f} ns per call")
+
+    for port in range(16):  # A filled registry: a few ports and upload results
+        registry.set("serial_reader_backlog_bytes", port, port=f"COM{port}")
+        registry.count("firmware_uploads_total", result=("ok", "failed", "skipped")[port % 3])
+        registry.observe("firmware_upload_seconds", port * 1.5, method="uart-bootloader")
+    for name, export in (("prometheus", registry.to_prometheus), ("json", registry.to_json)):
+        started = time.perf_counter()
+        size = len(export())
+        print(f"{name:<15} {(time.perf_counter() - started) * 1000:7.2f} ms for {len(registry.snapshot()['metrics'])} "
+              f"metrics ({size:,} bytes)")
+
+    for problem in problems:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Serial monitor render throughput, measured on frm.py's own SerialMonitor.
+
+Builds the GUI from frm.py (with the headless Tk stand-in, stub_tk.py, when
+there is no display), points the first tab's serial monitor at a
+SimulatedDevice (sim_device.py) on a pty pair and starts monitoring, so the
+lines go through the real SerialReader, read_serial_data, queue_output and
+render_output. The main loop is pumped for --seconds while every render
+frame is timed. The run fails (exit status 1) if a rendered line is lost,
+repeated or out of order, if the reader's ring buffer overran, or if fewer
+lines were rendered than the device sent. Without a display the frame times
+measure the monitor's own code, not Tk's text widget.
+
+    python benchmarks/bench_render.py [--seconds 5] [--rate 2000]
+"""
+import argparse
+import os
+import runpy
+import statistics
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+FRM = os.path.join(ROOT, "frm.py")
+HAS_DISPLAY = bool(os.environ.get("DISPLAY")) or sys.platform in ("win32", "darwin")
+sys.path.insert(0, ROOT)
+
+from sim_device import LINE_PATTERN, SimulatedDevice  # noqa: E402
+
+DRAIN_SECONDS = 2.0  # After the device stops, how long the rest may take to reach the widget
+
+
+class RenderProbe:
+    """Wraps a SerialMonitor's render_output to time its frames and check the lines it renders."""
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.render = monitor.render_output
+        self.frame_times = []
+        self.lines = 0
+        self.next_seq = 0
+        self.problems = []
+        self._partial = ""
+        monitor.render_output = self  # Looked up on the instance whenever a frame is scheduled
+
+    def __call__(self):
+        text = "".join(self.monitor._pending_output)
+        started = time.perf_counter()
+        self.render()
+        self.frame_times.append(time.perf_counter() - started)
+        if self.monitor._pending_output:
+            return  # Not rendered (hidden tab); it stays queued for the next frame
+        *lines, self._partial = (self._partial + text).split("\n")
+        for line in lines:
+            match = LINE_PATTERN.search(line)
+            if not match:
+                continue
+            seq = int(match.group(1))
+            if seq != self.next_seq and len(self.problems) < 5:
+                after = f"after seq={self.next_seq - 1}" if self.next_seq else "first"
+                self.problems.append(f"rendered seq={seq} {after}")
+            self.next_seq = seq + 1
+            self.lines += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rate", type=int, default=2000, help="lines per second the device writes (0: unpaced)")
+    args = parser.parse_args()
+
+    if not HAS_DISPLAY:
+        import stub_tk
+
+        stub_tk.install()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            app = runpy.run_path(FRM, run_name="frm_render")
+        finally:
+            os.chdir(cwd)
+    root, monitor = app["root"], app["serial_monitor_tab1"]
+    app["notebook"].select(0)
+    root.update()
+
+    device = SimulatedDevice.on_pty(rate=args.rate)
+    probe = RenderProbe(monitor)
+    problems = []
+    try:
+        monitor.monitor_mode.set("serial")
+        monitor.port_dropdown.set(device.port)
+        monitor.start_monitoring()
+        if not monitor.is_monitoring:
+            print(f"FAIL: the serial monitor did not open {device.port}")
+            return 1
+        device.start()
+        started = time.perf_counter()
+        while time.perf_counter() - started < args.seconds:
+            root.update()
+            time.sleep(0.001)
+        device.stop()
+        elapsed = time.perf_counter() - started
+        deadline = time.perf_counter() + DRAIN_SECONDS
+        while probe.lines < device.lines_sent and time.perf_counter() < deadline:
+            root.update()
+            time.sleep(0.005)
+        buffer = monitor.reader.buffer
+        if buffer.overruns or buffer.dropped_bytes:
+            problems.append(f"{buffer.overruns} ring buffer overrun(s), {buffer.dropped_bytes:,} bytes dropped")
+        monitor.stop_monitoring()
+    finally:
+        device.close()
+
+    problems += probe.problems
+    if device.error is not None:
+        problems.append(f"device error: {device.error}")
+    if probe.lines < device.lines_sent:
+        problems.append(f"rendered {probe.lines:,} of {device.lines_sent:,} lines")
+    frames = sorted(probe.frame_times)
+    print(
+        f"{probe.lines:,} lines in {elapsed:.2f} s ({probe.lines / elapsed:,.0f} lines/s), {len(frames)} frames: "
+        f"median {statistics.median(frames or [0]) * 1000:.2f} ms, "
+        f"p95 {frames[int(len(frames) * 0.95)] * 1000 if frames else 0:.2f} ms, "
+        f"max {max(frames, default=0) * 1000:.2f} ms{'' if HAS_DISPLAY else ' (stub Tk)'}"
+    )
+    for problem in problems:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
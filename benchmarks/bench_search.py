@@ -0,0 +1,147 @@
+"""Search and filter benchmark on a synthetic 1M-line serial capture.
+
+Feeds the capture into fr_uploader.search.LineIndex in arrival-sized chunks
+(like the monitor's render frames), then times counting matches, jumping
+to the next/previous match from random lines, finding the matches on one
+screen of lines, trimming, and include/exclude filters both as data arrives
+and when re-filtering the whole scrollback. A per-line Python scan, which
+is roughly what a line-by-line Tk text search costs, is timed for
+comparison. It fails (exit status 1) if a result differs from the scan.
+
+    python benchmarks/bench_search.py [--lines 1000000] [--chunk-lines 50] [--jumps 200]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fr_uploader.search import LineFilter, LineIndex, compile_pattern  # noqa: E402
+
+STATES = ["IDLE", "RUN", "HOMING", "RUN", "RUN"]
+FAULT_EVERY = 9973
+
+
+def make_line(i):
+    state = "FAULT code=0x1F" if i % FAULT_EVERY == 0 else STATES[i % len(STATES)]
+    return f"[{i / 1000:10.3f}] seq={i} temp={20 + i % 150 / 10:.1f}C current={i % 300 / 100:.2f}A state={state}\n"
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--chunk-lines", type=int, default=50, help="lines per appended chunk")
+    parser.add_argument("--jumps", type=int, default=200, help="random next/previous searches")
+    args = parser.parse_args()
+
+    chunks = [
+        "".join(make_line(i) for i in range(start, min(start + args.chunk_lines, args.lines)))
+        for start in range(0, args.lines, args.chunk_lines)
+    ]
+    lines = "".join(chunks).split("\n")[:-1]
+    problems = []
+
+    index = LineIndex()
+    started = time.perf_counter()
+    for chunk in chunks:
+        index.append(chunk)
+    ingest_ms = (time.perf_counter() - started) * 1000
+    _, join_ms = timed(index.text)
+    print(f"index:   {len(index) - 1:,} lines ({index.chars / 1e6:.0f} MB) in {ingest_ms:.0f} ms, "
+          f"first join {join_ms:.0f} ms")
+
+    regex = compile_pattern(r"FAULT code=0x[0-9A-F]+")
+    count, count_ms = timed(index.count, regex)
+    expected = [i for i, line in enumerate(lines) if regex.search(line)]
+    _, scan_ms = timed(lambda: [i for i, line in enumerate(lines) if regex.search(line)])
+    print(f"count:   {count:,} matches in {count_ms:.1f} ms (per-line scan: {scan_ms:.0f} ms)")
+    if count != len(expected):
+        problems.append(f"count {count}, expected {len(expected)}")
+
+    rng = random.Random(1)
+    forward = []
+    backward = []
+    for _ in range(args.jumps):
+        line = rng.randrange(len(lines))
+        found, ms = timed(index.find, regex, line, 0)
+        forward.append(ms)
+        want = next((i for i in expected if i >= line), expected[0])
+        if found is None or found[0] != want:
+            problems.append(f"next from line {line}: {found}, expected line {want}")
+        found, ms = timed(index.find, regex, line, 0, True)
+        backward.append(ms)
+        want = next((i for i in reversed(expected) if i < line), expected[-1])
+        if found is None or found[0] != want:
+            problems.append(f"previous from line {line}: {found}, expected line {want}")
+    forward.sort()
+    backward.sort()
+    print(f"next:    median {forward[len(forward) // 2]:.2f} ms, max {forward[-1]:.2f} ms")
+    print(f"prev:    median {backward[len(backward) // 2]:.2f} ms, max {backward[-1]:.2f} ms")
+
+    run = compile_pattern("state=RUN")
+    screen, screen_ms = timed(index.matches, run, len(lines) // 2, len(lines) // 2 + 50)
+    want = [i for i in range(len(lines) // 2, len(lines) // 2 + 51) if "state=RUN" in lines[i]]
+    print(f"screen:  {len(screen)} matches on 51 lines in {screen_ms:.2f} ms")
+    if [line for line, _, _ in screen] != want:
+        problems.append("matches on the visible lines differ from the scan")
+
+    filters = [
+        ("include FAULT", "FAULT", ""),
+        ("include RUN|HOMING", "RUN|HOMING", ""),
+        ("exclude RUN", "", "RUN"),
+        ("temp, not IDLE", "temp", "IDLE"),
+        ("include ^", "^", ""),
+        ("include $", "$", ""),
+    ]
+    for name, include, exclude in filters:
+        line_filter = LineFilter(include, exclude)
+        started = time.perf_counter()
+        passed = sum(len(line_filter.feed(chunk)) for chunk in chunks)
+        arrival_ms = (time.perf_counter() - started) * 1000
+        line_filter = LineFilter(include, exclude)
+        text, rebuild_ms = timed(line_filter.feed, index.text())
+        include_re = re.compile(include) if include else None
+        exclude_re = re.compile(exclude) if exclude else None
+        want = [
+            line for line in lines
+            if (include_re is None or include_re.search(line)) and (exclude_re is None or not exclude_re.search(line))
+        ]
+        print(f"filter:  {name:<20} {len(want):>9,} lines, as data arrives {arrival_ms:5.0f} ms "
+              f"({arrival_ms * 1e6 / len(lines):.0f} ns/line), re-filter all {rebuild_ms:5.0f} ms")
+        if text != "".join(line + "\n" for line in want) or passed != len(text):
+            problems.append(f"filter {name!r} output differs from the scan")
+
+    # Zero-width patterns that also match after a block's last newline
+    for include in ("^$", "^", "$"):
+        for block in ("\n", "\n\n", "a\n\n", "\na\n\nb\n\n"):
+            include_re = re.compile(include)
+            want = "".join(line + "\n" for line in block[:-1].split("\n") if include_re.search(line))
+            got = LineFilter(include).feed(block)
+            if got != want:
+                problems.append(f"filter {include!r} on {block!r}: {got!r}, expected {want!r}")
+
+    _, drop_ms = timed(index.drop, len(lines) // 10)
+    if index.line(0) != lines[len(lines) // 10]:
+        problems.append("drop() removed the wrong lines")
+    found = index.find(regex, 0)
+    if found is None or found[0] + index.dropped != next(i for i in expected if i >= len(lines) // 10):
+        problems.append("find() after drop() is off")
+    print(f"trim:    {len(lines) // 10:,} lines in {drop_ms:.1f} ms")
+
+    for problem in problems[:20]:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
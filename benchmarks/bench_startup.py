@@ -0,0 +1,148 @@
+"""Startup benchmark: how long frm.py takes before its window can appear.
+
+Runs, each in a fresh interpreter, all of frm.py's module body (imports,
+release cache and firmware store, every tab and widget), and the command
+line's --help. It then starts the GUI with --profile-startup and reads the
+profile it prints at the first frame. Without a display both GUI runs use
+the headless Tk stand-in (stub_tk.py), so they still cover every line of
+the startup but leave out Tk's own work.
+
+It fails (exit status 1) if the GUI raises an exception on the way to its
+first frame, if its startup imports a module that is only needed later
+(requests, asyncio, concurrent.futures, packaging, webbrowser, the port
+enumeration) or if the medians exceed the given budgets.
+
+    python benchmarks/bench_startup.py [--runs 5] [--max-gui-ms 400] [--max-cli-ms 400]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+FRM = os.path.join(ROOT, "frm.py")
+STUB_TK = os.path.join(BENCHMARKS, "stub_tk.py")
+HAS_DISPLAY = bool(os.environ.get("DISPLAY")) or sys.platform in ("win32", "darwin")
+DEFERRED_MODULES = (
+    "requests",
+    "urllib3",
+    "asyncio",
+    "concurrent.futures",
+    "packaging",
+    "webbrowser",
+    "serial.tools.list_ports",
+)
+
+# Runs all of frm.py's module body (without its main loop), in the repo directory like the app
+GUI_STARTUP = f"""
+import json, runpy, sys, time
+started = time.perf_counter()
+sys.path[:0] = [{ROOT!r}, {BENCHMARKS!r}]
+if {not HAS_DISPLAY!r}:
+    import stub_tk
+    stub_tk.install()
+runpy.run_path({FRM!r}, run_name="frm_startup")
+elapsed = time.perf_counter() - started
+print(json.dumps({{"ms": elapsed * 1000, "deferred": [m for m in {DEFERRED_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def timed_run(command):
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, timeout=60)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def profile_gui(timeout=30):
+    """Starts the GUI with --profile-startup; returns its output from the profile on, and any traceback."""
+    if not HAS_DISPLAY:
+        result = subprocess.run(
+            [sys.executable, STUB_TK, "--seconds", "1", FRM, "--profile-startup"],
+            cwd=ROOT, capture_output=True, text=True, timeout=timeout,
+        )
+        start = result.stdout.find("Startup profile")
+        profile = result.stdout[start:].rstrip() if start >= 0 else None
+        return profile, result.stderr if result.returncode else None
+    process = subprocess.Popen(
+        [sys.executable, FRM, "--profile-startup"], cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+    killer = threading.Timer(timeout, process.kill)
+    killer.start()
+    lines = []
+    error = []
+    for line in process.stdout:  # Ends when the process is killed
+        if line.startswith("Startup profile") and not lines:
+            killer.cancel()
+            killer = threading.Timer(1.0, process.kill)  # The report is printed at once; then close the window
+            killer.start()
+        if line.startswith("Traceback") or error:
+            error.append(line)
+        elif lines or line.startswith("Startup profile"):
+            lines.append(line.rstrip())
+    killer.cancel()
+    process.wait()
+    return "\n".join(lines) or None, "".join(error) or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-gui-ms", type=float, default=400, help="budget for frm.py before its window")
+    parser.add_argument("--max-cli-ms", type=float, default=400, help="budget for `frm.py --help`, process included")
+    args = parser.parse_args()
+    problems = []
+
+    in_process = []
+    wall = []
+    deferred = set()
+    for _ in range(args.runs):
+        result, ms = timed_run([sys.executable, "-c", GUI_STARTUP])
+        if result.returncode:
+            print(result.stderr)
+            print("FAIL: frm.py raised an exception while building its GUI")
+            return 1
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        in_process.append(report["ms"])
+        wall.append(ms)
+        deferred.update(report["deferred"])
+    gui_ms = statistics.median(in_process)
+    print(f"gui:  {gui_ms:6.1f} ms to build the window (median of {args.runs}{'' if HAS_DISPLAY else ', stub Tk'}), "
+          f"{statistics.median(wall):6.1f} ms with interpreter start")
+    if deferred:
+        problems.append(f"the GUI imports {', '.join(sorted(deferred))} before its window appears")
+    if gui_ms > args.max_gui_ms:
+        problems.append(f"GUI startup {gui_ms:.0f} ms exceeds {args.max_gui_ms:.0f} ms")
+
+    cli = []
+    for _ in range(args.runs):
+        result, ms = timed_run([sys.executable, FRM, "--help"])
+        if result.returncode:
+            print(result.stdout, result.stderr)
+            return 1
+        cli.append(ms)
+    cli_ms = statistics.median(cli)
+    print(f"cli:  {cli_ms:6.1f} ms for `frm.py --help` (median of {args.runs}, process included)")
+    if cli_ms > args.max_cli_ms:
+        problems.append(f"CLI startup {cli_ms:.0f} ms exceeds {args.max_cli_ms:.0f} ms")
+
+    profile, error = profile_gui()
+    print(profile or "gui profile: no report")
+    if error:
+        print(error)
+        problems.append("frm.py --profile-startup raised an exception")
+    elif not profile:
+        problems.append("frm.py --profile-startup printed no profile (did the window open?)")
+
+    for problem in problems:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Telemetry parsing benchmark: recorded 1 kHz streams through the parser, headless.
+
+Records a synthetic session capture (key=value and CSV firmware output at
+--rate lines per second, delivered in serial-sized chunks), replays it
+through fr_uploader.telemetry.TelemetryStage like the GUI does, and times
+parsing, plot decimation and CSV export. It fails (exit status 1) if a
+parsed channel differs from what was generated or the CSV does not read
+back to the same values.
+
+    python benchmarks/bench_telemetry.py [--seconds 60] [--rate 1000] [--width 800]
+"""
+import argparse
+import csv
+import math
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fr_uploader.capture import SessionCapture, SessionRecorder  # noqa: E402
+from fr_uploader.telemetry import TelemetryStage, TelemetryStore, decimate, export_csv, get_parser  # noqa: E402
+from fr_uploader.timestamps import SessionClock  # noqa: E402
+
+CHUNK_MS = 5  # Lines arrive in chunks, as from a USB serial adapter
+
+
+def sample(i, rate):
+    t = i / rate
+    return {
+        "temp": round(40 + 10 * math.sin(t / 5), 2),
+        "current": round(1.5 + math.sin(t * 20) + (3.0 if i % 997 == 0 else 0.0), 3),
+    }
+
+
+def line(kind, i, rate):
+    values = sample(i, rate)
+    if kind == "key=value":
+        return f"[{i / rate:10.3f}] seq={i} temp={values['temp']}C current={values['current']}A state=RUN\n"
+    return f"{i},{values['temp']},{values['current']}\n"
+
+
+def record(path, kind, seconds, rate):
+    recorder = SessionRecorder(path, clock=SessionClock(perf_ns=0))
+    if kind == "csv":
+        recorder.write(b"seq,temp,current\n", stamp=0)
+    per_chunk = max(1, rate * CHUNK_MS // 1000)
+    for first in range(0, seconds * rate, per_chunk):
+        text = "".join(line(kind, i, rate) for i in range(first, min(first + per_chunk, seconds * rate)))
+        recorder.write(text.encode(), stamp=(first + per_chunk) * 1_000_000_000 // rate)
+    recorder.close()
+    return recorder.bytes_written
+
+
+def check(kind, args, folder):
+    problems = []
+    path = os.path.join(folder, f"telemetry-{kind.replace('=', '-')}.frcap")
+    size = record(path, kind, args.seconds, args.rate)
+    count = args.seconds * args.rate
+    stage = TelemetryStage(get_parser(kind), TelemetryStore(capacity=count))
+    started = time.perf_counter()
+    with SessionCapture(path) as capture:
+        for _, time_ns, data in capture.frames():
+            stage.feed(data, time_ns)
+    parse_s = time.perf_counter() - started
+    store = stage.store
+    print(f"{kind:<10} {count:,} lines ({size / 1e6:.1f} MB) parsed in {parse_s * 1000:.0f} ms "
+          f"({count / parse_s:,.0f} lines/s, {parse_s * 1e6 / count:.1f} us/line)")
+
+    for name in ("temp", "current"):
+        channel = store.channels.get(name)
+        _, values = channel.window() if channel else (None, [])
+        expected = [sample(i, args.rate)[name] for i in range(count)]
+        if list(values) != expected:
+            problems.append(f"{kind}: channel {name} has {len(values)} samples that differ from the stream")
+
+    current = store.channels["current"]
+    end = store.last_time
+    times, values = current.window(end - 10)
+    started = time.perf_counter()
+    for _ in range(10):
+        points = decimate(times, values, end - 10, end, args.width)
+    decimate_ms = (time.perf_counter() - started) * 100
+    if max(value for _, value in points) != max(values):
+        problems.append(f"{kind}: decimation lost the spikes")
+    print(f"{'':<10} 10 s window ({len(times):,} samples) -> {len(points)} points in {decimate_ms:.2f} ms")
+
+    csv_path = os.path.join(folder, "telemetry.csv")
+    started = time.perf_counter()
+    rows = export_csv(store, csv_path)
+    export_ms = (time.perf_counter() - started) * 1000
+    with open(csv_path, newline="") as f:
+        table = list(csv.DictReader(f))
+    if len(table) != count or [float(row["temp"]) for row in table] != list(store.channels["temp"].window()[1]):
+        problems.append(f"{kind}: CSV export does not read back to the parsed values")
+    print(f"{'':<10} CSV export of {rows:,} rows in {export_ms:.0f} ms")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--rate", type=int, default=1000, help="lines per second")
+    parser.add_argument("--width", type=int, default=800, help="plot width in pixels")
+    args = parser.parse_args()
+
+    problems = []
+    with tempfile.TemporaryDirectory(prefix="telemetry-") as folder:
+        for kind in ("key=value", "csv"):
+            problems += check(kind, args, folder)
+    for problem in problems:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
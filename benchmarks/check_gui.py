@@ -0,0 +1,143 @@
+"""Check that frm.py's GUI builds and runs its main loop without errors.
+
+Runs frm.py as the application (`__main__`) with the headless Tk stand-in
+(stub_tk.py) in a scratch directory, lets its main loop run for --seconds
+(log bus, port watcher, startup report), then checks that every notebook
+tab was built and that the startup message reached both log panes. It then
+checks for updates in offline mode, opens pyserial's loop:// in the
+Multi-Port Monitor tab, sends a line through it and checks the line's
+per-port and merged views and the log, and uploads a .bin linked behind a
+bootloader from the Custom Upload tab: with the default base address it
+must be refused with its assumed load address and a "flash anyway"
+question (answered No by the stand-in). Any exception in the module body or
+in a scheduled callback fails the run (exit status 1), so a name used
+before it is defined cannot go unnoticed on a machine without a display.
+
+    python benchmarks/check_gui.py [--seconds 2]
+"""
+import argparse
+import os
+import runpy
+import sys
+import tempfile
+import time
+import traceback
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+FRM = os.path.join(ROOT, "frm.py")
+sys.path.insert(0, ROOT)
+
+import stub_tk  # noqa: E402
+from sim_bootloader import synthetic_image  # noqa: E402
+
+EXPECTED_TABS = ("FarmRobo Firmware", "Custom Upload", "Multi-Port Monitor", "Telemetry", "Diagnostics")
+LOOP_PORT = "loop://"
+
+
+def run_loop(root, seconds):
+    """Runs the GUI's scheduled callbacks for a while, as its main loop would."""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        root.update()
+        time.sleep(0.005)
+
+
+def check_update_offline(app, problems):
+    """Clicks Offline Mode and Check for Updates; without cached release data the check is skipped."""
+    app["offline_var"].set(True)
+    app["offline_check"].invoke()
+    app["check_update_button"].invoke()
+    run_loop(app["root"], 0.2)
+    if "Skipping update check" not in app["log_text_tab1"].get("1.0", "end"):
+        problems.append("Check for Updates in offline mode did not log that it skipped the check")
+
+
+def check_multi_port(app, problems):
+    panel = app["multi_port_monitor"]
+    panel.port_listbox.insert("end", LOOP_PORT)
+    panel.port_listbox.selection_set(panel.port_listbox.size() - 1)
+    panel.open_selected()
+    monitor = panel.manager.monitors.get(LOOP_PORT)
+    if monitor is None:
+        problems.append(f"the multi-port monitor did not open {LOOP_PORT}")
+        return
+    monitor.connection.write(b"multi-port check\r\n")
+    run_loop(app["root"], 0.5)
+    if "multi-port check" not in panel.views[LOOP_PORT][1].get("1.0", "end"):
+        problems.append(f"the line sent through {LOOP_PORT} is missing from its multi-port view")
+    if f"[{LOOP_PORT}] multi-port check" not in panel.merged_text.get("1.0", "end"):
+        problems.append(f"the line sent through {LOOP_PORT} is missing from the merged view")
+    panel.close_all()
+    run_loop(app["root"], 0.2)
+    log = app["log_text_tab1"].get("1.0", "end")
+    for message in (f"Monitoring serial port {LOOP_PORT}", f"Closed {LOOP_PORT} (multi-port)"):
+        if message not in log:
+            problems.append(f"the log is missing {message!r}")
+
+
+def check_custom_upload(app, problems):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "R1-APP.bin")
+        with open(path, "wb") as f:
+            f.write(synthetic_image(16 << 10, base=0x0800_8000).data)
+        app["custom_firmware_path"].set(path)
+        app["upload_custom_button"].invoke()
+    run_loop(app["root"], 0.2)
+    log = app["log_text_tab1"].get("1.0", "end")
+    for message in ("was checked as loaded at 0x08000000", "Upload cancelled."):
+        if message not in log:
+            problems.append(f"a .bin linked at 0x08008000 was not refused in the Custom Upload tab ({message!r})")
+    app["base_address_var"].set("bootloader")
+    app["upload_custom_button"].invoke()
+    run_loop(app["root"], 0.2)
+    if "is not an address" not in app["log_text_tab1"].get("1.0", "end"):
+        problems.append("the Custom Upload tab accepted a base address that is not a number")
+    app["base_address_var"].set("0x08000000")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0, help="how long the main loop runs")
+    args = parser.parse_args()
+
+    stub_tk.install(run_seconds=args.seconds)
+    problems = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        sys.argv = [FRM]
+        try:
+            app = runpy.run_path(FRM, run_name="__main__")
+        except BaseException:
+            traceback.print_exc()
+            app = None
+            problems.append("frm.py raised an exception (traceback above)")
+        finally:
+            os.chdir(cwd)
+
+    if app is not None:
+        notebook = app["notebook"]
+        tabs = [notebook.tab(tab, "text") for tab in notebook.tabs()]
+        if tabs != list(EXPECTED_TABS):
+            problems.append(f"notebook tabs are {tabs}, expected {list(EXPECTED_TABS)}")
+        for name in ("log_text_tab1", "log_text_tab2"):
+            if "Started in" not in app[name].get("1.0", "end"):
+                problems.append(f"{name} did not receive the startup message from the log bus")
+        for check in (check_update_offline, check_multi_port, check_custom_upload):
+            try:
+                check(app, problems)
+            except Exception:
+                traceback.print_exc()
+                problems.append(f"{check.__name__} raised an exception (traceback above)")
+        last_line = app["log_text_tab1"].get("1.0", "end-1c").splitlines()[-1:]
+        print(f"built {len(tabs)} tabs; last log line: {''.join(last_line)}")
+
+    for problem in problems:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
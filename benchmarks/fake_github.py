@@ -0,0 +1,245 @@
+"""Fake GitHub release server for download benchmarks, on localhost.
+
+Serves /repos/<owner>/<repo>/releases/latest with an ETag (answering 304
+to a matching If-None-Match, like GitHub) and the release's assets, each
+with its size and "sha256:" digest, under /download/<tag>/<name>. Asset
+requests honour Range headers (206 Partial Content) and carry an ETag (the
+MD5 of the content, as GitHub's storage sends); HEAD returns just the
+headers. --no-digests leaves the digests out, like older releases do.
+Downloads can be
+throttled to --rate KB/s per connection, and --cut-after N drops the
+first request for every asset after N bytes so the resume path runs.
+
+Point fr_uploader.releases.ReleaseCache at it with
+api_url=server.api_url (the harness does), or run `serve` and use the
+printed URL.
+
+    python benchmarks/fake_github.py serve [--port 8765] [--assets 4] [--size-kb 512] [--rate 0] [--cut-after N]
+                                           [--no-digests]
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPO = "farmrobo-dev/FR_Firmware_Uploader"
+SEND_CHUNK = 16 * 1024
+
+
+def synthetic_assets(count=4, size=512 << 10, seed=0):
+    """{name: bytes} of firmware-sized random assets named like the real release."""
+    generator = random.Random(seed)
+    names = ["R1-IT-CAN-BTS.bin", "R1-ET-THR-CYT.bin", "R1-IT-THR-BTS.bin", "R1-ET-CAN-CYT.bin"]
+    names += [f"R1-EXTRA-{number}.bin" for number in range(len(names), count)]
+    return {name: generator.randbytes(size) for name in names[:count]}
+
+
+class FakeGitHub:
+    """An HTTP server on a daemon thread serving one release of `assets` ({name: bytes})."""
+
+    def __init__(
+        self,
+        assets,
+        tag="v9.9.9",
+        repo=DEFAULT_REPO,
+        host="127.0.0.1",
+        port=0,
+        rate=None,
+        cut_after=None,
+        digests=True,
+    ):
+        self.assets = dict(assets)
+        self.digests = digests  # Publish each asset's "sha256:" digest
+        self.tag = tag
+        self.repo = repo
+        self.rate = rate  # Bytes per second per connection, None for unthrottled
+        self.cut_after = cut_after  # Drop each asset's first request after this many bytes
+        self.requests = 0
+        self.not_modified = 0
+        self.partial = 0
+        self.cut = 0
+        self.bytes_sent = 0
+        self._cut_done = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.address = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-github", daemon=True)
+        self._thread.start()
+
+    @property
+    def base_url(self):
+        return "http://{}:{}".format(*self.address)
+
+    @property
+    def api_url(self):
+        """For ReleaseCache(api_url=...); {repo} is filled in by the cache."""
+        return self.base_url + "/repos/{repo}/releases/latest"
+
+    def release(self):
+        return {
+            "tag_name": self.tag,
+            "name": f"Release {self.tag}",
+            "assets": [
+                {
+                    "name": name,
+                    "size": len(data),
+                    **({"digest": "sha256:" + hashlib.sha256(data).hexdigest()} if self.digests else {}),
+                    "browser_download_url": f"{self.base_url}/download/{self.tag}/{name}",
+                }
+                for name, data in self.assets.items()
+            ],
+        }
+
+    @property
+    def etag(self):
+        digest = hashlib.sha256(json.dumps(self.release(), sort_keys=True).encode()).hexdigest()
+        return f'"{digest[:16]}"'
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=1.0)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                path = self.path.split("?", 1)[0]
+                if path == f"/repos/{server.repo}/releases/latest":
+                    self.send_release()
+                elif self.asset_name(path):
+                    self.send_asset(self.asset_name(path))
+                else:
+                    self.send_error(404)
+
+            def do_HEAD(self):
+                with server._lock:
+                    server.requests += 1
+                name = self.asset_name(self.path.split("?", 1)[0])
+                if not name:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_asset_headers(name, len(server.assets[name]))
+
+            def asset_name(self, path):
+                name = path.rsplit("/", 1)[1]
+                return name if path.startswith(f"/download/{server.tag}/") and name in server.assets else None
+
+            def send_asset_headers(self, name, length):
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("ETag", f'"{hashlib.md5(server.assets[name]).hexdigest()}"')
+                self.send_header("Content-Length", str(length))
+                self.end_headers()
+
+            def send_release(self):
+                etag = server.etag
+                if self.headers.get("If-None-Match") == etag:
+                    with server._lock:
+                        server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = json.dumps(server.release()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_asset(self, name):
+                data = server.assets[name]
+                start = 0
+                match = self.headers.get("Range", "")
+                if match.startswith("bytes=") and match[6:].split("-")[0].isdigit():
+                    start = int(match[6:].split("-")[0])
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(data)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    with server._lock:
+                        server.partial += 1
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+                else:
+                    self.send_response(200)
+                self.send_asset_headers(name, len(data) - start)
+
+                with server._lock:
+                    cut = server.cut_after is not None and name not in server._cut_done
+                    if cut:
+                        server._cut_done.add(name)
+                        server.cut += 1
+                end = min(len(data), start + server.cut_after) if cut else len(data)
+                started = time.perf_counter()
+                position = start
+                while position < end:
+                    chunk = data[position:min(end, position + SEND_CHUNK)]
+                    self.wfile.write(chunk)
+                    position += len(chunk)
+                    with server._lock:
+                        server.bytes_sent += len(chunk)
+                    if server.rate:
+                        ahead = (position - start) / server.rate - (time.perf_counter() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+                if cut:
+                    self.close_connection = True  # The client sees a short body
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def serve(args):
+    server = FakeGitHub(
+        synthetic_assets(args.assets, args.size_kb << 10),
+        port=args.port,
+        rate=(args.rate << 10) or None,
+        cut_after=args.cut_after,
+        digests=not args.no_digests,
+    )
+    print(f"Fake GitHub API at {server.api_url.format(repo=server.repo)} (Ctrl+C to stop)", flush=True)
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    print(f"{server.requests} requests, {server.not_modified} not modified, {server.bytes_sent:,} bytes sent")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="serve a synthetic release until Ctrl+C")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--assets", type=int, default=4)
+    serve_parser.add_argument("--size-kb", type=int, default=512)
+    serve_parser.add_argument("--rate", type=int, default=0, help="KB/s per connection (0: unthrottled)")
+    serve_parser.add_argument("--cut-after", type=int, help="drop each asset's first download after this many bytes")
+    serve_parser.add_argument("--no-digests", action="store_true", help="publish assets without a sha256 digest")
+    args = parser.parse_args()
+    return serve(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
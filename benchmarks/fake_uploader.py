@@ -0,0 +1,77 @@
+"""Stand-in for win/massStorageCopy.bat, for flashing without a board or Windows.
+
+Takes the same arguments as the batch script (-I firmware -O target -P port),
+"copies" the image at --rate KB/s (0: at once) while printing
+"<done>/<total> bytes" progress lines like a copy tool, then waits --program
+seconds as the ST-LINK would while it programs the flash. --fail makes it
+report a FAIL.TXT error and exit with status 1; --fail-port fails only for
+that port, and --flaky-port fails the first attempt for that port and
+succeeds after (it remembers attempts in --state-dir). --record FILE
+appends one JSON line per run (port, start and end time), from which a
+test can tell how many uploads ran at once. stress_scheduler.py uses all
+of these to check fr_uploader.scheduler.
+
+Use it through fr_uploader.uploaders.BatchScriptUploader:
+
+    BatchScriptUploader(script=[sys.executable, "benchmarks/fake_uploader.py", "--rate", "1024"])
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+CHUNK_SIZE = 64 * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-I", dest="image", required=True, help="firmware file")
+    parser.add_argument("-O", dest="target", default="NODE_F446ZE", help="volume label")
+    parser.add_argument("-P", dest="port", default="", help="COM port (ignored)")
+    parser.add_argument("--rate", type=float, default=0, help="copy speed in KB/s (0: no delay)")
+    parser.add_argument("--program", type=float, default=0.0, help="seconds the board takes to program itself")
+    parser.add_argument("--fail", action="store_true", help="report a programming failure")
+    parser.add_argument("--fail-port", action="append", default=[], help="fail for this port; repeat for more")
+    parser.add_argument("--flaky-port", action="append", default=[], help="fail the first attempt for this port")
+    parser.add_argument("--state-dir", default=tempfile.gettempdir(), help="where --flaky-port counts attempts")
+    parser.add_argument("--record", help="append a JSON line with the port and start/end times to this file")
+    args = parser.parse_args()
+    started_at = time.time()
+
+    try:
+        total = os.path.getsize(args.image)
+    except OSError as e:
+        print(f"Cannot read {args.image}: {e}", flush=True)
+        return 2
+    print(f"Found {args.target} for {args.port or 'any port'}", flush=True)
+    print(f"Copying {os.path.basename(args.image)} to {args.target}", flush=True)
+    started = time.perf_counter()
+    for done in range(min(CHUNK_SIZE, total), total + CHUNK_SIZE, CHUNK_SIZE):
+        done = min(done, total)
+        if args.rate:
+            ahead = done / (args.rate * 1024) - (time.perf_counter() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+        print(f"{done}/{total} bytes", flush=True)
+        if done == total:
+            break
+    time.sleep(args.program)
+    fail = args.fail or args.port in args.fail_port
+    if args.port in args.flaky_port:
+        marker = os.path.join(args.state_dir, f"fake_uploader-{os.path.basename(args.port)}.attempted")
+        fail = fail or not os.path.exists(marker)
+        open(marker, "a").close()
+    if args.record:
+        with open(args.record, "a") as f:
+            f.write(json.dumps({"port": args.port, "start": started_at, "end": time.time(), "ok": not fail}) + "\n")
+    if fail:
+        print("FAIL.TXT: The interface firmware FAILED to reset/halt the target MCU", flush=True)
+        return 1
+    print(f"Upload complete on {args.target}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
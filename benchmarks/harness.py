@@ -0,0 +1,528 @@
+"""Benchmark harness: simulated boards and servers, results checked against a JSON baseline.
+
+Runs these suites without boards, network access or the Windows batch script:
+
+- monitor: a SimulatedDevice (sim_device.py) on a pty pair streams log
+  lines, binary bursts and resets into fr_uploader's SerialReader, which is
+  drained and decoded every SERIAL_DRAIN_INTERVAL like the GUI does. It
+  measures unpaced throughput and, at a fixed line rate, the latency from
+  the device writing a line to the drain that decodes it.
+- ui: the same stream rendered into a Tk text widget in frames like the
+  serial monitor, while an EventLoopLagProbe measures how late the event
+  loop runs its timers. Skipped without a display.
+- download: firmware.download_firmware fetches a synthetic release from
+  FakeGitHub (fake_github.py) into a temporary firmware store, once
+  unthrottled and once with every asset cut off part-way (and resumed);
+  then the release is fetched again from the store and revalidated (304).
+  A release published without digests is downloaded, and its next release
+  with the same files must be taken from the store (size and ETag).
+- flash: firmware.upload_firmware end to end, validation included, with
+  the batch uploader running fake_uploader.py, with the UART bootloader
+  uploader against sim_bootloader.py, and with a board that reports it
+  already runs the image. A .bin linked behind a bootloader must be
+  refused at the start of flash and land at its --base-address otherwise.
+- console: a send/expect script (fr_uploader.console) run on several
+  SimulatedDevices at once while they stream log lines, measuring each
+  command's round trip and the wall time of the parallel run.
+
+Every metric is compared with the baseline (baselines/default.json). A
+metric fails if it is worse than the baseline by more than its tolerance
+(a fraction of the baseline plus an absolute slack, to ride out noisy CI
+machines). Lost or reordered lines and downloads or flashes that do not
+match their source fail regardless. Record a new baseline with
+--update-baseline after an intended change, or for a new CI machine.
+Exit status 1 on regressions or failures.
+
+    python benchmarks/harness.py [--suites monitor,ui,download,flash,console] [--baseline FILE]
+                                 [--update-baseline] [--output results.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+sys.path.insert(0, BENCHMARKS)
+
+import serial  # noqa: E402
+
+from fake_github import FakeGitHub, synthetic_assets  # noqa: E402
+from fr_uploader import firmware  # noqa: E402
+from fr_uploader.console import parse_script, run_script_on_ports  # noqa: E402
+from fr_uploader.formatting import TextDecoder  # noqa: E402
+from fr_uploader.image import STM32F446  # noqa: E402
+from fr_uploader.metrics import EventLoopLagProbe, MetricsRegistry  # noqa: E402
+from fr_uploader.releases import ReleaseCache  # noqa: E402
+from fr_uploader.serial_reader import SerialReader  # noqa: E402
+from fr_uploader.store import FirmwareStore  # noqa: E402
+from fr_uploader.uploaders import BatchScriptUploader, SerialBootloaderUploader  # noqa: E402
+from sim_bootloader import SimulatedBootloader, synthetic_image  # noqa: E402
+from sim_device import LINE_PATTERN, SimulatedDevice  # noqa: E402
+
+SUITES = ("monitor", "ui", "download", "flash", "console")
+DEFAULT_BASELINE = os.path.join(BENCHMARKS, "baselines", "default.json")
+FAKE_UPLOADER = os.path.join(BENCHMARKS, "fake_uploader.py")
+SERIAL_DRAIN_INTERVAL = 0.030  # SERIAL_DRAIN_INTERVAL_MS in frm.py
+SERIAL_RENDER_INTERVAL = 0.033  # SERIAL_RENDER_INTERVAL_MS in frm.py
+UI_SCROLLBACK_LINES = 5000
+APPLICATION_BASE = 0x0800_8000  # An application behind a 32 KB bootloader
+CONSOLE_SCRIPT = """
+timeout 2
+ping
+expect ^pong$
+version?
+expect ^version=
+fw?
+expect ^fw_sha256=
+"""
+
+
+def quiet(message):
+    pass
+
+
+def percentile(values, fraction):
+    """The value below which `fraction` of values lie (nearest rank); None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Results:
+    """Named measurements, each with the direction that counts as better and its tolerance."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.problems = []
+
+    def add(self, name, value, unit, better="lower", tolerance=0.5, slack=0.0):
+        """Records a metric; it regresses when worse than its baseline by tolerance * baseline + slack."""
+        self.metrics[name] = {"value": round(value, 4), "unit": unit, "better": better, "tolerance": tolerance,
+                              "slack": slack}
+        print(f"  {name:<34} {value:12.3f} {unit}")
+
+    def fail(self, problem):
+        self.problems.append(problem)
+        print(f"  FAIL: {problem}")
+
+
+class LineChecker:
+    """Follows the device's numbered lines: losses, reordering, boots and per-line latency."""
+
+    def __init__(self):
+        self.pending = ""
+        self.expected = 0
+        self.lines = 0
+        self.lost = 0
+        self.reordered = 0
+        self.boots = 0
+        self.other = 0  # Bursts, replies and anything else
+        self.latencies = []  # Milliseconds from the device's write to the decode
+
+    def feed(self, text, now_ns):
+        self.pending += text
+        *lines, self.pending = self.pending.split("\n")
+        for line in lines:
+            match = LINE_PATTERN.match(line)
+            if match is None:
+                if line.startswith("[boot]"):
+                    self.boots += 1
+                    self.expected = 0
+                else:
+                    self.other += 1
+                continue
+            seq = int(match.group(1))
+            if seq > self.expected:
+                self.lost += seq - self.expected
+            elif seq < self.expected:
+                self.reordered += 1
+            self.expected = seq + 1
+            self.lines += 1
+            self.latencies.append((now_ns - int(match.group(2))) / 1e6)
+
+
+def stream(device, seconds, drain_interval=SERIAL_DRAIN_INTERVAL):
+    """Reads the device for `seconds` like the GUI's serial monitor; returns (checker, reader, elapsed)."""
+    connection = serial.serial_for_url(device.port, 115200, timeout=0.05)
+    reader = SerialReader(connection)
+    decoder = TextDecoder()
+    checker = LineChecker()
+    reader.start()
+    device.start()
+    started = time.perf_counter()
+    try:
+        while time.perf_counter() - started < seconds:
+            time.sleep(drain_interval)
+            for _, data in reader.buffer.read_chunks():
+                checker.feed(decoder.decode(data), time.perf_counter_ns())
+        device.stop()
+        elapsed = time.perf_counter() - started
+        time.sleep(0.2)  # Let the reader catch the tail
+        for _, data in reader.buffer.read_chunks():
+            checker.feed(decoder.decode(data), time.perf_counter_ns())
+    finally:
+        reader.stop()
+        connection.close()
+        device.close()
+    return checker, reader, elapsed
+
+
+def run_monitor(results, args):
+    device = SimulatedDevice.on_pty(rate=0, burst_every=0.5, burst_size=4096)
+    checker, reader, elapsed = stream(device, args.seconds)
+    overruns = reader.buffer.overruns
+    results.add("monitor.unpaced_kb_per_s", reader.bytes_received / 1024 / elapsed, "KB/s", better="higher")
+    results.add("monitor.unpaced_lines_per_s", checker.lines / elapsed, "lines/s", better="higher")
+    if checker.lost and not overruns:
+        results.fail(f"monitor: {checker.lost} lines lost without a buffer overrun")
+    if checker.reordered:
+        results.fail(f"monitor: {checker.reordered} lines out of order")
+
+    device = SimulatedDevice.on_pty(rate=args.rate, burst_every=0.5, burst_size=1024, reset_every=args.seconds / 2.5)
+    checker, reader, _ = stream(device, args.seconds)
+    results.add("monitor.latency_p50_ms", percentile(checker.latencies, 0.50), "ms", slack=5)
+    results.add("monitor.latency_p99_ms", percentile(checker.latencies, 0.99), "ms", slack=10)
+    if checker.lost or checker.reordered or reader.buffer.overruns:
+        results.fail(
+            f"monitor at {args.rate} lines/s: {checker.lost} lost, {checker.reordered} reordered, "
+            f"{reader.buffer.overruns} overruns"
+        )
+    if checker.boots != device.resets or checker.lines != device.lines_sent:
+        results.fail(
+            f"monitor: saw {checker.lines} of {device.lines_sent} lines and {checker.boots} of {device.resets} boots"
+        )
+
+
+def has_display():
+    return bool(os.environ.get("DISPLAY")) or sys.platform in ("win32", "darwin")
+
+
+def run_ui(results, args):
+    if not has_display():
+        print("  skipped: no display")
+        return
+    import tkinter as tk
+    from tkinter import scrolledtext
+
+    root = tk.Tk()
+    text = scrolledtext.ScrolledText(root, wrap=tk.NONE, width=100, height=30)
+    text.pack(fill=tk.BOTH, expand=True)
+    root.update()
+    registry = MetricsRegistry(enabled=True)
+    probe = EventLoopLagProbe(root, registry, interval_ms=20)
+    device = SimulatedDevice.on_pty(rate=args.rate, burst_every=0.5, burst_size=1024)
+    connection = serial.serial_for_url(device.port, 115200, timeout=0.05)
+    reader = SerialReader(connection)
+    decoder = TextDecoder()
+    pending = []
+
+    def drain():
+        for _, data in reader.buffer.read_chunks():
+            pending.append(decoder.decode(data))
+        root.after(int(SERIAL_DRAIN_INTERVAL * 1000), drain)
+
+    def render():
+        with registry.timer("render_seconds"):
+            if pending:
+                text.insert(tk.END, "".join(pending))
+                pending.clear()
+                lines = int(text.index("end-1c").split(".")[0])
+                if lines > UI_SCROLLBACK_LINES:
+                    text.delete("1.0", f"{lines - UI_SCROLLBACK_LINES}.0")
+                text.see(tk.END)
+        root.after(int(SERIAL_RENDER_INTERVAL * 1000), render)
+
+    reader.start()
+    device.start()
+    probe.start()
+    drain()
+    render()
+    root.after(int(args.seconds * 1000), root.quit)
+    try:
+        root.mainloop()
+    finally:
+        probe.stop()
+        device.close()
+        reader.stop()
+        connection.close()
+        root.destroy()
+    lag = registry.histogram("tk_event_loop_lag_seconds")
+    frames = registry.histogram("render_seconds")
+    results.add("ui.event_loop_lag_p95_ms", lag.quantile(0.95) * 1000, "ms", slack=5)
+    results.add("ui.event_loop_lag_max_ms", lag.max * 1000, "ms", tolerance=1.0, slack=20)
+    results.add("ui.render_frame_p95_ms", frames.quantile(0.95) * 1000, "ms", slack=2)
+
+
+def check_store(results, store, assets, tag, label):
+    for name, data in assets.items():
+        path = store.resolve(name, tag)
+        if path is None or open(path, "rb").read() != data:
+            results.fail(f"download ({label}): {name} in the store differs from the served asset")
+            return
+
+
+def run_download(results, args):
+    assets = synthetic_assets(4, (args.download_mb << 20) // 4)
+    total_mb = sum(map(len, assets.values())) / (1 << 20)
+    with tempfile.TemporaryDirectory() as folder:
+        server = FakeGitHub(assets)
+        try:
+            cache = ReleaseCache(os.path.join(folder, "release_cache.json"), server.repo, api_url=server.api_url)
+            started = time.perf_counter()
+            tag, listed = firmware.get_latest_firmware_version(cache, quiet)
+            results.add("download.release_ms", (time.perf_counter() - started) * 1000, "ms", slack=20)
+            store = FirmwareStore(os.path.join(folder, "store"))
+            started = time.perf_counter()
+            ok = firmware.download_firmware(store, listed, tag, quiet)
+            elapsed = time.perf_counter() - started
+            if not ok:
+                results.fail("download: the release did not download")
+                return
+            results.add("download.mb_per_s", total_mb / elapsed, "MB/s", better="higher")
+            check_store(results, store, assets, tag, "unthrottled")
+
+            started = time.perf_counter()
+            firmware.download_firmware(store, listed, tag, quiet)
+            results.add("download.stored_ms", (time.perf_counter() - started) * 1000, "ms", slack=20)
+            requests = server.requests
+            started = time.perf_counter()
+            cache.latest(force=True)
+            results.add("download.revalidate_ms", (time.perf_counter() - started) * 1000, "ms", slack=20)
+            if server.requests != requests + 1 or cache.revalidations != 1:
+                results.fail("download: revalidating the release was not a single 304")
+        finally:
+            server.close()
+
+        server = FakeGitHub(assets, cut_after=len(next(iter(assets.values()))) // 3)
+        try:
+            cache = ReleaseCache(os.path.join(folder, "resume_cache.json"), server.repo, api_url=server.api_url)
+            tag, listed = firmware.get_latest_firmware_version(cache, quiet)
+            store = FirmwareStore(os.path.join(folder, "resume_store"))
+            started = time.perf_counter()
+            ok = firmware.download_firmware(store, listed, tag, quiet)
+            elapsed = time.perf_counter() - started
+            if not ok or server.partial != len(assets):
+                results.fail(f"download: {server.partial} of {len(assets)} cut-off assets resumed")
+                return
+            results.add("download.resumed_mb_per_s", total_mb / elapsed, "MB/s", better="higher")
+            check_store(results, store, assets, tag, "resumed")
+        finally:
+            server.close()
+        check_undigested(results, folder, assets)
+
+
+def check_undigested(results, folder, assets):
+    """Files of a release without digests are recognised by size and ETag in the next release."""
+    server = FakeGitHub(assets, tag="v1.0.0", digests=False)
+    try:
+        store = FirmwareStore(os.path.join(folder, "undigested_store"))
+        if not firmware.download_firmware(store, server.release()["assets"], server.tag, quiet):
+            results.fail("download: a release without digests did not download")
+            return
+        check_store(results, store, assets, server.tag, "without digests")
+        server.tag = "v1.0.1"
+        sent = server.bytes_sent
+        firmware.download_firmware(store, server.release()["assets"], server.tag, quiet)
+        if server.bytes_sent != sent:
+            results.fail("download: unchanged files without digests were downloaded again for the next release")
+        check_store(results, store, assets, server.tag, "without digests, next release")
+    finally:
+        server.close()
+
+
+def timed_upload(path, port, uploader, skip_current=False, base_address=None):
+    """(ok, seconds, log lines) for one firmware.upload_firmware call."""
+    lines = []
+    started = time.perf_counter()
+    ok = firmware.upload_firmware(
+        path, port, method=uploader, log=lines.append, skip_current=skip_current, base_address=base_address
+    )
+    return ok, time.perf_counter() - started, lines
+
+
+def check_base_address(results, folder, batch):
+    """An application linked behind a bootloader is refused at the start of flash, and lands where it is linked."""
+    image = synthetic_image(16 << 10, seed=2, base=APPLICATION_BASE)
+    path = os.path.join(folder, "R1-APP.bin")
+    with open(path, "wb") as f:
+        f.write(image.data)
+    ok, _, lines = timed_upload(path, "SIM0", batch)
+    if ok or not any(f"loaded at 0x{STM32F446.flash_base:08X}" in line for line in lines):
+        results.fail("flash: a .bin linked at 0x08008000 was not refused with its assumed load address")
+    ok, _, lines = timed_upload(path, "SIM0", batch, base_address=APPLICATION_BASE)
+    if ok:
+        results.fail("flash: the batch uploader was allowed to write a .bin linked at 0x08008000")
+
+    simulator = SimulatedBootloader(latency=0.001).start()
+    try:
+        uploader = SerialBootloaderUploader(window=8, reset=lambda connection: simulator.reset())
+        ok, _, lines = timed_upload(path, simulator.device, uploader, base_address=APPLICATION_BASE)
+        if not ok or simulator.contents(image) != image.data:
+            results.fail("flash: a .bin with a base address did not land there: " + " | ".join(lines[-3:]))
+    finally:
+        simulator.close()
+
+
+def run_flash(results, args):
+    image = synthetic_image(args.flash_kb << 10)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "R1-SIM.bin")
+        with open(path, "wb") as f:
+            f.write(image.data)
+
+        batch = BatchScriptUploader(script=[sys.executable, FAKE_UPLOADER])
+        runs = [timed_upload(path, "SIM0", batch) for _ in range(3)]
+        if not all(ok for ok, _, _ in runs):
+            results.fail("flash: the batch uploader with fake_uploader.py failed: " + " | ".join(runs[0][2][-3:]))
+        else:
+            results.add("flash.batch_s", statistics.median(seconds for _, seconds, _ in runs), "s", slack=0.2)
+
+        simulator = SimulatedBootloader(latency=0.001).start()
+        try:
+            uploader = SerialBootloaderUploader(window=8, reset=lambda connection: simulator.reset())
+            ok, seconds, lines = timed_upload(path, simulator.device, uploader)
+            if not ok or simulator.contents(image) != image.data:
+                results.fail("flash: the UART bootloader upload failed or left different flash: " + " | ".join(lines[-3:]))
+            else:
+                results.add("flash.uart_s", seconds, "s", tolerance=0.2, slack=0.2)
+                results.add("flash.uart_kb_per_s", image.size / 1024 / seconds, "KB/s", better="higher", tolerance=0.2)
+        finally:
+            simulator.close()
+        check_base_address(results, folder, batch)
+
+        device = SimulatedDevice.on_pty(rate=200, digest=image.sha256).start()
+        try:
+            ok, seconds, lines = timed_upload(path, device.port, batch, skip_current=True)
+            if not ok or any("Copying" in line for line in lines):
+                results.fail("flash: a board already running the image was flashed again")
+            else:
+                results.add("flash.skip_current_s", seconds, "s", slack=0.2)
+        finally:
+            device.close()
+
+
+def run_console(results, args):
+    steps = parse_script(CONSOLE_SCRIPT * args.console_rounds)
+    devices = [SimulatedDevice.on_pty(rate=args.rate, seed=number).start() for number in range(args.console_boards)]
+    try:
+        started = time.perf_counter()
+        outcomes = run_script_on_ports(steps, [device.port for device in devices], log=quiet)
+        elapsed = time.perf_counter() - started
+    finally:
+        for device in devices:
+            device.close()
+    trips = []
+    for port, result in outcomes.items():
+        if isinstance(result, Exception) or not result.ok:
+            detail = result if isinstance(result, Exception) else result.steps[-1].format()
+            results.fail(f"console: the script failed on {port}: {detail}")
+            return
+        trips += result.round_trips
+    results.add("console.parallel_s", elapsed, "s", slack=0.2)
+    results.add("console.round_trip_p50_ms", percentile(trips, 0.50) * 1000, "ms", slack=5)
+    results.add("console.round_trip_p99_ms", percentile(trips, 0.99) * 1000, "ms", slack=10)
+
+
+def compare(baseline, metrics):
+    """Prints current vs. baseline for every metric; returns the names of those that regressed."""
+    reference = baseline.get("metrics", {})
+    regressed = []
+    print(f"\n{'metric':<34} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in metrics.items():
+        value = current["value"]
+        if name not in reference:
+            print(f"{name:<34} {'-':>12} {value:12.3f} {'new':>8}")
+            continue
+        base = reference[name]["value"]
+        worse = value - base if current["better"] == "lower" else base - value
+        allowed = abs(base) * current["tolerance"] + current["slack"]
+        change = f"{(value - base) / base * 100:+.0f}%" if base else "-"
+        status = "REGRESSED" if worse > allowed else ""
+        print(f"{name:<34} {base:12.3f} {value:12.3f} {change:>8} {status}")
+        if status:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"comma-separated, from {', '.join(SUITES)}")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--seconds", type=float, default=3.0, help="duration of each monitor and UI run")
+    parser.add_argument("--rate", type=int, default=2000, help="device log lines per second for latency runs")
+    parser.add_argument("--download-mb", type=int, default=16, help="size of the synthetic release")
+    parser.add_argument("--flash-kb", type=int, default=16, help="size of the image flashed over UART")
+    parser.add_argument("--console-boards", type=int, default=4, help="simulated boards the console script runs on")
+    parser.add_argument("--console-rounds", type=int, default=20, help="times the console script repeats its commands")
+    args = parser.parse_args()
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    results = Results()
+    runners = {
+        "monitor": run_monitor,
+        "ui": run_ui,
+        "download": run_download,
+        "flash": run_flash,
+        "console": run_console,
+    }
+    for suite in suites:
+        print(f"{suite}:")
+        runners[suite](results, args)
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": f"{platform.system()} {platform.machine()}, Python {platform.python_version()}",
+        "config": {
+            key: getattr(args, key)
+            for key in ("seconds", "rate", "download_mb", "flash_kb", "console_boards", "console_rounds")
+        },
+        "metrics": results.metrics,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    regressed = []
+    if args.update_baseline:
+        if results.problems:
+            print("Not updating the baseline: the run had failures.")
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+            if os.path.exists(args.baseline):  # Keep metrics of suites that did not run (e.g. ui without a display)
+                with open(args.baseline) as f:
+                    report["metrics"] = {**json.load(f).get("metrics", {}), **results.metrics}
+            with open(args.baseline, "w") as f:
+                json.dump(report, f, indent=2)
+                f.write("\n")
+            print(f"Baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print(f"Note: the baseline was recorded with {baseline.get('config')}, not {report['config']}")
+        print(f"Baseline: {baseline.get('machine')}, {baseline.get('created')}")
+        regressed = compare(baseline, results.metrics)
+    else:
+        print(f"No baseline at {args.baseline}; record one with --update-baseline.")
+
+    problems = results.problems + [f"{name} regressed" for name in regressed]
+    for problem in problems:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+"""Simulated STM32F446 UART bootloader (AN3155) on a pty pair.
+
+The simulator answers Get, Get Version, Get ID, Read Memory, Write Memory,
+Extended Erase and Go like the ROM bootloader, on 512 KB of simulated flash
+(programming can only clear bits, erasing sets a sector back to 0xFF). It
+paces its input and output at the line rate of the baud rate the host set
+on the pty, adds a fixed latency each way like a USB serial adapter, and
+only syncs at or below --max-baud (and garbles replies above
+--stable-baud). Faults can be injected: a NACK on every Nth write frame, or
+a flipped bit in every Nth programmed block.
+
+`serve` runs it until Ctrl+C and prints the pty to flash, e.g.
+`python frm.py flash --method uart-bootloader --port /dev/pts/5 --file fw.bin`.
+
+`check` flashes synthetic images through fr_uploader.stm32boot with and
+without pipelining and reports the throughput. It fails (exit status 1) if
+the baud negotiation picks the wrong rate, the simulated flash differs from
+the image, NACKed frames are not retried, or a corrupted block is not
+caught by the readback.
+
+    python benchmarks/sim_bootloader.py serve [--max-baud 115200] [--latency 0.002]
+    python benchmarks/sim_bootloader.py check [--size 32768] [--latency 0.002] [--window 8]
+"""
+import argparse
+import hashlib
+import os
+import queue
+import random
+import struct
+import sys
+import termios
+import threading
+import time
+import tty
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fr_uploader.image import STM32F446, FirmwareImage  # noqa: E402
+from fr_uploader.progress import UploadTimings  # noqa: E402
+from fr_uploader.stm32boot import (  # noqa: E402
+    ACK,
+    BITS_PER_BYTE,
+    EXTENDED_ERASE,
+    GET,
+    GET_ID,
+    GET_VERSION,
+    GO,
+    NACK,
+    READ_MEMORY,
+    SYNC,
+    WRITE_MEMORY,
+    BootloaderError,
+    checksum,
+    connect,
+    flash_image,
+)
+from fr_uploader.uploaders import SerialBootloaderUploader  # noqa: E402
+
+VERSION = 0x31
+SPEEDS = {
+    getattr(termios, f"B{rate}"): rate
+    for rate in (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600)
+    if hasattr(termios, f"B{rate}")
+}
+
+
+class Restart(Exception):
+    """Raised inside the protocol loop when the board is reset mid-command."""
+
+
+class SimulatedBootloader:
+    def __init__(self, target=STM32F446, max_baud=115200, stable_baud=None, latency=0.0, program_time=0.001,
+                 erase_time=0.02, nack_every=0, corrupt_every=0):
+        self.target = target
+        self.max_baud = max_baud
+        self.stable_baud = stable_baud or max_baud
+        self.latency = latency  # Seconds each way, like a USB serial adapter's frame timing
+        self.program_time = program_time  # Per write frame
+        self.erase_time = erase_time  # Per sector (2 s on silicon, shortened here)
+        self.nack_every = nack_every
+        self.corrupt_every = corrupt_every
+        self.flash = bytearray(b"\xff") * target.flash_size
+        self.writes = 0
+        self.nacks = 0
+        self.started_at = None  # Address of the last Go
+        self.synced = False
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.device = os.ttyname(self.slave)
+        self._input = queue.Queue()  # (time the bytes are available, bytes)
+        self._output = queue.Queue()  # (time the bytes reach the host, bytes)
+        self._buffer = b""
+        self._ready_at = 0.0
+        self._rx_free_at = 0.0  # When the receive line is idle again
+        self._tx_free_at = 0.0
+        self._sent = 0
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=target_, daemon=True) for target_ in (self._reader, self._writer, self._run)
+        ]
+
+    # --- Line model ---
+    @property
+    def baud_rate(self):
+        return SPEEDS.get(termios.tcgetattr(self.slave)[5], 0)
+
+    def _byte_time(self, count):
+        return count * BITS_PER_BYTE / self.baud_rate if self.baud_rate else 0.0
+
+    def _reader(self):
+        while not self._stop.is_set():
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                return
+            now = time.perf_counter()
+            self._rx_free_at = max(self._rx_free_at, now) + self._byte_time(len(data))
+            self._input.put((self._rx_free_at + self.latency, data))
+
+    def _writer(self):
+        while True:
+            due, data = self._output.get()
+            if data is None:
+                return
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                os.write(self.master, data)
+            except OSError:
+                return
+
+    def _take(self, count):
+        while len(self._buffer) < count:
+            ready_at, data = self._input.get()
+            if data is None:
+                raise EOFError
+            if data is Restart:
+                self._buffer = b""
+                raise Restart
+            self._buffer += data
+            self._ready_at = max(self._ready_at, ready_at)
+        delay = self._ready_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        data, self._buffer = self._buffer[:count], self._buffer[count:]
+        return data
+
+    def _send(self, data):
+        if self.baud_rate > self.stable_baud:
+            data = bytearray(data)
+            for i in range(len(data)):
+                self._sent += 1
+                if self._sent % 50 == 0:
+                    data[i] ^= 0x10  # Bit errors above the stable rate
+            data = bytes(data)
+        self._tx_free_at = max(time.perf_counter(), self._tx_free_at) + self._byte_time(len(data))
+        self._output.put((self._tx_free_at + self.latency, data))
+
+    # --- Protocol ---
+    def reset(self):
+        """Restarts in the bootloader, waiting for 0x7F (flash is kept)."""
+        while not self._input.empty():
+            self._input.get_nowait()
+        self._input.put((0.0, Restart))
+
+    def _address(self):
+        frame = self._take(5)
+        if checksum(frame[:4]) != frame[4]:
+            return None
+        address = struct.unpack(">I", frame[:4])[0]
+        base = self.target.flash_base
+        return address if base <= address < base + self.target.flash_size else None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._serve_commands()
+            except Restart:
+                self.synced = False
+            except EOFError:
+                return
+
+    def _serve_commands(self):
+        while True:
+            code = self._take(1)[0]
+            if not self.synced:
+                if code == SYNC and self.baud_rate <= self.max_baud:
+                    self.synced = True
+                    self._send(bytes([ACK]))
+                continue  # Anything else is noise to the autobaud
+            if self._take(1)[0] != code ^ 0xFF:
+                self._send(bytes([NACK]))
+                continue
+            handler = {
+                GET: self._get, GET_VERSION: self._get_version, GET_ID: self._get_id,
+                READ_MEMORY: self._read_memory, WRITE_MEMORY: self._write_memory,
+                EXTENDED_ERASE: self._extended_erase, GO: self._go,
+            }.get(code)
+            if handler is None:
+                self._send(bytes([NACK]))
+            else:
+                handler()
+
+    def _get(self):
+        commands = bytes([GET, GET_VERSION, GET_ID, READ_MEMORY, GO, WRITE_MEMORY, EXTENDED_ERASE])
+        self._send(bytes([ACK, len(commands), VERSION]) + commands + bytes([ACK]))
+
+    def _get_version(self):
+        self._send(bytes([ACK, VERSION, 0, 0, ACK]))
+
+    def _get_id(self):
+        self._send(bytes([ACK, 1]) + self.target.product_id.to_bytes(2, "big") + bytes([ACK]))
+
+    def _read_memory(self):
+        self._send(bytes([ACK]))
+        address = self._address()
+        if address is None:
+            self._send(bytes([NACK]))
+            return
+        self._send(bytes([ACK]))
+        length, complement = self._take(2)
+        if length ^ complement != 0xFF:
+            self._send(bytes([NACK]))
+            return
+        offset = address - self.target.flash_base
+        self._send(bytes([ACK]) + bytes(self.flash[offset:offset + length + 1]))
+
+    def _write_memory(self):
+        self._send(bytes([ACK]))
+        address = self._address()
+        if address is None:
+            self._send(bytes([NACK]))
+            return
+        self._send(bytes([ACK]))
+        length = self._take(1)[0] + 1
+        data = self._take(length)
+        if checksum(bytes([length - 1]) + data) != self._take(1)[0] or length % 4:
+            self._send(bytes([NACK]))
+            return
+        self.writes += 1
+        if self.nack_every and self.writes % self.nack_every == 0:
+            self.nacks += 1
+            self._send(bytes([NACK]))
+            return
+        if self.corrupt_every and self.writes % self.corrupt_every == 0:
+            data = bytearray(data)
+            i = next((i for i, byte in enumerate(data) if byte), 0)
+            data[i] &= data[i] - 1 if data[i] else 0  # A stuck bit: the lowest set bit stays clear
+        offset = address - self.target.flash_base
+        for i, byte in enumerate(data):
+            self.flash[offset + i] &= byte  # Programming only clears bits
+        time.sleep(self.program_time)
+        self._send(bytes([ACK]))
+
+    def _extended_erase(self):
+        self._send(bytes([ACK]))
+        count = struct.unpack(">H", self._take(2))[0] + 1
+        frame = struct.pack(">H", count - 1) + self._take(2 * count)
+        if checksum(frame) != self._take(1)[0]:
+            self._send(bytes([NACK]))
+            return
+        sectors = struct.unpack(f">{count}H", frame[2:])
+        for sector in sectors:
+            start = sum(self.target.sector_sizes[:sector])
+            size = self.target.sector_sizes[sector]
+            self.flash[start:start + size] = b"\xff" * size
+        time.sleep(self.erase_time * len(sectors))
+        self._send(bytes([ACK]))
+
+    def _go(self):
+        self._send(bytes([ACK]))
+        address = self._address()
+        if address is None:
+            self._send(bytes([NACK]))
+            return
+        self._send(bytes([ACK]))
+        self.started_at = address
+        self.synced = False  # The application runs; a reset brings the bootloader back
+
+    # --- Lifetime ---
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self._input.put((0.0, None))
+        self._output.put((0.0, None))
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def contents(self, image):
+        offset = image.base_address - self.target.flash_base
+        return bytes(self.flash[offset:offset + image.size])
+
+
+def synthetic_image(size, seed=1, base=STM32F446.flash_base):
+    """A random image of size bytes linked at base: a plausible vector table, an erased gap in the middle."""
+    rng = random.Random(seed)
+    vectors = [STM32F446.sram_base + STM32F446.sram_size, base + 0x201] + [base + 0x301] * 14
+    body = bytearray(rng.randbytes(size - 64))
+    gap = len(body) // 2
+    body[gap:gap + 4096] = b"\xff" * 4096  # Hex gaps and padding stay erased and are not sent
+    return FirmwareImage(struct.pack("<16I", *vectors) + bytes(body), base)
+
+
+def run_flash(simulator, image, window, baud_rates=(115200,), verify=True):
+    timings = UploadTimings()
+    bootloader = connect(simulator.device, baud_rates, reset=lambda connection: simulator.reset(), log=lambda _: None)
+    try:
+        result = flash_image(bootloader, image, window=window, verify=verify, log=lambda _: None, timings=timings)
+    finally:
+        bootloader.connection.close()
+    return result
+
+
+def check(args):
+    problems = []
+    image = synthetic_image(args.size)
+
+    simulator = SimulatedBootloader(max_baud=230400, stable_baud=57600, latency=args.latency).start()
+    try:
+        bootloader = connect(
+            simulator.device, (230400, 115200, 57600, 9600), reset=lambda connection: simulator.reset(),
+            timeout=0.3, log=lambda _: None,
+        )
+        bootloader.connection.close()
+        print(f"negotiate: {bootloader.baud_rate} baud (syncs up to 230400, stable up to 57600)")
+        if bootloader.baud_rate != 57600:
+            problems.append(f"negotiated {bootloader.baud_rate} baud instead of 57600")
+    finally:
+        simulator.close()
+
+    for window in (1, args.window):
+        simulator = SimulatedBootloader(latency=args.latency).start()
+        try:
+            result = run_flash(simulator, image, window)
+            print(f"window {window:>2}: {result.summary()} [{result.timings.summary()}]")
+            if simulator.contents(image) != image.data:
+                problems.append(f"window {window}: flash differs from the image")
+        except BootloaderError as e:
+            problems.append(f"window {window}: {e}")
+        finally:
+            simulator.close()
+
+    simulator = SimulatedBootloader(latency=args.latency, nack_every=7).start()
+    try:
+        run_flash(simulator, image, 1, verify=False)
+        print(f"nack:      {simulator.nacks} NACKed frame(s) retried")
+        if simulator.contents(image) != image.data:
+            problems.append("flash differs after NACK retries")
+    except BootloaderError as e:
+        problems.append(f"NACK retries: {e}")
+    finally:
+        simulator.close()
+
+    simulator = SimulatedBootloader(latency=args.latency, corrupt_every=max(2, args.size // 256 // 2)).start()
+    try:
+        run_flash(simulator, image, args.window)
+        problems.append("a corrupted block was not detected")
+    except BootloaderError as e:
+        print(f"corrupt:   {e}")
+        if "verify failed" not in str(e):
+            problems.append(f"unexpected error for a corrupted block: {e}")
+    finally:
+        simulator.close()
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_sim_bootloader.bin")
+    simulator = SimulatedBootloader(latency=args.latency).start()
+    try:
+        with open(path, "wb") as f:
+            f.write(image.data)
+        uploader = SerialBootloaderUploader(window=args.window, reset=lambda connection: simulator.reset())
+        ok = uploader.upload(path, simulator.device, log=lambda _: None)
+        print(f"uploader:  {'ok' if ok else 'failed'}, started at 0x{simulator.started_at or 0:08X}")
+        if not ok or simulator.contents(image) != image.data or simulator.started_at != image.base_address:
+            problems.append("SerialBootloaderUploader did not flash and start the image")
+    finally:
+        simulator.close()
+        os.remove(path)
+
+    for problem in problems:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+def serve(args):
+    simulator = SimulatedBootloader(max_baud=args.max_baud, latency=args.latency).start()
+    print(f"Simulated {simulator.target.name} bootloader on {simulator.device} (Ctrl+C to stop)")
+    last_go = None
+    try:
+        while True:
+            time.sleep(0.5)
+            if simulator.started_at != last_go:
+                last_go = simulator.started_at
+                used = len(simulator.flash.rstrip(b"\xff"))
+                digest = hashlib.sha256(simulator.flash[:used]).hexdigest()
+                print(f"Go 0x{last_go:08X} after {simulator.writes} write frame(s); {used:,} bytes used, "
+                      f"SHA-256 {digest[:16]}...")
+                simulator.reset()
+    except KeyboardInterrupt:
+        pass
+    simulator.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve")
+    serve_parser.add_argument("--max-baud", type=int, default=115200)
+    serve_parser.add_argument("--latency", type=float, default=0.002, help="seconds each way")
+    check_parser = commands.add_parser("check")
+    check_parser.add_argument("--size", type=int, default=32768, help="image size in bytes")
+    check_parser.add_argument("--latency", type=float, default=0.002, help="seconds each way")
+    check_parser.add_argument("--window", type=int, default=8, help="frames in flight when pipelined")
+    args = parser.parse_args()
+    if args.command == "serve":
+        return serve(args)
+    return check(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
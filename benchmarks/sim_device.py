@@ -0,0 +1,244 @@
+"""Simulated R1 board: its serial log output on a pty pair (or any write()).
+
+The device writes numbered log lines such as
+"seq=42 t=1234567890 temp=23.4 current=1.20 state=RUN" at --rate lines per
+second (0: as fast as the port takes them), where t is the
+time.perf_counter_ns() at which the line was written, so a reader in the
+same machine can compute each line's latency. It can also send binary
+bursts (random bytes, no newlines, ended by CRLF) every --burst-every
+seconds and reset every --reset-every seconds: a boot banner, its firmware
+digest, a silent pause, then seq starts over at 0.
+
+On a pty it answers commands written to it, one per line: "fw?" (the
+digest reply fr_uploader.image.query_firmware expects), "ping" ("pong"),
+"version?" and "reset".
+
+`serve` runs it until Ctrl+C and prints the pty to open, e.g.
+`python frm.py monitor --port /dev/pts/5 --timestamps`. The benchmark
+harness (benchmarks/harness.py) drives it in-process.
+
+    python benchmarks/sim_device.py serve [--rate 1000] [--burst-every 5] [--reset-every 30]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+FIRMWARE_VERSION = "v1.4.2-sim"
+BOOT_BANNER = "[boot] R1 firmware {version} reset={resets}"
+LINE_PATTERN = re.compile(r"seq=(\d+) t=(\d+) ")
+WRITE_BATCH = 64  # Lines per write when unpaced
+
+
+class SimulatedDevice:
+    """Writes an R1 board's log stream with write(data) on a background thread.
+
+    Use SimulatedDevice.on_pty() for a pty pair whose other end (`port`)
+    the host opens like a serial port; it also answers commands.
+    """
+
+    def __init__(
+        self,
+        write,
+        rate=1000,
+        burst_every=None,
+        burst_size=4096,
+        reset_every=None,
+        reset_pause=0.2,
+        digest=None,
+        seed=0,
+    ):
+        self.write = write
+        self.rate = rate  # Lines per second, 0 for as fast as write() returns
+        self.burst_every = burst_every
+        self.burst_size = burst_size
+        self.reset_every = reset_every
+        self.reset_pause = reset_pause
+        self.digest = digest  # SHA-256 hex digest reported for "fw?"
+        self.port = None
+        self.lines_sent = 0  # Since the start, over all resets
+        self.bytes_sent = 0
+        self.bursts = 0
+        self.resets = 0
+        self.commands = 0
+        self.error = None
+        self._random = random.Random(seed)
+        self._seq = 0
+        self._master = None
+        self._write_lock = threading.Lock()
+        self._reset_requested = threading.Event()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    @classmethod
+    def on_pty(cls, **options):
+        """A device behind a new pty pair; open device.port on the host side (POSIX only)."""
+        import tty
+
+        master, slave = os.openpty()
+        tty.setraw(master)
+        tty.setraw(slave)
+        device = cls(None, **options)
+        device.write = device._write_master
+        device.port = os.ttyname(slave)
+        device._master = master
+        device._slave = slave  # Kept open so the pty survives the host closing and reopening it
+        return device
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._emit, name="sim-device", daemon=True)]
+        if self._master is not None:
+            self._threads.append(threading.Thread(target=self._answer, name="sim-device-input", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stops writing; the pty stays open until close()."""
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+
+    def close(self):
+        self.stop()
+        if self._master is not None:
+            os.close(self._master)
+            os.close(self._slave)
+            self._master = None
+
+    def reset(self):
+        """Reboots the device at its next line."""
+        self._reset_requested.set()
+
+    def _write_master(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._master, view):]
+
+    def _send(self, data):
+        with self._write_lock:
+            self.write(data)
+            self.bytes_sent += len(data)
+
+    def _line(self):
+        seq = self._seq
+        self._seq += 1
+        return (
+            f"seq={seq} t={time.perf_counter_ns()} temp={20 + seq % 100 / 10:.1f} "
+            f"current={1 + seq % 50 / 100:.2f} state=RUN\r\n"
+        )
+
+    def _boot(self):
+        self.resets += 1
+        self._seq = 0
+        banner = BOOT_BANNER.format(version=FIRMWARE_VERSION, resets=self.resets) + "\r\n"
+        if self.digest:
+            banner += f"fw_sha256={self.digest}\r\n"
+        self._send(b"\r\n" + banner.encode("ascii"))
+        self._stop_event.wait(self.reset_pause)
+
+    def _emit(self):
+        started = time.perf_counter()
+        next_burst = started + self.burst_every if self.burst_every else None
+        next_reset = started + self.reset_every if self.reset_every else None
+        due = 0  # Lines written since `started` or the last pause
+        try:
+            while not self._stop_event.is_set():
+                now = time.perf_counter()
+                if self._reset_requested.is_set() or (next_reset and now >= next_reset):
+                    self._reset_requested.clear()
+                    self._boot()
+                    started, due = time.perf_counter(), 0
+                    next_reset = started + self.reset_every if self.reset_every else None
+                    continue
+                if next_burst and now >= next_burst:
+                    burst = self._random.randbytes(self.burst_size).replace(b"\n", b"\x00")
+                    self._send(burst + b"\r\n")
+                    self.bursts += 1
+                    next_burst = now + self.burst_every
+                if self.rate:
+                    count = int((now - started) * self.rate) - due
+                    if count <= 0:
+                        time.sleep(min(0.001, 1 / self.rate))
+                        continue
+                else:
+                    count = WRITE_BATCH
+                self._send("".join(self._line() for _ in range(count)).encode("ascii"))
+                due += count
+                self.lines_sent += count
+        except OSError as e:
+            if not self._stop_event.is_set():
+                self.error = e
+
+    def _answer(self):
+        """Reads commands from the host side of the pty and replies to them."""
+        import select
+
+        pending = b""
+        while not self._stop_event.is_set():
+            readable, _, _ = select.select([self._master], [], [], 0.05)
+            if not readable:
+                continue
+            try:
+                pending += os.read(self._master, 4096)
+            except OSError:
+                return
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                self.commands += 1
+                reply = self.reply(line.strip().decode("ascii", "replace"))
+                if reply:
+                    self._send(f"{reply}\r\n".encode("ascii"))
+
+    def reply(self, command):
+        """The device's answer to one command line (None for none)."""
+        if command == "fw?":
+            return f"fw_sha256={self.digest}" if self.digest else "fw_sha256=unknown"
+        if command == "ping":
+            return "pong"
+        if command == "version?":
+            return f"version={FIRMWARE_VERSION}"
+        if command == "reset":
+            self.reset()
+            return "ok"
+        return f"ERR unknown command: {command}" if command else None
+
+
+def serve(args):
+    device = SimulatedDevice.on_pty(
+        rate=args.rate, burst_every=args.burst_every, burst_size=args.burst_size, reset_every=args.reset_every,
+        digest=args.digest,
+    ).start()
+    print(f"Simulated R1 board on {device.port} ({args.rate} lines/s; Ctrl+C to stop)", flush=True)
+    try:
+        while True:
+            time.sleep(1.0)
+            if device.error:
+                print(f"Stopped: {device.error}")
+                return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        device.close()
+    print(f"Sent {device.lines_sent:,} lines, {device.bursts} bursts, {device.resets} resets")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="run the device on a pty until Ctrl+C")
+    serve_parser.add_argument("--rate", type=int, default=1000, help="log lines per second (0: unpaced)")
+    serve_parser.add_argument("--burst-every", type=float, help="seconds between binary bursts")
+    serve_parser.add_argument("--burst-size", type=int, default=4096)
+    serve_parser.add_argument("--reset-every", type=float, help="seconds between resets")
+    serve_parser.add_argument("--digest", help="SHA-256 to report for fw? (the image the board runs)")
+    args = parser.parse_args()
+    return serve(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Stress test for fr_uploader.logbus: many threads logging while one drains.
+
+Each writer thread logs numbered messages as fast as it can while the main
+thread drains the bus on a timer, like the Tk loop does. The run fails
+(exit status 1) if any record is lost, duplicated or reordered within its
+thread, or if the JSON-lines file does not hold exactly the same records.
+
+    python benchmarks/stress_logbus.py [--threads 8] [--messages 20000] [--interval 0.05]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fr_uploader.logbus import LogBus  # noqa: E402
+
+
+def writer(bus, index, count, start):
+    start.wait()
+    for i in range(count):
+        bus.log(f"writer-{index} {i}")
+
+
+def check_order(messages, threads, count):
+    """Returns a list of problems with the delivered messages."""
+    problems = []
+    seen = {}
+    for message in messages:
+        name, number = message.split()
+        number = int(number)
+        expected = seen.get(name, -1) + 1
+        if number != expected:
+            problems.append(f"{name}: got {number}, expected {expected}")
+        seen[name] = number
+    for index in range(threads):
+        last = seen.get(f"writer-{index}", -1)
+        if last != count - 1:
+            problems.append(f"writer-{index}: last message {last}, expected {count - 1}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--messages", type=int, default=20000, help="messages per thread")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between drains")
+    parser.add_argument("--max-bytes", type=int, default=1 << 20, help="log file rotation size")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="logbus-")
+    log_path = os.path.join(folder, "stress.jsonl")
+    bus = LogBus()
+    bus.open_file(log_path, max_bytes=args.max_bytes, backup_count=1000)
+    delivered = []
+    sink_threads = set()
+
+    def sink(records):
+        sink_threads.add(threading.get_ident())
+        delivered.extend(record.message for record in records)
+
+    bus.add_sink(sink)
+
+    start = threading.Event()
+    threads = [
+        threading.Thread(target=writer, args=(bus, i, args.messages, start), name=f"writer-{i}")
+        for i in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    began = time.perf_counter()
+    start.set()
+    drain_times = []
+    while any(thread.is_alive() for thread in threads) or bus.backlog:
+        time.sleep(args.interval)
+        t = time.perf_counter()
+        bus.drain()
+        drain_times.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - began
+    bus.close_file()
+
+    total = args.threads * args.messages
+    problems = check_order(delivered, args.threads, args.messages)
+    if len(delivered) != total:
+        problems.append(f"delivered {len(delivered)} records, expected {total}")
+    if sink_threads != {threading.get_ident()}:
+        problems.append("sink was called from a thread other than the draining one")
+
+    files = sorted(glob.glob(log_path + "*"))
+    file_messages = []
+    # Oldest backups (highest suffix) first, the active file last
+    for path in sorted(files, key=lambda p: -int(p.rsplit(".", 1)[1]) if p[-1].isdigit() else 0):
+        with open(path, "r", encoding="utf-8") as f:
+            file_messages.extend(json.loads(line)["message"] for line in f)
+    if file_messages != delivered:
+        problems.append(f"log file holds {len(file_messages)} records that differ from the delivered ones")
+
+    stats = bus.stats()
+    print(
+        f"{total} records from {args.threads} threads in {elapsed:.2f} s ({total / elapsed:,.0f}/s), "
+        f"{stats['drains']} drains, largest batch {stats['largest_batch']}, "
+        f"slowest drain {max(drain_times) * 1000:.1f} ms, {len(files)} log file(s)"
+    )
+    for problem in problems[:20]:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Stress test for fr_uploader.monitors: several ports written concurrently.
+
+Opens --ports pty pairs (POSIX) plus one pyserial loop:// port, writes
+numbered lines to all of them from separate threads and polls a
+MonitorManager like the GUI does. It fails (exit status 1) if a port loses
+or reorders lines, if the merged view is not in time order, or if a ring
+buffer overruns.
+
+    python benchmarks/stress_monitors.py [--ports 3] [--lines 5000] [--interval 0.03]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fr_uploader.monitors import MonitorManager  # noqa: E402
+
+
+def write_lines(write, tag, count):
+    for i in range(count):
+        write(f"{tag} seq={i} temp=23.4\n".encode())
+        if i % 20 == 0:
+            time.sleep(0.0005)  # Let the writers interleave
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ports", type=int, default=3, help="number of pty pairs")
+    parser.add_argument("--lines", type=int, default=5000, help="lines per port")
+    parser.add_argument("--interval", type=float, default=0.03, help="seconds between polls")
+    args = parser.parse_args()
+
+    manager = MonitorManager(log=print)
+    writers = []
+    if hasattr(os, "openpty"):
+        for i in range(args.ports):
+            master, slave = os.openpty()
+            name = os.ttyname(slave)
+            manager.open_serial(name)
+            writers.append((name, lambda data, fd=master: os.write(fd, data)))
+    loop = manager.open_serial("loop://")
+    writers.append(("loop://", loop.connection.write))
+
+    threads = [
+        threading.Thread(target=write_lines, args=(write, name, args.lines), daemon=True) for name, write in writers
+    ]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    per_port = {name: [] for name, _ in writers}
+    merged = []
+    poll_times = []
+    deadline = began + 30
+    while time.perf_counter() < deadline and len(merged) < len(writers) * args.lines:
+        time.sleep(args.interval)
+        t = time.perf_counter()
+        lines, merged_lines = manager.poll()
+        poll_times.append(time.perf_counter() - t)
+        merged.extend(merged_lines)
+        for name, port_lines in lines.items():
+            per_port[name].extend(port_lines)
+    elapsed = time.perf_counter() - began
+    stats = manager.stats()
+    manager.close_all()
+
+    problems = []
+    for name, lines in per_port.items():
+        expected = [f"{name} seq={i} temp=23.4" for i in range(args.lines)]
+        if [line for _, _, line in lines] != expected:
+            problems.append(f"{name}: {len(lines)} lines, lost or out of order")
+        if stats[name]["overruns"]:
+            problems.append(f"{name}: {stats[name]['overruns']} overruns")
+    inversions = sum(1 for a, b in zip(merged, merged[1:]) if b[0] < a[0])
+    if inversions:
+        problems.append(f"merged view has {inversions} lines out of time order")
+    if len(merged) != len(writers) * args.lines:
+        problems.append(f"merged view has {len(merged)} of {len(writers) * args.lines} lines")
+
+    total_bytes = sum(s["bytes_received"] for s in stats.values())
+    print(
+        f"{len(merged)} lines ({total_bytes / 1e6:.2f} MB) from {len(writers)} ports in {elapsed:.2f} s, "
+        f"{len(poll_times)} polls, slowest poll {max(poll_times) * 1000:.1f} ms"
+    )
+    for problem in problems:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
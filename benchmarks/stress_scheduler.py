@@ -0,0 +1,146 @@
+"""Check for fr_uploader.scheduler with the stub uploader script (fake_uploader.py).
+
+Flashes a batch of fake ports through FlashScheduler and BatchScriptUploader
+running fake_uploader.py: one port always fails, one fails its first attempt
+and succeeds on the retry, the rest succeed. The run fails (exit status 1)
+unless every job ends with the expected status and number of attempts, the
+stub never ran more than --workers uploads at once (and did reach that many),
+and the BatchReport's counts and summary agree. It also checks that a batch
+of several ports is refused, before anything is flashed, for uploaders that
+cannot tell boards apart (massStorageCopy.bat, or two mass-storage volumes
+with the board's label).
+
+    python benchmarks/stress_scheduler.py [--ports 8] [--workers 3] [--program 0.3]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+from fr_uploader.scheduler import FAILED, SUCCEEDED, FlashJob, FlashScheduler  # noqa: E402
+from fr_uploader.uploaders import DEFAULT_TARGET, BatchScriptUploader, MassStorageUploader  # noqa: E402
+
+FAKE_UPLOADER = os.path.join(BENCHMARKS, "fake_uploader.py")
+
+
+def max_overlap(runs):
+    """Most stub runs that were in progress at the same moment."""
+    events = sorted([(run["start"], 1) for run in runs] + [(run["end"], -1) for run in runs])
+    running = peak = 0
+    for _, change in events:
+        running += change
+        peak = max(peak, running)
+    return peak
+
+
+def check_port_addressing(folder, firmware_path, problems):
+    """Uploaders that do not address the port must not run a batch of several ports."""
+    record = os.path.join(folder, "unaddressed.jsonl")
+    uploader = BatchScriptUploader(script=[sys.executable, FAKE_UPLOADER, "--record", record])
+    try:
+        FlashScheduler(uploader).run(FlashJob(port, firmware_path) for port in ("SIM0", "SIM1"))
+        problems.append("a batch script that ignores -P was allowed to flash two ports")
+    except ValueError:
+        pass
+    if os.path.exists(record):
+        problems.append("the refused batch still ran the uploader")
+    if uploader.check_ports(["SIM0"]) is not None:
+        problems.append("a single port was refused for a batch script that ignores -P")
+
+    roots = [os.path.join(folder, "board-a"), os.path.join(folder, "board-b")]
+    for root in roots:
+        os.makedirs(os.path.join(root, DEFAULT_TARGET))
+    mass_storage = MassStorageUploader(mount_roots=roots, timeout=1.0)
+    if mass_storage.check_ports(["SIM0", "SIM1"]) is None:
+        problems.append("mass-storage uploads by volume label were allowed to flash two ports")
+    lines = []
+    if mass_storage.upload(firmware_path, "SIM0", log=lines.append):
+        problems.append("a mass-storage upload picked one of two volumes with the board's label")
+    copied = [root for root in roots if os.listdir(os.path.join(root, DEFAULT_TARGET))]
+    if copied:
+        problems.append(f"the firmware was copied to {copied} although the board could not be told apart")
+    if MassStorageUploader(mount_roots=roots[:1]).find_volume("SIM0") != os.path.join(roots[0], DEFAULT_TARGET):
+        problems.append("the only volume with the board's label was not found")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ports", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--program", type=float, default=0.3, help="seconds each stub upload takes")
+    args = parser.parse_args()
+    if args.ports < 3:
+        parser.error("--ports must be at least 3")
+
+    ports = [f"SIM{number}" for number in range(args.ports)]
+    failing, flaky = ports[1], ports[2]
+    with tempfile.TemporaryDirectory() as folder:
+        firmware_path = os.path.join(folder, "R1-SIM.bin")
+        with open(firmware_path, "wb") as f:
+            f.write(os.urandom(64 << 10))
+        record = os.path.join(folder, "runs.jsonl")
+        uploader = BatchScriptUploader(
+            script=[
+                sys.executable, FAKE_UPLOADER, "--program", str(args.program), "--record", record,
+                "--fail-port", failing, "--flaky-port", flaky, "--state-dir", folder,
+            ],
+            addresses_port=True,  # Unlike massStorageCopy.bat, the stub goes by -P
+        )
+        lock = threading.Lock()
+        notified = set()
+
+        def on_progress(job):
+            with lock:
+                notified.add(job.port)
+
+        scheduler = FlashScheduler(
+            uploader, max_workers=args.workers, retries=1, retry_delay=0.05, on_progress=on_progress
+        )
+        report = scheduler.run(FlashJob(port, firmware_path) for port in ports)
+        with open(record) as f:
+            runs = [json.loads(line) for line in f]
+        problems = []
+        check_port_addressing(folder, firmware_path, problems)
+
+    expected = {port: (SUCCEEDED, 1) for port in ports}
+    expected[failing] = (FAILED, 2)
+    expected[flaky] = (SUCCEEDED, 2)
+    for job in report.jobs:
+        status, attempts = expected[job.port]
+        if (job.status, job.attempts) != (status, attempts):
+            problems.append(
+                f"{job.port}: {job.status} after {job.attempts} attempt(s), expected {status} after {attempts}"
+            )
+        if job.status == SUCCEEDED and job.percent != 100.0:
+            problems.append(f"{job.port}: progress ended at {job.percent}, expected 100")
+    if [job.port for job in report.failed] != [failing]:
+        problems.append(f"report lists {[job.port for job in report.failed]} as failed, expected [{failing!r}]")
+    if len(report.succeeded) != args.ports - 1:
+        problems.append(f"report lists {len(report.succeeded)} succeeded, expected {args.ports - 1}")
+    if f"Flashed {args.ports - 1}/{args.ports} boards" not in report.summary():
+        problems.append("the summary's last line does not count the flashed boards")
+    if notified != set(ports):
+        problems.append(f"on_progress was not called for {sorted(set(ports) - notified)}")
+    if len(runs) != args.ports + 2:
+        problems.append(f"the stub ran {len(runs)} times, expected {args.ports + 2} (two retries)")
+    peak = max_overlap(runs)
+    if peak > args.workers:
+        problems.append(f"{peak} uploads ran at once, the limit is {args.workers}")
+    elif peak < min(args.workers, args.ports):
+        problems.append(f"at most {peak} uploads ran at once; expected {args.workers} in parallel")
+
+    print(report.summary())
+    print(f"{len(runs)} stub runs, at most {peak} at once (limit {args.workers})")
+    for problem in problems:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Stress test for fr_uploader.serial_reader: no byte loss at 250000 baud.
+
+Writes a pseudo-random pattern through pyserial's loop:// port while a
+SerialReader reads it into its RingBuffer and the main thread drains the
+buffer every SERIAL_DRAIN_INTERVAL, like the serial monitor does. loop://
+itself has no line speed, so the writer paces the data to the 8N1 rate of
+--baud (baud / 10 bytes per second) times --speed; the default runs 8x
+faster than a real 250000 baud link to keep the run short. The run fails
+(exit status 1) if the drained stream differs from the pattern in any byte,
+or if the ring buffer reports an overrun.
+
+    python benchmarks/stress_serial_reader.py [--baud 250000] [--mb 4] [--speed 8] [--buffer-kb 1024]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serial  # noqa: E402
+
+from fr_uploader.serial_reader import DEFAULT_BUFFER_SIZE, SerialReader  # noqa: E402
+
+SERIAL_DRAIN_INTERVAL = 0.030  # SERIAL_DRAIN_INTERVAL_MS in frm.py
+WRITE_INTERVAL = 0.001  # The writer sends this many seconds' worth of data at a time
+
+
+def writer(connection, pattern, bytes_per_second, start):
+    """Writes pattern in small pieces, no faster than bytes_per_second."""
+    start.wait()
+    piece = max(1, int(bytes_per_second * WRITE_INTERVAL))
+    began = time.perf_counter()
+    for position in range(0, len(pattern), piece):
+        ahead = position / bytes_per_second - (time.perf_counter() - began)
+        if ahead > 0:
+            time.sleep(ahead)
+        connection.write(pattern[position:position + piece])
+
+
+def first_difference(received, pattern):
+    for index, (got, want) in enumerate(zip(received, pattern)):
+        if got != want:
+            return index
+    return min(len(received), len(pattern))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baud", type=int, default=250000)
+    parser.add_argument("--mb", type=float, default=4.0, help="size of the pattern in MB")
+    parser.add_argument("--speed", type=float, default=8.0, help="multiple of the baud rate's line speed")
+    parser.add_argument("--buffer-kb", type=int, default=DEFAULT_BUFFER_SIZE >> 10, help="ring buffer size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pattern = random.Random(args.seed).randbytes(int(args.mb * (1 << 20)))
+    bytes_per_second = args.baud / 10 * args.speed
+    connection = serial.serial_for_url("loop://", args.baud, timeout=0.05)
+    reader = SerialReader(connection, buffer_size=args.buffer_kb << 10)
+    start = threading.Event()
+    thread = threading.Thread(
+        target=writer, args=(connection, pattern, bytes_per_second, start), name="loop-writer", daemon=True
+    )
+    reader.start()
+    thread.start()
+
+    received = bytearray()
+    drain_times = []
+    largest_drain = 0
+    deadline = time.perf_counter() + len(pattern) / bytes_per_second * 2 + 10
+    began = time.perf_counter()
+    start.set()
+    while len(received) < len(pattern) and time.perf_counter() < deadline and reader.error is None:
+        time.sleep(SERIAL_DRAIN_INTERVAL)
+        t = time.perf_counter()
+        drained = 0
+        for _, data in reader.buffer.read_chunks():
+            received += data
+            drained += len(data)
+        drain_times.append(time.perf_counter() - t)
+        largest_drain = max(largest_drain, drained)
+    elapsed = time.perf_counter() - began
+    reader.stop()
+    thread.join(timeout=1.0)
+    received += reader.buffer.read()
+    connection.close()
+
+    problems = []
+    if reader.error is not None:
+        problems.append(f"reader error: {reader.error}")
+    if reader.buffer.overruns or reader.buffer.dropped_bytes:
+        problems.append(f"{reader.buffer.overruns} overrun(s), {reader.buffer.dropped_bytes} bytes dropped")
+    if len(received) != len(pattern):
+        problems.append(f"received {len(received):,} bytes, expected {len(pattern):,}")
+    if received != pattern:
+        problems.append(f"the stream differs from the pattern from byte {first_difference(received, pattern):,}")
+
+    print(
+        f"{len(received):,} bytes through loop:// in {elapsed:.2f} s "
+        f"({len(received) / elapsed / 1024:,.0f} KB/s, {args.speed:g}x {args.baud} baud), "
+        f"{len(drain_times)} drains, largest {largest_drain:,} bytes, "
+        f"slowest {max(drain_times, default=0) * 1000:.2f} ms"
+    )
+    for problem in problems:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
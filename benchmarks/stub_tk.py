@@ -0,0 +1,773 @@
+"""Headless stand-in for tkinter, so frm.py's module body runs without a display.
+
+install() puts a small fake `tkinter` package (ttk, scrolledtext,
+messagebox, filedialog) into sys.modules; import frm.py after it. Widgets
+keep their options and children, variables keep their values, and Text
+keeps its content with enough of the Tk index syntax ("1.0", "end-1c",
+"1.0 + 5 chars", "@0,0") for Scrollback and the serial monitor. after()
+callbacks run on Tk.update() or mainloop() when they are due; an exception
+in one propagates instead of being printed and swallowed as Tk does, so a
+check fails on it. Dialogs answer None or False.
+
+The stub knows only the methods frm.py calls: a call to anything else is an
+AttributeError, as a typo would be under real Tk. Nothing is drawn, so
+timings measured under it leave out Tk's own layout and rendering.
+
+    python benchmarks/stub_tk.py [--seconds 2] frm.py [args...]   # runs a script under the stub
+"""
+import argparse
+import heapq
+import itertools
+import os
+import re
+import runpy
+import sys
+import time
+import types
+
+CONSTANTS = {
+    "END": "end", "INSERT": "insert", "NORMAL": "normal", "DISABLED": "disabled", "HIDDEN": "hidden",
+    "BOTH": "both", "X": "x", "Y": "y", "NONE": "none", "WORD": "word", "CHAR": "char",
+    "LEFT": "left", "RIGHT": "right", "TOP": "top", "BOTTOM": "bottom", "CENTER": "center",
+    "N": "n", "S": "s", "E": "e", "W": "w", "NE": "ne", "NW": "nw", "SE": "se", "SW": "sw",
+    "NS": "ns", "EW": "ew", "NSEW": "nsew", "HORIZONTAL": "horizontal", "VERTICAL": "vertical",
+    "SINGLE": "single", "BROWSE": "browse", "MULTIPLE": "multiple", "EXTENDED": "extended",
+}
+INDEX_PATTERN = re.compile(r"^(?P<base>[^ +-]+)\s*(?P<offsets>(?:\s*[+-]\s*\d+\s*c(?:hars?)?)*)\s*$")
+OFFSET_PATTERN = re.compile(r"([+-])\s*(\d+)")
+FAKE_WIDTH, FAKE_HEIGHT = 800, 400
+
+_ids = itertools.count(1)
+_default_root = None
+
+
+class TclError(Exception):
+    pass
+
+
+class Misc:
+    """What every widget and the root share: options, children, after()."""
+
+    def __init__(self, master=None, **options):
+        if master is None and not isinstance(self, Tk):
+            master = _default_root
+        self.master = master
+        self.children = {}
+        self._options = dict(options)
+        self._bindings = {}
+        self._mapped = False
+        self._destroyed = False
+        if master is not None:
+            master.children[f"!{type(self).__name__.lower()}{next(_ids)}"] = self
+
+    # Options
+    def configure(self, cnf=None, **options):
+        if isinstance(cnf, dict):
+            options.update(cnf)
+        elif isinstance(cnf, str):
+            return self._options.get(cnf)
+        self._options.update(options)
+
+    config = configure
+
+    def cget(self, key):
+        return self._options.get(key, "")
+
+    def __setitem__(self, key, value):
+        self._options[key] = value
+
+    def __getitem__(self, key):
+        return self._options.get(key, "")
+
+    def keys(self):
+        return list(self._options)
+
+    # Scheduling, delegated to the root
+    def _root(self):
+        widget = self
+        while widget.master is not None:
+            widget = widget.master
+        return widget
+
+    def after(self, ms, func=None, *args):
+        if func is None:
+            time.sleep(ms / 1000)
+            return None
+        return self._root()._schedule(ms, func, args)
+
+    def after_idle(self, func, *args):
+        return self._root()._schedule(0, func, args)
+
+    def after_cancel(self, job):
+        self._root()._cancelled.add(job)
+
+    def update(self):
+        self._root()._run_due()
+
+    update_idletasks = update
+
+    # Geometry managers
+    def _map(self, *args, **options):
+        self._mapped = True
+
+    def _unmap(self, *args, **options):
+        self._mapped = False
+
+    pack = grid = place = pack_configure = grid_configure = _map
+    pack_forget = grid_forget = grid_remove = place_forget = _unmap
+
+    def _noop(self, *args, **options):
+        return None
+
+    columnconfigure = rowconfigure = grid_columnconfigure = grid_rowconfigure = _noop
+    pack_propagate = grid_propagate = _noop
+    focus = focus_set = focus_force = lift = lower = tkraise = _noop
+    event_generate = grab_set = grab_release = bell = _noop
+    option_add = clipboard_clear = clipboard_append = _noop
+
+    def bind(self, sequence=None, func=None, add=None):
+        if sequence is None:
+            return list(self._bindings)
+        self._bindings.setdefault(sequence, []).append(func)
+        return f"bind{next(_ids)}"
+
+    bind_all = bind
+
+    def unbind(self, sequence, funcid=None):
+        self._bindings.pop(sequence, None)
+
+    def winfo_viewable(self):
+        return 0 if self._destroyed else 1
+
+    def winfo_exists(self):
+        return 0 if self._destroyed else 1
+
+    def winfo_ismapped(self):
+        return 1 if self._mapped else 0
+
+    def winfo_width(self):
+        return FAKE_WIDTH
+
+    def winfo_height(self):
+        return FAKE_HEIGHT
+
+    winfo_reqwidth = winfo_width
+    winfo_reqheight = winfo_height
+
+    def winfo_toplevel(self):
+        widget = self
+        while not isinstance(widget, (Tk, Toplevel)) and widget.master is not None:
+            widget = widget.master
+        return widget
+
+    def winfo_children(self):
+        return list(self.children.values())
+
+    def nametowidget(self, name):
+        return name if isinstance(name, Misc) else None
+
+    def destroy(self):
+        for child in list(self.children.values()):
+            child.destroy()
+        self.children.clear()
+        self._destroyed = True
+        if self.master is not None:
+            for key, child in list(self.master.children.items()):
+                if child is self:
+                    del self.master.children[key]
+
+
+class Wm:
+    """Window manager methods of Tk and Toplevel."""
+
+    def _noop(self, *args, **options):
+        return None
+
+    title = geometry = minsize = maxsize = resizable = iconbitmap = iconphoto = Misc._noop
+    transient = attributes = deiconify = withdraw = iconify = Misc._noop
+
+    def protocol(self, name=None, func=None):
+        self._options[f"protocol:{name}"] = func
+
+    def wait_window(self, window=None):
+        return None
+
+    def state(self, newstate=None):
+        return "normal" if newstate is None else None
+
+
+class Tk(Misc, Wm):
+    def __init__(self, *args, **options):
+        global _default_root
+        super().__init__(None, **options)
+        self._jobs = []  # (due, sequence, id, func, args) heap
+        self._cancelled = set()
+        self._quit = False
+        if _default_root is None:
+            _default_root = self
+
+    def _schedule(self, ms, func, args):
+        job = f"after#{next(_ids)}"
+        heapq.heappush(self._jobs, (time.monotonic() + ms / 1000, next(_ids), job, func, args))
+        return job
+
+    def _run_due(self):
+        """Runs the callbacks that are due, including ones they schedule for now."""
+        now = time.monotonic()
+        while self._jobs and self._jobs[0][0] <= now and not self._destroyed:
+            _, _, job, func, args = heapq.heappop(self._jobs)
+            if job in self._cancelled:
+                self._cancelled.discard(job)
+                continue
+            func(*args)
+
+    def mainloop(self, n=0):
+        """Runs callbacks until quit() or destroy(), or for `run_seconds` given to install()."""
+        deadline = time.monotonic() + _run_seconds if _run_seconds is not None else None
+        self._quit = False
+        while not (self._quit or self._destroyed):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            self._run_due()
+            due = self._jobs[0][0] if self._jobs else time.monotonic() + 0.05
+            if deadline is not None:
+                due = min(due, deadline)
+            time.sleep(min(max(due - time.monotonic(), 0), 0.05))
+
+    def quit(self):
+        self._quit = True
+
+    def report_callback_exception(self, exc, value, traceback):
+        raise value
+
+    def destroy(self):
+        global _default_root
+        super().destroy()
+        if _default_root is self:
+            _default_root = None
+
+
+class Toplevel(Misc, Wm):
+    pass
+
+
+class Widget(Misc):
+    pass
+
+
+class Frame(Widget):
+    pass
+
+
+class Label(Widget):
+    pass
+
+
+class Button(Widget):
+    def invoke(self):
+        command = self._options.get("command")
+        return command() if command else None
+
+
+class Checkbutton(Button):
+    pass
+
+
+class Radiobutton(Button):
+    pass
+
+
+class Scrollbar(Widget):
+    def set(self, first, last):
+        self._options["position"] = (first, last)
+
+
+class Progressbar(Widget):
+    def start(self, interval=None):
+        pass
+
+    def stop(self):
+        pass
+
+
+class Scale(Widget):
+    def get(self):
+        variable = self._options.get("variable")
+        return variable.get() if variable is not None else self._options.get("from_", 0)
+
+    def set(self, value):
+        variable = self._options.get("variable")
+        if variable is not None:
+            variable.set(value)
+
+
+class Style:
+    def __init__(self, master=None):
+        self._themes = ["default", "clam", "alt", "classic"]
+
+    def theme_names(self):
+        return tuple(self._themes)
+
+    def theme_use(self, name=None):
+        return "default" if name is None else None
+
+    def configure(self, style, **options):
+        return None
+
+    def map(self, style, **options):
+        return None
+
+    def lookup(self, style, option, state=None, default=None):
+        return default
+
+
+class Entry(Widget):
+    """Entry, Combobox and Spinbox: a string value, or the textvariable's."""
+
+    def __init__(self, master=None, **options):
+        super().__init__(master, **options)
+        self._value = ""
+
+    def get(self):
+        variable = self._options.get("textvariable")
+        return str(variable.get()) if variable is not None else self._value
+
+    def set(self, value):
+        variable = self._options.get("textvariable")
+        if variable is not None:
+            variable.set(value)
+        else:
+            self._value = str(value)
+
+    def delete(self, first, last=None):
+        value = self.get()
+        start = len(value) if first == "end" else int(first)
+        end = start + 1 if last is None else (len(value) if last == "end" else int(last))
+        self.set(value[:start] + value[end:])
+
+    def insert(self, index, text):
+        value = self.get()
+        position = len(value) if index == "end" else int(index)
+        self.set(value[:position] + str(text) + value[position:])
+
+    def icursor(self, index):
+        pass
+
+    def selection_range(self, start, end):
+        pass
+
+    def current(self, index=None):
+        values = list(self._options.get("values") or ())
+        if index is None:
+            return values.index(self.get()) if self.get() in values else -1
+        self.set(values[index])
+
+
+class Combobox(Entry):
+    pass
+
+
+class Spinbox(Entry):
+    pass
+
+
+class Listbox(Widget):
+    def __init__(self, master=None, **options):
+        super().__init__(master, **options)
+        self._items = []
+        self._selected = set()
+
+    def insert(self, index, *items):
+        position = len(self._items) if index == "end" else int(index)
+        self._items[position:position] = [str(item) for item in items]
+
+    def delete(self, first, last=None):
+        start = int(first)
+        end = len(self._items) if last == "end" else (start + 1 if last is None else int(last) + 1)
+        del self._items[start:end]
+        self._selected = {i for i in self._selected if i < len(self._items)}
+
+    def get(self, first, last=None):
+        if last is None:
+            return self._items[int(first)]
+        end = len(self._items) if last == "end" else int(last) + 1
+        return tuple(self._items[int(first):end])
+
+    def size(self):
+        return len(self._items)
+
+    def curselection(self):
+        return tuple(sorted(self._selected))
+
+    def selection_set(self, first, last=None):
+        end = len(self._items) - 1 if last == "end" else (int(first) if last is None else int(last))
+        self._selected.update(range(int(first), end + 1))
+
+    def selection_clear(self, first, last=None):
+        end = int(first) if last is None else (len(self._items) - 1 if last == "end" else int(last))
+        self._selected.difference_update(range(int(first), end + 1))
+
+    select_set = selection_set
+    select_clear = selection_clear
+
+    def see(self, index):
+        pass
+
+
+class Notebook(Widget):
+    def __init__(self, master=None, **options):
+        super().__init__(master, **options)
+        self._tabs = []
+        self._current = None
+
+    def add(self, child, **options):
+        self._tabs.append(child)
+        child._options.update({f"tab:{key}": value for key, value in options.items()})
+        if self._current is None:
+            self._current = child
+
+    def tabs(self):
+        return tuple(self._tabs)
+
+    def select(self, tab_id=None):
+        if tab_id is None:
+            return self._current if self._current is not None else ""
+        self._current = self.nametowidget(tab_id) or self._tabs[int(tab_id)]
+        for func in self._bindings.get("<<NotebookTabChanged>>", []):
+            func(None)
+
+    def index(self, tab_id):
+        if tab_id == "end":
+            return len(self._tabs)
+        if tab_id == "current":
+            return self._tabs.index(self._current)
+        return self._tabs.index(self.nametowidget(tab_id))
+
+    def tab(self, tab_id, option=None, **options):
+        child = self._tabs[tab_id] if isinstance(tab_id, int) else self.nametowidget(tab_id)
+        if options:
+            child._options.update({f"tab:{key}": value for key, value in options.items()})
+            return None
+        return child._options.get(f"tab:{option}") if option else None
+
+    def forget(self, tab_id):
+        child = self._tabs[tab_id] if isinstance(tab_id, int) else self.nametowidget(tab_id)
+        self._tabs.remove(child)
+        if self._current is child:
+            self._current = self._tabs[0] if self._tabs else None
+
+
+class PanedWindow(Widget):
+    def add(self, child, **options):
+        pass
+
+
+class Treeview(Widget):
+    def __init__(self, master=None, **options):
+        super().__init__(master, **options)
+        self._items = {}
+        self._selection = ()
+
+    def heading(self, column, **options):
+        pass
+
+    def column(self, column, **options):
+        pass
+
+    def insert(self, parent, index, iid=None, **options):
+        iid = iid if iid is not None else f"I{next(_ids):03d}"
+        self._items[iid] = dict(options)
+        return iid
+
+    def item(self, iid, option=None, **options):
+        if options:
+            self._items[iid].update(options)
+            return None
+        return self._items[iid].get(option) if option else dict(self._items[iid])
+
+    def set(self, iid, column=None, value=None):
+        values = list(self._items[iid].get("values", ()))
+        columns = list(self._options.get("columns", ()))
+        if column is not None and value is not None:
+            index = columns.index(column)
+            values += [""] * (index + 1 - len(values))
+            values[index] = value
+            self._items[iid]["values"] = values
+        return None
+
+    def delete(self, *iids):
+        for iid in iids:
+            self._items.pop(iid, None)
+
+    def get_children(self, item=None):
+        return tuple(self._items)
+
+    def exists(self, iid):
+        return iid in self._items
+
+    def selection(self):
+        return self._selection
+
+    def selection_set(self, *items):
+        self._selection = tuple(items)
+
+    def see(self, iid):
+        pass
+
+
+class Canvas(Widget):
+    def _create(self, *args, **options):
+        return next(_ids)
+
+    create_line = create_text = create_rectangle = create_oval = create_polygon = _create
+
+    def delete(self, *items):
+        pass
+
+    def coords(self, item, *coords):
+        return []
+
+    def itemconfigure(self, item, **options):
+        pass
+
+    itemconfig = itemconfigure
+
+
+class Text(Widget):
+    """The text widget's content, tags and the index syntax frm.py uses."""
+
+    def __init__(self, master=None, **options):
+        super().__init__(master, **options)
+        self._text = ""  # Without the newline Tk always keeps at the end
+        self._tags = {}
+        self._marks = {"insert": 0}
+
+    # Indices are offsets into self._text + "\n"
+    def _offset(self, index):
+        if isinstance(index, (int, float)):
+            index = str(index)
+        match = INDEX_PATTERN.match(index.strip())
+        if not match:
+            raise TclError(f'bad text index "{index}"')
+        base = match.group("base")
+        end = len(self._text) + 1
+        if base == "end":
+            offset = end
+        elif base in self._marks:
+            offset = self._marks[base]
+        elif base.startswith("@"):
+            y = int(base[1:].split(",")[1])
+            offset = 0 if y <= 0 else len(self._text)
+        elif "." in base:
+            line, column = base.split(".", 1)
+            offset = self._line_start(int(line))
+            if offset is None:
+                offset = end
+            else:
+                line_end = self._text.find("\n", offset)
+                line_end = len(self._text) if line_end < 0 else line_end
+                offset = min(offset + (line_end - offset if column == "end" else int(column)), line_end)
+        else:
+            raise TclError(f'bad text index "{index}"')
+        for sign, amount in OFFSET_PATTERN.findall(match.group("offsets")):
+            offset += int(amount) if sign == "+" else -int(amount)
+        return min(max(offset, 0), end)
+
+    def _line_start(self, line):
+        if line <= 1:
+            return 0
+        position = -1
+        for _ in range(line - 1):
+            position = self._text.find("\n", position + 1)
+            if position < 0:
+                return None
+        return position + 1
+
+    def index(self, index):
+        offset = self._offset(index)
+        full = self._text + "\n"
+        line = full.count("\n", 0, offset) + 1
+        column = offset - (full.rfind("\n", 0, offset) + 1)
+        return f"{line}.{column}"
+
+    def insert(self, index, chars, *tags):
+        if self.cget("state") == "disabled":
+            return
+        offset = min(self._offset(index), len(self._text))
+        self._text = self._text[:offset] + chars + self._text[offset:]
+
+    def delete(self, index1, index2=None):
+        if self.cget("state") == "disabled":
+            return
+        start = min(self._offset(index1), len(self._text))
+        end = start + 1 if index2 is None else min(self._offset(index2), len(self._text))
+        if end > start:
+            self._text = self._text[:start] + self._text[end:]
+
+    def get(self, index1, index2=None):
+        full = self._text + "\n"
+        start = self._offset(index1)
+        end = start + 1 if index2 is None else self._offset(index2)
+        return full[start:end]
+
+    def count(self, index1, index2, *options):
+        return (self._offset(index2) - self._offset(index1),)
+
+    def see(self, index):
+        self._offset(index)
+
+    def mark_set(self, name, index):
+        self._marks[name] = self._offset(index)
+
+    def tag_configure(self, name, **options):
+        self._tags.setdefault(name, [])
+
+    tag_config = tag_configure
+
+    def tag_add(self, name, index1, index2=None):
+        self._tags.setdefault(name, []).append((self.index(index1), self.index(index2 or index1)))
+
+    def tag_remove(self, name, index1, index2=None):
+        self._tags[name] = []
+
+    def tag_ranges(self, name):
+        return tuple(index for pair in self._tags.get(name, []) for index in pair)
+
+    def tag_raise(self, name, above=None):
+        pass
+
+    def tag_bind(self, name, sequence, func, add=None):
+        pass
+
+    def xview(self, *args):
+        return (0.0, 1.0)
+
+    def yview(self, *args):
+        return (0.0, 1.0)
+
+    yview_moveto = xview_moveto = Misc._noop
+    edit_reset = edit_separator = Misc._noop
+
+
+class ScrolledText(Text):
+    pass
+
+
+class Variable:
+    _default = ""
+
+    def __init__(self, master=None, value=None, name=None):
+        self._value = self._default if value is None else value
+        self._traces = []
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+        for mode, callback in list(self._traces):
+            callback(str(id(self)), "", mode)
+
+    def trace_add(self, mode, callback):
+        modes = (mode,) if isinstance(mode, str) else tuple(mode)
+        if "write" in modes:
+            self._traces.append(("write", callback))
+        return f"trace{next(_ids)}"
+
+    def trace_remove(self, mode, name):
+        pass
+
+
+class StringVar(Variable):
+    _default = ""
+
+    def get(self):
+        return str(self._value)
+
+
+class IntVar(Variable):
+    _default = 0
+
+    def get(self):
+        return int(self._value)
+
+
+class DoubleVar(Variable):
+    _default = 0.0
+
+    def get(self):
+        return float(self._value)
+
+
+class BooleanVar(Variable):
+    _default = False
+
+    def get(self):
+        return bool(self._value)
+
+
+def _answer_none(*args, **options):
+    return None
+
+
+def _answer_no(*args, **options):
+    return False
+
+
+def _answer_empty(*args, **options):
+    return ""
+
+
+_run_seconds = None
+
+
+def install(run_seconds=None):
+    """Makes `import tkinter` return the stub; mainloop() returns after run_seconds if given."""
+    global _run_seconds
+    _run_seconds = run_seconds
+    tkinter = types.ModuleType("tkinter")
+    tkinter.__dict__.update(CONSTANTS)
+    for cls in (TclError, Misc, Tk, Toplevel, Widget, Frame, Label, Button, Checkbutton, Radiobutton, Scrollbar,
+                Entry, Listbox, Canvas, Text, Scale, Variable, StringVar, IntVar, DoubleVar, BooleanVar):
+        setattr(tkinter, cls.__name__, cls)
+    tkinter.Spinbox = Spinbox
+    tkinter.PanedWindow = PanedWindow
+
+    ttk = types.ModuleType("tkinter.ttk")
+    for cls in (Frame, Label, Button, Checkbutton, Radiobutton, Scrollbar, Entry, Combobox, Spinbox, Notebook,
+                PanedWindow, Progressbar, Scale, Style, Treeview):
+        setattr(ttk, cls.__name__, cls)
+    scrolledtext = types.ModuleType("tkinter.scrolledtext")
+    scrolledtext.ScrolledText = ScrolledText
+    messagebox = types.ModuleType("tkinter.messagebox")
+    for name in ("showinfo", "showwarning", "showerror"):
+        setattr(messagebox, name, _answer_none)
+    for name in ("askyesno", "askokcancel", "askretrycancel", "askyesnocancel", "askquestion"):
+        setattr(messagebox, name, _answer_no)
+    filedialog = types.ModuleType("tkinter.filedialog")
+    for name in ("askopenfilename", "asksaveasfilename", "askdirectory"):
+        setattr(filedialog, name, _answer_empty)
+
+    for name, module in (("ttk", ttk), ("scrolledtext", scrolledtext), ("messagebox", messagebox),
+                         ("filedialog", filedialog)):
+        setattr(tkinter, name, module)
+        sys.modules[f"tkinter.{name}"] = module
+    sys.modules["tkinter"] = tkinter
+    return tkinter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, help="return from mainloop() after this long")
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    install(run_seconds=args.seconds)
+    sys.argv = [args.script] + args.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    runpy.run_path(args.script, run_name="__main__")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Fake UART-over-Wi-Fi bridge for the TCP monitor mode.
+
+`serve` streams synthetic firmware log lines to every client, dropping the
+connection every --drop-after lines to exercise reconnects, and echoes back
+whatever a client sends. Point the GUI's TCP monitor (or
+`python frm.py monitor --tcp 127.0.0.1:2323`) at it.
+
+`check` starts the bridge in-process and runs fr_uploader.tcp_reader against
+it. It fails (exit status 1) if any line arrives corrupted or out of order
+within a connection, or if the reader does not reconnect.
+
+    python benchmarks/tcp_bridge.py serve [--port 2323] [--rate 2000] [--drop-after 5000]
+    python benchmarks/tcp_bridge.py check [--lines 20000] [--drop-after 4000]
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fr_uploader.tcp_reader import TcpReader  # noqa: E402
+
+LINE_PATTERN = re.compile(rb"^\[(\d+)\] seq=(\d+) temp=\d+\.\d C current=\d\.\d\dA state=\w+$")
+STATES = ["IDLE", "RUN", "HOMING", "FAULT"]
+
+
+def log_line(connection, seq):
+    return (
+        f"[{connection}] seq={seq} temp={20 + seq % 150 / 10:.1f} C "
+        f"current={seq % 300 / 100:.2f}A state={STATES[seq % len(STATES)]}\n"
+    ).encode()
+
+
+class Bridge:
+    def __init__(self, rate=0, drop_after=0, limit=0):
+        self.rate = rate  # lines per second per client, 0 = as fast as possible
+        self.drop_after = drop_after  # lines per connection, 0 = never drop
+        self.limit = limit  # total lines over all connections, 0 = unlimited
+        self.connections = 0
+        self.sent = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        connection = self.connections
+        echo = asyncio.ensure_future(self.echo(reader, writer))
+        seq = 0
+        try:
+            while True:
+                if self.limit and self.sent >= self.limit:
+                    await writer.drain()
+                    await asyncio.sleep(3600)  # Stay connected so the echo still works
+                if self.drop_after and seq >= self.drop_after:
+                    break
+                writer.write(log_line(connection, seq))
+                seq += 1
+                self.sent += 1
+                if self.rate:
+                    await asyncio.sleep(1 / self.rate)
+                elif seq % 100 == 0:
+                    await writer.drain()
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            echo.cancel()
+            writer.close()
+
+    @staticmethod
+    async def echo(reader, writer):
+        while True:
+            data = await reader.read(1024)
+            if not data:
+                return
+            writer.write(b"echo: " + data)
+
+
+async def serve(args):
+    bridge = Bridge(args.rate, args.drop_after)
+    server = await asyncio.start_server(bridge.handle, args.host, args.port)
+    print(f"Fake bridge on {args.host}:{args.port} ({args.rate or 'max'} lines/s, drop after {args.drop_after or 'never'})")
+    async with server:
+        await server.serve_forever()
+
+
+def check(args):
+    loop = asyncio.new_event_loop()
+    bridge = Bridge(0, args.drop_after, args.lines)
+    server = loop.run_until_complete(asyncio.start_server(bridge.handle, "127.0.0.1", 0))
+    port = server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    messages = []
+    reader = TcpReader("127.0.0.1", port, log=messages.append)
+    reader.start()
+    received = bytearray()
+    began = time.perf_counter()
+    deadline = began + args.timeout
+    while time.perf_counter() < deadline and received.count(b"\n") < args.lines:
+        time.sleep(0.03)
+        for _, data in reader.buffer.read_chunks():
+            received += data
+    elapsed = time.perf_counter() - began
+    echo_sent = reader.write(b"ping\n")
+    time.sleep(0.2)
+    for _, data in reader.buffer.read_chunks():
+        received += data
+    stats = reader.stats()
+    reader.stop()
+    loop.call_soon_threadsafe(server.close)
+
+    problems = []
+    expected = {}
+    lines = 0
+    for line in bytes(received).split(b"\n")[:-1]:
+        if line == b"echo: ping":
+            continue
+        match = LINE_PATTERN.match(line)
+        if not match:
+            problems.append(f"corrupted line {line[:60]!r}")
+            continue
+        connection, seq = int(match.group(1)), int(match.group(2))
+        if seq != expected.get(connection, 0):
+            problems.append(f"connection {connection}: got seq {seq}, expected {expected.get(connection, 0)}")
+        expected[connection] = seq + 1
+        lines += 1
+    if lines < args.lines:
+        problems.append(f"received {lines} of {args.lines} lines")
+    if args.drop_after and args.lines > args.drop_after and stats["reconnects"] == 0:
+        problems.append("the reader never reconnected")
+    if not echo_sent or b"echo: ping" not in received:
+        problems.append("write() was not echoed back")
+    if stats["overruns"]:
+        problems.append(f"{stats['overruns']} ring buffer overruns")
+
+    print(
+        f"{lines} lines ({len(received) / 1e6:.1f} MB) over {len(expected)} connection(s) in {elapsed:.2f} s, "
+        f"{stats['reconnects']} reconnects"
+    )
+    for message in messages[:5]:
+        print("  reader:", message)
+    for problem in problems[:20]:
+        print("FAIL:", problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=2323)
+    serve_parser.add_argument("--rate", type=float, default=2000, help="lines per second, 0 = unthrottled")
+    serve_parser.add_argument("--drop-after", type=int, default=5000, help="lines per connection, 0 = never")
+    check_parser = commands.add_parser("check")
+    check_parser.add_argument("--lines", type=int, default=20000)
+    check_parser.add_argument("--drop-after", type=int, default=4000)
+    check_parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    return check(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
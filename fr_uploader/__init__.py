@@ -0,0 +1 @@
+"""Core helpers for the FR Firmware Uploader (no GUI dependencies)."""
@@ -0,0 +1,5 @@
+import sys
+
+from fr_uploader.cli import main
+
+sys.exit(main())
@@ -0,0 +1,322 @@
+"""On-disk capture of the serial stream: raw rotating files and timestamped session captures."""
+import mmap
+import os
+import struct
+import threading
+import time
+
+from fr_uploader.timestamps import SessionClock
+
+DEFAULT_CAPTURE_MAX_BYTES = 64 << 20  # 64 MiB per file
+DEFAULT_CAPTURE_BACKUPS = 9
+
+
+class RotatingCaptureFile:
+    """Appends raw bytes to a file, rotating it like logging's RotatingFileHandler.
+
+    capture.bin is the active file; full files are shifted to capture.bin.1,
+    capture.bin.2, ... and the oldest beyond backup_count is deleted.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_CAPTURE_MAX_BYTES, backup_count=DEFAULT_CAPTURE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.bytes_written = 0
+        self.rotations = 0
+        self._lock = threading.Lock()
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+
+    def write(self, data):
+        with self._lock:
+            if self._file is None:
+                return
+            if self.max_bytes and self._size and self._size + len(data) > self.max_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._size += len(data)
+            self.bytes_written += len(data)
+
+    def _rotate(self):
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, "wb")
+        self._size = 0
+        self.rotations += 1
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# --- Session captures ---
+#
+# A session capture keeps every received chunk with its arrival time:
+#
+#   header   "FRCAP\0", version (u16), session start in wall-clock ns (u64)
+#   frames   time since the session start in ns (u64), length (u32), data
+#
+# The sidecar <capture>.idx holds "FRIDX\0", version (u16) and then one
+# entry per SESSION_INDEX_INTERVAL bytes of frames: file offset, time,
+# stream position and frame number (4 x u64). Readers map both files, so
+# seeking a multi-GB capture touches only the index and one interval of
+# frames. All integers are little-endian.
+
+SESSION_MAGIC = b"FRCAP\x00"
+SESSION_INDEX_MAGIC = b"FRIDX\x00"
+SESSION_VERSION = 1
+SESSION_EXTENSION = ".frcap"
+SESSION_INDEX_INTERVAL = 64 << 10  # Bytes of frames between index entries
+_SESSION_HEADER = struct.Struct("<6sHQ")
+_INDEX_HEADER = struct.Struct("<6sH")
+_FRAME = struct.Struct("<QI")
+_INDEX_ENTRY = struct.Struct("<QQQQ")
+
+
+class CaptureFormatError(ValueError):
+    """Raised when a file is not a session capture (or a newer version of one)."""
+
+
+class SessionRecorder:
+    """Writes a session capture and its index; write() may be used as a reader sink."""
+
+    def __init__(self, path, clock=None):
+        self.path = path
+        self.clock = clock or SessionClock()
+        self.bytes_written = 0  # Payload bytes
+        self.frames = 0
+        self._lock = threading.Lock()
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._file = open(path, "wb")
+        self._index = open(path + ".idx", "wb")
+        self._file.write(_SESSION_HEADER.pack(SESSION_MAGIC, SESSION_VERSION, self.clock.wall_ns))
+        self._index.write(_INDEX_HEADER.pack(SESSION_INDEX_MAGIC, SESSION_VERSION))
+        self._offset = _SESSION_HEADER.size
+        self._next_index_offset = self._offset
+
+    def write(self, data, stamp=None):
+        """Appends one frame; stamp is its perf_counter_ns() arrival time (default: now)."""
+        if not data:
+            return
+        time_ns = max(0, (time.perf_counter_ns() if stamp is None else stamp) - self.clock.perf_ns)
+        with self._lock:
+            if self._file is None:
+                return
+            if self._offset >= self._next_index_offset:
+                self._index.write(_INDEX_ENTRY.pack(self._offset, time_ns, self.bytes_written, self.frames))
+                self._next_index_offset = self._offset + SESSION_INDEX_INTERVAL
+            self._file.write(_FRAME.pack(time_ns, len(data)))
+            self._file.write(data)
+            self._offset += _FRAME.size + len(data)
+            self.bytes_written += len(data)
+            self.frames += 1
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                self._index.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._index.close()
+                self._file = self._index = None
+
+
+class SessionCapture:
+    """Read-only, memory-mapped view of a session capture.
+
+    Frames are (file offset, time in ns since the session start, bytes). A
+    frame cut off by a crash ends the capture. A missing or stale index is
+    rebuilt in memory by scanning the frames.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size < _SESSION_HEADER.size:
+                raise CaptureFormatError(f"{path} is not a session capture")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+        magic, version, self.start_wall_ns = _SESSION_HEADER.unpack_from(self._map, 0)
+        if magic != SESSION_MAGIC:
+            self.close()
+            raise CaptureFormatError(f"{path} is not a session capture")
+        if version > SESSION_VERSION:
+            self.close()
+            raise CaptureFormatError(f"{path} needs a newer version of this tool (format {version})")
+        self.size = size
+        self.index = self._load_index()
+        if not self.index:
+            self.index = [(_SESSION_HEADER.size, 0, 0, 0)]
+        # A complete index ends within one interval of the end; scan the rest
+        last_offset, _, position, frame = self.index[-1]
+        self.frame_count = frame
+        self.total_bytes = position
+        self.duration_ns = 0
+        for offset, time_ns, data in self.frames(last_offset):
+            self.frame_count += 1
+            self.total_bytes += len(data)
+            self.duration_ns = time_ns
+        if self.size - last_offset > 2 * SESSION_INDEX_INTERVAL:
+            self.index = self.build_index()  # Index was not flushed (e.g. after a crash)
+
+    def _load_index(self):
+        """Reads the sidecar index, or scans the frames when it is missing or broken."""
+        try:
+            with open(self.path + ".idx", "rb") as f:
+                raw = f.read()
+        except OSError:
+            return self.build_index()
+        if len(raw) < _INDEX_HEADER.size or raw[:len(SESSION_INDEX_MAGIC)] != SESSION_INDEX_MAGIC:
+            return self.build_index()
+        count = (len(raw) - _INDEX_HEADER.size) // _INDEX_ENTRY.size
+        entries = list(_INDEX_ENTRY.iter_unpack(raw[_INDEX_HEADER.size:_INDEX_HEADER.size + count * _INDEX_ENTRY.size]))
+        if entries and entries[-1][0] > self.size:
+            return self.build_index()
+        return entries
+
+    def build_index(self):
+        """Scans every frame header (not the data) to build an index."""
+        entries = []
+        next_index_offset = offset = _SESSION_HEADER.size
+        position = frame = 0
+        size = self.size
+        while offset + _FRAME.size <= size:
+            time_ns, length = _FRAME.unpack_from(self._map, offset)
+            if offset + _FRAME.size + length > size:
+                break
+            if offset >= next_index_offset:
+                entries.append((offset, time_ns, position, frame))
+                next_index_offset = offset + SESSION_INDEX_INTERVAL
+            offset += _FRAME.size + length
+            position += length
+            frame += 1
+        return entries
+
+    def write_index(self):
+        """Saves the index next to the capture (e.g. after a rebuild)."""
+        with open(self.path + ".idx", "wb") as f:
+            f.write(_INDEX_HEADER.pack(SESSION_INDEX_MAGIC, SESSION_VERSION))
+            for entry in self.index:
+                f.write(_INDEX_ENTRY.pack(*entry))
+
+    def clock(self):
+        """A SessionClock mapping the frames' times to wall-clock time."""
+        return SessionClock(wall_ns=self.start_wall_ns, perf_ns=0)
+
+    def frames(self, offset=None, end_offset=None):
+        """Yields (file offset, time ns, bytes) from the frame at offset onwards."""
+        offset = _SESSION_HEADER.size if offset is None else offset
+        end = self.size if end_offset is None else min(end_offset, self.size)
+        view = self._map
+        while offset + _FRAME.size <= end:
+            time_ns, length = _FRAME.unpack_from(view, offset)
+            start = offset + _FRAME.size
+            if start + length > self.size:
+                return  # Cut off mid-frame
+            yield offset, time_ns, view[start:start + length]
+            offset = start + length
+
+    def _seek(self, field, value):
+        """Offset of the last frame whose field (1 = time, 2 = stream position) is <= value."""
+        index = self.index
+        lo, hi = 0, len(index)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if index[mid][field] <= value:
+                lo = mid + 1
+            else:
+                hi = mid
+        entry = index[max(0, lo - 1)]
+        best = entry[0]
+        position = entry[2]
+        end = index[lo][0] if lo < len(index) else None
+        for offset, time_ns, data in self.frames(entry[0], end):
+            if (time_ns if field == 1 else position) > value:
+                break
+            best = offset
+            position += len(data)
+        return best
+
+    def seek_time(self, time_ns):
+        """File offset of the frame that was being received at time_ns into the session."""
+        return self._seek(1, time_ns)
+
+    def seek_position(self, position):
+        """File offset of the frame holding byte `position` of the received stream."""
+        return self._seek(2, position)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CaptureReplay:
+    """Paces the frames of a SessionCapture for replay.
+
+    due() returns the frames whose time has come: `speed` times the original
+    pace, or as fast as possible when speed is None. Each call returns at
+    most max_bytes, so a GUI loop calling it stays responsive.
+    """
+
+    def __init__(self, capture, offset=None, speed=1.0, max_bytes=256 << 10):
+        self.capture = capture
+        self.speed = speed
+        self.max_bytes = max_bytes
+        self.frames_replayed = 0
+        self.bytes_replayed = 0
+        self._frames = capture.frames(offset)
+        self._next = next(self._frames, None)
+        self._base_ns = self._next[1] if self._next else 0
+        self._started = time.perf_counter_ns()
+
+    @property
+    def done(self):
+        return self._next is None
+
+    def due(self):
+        """Returns [(time ns, bytes)] to feed to the display now."""
+        out = []
+        size = 0
+        elapsed_ns = time.perf_counter_ns() - self._started
+        while self._next is not None and size < self.max_bytes:
+            _, time_ns, data = self._next
+            if self.speed is not None and (time_ns - self._base_ns) / self.speed > elapsed_ns:
+                break
+            out.append((time_ns, data))
+            size += len(data)
+            self._next = next(self._frames, None)
+        self.frames_replayed += len(out)
+        self.bytes_replayed += size
+        return out
@@ -0,0 +1,500 @@
+"""Command line interface: `python frm.py <command>` or `python -m fr_uploader <command>`.
+
+    check                          is a newer release available?
+    download                       download the latest release into the store
+    flash --port COM3 --config IT-CAN-BTS [--port COM4 ...]
+    flash --port COM3 --file firmware.bin [--force] [--always-flash] [--base-address 0x08008000]
+    flash --port COM3 --port COM4 --config IT-CAN-BTS --script selftest.txt
+    validate firmware.hex [--port COM3]  check an image (and what a board runs)
+    script selftest.txt --port COM3 [--port COM4 ...]  test boards in parallel
+    monitor --port COM3 [--baud 115200] [--hex] [--timestamps]
+    monitor --tcp 192.168.4.1:23 [--record session.frcap]
+    replay session.frcap [--speed max] [--from 12.5]
+    telemetry session.frcap [--parser csv] [--csv channels.csv]
+    ports [--watch]                list serial ports (and hotplug events)
+
+Any command takes --metrics FILE before its name (`frm.py --metrics run.prom
+flash ...`) to record performance metrics and write them on exit, as JSON
+for *.json and Prometheus text otherwise.
+
+Never imports tkinter, and imports requests/pyserial only for the commands
+that need them, so station scripts start quickly and run without a display.
+Exit status is 0 on success, 1 on failure and 2 for usage errors.
+"""
+import argparse
+import os
+import sys
+import time
+
+from fr_uploader import firmware
+from fr_uploader.metrics import METRICS
+from fr_uploader.progress import format_progress
+from fr_uploader.telemetry import PARSERS, KeyValueParser
+from fr_uploader.uploaders import UPLOADER_BACKENDS, default_backend_name
+
+
+def log(message):
+    print(message, flush=True)
+
+
+def cmd_check(args):
+    release_cache = firmware.default_release_cache()
+    release_cache.offline = args.offline
+    _, latest_version, _ = firmware.check_for_update(release_cache, log)
+    return 1 if latest_version == firmware.NO_VERSION else 0
+
+
+def cmd_download(args):
+    release_cache = firmware.default_release_cache()
+    release_cache.offline = args.offline
+    tag = firmware.download_latest_release(release_cache, firmware.default_store(), log)
+    return 0 if tag else 1
+
+
+def firmware_path_from_args(args):
+    if args.file:
+        return os.path.abspath(args.file)
+    return firmware.resolve_firmware_path(
+        firmware.default_store(), firmware.firmware_file_name(args.config), args.release, log
+    )
+
+
+def print_progress(percent, rate):
+    log(f"Progress: {format_progress(percent, rate)}")
+
+
+def cmd_flash(args):
+    try:
+        firmware_path = firmware_path_from_args(args)
+    except ValueError as e:
+        log(f"Error: {e}")
+        return 2
+    if not os.path.exists(firmware_path):
+        log(f"Firmware file not found: {firmware_path}")
+        return 1
+    steps = None
+    if args.script:
+        steps = load_script_from_args(args)
+        if steps is None:
+            return 2
+    if len(args.port) == 1:
+        ok = firmware.upload_firmware(
+            firmware_path,
+            args.port[0],
+            args.method,
+            log=log,
+            progress=None if args.quiet else print_progress,
+            skip_current=not args.always_flash,
+            force=args.force,
+            base_address=args.base_address,
+        )
+        if ok and steps is not None:
+            return run_script_on_ports(args, steps, args.port)
+        return 0 if ok else 1
+
+    from fr_uploader.scheduler import FlashJob, FlashScheduler
+    from fr_uploader.uploaders import get_uploader
+
+    uploader = get_uploader(args.method)
+    problem = uploader.check() or uploader.check_ports(args.port)
+    if problem:
+        log(problem)
+        return 1
+    image = firmware.check_firmware_image(firmware_path, log, args.force, args.base_address)
+    if image is None or not firmware.place_image(uploader, image, log):
+        return 1
+    skip_current = None
+    if not (args.always_flash or args.force) and uploader.board_running:
+        skip_current = lambda job, job_log: firmware.board_runs_image(image, job.port, job_log)  # noqa: E731
+    last_status = {}
+
+    def on_progress(job):
+        if last_status.get(job.port) != job.status:
+            last_status[job.port] = job.status
+            log(f"{job.port}: {job.status}")
+
+    scheduler = FlashScheduler(
+        uploader, max_workers=args.workers, retries=args.retries, on_progress=on_progress, skip_current=skip_current
+    )
+    log(f"Flashing {os.path.basename(firmware_path)} to {', '.join(args.port)}")
+    report = scheduler.run(FlashJob(port, firmware_path) for port in args.port)
+    log(report.summary())
+    if steps is not None:
+        ready = [job.port for job in report.jobs if job not in report.failed]
+        if ready and run_script_on_ports(args, steps, ready):
+            return 1
+    return 0 if not report.failed else 1
+
+
+def load_script_from_args(args):
+    """The steps of args.script, or None after logging why it cannot be used."""
+    from fr_uploader.console import ScriptError, load_script
+
+    try:
+        return load_script(args.script, args.expect_timeout)
+    except (ScriptError, OSError) as e:
+        log(f"{args.script}: {e}")
+        return None
+
+
+def run_script_on_ports(args, steps, ports):
+    """Runs the test script on all ports at once; returns the exit status."""
+    from fr_uploader import console
+
+    if len(ports) > 1:
+        log(f"Running {os.path.basename(args.script)} on {', '.join(ports)}")
+    results = console.run_script_on_ports(
+        steps,
+        ports,
+        args.baud,
+        console.LINE_ENDINGS[args.line_ending],
+        log,
+        max_workers=max(len(ports), 1),
+        flow_control=args.flow,
+    )
+    failed = 0
+    for port, result in results.items():
+        if isinstance(result, Exception):
+            failed += 1
+            log(f"{port:<12} ERROR   {result}")
+            continue
+        failed += not result.ok
+        log(f"{port:<12} {'PASS' if result.ok else 'FAIL':<7} {result.summary()}")
+    return 1 if failed else 0
+
+
+def cmd_script(args):
+    steps = load_script_from_args(args)
+    if steps is None:
+        return 2
+    return run_script_on_ports(args, steps, args.port)
+
+
+def add_script_arguments(parser):
+    parser.add_argument("--baud", type=int, default=115200, help="baud rate for the script")
+    parser.add_argument(
+        "--line-ending", choices=["None", "LF", "CR", "CRLF"], default="LF", help="appended to every sent line"
+    )
+    parser.add_argument("--flow", choices=["rtscts", "xonxoff"], help="serial flow control")
+    parser.add_argument(
+        "--expect-timeout", type=float, default=2.0, help="seconds an expect waits unless the script sets a timeout"
+    )
+
+
+def add_base_address_argument(parser):
+    parser.add_argument(
+        "--base-address",
+        type=lambda text: int(text, 0),
+        metavar="ADDRESS",
+        help="where a .bin is linked to run, e.g. 0x08008000 behind a bootloader (default: start of flash)",
+    )
+
+
+def cmd_validate(args):
+    from fr_uploader.image import ImageError, load_image, query_firmware, reports_image, validate_image
+
+    try:
+        image = load_image(args.file, base_address=args.base_address)
+    except (ImageError, OSError) as e:
+        log(f"{args.file}: {e}")
+        return 1
+    log(f"{args.file}: {image.format} image, {image.describe()}")
+    log(f"SHA-256 {image.sha256}")
+    problems = validate_image(image)
+    for problem in problems:
+        log(f"Problem: {problem}")
+    if problems and image.format == "bin":
+        log(f"Checked as loaded at 0x{image.base_address:08X}; use --base-address if it is linked elsewhere.")
+    if not problems:
+        log("Image looks valid for STM32F446.")
+    if args.port:
+        try:
+            reported = query_firmware(args.port, args.baud)
+        except Exception as e:
+            log(f"Could not query {args.port}: {e}")
+            return 1
+        if not reported:
+            log(f"{args.port} did not report its firmware digest.")
+        else:
+            state = "runs this image" if reports_image(reported, image) else "runs different firmware"
+            digests = [f"SHA-256 {reported['sha256'][:16]}..."] if "sha256" in reported else []
+            digests += [f"CRC32 {reported['crc32']:08X}"] if "crc32" in reported else []
+            log(f"{args.port} {state} ({', '.join(digests)}).")
+    return 1 if problems else 0
+
+
+def cmd_monitor(args):
+    import serial
+
+    from fr_uploader.formatting import HexFormatter, TextDecoder
+    from fr_uploader.serial_reader import SerialReader
+    from fr_uploader.timestamps import LineTimestamper, SessionClock, TimestampFormatter
+
+    connection = None
+    if args.tcp:
+        from fr_uploader.tcp_reader import TcpReader, parse_address
+
+        try:
+            host, port = parse_address(args.tcp)
+        except ValueError as e:
+            log(f"Error: {e}")
+            return 2
+    else:
+        try:
+            connection = serial.serial_for_url(args.port, args.baud, timeout=0.05)
+        except serial.SerialException as e:
+            log(f"Error opening serial port: {e}")
+            return 1
+    clock = SessionClock()
+    sinks = []
+    if args.capture:
+        from fr_uploader.capture import RotatingCaptureFile
+
+        sinks.append(RotatingCaptureFile(args.capture))
+    if args.record:
+        from fr_uploader.capture import SessionRecorder
+
+        sinks.append(SessionRecorder(args.record, clock=clock))
+    sink = None
+    if len(sinks) == 1:
+        sink = sinks[0].write
+    elif sinks:
+        def sink(data):
+            for target in sinks:
+                target.write(data)
+    if connection is None:
+        reader = TcpReader(host, port, sink=sink, log=lambda message: print(message, file=sys.stderr))
+    else:
+        reader = SerialReader(connection, sink=sink)
+    formatter = HexFormatter("xxd") if args.hex else TextDecoder()
+    timestamper = LineTimestamper(TimestampFormatter(clock)) if args.timestamps else None
+    deadline = time.monotonic() + args.duration if args.duration else None
+    reader.start()
+    out = sys.stdout
+    try:
+        while reader.is_alive() and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.03)
+            for stamp, data in reader.buffer.read_chunks():
+                text = formatter.format(data) if args.hex else formatter.decode(data)
+                out.write(timestamper.stamp(text, stamp) if timestamper else text)
+            out.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.stop()
+        if connection is not None:
+            connection.close()
+        for target in sinks:
+            target.close()
+    if not args.hex:
+        out.write(formatter.flush())
+    if reader.error:
+        log(f"Error reading from {args.tcp or args.port}: {reader.error}")
+        return 1
+    return 0
+
+
+def parse_speed(value):
+    """"1", "10x" or "max" (None: as fast as possible)."""
+    value = value.lower()
+    if value == "max":
+        return None
+    try:
+        speed = float(value[:-1] if value.endswith("x") else value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad speed {value!r}") from None
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive")
+    return speed
+
+
+def cmd_replay(args):
+    from fr_uploader.capture import CaptureReplay, SessionCapture
+    from fr_uploader.formatting import HexFormatter, TextDecoder
+    from fr_uploader.timestamps import LineTimestamper, TimestampFormatter
+
+    try:
+        capture = SessionCapture(args.file)
+    except (OSError, ValueError) as e:
+        log(f"Error opening capture: {e}")
+        return 1
+    with capture:
+        offset = capture.seek_time(int(args.start * 1e9)) if args.start else None
+        replay = CaptureReplay(capture, offset, args.speed)
+        formatter = HexFormatter("xxd") if args.hex else TextDecoder()
+        timestamper = LineTimestamper(TimestampFormatter(capture.clock())) if args.timestamps else None
+        out = sys.stdout
+        try:
+            while not replay.done:
+                for time_ns, data in replay.due():
+                    text = formatter.format(data) if args.hex else formatter.decode(data)
+                    out.write(timestamper.stamp(text, time_ns) if timestamper else text)
+                out.flush()
+                if args.speed is not None and not replay.done:
+                    time.sleep(0.01)
+        except KeyboardInterrupt:
+            pass
+        if not args.hex:
+            out.write(formatter.flush())
+    return 0
+
+
+def cmd_telemetry(args):
+    from fr_uploader.capture import SessionCapture
+    from fr_uploader.telemetry import TelemetryStage, TelemetryStore, export_csv, export_parquet, get_parser
+
+    try:
+        capture = SessionCapture(args.file)
+    except (OSError, ValueError) as e:
+        log(f"Error opening capture: {e}")
+        return 1
+    stage = TelemetryStage(get_parser(args.parser), TelemetryStore(capacity=args.capacity))
+    started = time.perf_counter()
+    with capture:
+        for _, time_ns, data in capture.frames():
+            stage.feed(data, time_ns)
+    elapsed = time.perf_counter() - started
+    store = stage.store
+    log(
+        f"Parsed {stage.parsed_lines:,} of {stage.lines:,} lines into {len(store.channels)} channels "
+        f"in {elapsed:.2f} s"
+    )
+    for name, channel in store.channels.items():
+        _, values = channel.window()
+        log(
+            f"  {name:<20} {channel.total:>9,} samples  min {min(values):<12g} max {max(values):<12g} "
+            f"mean {sum(values) / len(values):<12g} last {channel.last:g}"
+        )
+    if store.ignored:
+        log(f"Ignored {store.ignored:,} values beyond the first {store.max_channels} channels.")
+    try:
+        if args.csv:
+            log(f"Wrote {export_csv(store, args.csv):,} rows to {args.csv}")
+        if args.parquet:
+            log(f"Wrote {export_parquet(store, args.parquet):,} rows to {args.parquet}")
+    except (OSError, ImportError) as e:
+        log(f"Error exporting: {e}")
+        return 1
+    return 0
+
+
+def cmd_ports(args):
+    from fr_uploader.ports import PortWatcher
+
+    watcher = PortWatcher()
+    watcher.scan()
+    for device, info in sorted(watcher.ports.items()):
+        log(f"{device}\t{info.identity}\t{info.description}")
+    if not args.watch:
+        return 0
+    log("Watching for port changes (Ctrl+C to stop)...")
+
+    def report(added, removed):
+        for info in removed:
+            log(f"- {info.device}\t{info.identity}")
+        for info in added:
+            log(f"+ {info.device}\t{info.identity}\t{info.description}")
+
+    watcher.add_listener(report)
+    try:
+        while True:
+            time.sleep(watcher.interval)
+            watcher.scan()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="frm", description="FR Firmware Uploader")
+    parser.add_argument(
+        "--metrics", metavar="FILE", help="write performance metrics to FILE on exit (.json or Prometheus text)"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    check = commands.add_parser("check", help="check for a newer firmware release")
+    check.add_argument("--offline", action="store_true", help="use the cached release information only")
+    check.set_defaults(func=cmd_check)
+
+    download = commands.add_parser("download", help="download the latest release into the firmware store")
+    download.add_argument("--offline", action="store_true", help="use the cached release information only")
+    download.set_defaults(func=cmd_download)
+
+    flash = commands.add_parser("flash", help="upload firmware to one or more boards")
+    flash.add_argument("--port", action="append", required=True, help="serial port; repeat for a batch")
+    source = flash.add_mutually_exclusive_group(required=True)
+    source.add_argument("--config", help="board configuration, e.g. IT-CAN-BTS")
+    source.add_argument("--file", help="firmware file to upload instead of a configuration")
+    flash.add_argument("--release", help="stored release to take --config from (default: local version)")
+    flash.add_argument("--method", choices=list(UPLOADER_BACKENDS), default=default_backend_name())
+    flash.add_argument("--workers", type=int, default=4, help="concurrent uploads for several ports")
+    flash.add_argument("--retries", type=int, default=1, help="retries per board in a batch")
+    flash.add_argument("--quiet", action="store_true", help="do not print progress updates")
+    flash.add_argument("--force", action="store_true", help="flash even if the image fails validation")
+    flash.add_argument(
+        "--always-flash", action="store_true", help="do not skip boards that report they already run the image"
+    )
+    add_base_address_argument(flash)
+    flash.add_argument("--script", help="test script to run on every flashed (or already current) board")
+    add_script_arguments(flash)
+    flash.set_defaults(func=cmd_flash)
+
+    validate = commands.add_parser("validate", help="check a .bin/.hex image for STM32F446 and print its digests")
+    validate.add_argument("file", help="firmware image (.bin or Intel .hex)")
+    validate.add_argument("--port", help="also ask the board on this port which firmware it runs")
+    validate.add_argument("--baud", type=int, default=115200)
+    add_base_address_argument(validate)
+    validate.set_defaults(func=cmd_validate)
+
+    script = commands.add_parser("script", help="run a send/expect test script on one or more boards at once")
+    script.add_argument("script", help="script file: send, expect <regex>, wait <s>, timeout <s> lines")
+    script.add_argument("--port", action="append", required=True, help="serial port or pyserial URL; repeat")
+    add_script_arguments(script)
+    script.set_defaults(func=cmd_script)
+
+    monitor = commands.add_parser("monitor", help="print a serial port's output until Ctrl+C")
+    target = monitor.add_mutually_exclusive_group(required=True)
+    target.add_argument("--port", help="serial port or pyserial URL")
+    target.add_argument("--tcp", metavar="HOST:PORT", help="UART-over-TCP bridge; reconnects when the link drops")
+    monitor.add_argument("--baud", type=int, default=115200)
+    monitor.add_argument("--hex", action="store_true", help="show a hex dump instead of text")
+    monitor.add_argument("--timestamps", action="store_true", help="prefix every line with its arrival time")
+    monitor.add_argument("--duration", type=float, help="stop after this many seconds")
+    monitor.add_argument("--capture", help="also save the raw stream to this file")
+    monitor.add_argument("--record", metavar="FILE", help="record a timestamped session capture for replay")
+    monitor.set_defaults(func=cmd_monitor)
+
+    replay = commands.add_parser("replay", help="play back a recorded session capture")
+    replay.add_argument("file", help="session capture (.frcap)")
+    replay.add_argument("--speed", type=parse_speed, default=1.0, help="1, 10, 100 ... or max (default: 1)")
+    replay.add_argument("--from", dest="start", type=float, default=0.0, metavar="SECONDS", help="start offset")
+    replay.add_argument("--hex", action="store_true", help="show a hex dump instead of text")
+    replay.add_argument("--timestamps", action="store_true", help="prefix every line with its original arrival time")
+    replay.set_defaults(func=cmd_replay)
+
+    telemetry = commands.add_parser("telemetry", help="parse numeric channels out of a recorded session capture")
+    telemetry.add_argument("file", help="session capture (.frcap)")
+    telemetry.add_argument("--parser", choices=list(PARSERS), default=KeyValueParser.name)
+    telemetry.add_argument("--capacity", type=int, default=1_000_000, help="samples kept per channel")
+    telemetry.add_argument("--csv", metavar="FILE", help="export the channels as CSV")
+    telemetry.add_argument("--parquet", metavar="FILE", help="export the channels as Parquet (needs pyarrow)")
+    telemetry.set_defaults(func=cmd_telemetry)
+
+    ports = commands.add_parser("ports", help="list serial ports with their board identity (VID:PID:serial)")
+    ports.add_argument("--watch", action="store_true", help="keep running and print ports as they come and go")
+    ports.set_defaults(func=cmd_ports)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.metrics:
+        return args.func(args)
+    METRICS.enabled = True
+    try:
+        return args.func(args)
+    finally:
+        try:
+            METRICS.write(args.metrics)
+        except OSError as e:
+            log(f"Error writing metrics to {args.metrics}: {e}")
@@ -0,0 +1,497 @@
+"""Talking to a board: send queue, command history, macros and test scripts.
+
+SendQueue hands outgoing bytes to a writer thread, so neither the Tk loop
+nor a script waits on a slow port. The queue is bounded (send() returns
+False when it is full). Flow control is left to the port: with RTS/CTS or
+XON/XOFF enabled in pyserial the writer thread simply blocks while the
+board holds it off. Boards without flow control and with small receive
+buffers can be paced instead, per character and after every line.
+
+A script is plain text, one step per line; blank lines and lines starting
+with "#" are ignored:
+
+    timeout 2.5
+    send fw?
+    expect fw_sha256=[0-9a-f]{64}
+    wait 0.5
+
+"timeout" sets how many seconds the following expects wait, "send" sends
+a line with the line ending (a line without a keyword is sent too),
+"expect" waits for a received line matching a regular expression and
+"wait" pauses.
+
+Macros are saved scripts, so a macro can be a single command or a whole
+sequence. ScriptRunner runs a script against a SendQueue and a
+ResponseBuffer fed with the received text. For every expect it records
+the board's round trip: the time from the last byte of the previous
+command leaving the port to the matching line. run_script() does all of
+that on one serial port, and run_script_on_ports() on several ports at
+once.
+"""
+import collections
+import json
+import os
+import re
+import threading
+import time
+
+from fr_uploader.metrics import METRICS
+
+LINE_ENDINGS = {"None": "", "LF": "\n", "CR": "\r", "CRLF": "\r\n"}
+DEFAULT_EXPECT_TIMEOUT = 2.0
+DEFAULT_MAX_PENDING = 64 << 10  # Bytes queued before send() refuses more
+RESPONSE_LINES = 10_000  # Received lines an expect can look back on
+HISTORY_LIMIT = 500
+CONSOLE_FOLDER = "console"
+HISTORY_FILE = os.path.join(CONSOLE_FOLDER, "history.json")
+MACROS_FILE = os.path.join(CONSOLE_FOLDER, "macros.json")
+
+
+class ScriptError(ValueError):
+    """A script line cannot be understood."""
+
+
+class SendQueue:
+    """Writes queued data to a port on a daemon thread, in order.
+
+    `write(data)` is the port's write (e.g. serial.Serial.write or
+    TcpReader.write). If it returns False the port is not connected yet and
+    the data is retried every retry_interval; any exception stops the queue
+    and is kept in `error`.
+    """
+
+    def __init__(self, write, max_pending=DEFAULT_MAX_PENDING, char_delay=0.0, line_delay=0.0, retry_interval=0.1,
+                 name="send-queue"):
+        self.write = write
+        self.max_pending = max_pending
+        self.char_delay = char_delay  # Seconds after every byte, for boards without flow control
+        self.line_delay = line_delay  # Seconds after every line ending
+        self.retry_interval = retry_interval
+        self.bytes_sent = 0
+        self.last_write = None  # time.perf_counter() when the last write returned
+        self.refused = 0  # send() calls turned away because the queue was full
+        self.error = None
+        self._queue = collections.deque()
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self):
+        """Bytes queued or being written."""
+        return self._pending
+
+    def send(self, data):
+        """Queues data (bytes or str, sent as UTF-8); returns False if the queue is full or stopped."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not data:
+            return True
+        with self._condition:
+            if self.error is not None or self._stop_event.is_set() or self._pending + len(data) > self.max_pending:
+                self.refused += 1
+                return False
+            self._queue.append(data)
+            self._pending += len(data)
+            self._condition.notify_all()
+        return True
+
+    def wait_idle(self, timeout=None):
+        """Waits until everything queued has been written; returns False on timeout or error."""
+        with self._condition:
+            done = self._condition.wait_for(lambda: not self._pending or self.error is not None, timeout)
+        return done and self.error is None
+
+    def stop(self, timeout=1.0):
+        """Drops whatever is still queued and stops the writer thread."""
+        self._stop_event.set()
+        with self._condition:
+            self._queue.clear()
+            self._condition.notify_all()
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or self._stop_event.is_set())
+                if self._stop_event.is_set():
+                    break
+                data = self._queue.popleft()
+            try:
+                self._write(data)
+            except Exception as e:  # Port closed or unplugged
+                with self._condition:
+                    self.error = e
+                    self._queue.clear()
+                    self._pending = 0
+                    self._condition.notify_all()
+                return
+            with self._condition:
+                self._pending -= len(data)
+                self._condition.notify_all()
+        with self._condition:
+            self._pending = 0
+            self._condition.notify_all()
+
+    def _write(self, data):
+        paced = self.char_delay or self.line_delay
+        pieces = [data[i:i + 1] for i in range(len(data))] if self.char_delay else [data]
+        if self.line_delay and not self.char_delay:
+            pieces = [piece for piece in re.split(rb"(?<=\n)|(?<=\r)(?!\n)", data) if piece]
+        for piece in pieces:
+            while self.write(piece) is False:  # Not connected (TCP bridge): try again shortly
+                if self._stop_event.wait(self.retry_interval):
+                    return
+            self.last_write = time.perf_counter()
+            self.bytes_sent += len(piece)
+            METRICS.count("serial_bytes_out_total", len(piece))
+            if paced:
+                delay = self.char_delay + (self.line_delay if piece.endswith((b"\n", b"\r")) else 0.0)
+                if delay and self._stop_event.wait(delay):
+                    return
+
+
+class ResponseBuffer:
+    """Received lines for expect steps; feed() it the decoded text from any thread."""
+
+    def __init__(self, max_lines=RESPONSE_LINES):
+        self._lines = collections.deque(maxlen=max_lines)
+        self._partial = ""
+        self._received = 0  # Lines ever completed
+        self._consumed = 0  # Lines before this one are no longer matched
+        self._condition = threading.Condition()
+
+    def feed(self, text):
+        if not text:
+            return
+        with self._condition:
+            *lines, self._partial = (self._partial + text).split("\n")
+            if lines:
+                self._lines.extend(line.rstrip("\r") for line in lines)
+                self._received += len(lines)
+                self._condition.notify_all()
+
+    def mark(self):
+        """Later expects only match lines completed after this call."""
+        with self._condition:
+            self._consumed = self._received
+
+    def wait_for(self, pattern, timeout, stop_event=None):
+        """Waits for an unconsumed line matching pattern; returns (line, match) or None on timeout.
+
+        The matching line and all before it are consumed, so consecutive
+        expects match consecutive responses.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                first = self._received - len(self._lines)  # Number of the oldest line still held
+                for number in range(max(self._consumed, first), self._received):
+                    line = self._lines[number - first]
+                    match = pattern.search(line)
+                    if match:
+                        self._consumed = number + 1
+                        return line, match
+                self._consumed = self._received
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (stop_event is not None and stop_event.is_set()):
+                    return None
+                self._condition.wait(min(remaining, 0.1))
+
+
+class ScriptStep:
+    """One script line: kind is "send", "expect" or "wait"."""
+
+    def __init__(self, kind, argument, line_number, timeout=None):
+        self.kind = kind
+        self.argument = argument  # Text to send, pattern source, or seconds to wait
+        self.line_number = line_number
+        self.timeout = timeout  # For expect
+        self.pattern = re.compile(argument) if kind == "expect" else None
+
+    def describe(self):
+        return f"{self.kind} {self.argument}"
+
+    def __repr__(self):
+        return f"ScriptStep({self.kind!r}, {self.argument!r})"
+
+
+def parse_script(text, default_timeout=DEFAULT_EXPECT_TIMEOUT):
+    """Returns the ScriptSteps of a script (see the module docstring); raises ScriptError."""
+    steps = []
+    timeout = default_timeout
+    for number, raw in enumerate(text.splitlines(), 1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        keyword, _, argument = line.partition(" ")
+        argument = argument.strip()
+        try:
+            if keyword == "timeout":
+                timeout = float(argument)
+            elif keyword == "wait":
+                steps.append(ScriptStep("wait", float(argument), number))
+            elif keyword == "expect":
+                if not argument:
+                    raise ScriptError(f"line {number}: expect needs a regular expression")
+                steps.append(ScriptStep("expect", argument, number, timeout))
+            elif keyword == "send":
+                steps.append(ScriptStep("send", argument, number))
+            else:
+                steps.append(ScriptStep("send", line, number))
+        except ScriptError:
+            raise
+        except re.error as e:
+            raise ScriptError(f"line {number}: invalid regular expression: {e}") from None
+        except ValueError:
+            raise ScriptError(f"line {number}: {keyword} needs a number of seconds, not {argument!r}") from None
+    return steps
+
+
+def load_script(path, default_timeout=DEFAULT_EXPECT_TIMEOUT):
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_script(f.read(), default_timeout)
+
+
+class StepResult:
+    def __init__(self, step, ok, seconds, detail=""):
+        self.step = step
+        self.ok = ok
+        self.seconds = seconds  # For expect: round trip since the previous send was written
+        self.detail = detail
+
+    def format(self):
+        status = "ok" if self.ok else "FAILED"
+        detail = f": {self.detail}" if self.detail else ""
+        return f"line {self.step.line_number} {self.step.describe()} {status} in {self.seconds * 1000:.1f} ms{detail}"
+
+
+class ScriptResult:
+    def __init__(self, steps, wall_time, stopped=False):
+        self.steps = steps  # StepResults, up to and including the first failure
+        self.wall_time = wall_time
+        self.stopped = stopped
+
+    @property
+    def ok(self):
+        return not self.stopped and all(result.ok for result in self.steps)
+
+    @property
+    def round_trips(self):
+        return [result.seconds for result in self.steps if result.step.kind == "expect" and result.ok]
+
+    def summary(self):
+        passed = sum(result.ok for result in self.steps)
+        text = f"{passed}/{len(self.steps)} steps passed in {self.wall_time:.2f} s"
+        if self.stopped:
+            text += " (stopped)"
+        trips = sorted(self.round_trips)
+        if trips:
+            text += f"; round trip median {trips[len(trips) // 2] * 1000:.1f} ms, max {trips[-1] * 1000:.1f} ms"
+        return text
+
+
+class ScriptRunner:
+    """Runs ScriptSteps against a SendQueue, matching replies in a ResponseBuffer.
+
+    Stops at the first failed step. stop() (from any thread) ends the run
+    at the next step or expect poll.
+    """
+
+    def __init__(self, steps, queue, responses, line_ending="\n", log=print, write_timeout=5.0):
+        self.steps = steps
+        self.queue = queue
+        self.responses = responses
+        self.line_ending = line_ending
+        self.log = log
+        self.write_timeout = write_timeout
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        results = []
+        started = time.perf_counter()
+        sent_at = started
+        for step in self.steps:
+            if self._stop_event.is_set():
+                return ScriptResult(results, time.perf_counter() - started, stopped=True)
+            step_started = time.perf_counter()
+            if step.kind == "send":
+                self.responses.mark()
+                ok = self.queue.send(step.argument + self.line_ending) and self.queue.wait_idle(self.write_timeout)
+                sent_at = self.queue.last_write if ok else time.perf_counter()
+                detail = "" if ok else f"not written ({self.queue.error or 'queue full or port busy'})"
+                result = StepResult(step, ok, time.perf_counter() - step_started, detail)
+            elif step.kind == "expect":
+                found = self.responses.wait_for(step.pattern, step.timeout, self._stop_event)
+                now = time.perf_counter()
+                if found is None:
+                    detail = "stopped" if self._stop_event.is_set() else f"no match within {step.timeout:g} s"
+                    result = StepResult(step, False, now - sent_at, detail)
+                else:
+                    result = StepResult(step, True, now - sent_at, found[0].strip())
+                    METRICS.observe("console_round_trip_seconds", now - sent_at)
+            else:
+                self._stop_event.wait(step.argument)
+                result = StepResult(step, True, time.perf_counter() - step_started)
+            results.append(result)
+            self.log(result.format())
+            if not result.ok:
+                break
+        return ScriptResult(results, time.perf_counter() - started, stopped=self._stop_event.is_set())
+
+
+class CommandHistory:
+    """Sent commands, newest last, with shell-like Up/Down navigation; saved as JSON."""
+
+    def __init__(self, path=None, limit=HISTORY_LIMIT):
+        self.path = path
+        self.limit = limit
+        self.entries = []
+        self._cursor = None  # Index while navigating, None when at the (new) input line
+        self._draft = ""
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = [entry for entry in json.load(f) if isinstance(entry, str)][-limit:]
+            except (OSError, ValueError):
+                pass
+
+    def add(self, command):
+        """Records a sent command (moving a repeated one to the end) and saves the history."""
+        self._cursor = None
+        if not command.strip():
+            return
+        if command in self.entries:
+            self.entries.remove(command)
+        self.entries.append(command)
+        del self.entries[:-self.limit]
+        if self.path:
+            try:
+                _write_json(self.path, self.entries)
+            except OSError:
+                pass  # History is a convenience; sending must not fail because of it
+
+    def previous(self, current=""):
+        """The entry before the current one (Up); keeps what was being typed as the draft."""
+        if not self.entries:
+            return current
+        if self._cursor is None:
+            self._draft = current
+            self._cursor = len(self.entries)
+        self._cursor = max(0, self._cursor - 1)
+        return self.entries[self._cursor]
+
+    def next(self):
+        """The entry after the current one (Down), and finally the draft again."""
+        if self._cursor is None:
+            return self._draft
+        self._cursor += 1
+        if self._cursor >= len(self.entries):
+            self._cursor = None
+            return self._draft
+        return self.entries[self._cursor]
+
+
+class MacroBook:
+    """Named scripts ({name: script text}), saved as JSON."""
+
+    def __init__(self, path=MACROS_FILE):
+        self.path = path
+        self.macros = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.macros = {str(name): str(text) for name, text in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def names(self):
+        return sorted(self.macros, key=str.lower)
+
+    def get(self, name):
+        return self.macros.get(name)
+
+    def set(self, name, text):
+        """Saves a macro; raises ScriptError if its text is not a valid script."""
+        parse_script(text)
+        self.macros[name] = text
+        _write_json(self.path, self.macros)
+
+    def remove(self, name):
+        if self.macros.pop(name, None) is not None:
+            _write_json(self.path, self.macros)
+
+
+def _write_json(path, data):
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_script(steps, port, baud_rate=115200, line_ending="\n", log=print, open_port=None, flow_control=None):
+    """Opens port, runs the script against the board and closes it again; returns a ScriptResult.
+
+    flow_control is None, "rtscts" or "xonxoff". open_port(port, baud_rate)
+    may return any pyserial-like connection instead (e.g. for loop://).
+    """
+    import serial
+
+    from fr_uploader.formatting import TextDecoder
+
+    options = {flow_control: True} if flow_control else {}
+    connection = open_port(port, baud_rate) if open_port else serial.serial_for_url(
+        port, baud_rate, timeout=0.05, **options
+    )
+    responses = ResponseBuffer()
+    stop_event = threading.Event()
+
+    def read():
+        decoder = TextDecoder()
+        while not stop_event.is_set():
+            try:
+                data = connection.read(max(connection.in_waiting, 1))
+            except (serial.SerialException, OSError, TypeError):
+                return
+            responses.feed(decoder.decode(data))
+
+    reader = threading.Thread(target=read, name=f"script-reader-{port}", daemon=True)
+    reader.start()
+    queue = SendQueue(connection.write, name=f"script-writer-{port}")
+    try:
+        return ScriptRunner(steps, queue, responses, line_ending, log).run()
+    finally:
+        stop_event.set()
+        queue.stop()
+        reader.join(timeout=1.0)
+        connection.close()
+
+
+def run_script_on_ports(steps, ports, baud_rate=115200, line_ending="\n", log=print, max_workers=8, **options):
+    """Runs the script on every port at once; returns {port: ScriptResult or the exception it raised}.
+
+    Log lines are prefixed with their port.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    lock = threading.Lock()
+
+    def port_log(port, message):
+        with lock:  # One whole line at a time
+            log(f"{port}: {message}")
+
+    def run(port):
+        try:
+            return run_script(steps, port, baud_rate, line_ending, lambda message: port_log(port, message), **options)
+        except Exception as e:  # Port missing or busy: report it with the others
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ports))), thread_name_prefix="script") as pool:
+        return dict(zip(ports, pool.map(run, ports)))
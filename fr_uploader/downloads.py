@@ -0,0 +1,149 @@
+"""Streaming, resumable and verified downloads of release assets.
+
+Every asset is streamed to `<name>.part` next to its final location and only
+renamed into place (atomically) once its size and SHA-256 check out, so an
+interrupted download never leaves a truncated .bin behind. A leftover .part
+file is resumed with an HTTP Range request on the next attempt.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fr_uploader.metrics import METRICS
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 2
+USER_AGENT = "FR_Firmware_Uploader"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    """Raised when an asset cannot be downloaded or fails verification."""
+
+
+def get_session(pool_size=DEFAULT_WORKERS * 2):
+    """Returns the shared requests.Session (one connection pool per host)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
+
+
+def asset_sha256(asset):
+    """Returns the SHA-256 GitHub publishes for an asset ("digest" field), if any."""
+    digest = asset.get("digest") or ""
+    if digest.startswith("sha256:"):
+        return digest.split(":", 1)[1].lower()
+    return None
+
+
+def asset_etag(asset, session=None, timeout=10):
+    """Returns the ETag the download URL of an asset is served with, or None if it cannot be fetched.
+
+    For assets without a published digest: the storage behind GitHub's
+    downloads derives the ETag from the content, so together with the size
+    it tells an unchanged file from a changed one without downloading it.
+    """
+    session = session or get_session()
+    try:
+        with session.head(asset["browser_download_url"], allow_redirects=True, timeout=timeout) as response:
+            response.raise_for_status()
+            return response.headers.get("ETag")
+    except requests.RequestException:
+        return None
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha
+
+
+def download_asset(asset, folder, session=None, timeout=10, log=print):
+    """Downloads one release asset into folder and returns its SHA-256 hex digest."""
+    session = session or get_session()
+    url = asset["browser_download_url"]
+    target = os.path.join(folder, asset["name"])
+    part = target + ".part"
+    expected_size = asset.get("size")
+    expected_sha = asset_sha256(asset)
+
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    if expected_size is not None and offset > expected_size:
+        os.remove(part)
+        offset = 0
+
+    if expected_size is None or offset < expected_size:
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+            if offset and response.status_code == 416:
+                os.remove(part)  # Stale partial file; the next attempt starts over
+                raise DownloadError(f"{asset['name']}: server rejected resume at {offset} bytes")
+            if offset and response.status_code != 206:
+                offset = 0  # Server ignored the Range header; start over
+            response.raise_for_status()
+            if offset:
+                sha = file_sha256(part)
+                log(f"Resuming {asset['name']} at {offset} bytes")
+            else:
+                sha = hashlib.sha256()
+            with open(part, "ab" if offset else "wb") as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    sha.update(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+                METRICS.count("firmware_download_bytes_total", f.tell() - offset)
+    else:
+        sha = file_sha256(part)  # Complete from an earlier attempt, only verify
+
+    size = os.path.getsize(part)
+    if expected_size is not None and size != expected_size:
+        # A short file is kept so the next attempt can resume it
+        raise DownloadError(f"{asset['name']}: got {size} of {expected_size} bytes")
+    digest = sha.hexdigest()
+    if expected_sha and digest != expected_sha:
+        os.remove(part)
+        raise DownloadError(f"{asset['name']}: SHA-256 mismatch (expected {expected_sha}, got {digest})")
+    os.replace(part, target)
+    return digest
+
+
+def download_assets(assets, folder, session=None, max_workers=DEFAULT_WORKERS, retries=DEFAULT_RETRIES, log=print):
+    """Downloads assets concurrently.
+
+    Returns {asset name: SHA-256 hex digest, or the exception for failed assets}.
+    """
+    session = session or get_session()
+    os.makedirs(folder, exist_ok=True)
+
+    def fetch(asset):
+        for attempt in range(retries + 1):
+            try:
+                digest = download_asset(asset, folder, session=session, log=log)
+                log(f"Downloaded {os.path.join(folder, asset['name'])}")
+                return digest
+            except (requests.RequestException, DownloadError, OSError) as e:
+                if attempt == retries:
+                    log(f"Failed to download {asset['browser_download_url']}: {e}")
+                    return e
+                log(f"Retrying {asset['name']} after error: {e}")
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download") as pool:
+        results = list(pool.map(fetch, assets))
+    return {asset["name"]: result for asset, result in zip(assets, results)}
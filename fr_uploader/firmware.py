@@ -0,0 +1,279 @@
+"""Firmware management without a GUI: versions, releases, downloads and uploads.
+
+These are the operations behind both the Tkinter application (frm.py) and the
+command line (fr_uploader.cli). Every function reports progress through a
+`log` callable instead of touching widgets, so it can run on any thread.
+"""
+import os
+
+from fr_uploader.image import STM32F446, ImageError, load_image, query_firmware, reports_image, validate_image
+from fr_uploader.metrics import METRICS
+from fr_uploader.progress import UploadTimings
+from fr_uploader.uploaders import get_uploader
+
+GITHUB_REPO = "farmrobo-dev/FR_Firmware_Uploader"
+FIRMWARE_FOLDER = "bin"
+LOCAL_VERSION_FILE = os.path.join(FIRMWARE_FOLDER, "version.txt")
+RELEASE_CACHE_FILE = os.path.join(FIRMWARE_FOLDER, "release_cache.json")
+FIRMWARE_STORE_FOLDER = os.path.join(FIRMWARE_FOLDER, "store")
+NO_VERSION = "v0.0.0"
+
+# Board configuration: one option per slot, e.g. "IT-CAN-BTS"
+CONFIG_OPTIONS = {
+    "R1-TEMP": ["IT", "ET"],
+    "R1-TOOLS": ["CAN", "THR"],
+    "R1-ACTUATOR": ["BTS", "CYT"],
+}
+
+
+def get_local_version(log=print):
+    """Reads the local firmware version from file."""
+    try:
+        if os.path.exists(LOCAL_VERSION_FILE):
+            with open(LOCAL_VERSION_FILE, "r") as f:
+                return f.read().strip()
+    except Exception as e:
+        log(f"Error reading local version: {e}")
+    return NO_VERSION
+
+
+def set_local_version(tag):
+    os.makedirs(os.path.dirname(os.path.abspath(LOCAL_VERSION_FILE)), exist_ok=True)
+    with open(LOCAL_VERSION_FILE, "w") as f:
+        f.write(tag)
+
+
+def firmware_file_name(config):
+    """Maps a configuration such as "IT-CAN-BTS" to its file, R1-IT-CAN-BTS.bin.
+
+    Raises ValueError for unknown options.
+    """
+    options = config.upper().split("-")
+    if len(options) != len(CONFIG_OPTIONS):
+        raise ValueError(f"Expected {len(CONFIG_OPTIONS)} options like IT-CAN-BTS, got {config!r}")
+    for option, (slot, choices) in zip(options, CONFIG_OPTIONS.items()):
+        if option not in choices:
+            raise ValueError(f"Unknown {slot} option {option!r} (choose from {', '.join(choices)})")
+    return f"R1-{'-'.join(options)}.bin"
+
+
+def default_release_cache():
+    from fr_uploader.releases import ReleaseCache
+
+    return ReleaseCache(RELEASE_CACHE_FILE, GITHUB_REPO)
+
+
+def default_store():
+    from fr_uploader.store import FirmwareStore
+
+    return FirmwareStore(FIRMWARE_STORE_FOLDER)
+
+
+def get_latest_firmware_version(release_cache, log=print):
+    """Returns (tag, assets) of the latest release, or (NO_VERSION, []) when unavailable."""
+    import requests
+
+    from fr_uploader.releases import ReleaseError
+
+    try:
+        release_data = release_cache.latest()
+    except ReleaseError as e:
+        log(str(e))
+        return NO_VERSION, []
+    except requests.RequestException as e:
+        log(f"Network error getting latest version: {e}")
+        return NO_VERSION, []
+    return release_data.get("tag_name", "v1.0.0"), release_data.get("assets", [])
+
+
+def is_newer(latest_version, local_version):
+    from packaging import version
+
+    return version.parse(latest_version) > version.parse(local_version)
+
+
+def check_for_update(release_cache, log=print):
+    """Compares the local firmware version with the latest release and logs the outcome.
+
+    Returns (local_version, latest_version, newer); latest_version is NO_VERSION
+    when the release information is not available.
+    """
+    local_version = get_local_version(log)
+    latest_version, _ = get_latest_firmware_version(release_cache, log)
+    if latest_version == NO_VERSION:
+        log("No internet connection. Skipping update check.")
+        return local_version, latest_version, False
+    log(f"Local version: {local_version}, latest release: {latest_version}")
+    newer = is_newer(latest_version, local_version)
+    log(f"New firmware available: {latest_version}." if newer else "Firmware is up to date.")
+    return local_version, latest_version, newer
+
+
+def download_firmware(store, assets, release_tag, log=print):
+    """Downloads a release's firmware files into the firmware store; returns True if all succeeded.
+
+    Files already in the store (same SHA-256) are not downloaded again.
+    """
+    from fr_uploader.store import download_release
+
+    try:
+        with METRICS.timer("firmware_download_seconds"):
+            manifest = download_release(store, release_tag, assets, log=log)
+    except OSError as e:
+        log(f"Error writing to the firmware store: {e}")
+        METRICS.count("firmware_downloads_total", result="error")
+        return False
+    METRICS.count("firmware_downloads_total", result="ok" if manifest is not None else "failed")
+    return manifest is not None
+
+
+def download_latest_release(release_cache, store, log=print):
+    """Downloads the latest release and makes it the local version; returns its tag or None."""
+    latest_version, assets = get_latest_firmware_version(release_cache, log)
+    if latest_version == NO_VERSION:
+        log("No internet connection. Cannot download firmware.")
+        return None
+    if not download_firmware(store, assets, latest_version, log):
+        log("Some firmware files failed to download. Keeping the current version.")
+        return None
+    try:
+        set_local_version(latest_version)
+    except Exception as e:
+        log(f"Error writing local version file: {e}")
+        return None
+    log("Downloaded Successfully.")
+    return latest_version
+
+
+def resolve_firmware_path(store, firmware_file, release_tag=None, log=print):
+    """Finds a firmware file in a stored release, falling back to the flat bin/ folder (and logging that it did)."""
+    release_tag = release_tag or get_local_version(log)
+    stored_path = store.resolve(firmware_file, release_tag)
+    if stored_path:
+        return os.path.abspath(stored_path)
+    path = os.path.abspath(os.path.join(FIRMWARE_FOLDER, firmware_file))
+    if os.path.exists(path):
+        log(f"{firmware_file} is not in release {release_tag}; using {FIRMWARE_FOLDER}/{firmware_file} instead.")
+    return path
+
+
+def check_firmware_image(firmware_path, log=print, force=False, base_address=None):
+    """Loads and validates a firmware image; returns it, or None (after logging why) if it must not be flashed.
+
+    A .bin is checked as loaded at base_address (default: the start of flash).
+    With force, validation problems are logged as warnings and the image is returned anyway.
+    """
+    try:
+        image = load_image(firmware_path, base_address=base_address)
+    except (ImageError, OSError) as e:
+        log(f"Invalid firmware image {os.path.basename(firmware_path)}: {e}")
+        return None
+    problems = validate_image(image)
+    for problem in problems:
+        log(f"{'Warning' if force else 'Invalid firmware image'}: {problem}")
+    if problems and image.format == "bin":
+        log(
+            f"{os.path.basename(firmware_path)} was checked as loaded at 0x{image.base_address:08X}; give its "
+            "base address if it is linked elsewhere (e.g. behind a bootloader)."
+        )
+    if problems and not force:
+        log("Not flashing this image.")
+        return None
+    log(f"Firmware image: {image.describe()}")
+    return image
+
+
+def place_image(uploader, image, log=print):
+    """Hands a .bin's base address to the uploader; False (after logging why) if it cannot write it there."""
+    if image.format != "bin" or image.base_address == STM32F446.flash_base:
+        return True
+    if not uploader.accepts_base_address:
+        log(
+            f"The {uploader.name} upload method writes a .bin to the start of flash (0x{STM32F446.flash_base:08X}). "
+            f"Use uart-bootloader, or a .hex file, for an image linked at 0x{image.base_address:08X}."
+        )
+        return False
+    uploader.base_address = image.base_address
+    return True
+
+
+def board_runs_image(image, com_port, log=print):
+    """True if the board on com_port reports that it already runs image."""
+    try:
+        reported = query_firmware(com_port)
+    except Exception as e:  # Port busy or gone; the upload itself will tell
+        log(f"Could not ask {com_port} for its firmware: {e}")
+        return False
+    if not reported:
+        return False
+    if reports_image(reported, image):
+        log(f"{com_port} already runs this image; skipping the flash.")
+        return True
+    log(f"{com_port} runs different firmware; flashing.")
+    return False
+
+
+def upload_firmware(
+    firmware_path,
+    com_port,
+    method=None,
+    log=print,
+    progress=None,
+    timings=None,
+    skip_current=True,
+    force=False,
+    base_address=None,
+):
+    """Uploads firmware with the uploader backend `method` (a name or an UploaderBackend); returns True on success.
+
+    The image is validated first (see check_firmware_image), a .bin as loaded
+    at base_address. With skip_current, a board that reports it already runs
+    the image is not flashed again.
+    """
+    if not com_port:
+        log("Error: Please select a COM port.")
+        return False
+
+    uploader = get_uploader(method)
+    problem = uploader.check()
+    if problem:
+        log(problem)
+        return False
+
+    if not os.path.exists(firmware_path):
+        log(f"Firmware file not found: {firmware_path}. Ensure it exists.")
+        return False
+
+    timings = timings or UploadTimings()
+    with timings.phase("validate"):
+        image = check_firmware_image(firmware_path, log, force, base_address)
+    if image is None or not place_image(uploader, image, log):
+        METRICS.count("firmware_uploads_total", result="invalid")
+        return False
+    if skip_current and not force and uploader.board_running:
+        with timings.phase("query"):
+            if board_runs_image(image, com_port, log):
+                METRICS.count("firmware_uploads_total", result="skipped")
+                return True
+    result = "error"
+    try:
+        log(f"Uploading firmware from: {firmware_path} to {com_port} ({uploader.description})")
+        with METRICS.timer("firmware_upload_seconds", method=uploader.name):
+            ok = uploader.upload(firmware_path, com_port, log=log, progress=progress, timings=timings)
+        result = "ok" if ok else "failed"
+        if ok:
+            METRICS.count("firmware_upload_bytes_total", image.size)
+        log("Firmware uploaded successfully." if ok else "Upload failed.")
+        log(f"Upload timings: {timings.summary()}")
+        return ok
+    except FileNotFoundError:
+        log(f"File not found: {firmware_path}. Please ensure the file exists.")
+    except PermissionError as e:
+        log(
+            f"PermissionError: Could not open port '{com_port}'. Access is denied.  Close any other applications using this port and try again. Error: {e}"
+        )
+    except Exception as e:
+        log(f"An unexpected error occurred during upload: {e}")
+    finally:
+        METRICS.count("firmware_uploads_total", result=result)
+    return False
@@ -0,0 +1,69 @@
+"""Text and hex formatting of received serial data."""
+import codecs
+
+BYTES_PER_ROW = 16
+
+# Byte -> printable ASCII (non-printables become '.'), for bytes.translate
+_ASCII_TABLE = bytes(b if 32 <= b < 127 else ord(".") for b in range(256))
+
+
+class TextDecoder:
+    """Incremental UTF-8 decoder.
+
+    A multi-byte character split across two reads is held back until the rest
+    arrives instead of turning into replacement characters.
+    """
+
+    def __init__(self, encoding="utf-8"):
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    def decode(self, data):
+        return self._decoder.decode(data)
+
+    def flush(self):
+        """Returns any incomplete trailing sequence (as replacement characters)."""
+        return self._decoder.decode(b"", final=True)
+
+    def reset(self):
+        self._decoder.reset()
+
+
+def hex_bytes(data):
+    """Formats bytes as space-separated uppercase hex pairs ("0A 1B FF")."""
+    return data.hex(" ").upper()
+
+
+def hex_dump(data, offset=0, bytes_per_row=BYTES_PER_ROW):
+    """Formats bytes like `xxd`: offset, hex in 2-byte groups, ASCII column."""
+    width = bytes_per_row * 2 + (bytes_per_row + 1) // 2 - 1
+    ascii_text = data.translate(_ASCII_TABLE).decode("ascii")
+    view = memoryview(data)
+    return "".join(
+        f"{offset + start:08x}: {view[start:start + bytes_per_row].hex(' ', -2):<{width}}  "
+        f"{ascii_text[start:start + bytes_per_row]}\n"
+        for start in range(0, len(data), bytes_per_row)
+    )
+
+
+class HexFormatter:
+    """Formats a stream of chunks in plain hex or `xxd` layout.
+
+    In the `xxd` layout the offset column keeps counting across chunks; each
+    chunk starts a new row so nothing waits for a row to fill up.
+    """
+
+    def __init__(self, layout="plain", bytes_per_row=BYTES_PER_ROW):
+        self.layout = layout
+        self.bytes_per_row = bytes_per_row
+        self.offset = 0
+
+    def format(self, data):
+        if self.layout == "xxd":
+            text = hex_dump(data, self.offset, self.bytes_per_row)
+        else:
+            text = hex_bytes(data) + " "
+        self.offset += len(data)
+        return text
+
+    def reset(self):
+        self.offset = 0
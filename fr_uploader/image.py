@@ -0,0 +1,268 @@
+"""Firmware image checks before flashing.
+
+load_image() reads a raw .bin (placed at the target's flash base unless it
+is given another base address, e.g. for an application linked behind a
+bootloader) or an Intel .hex file (checksums verified, records assembled into one
+contiguous image, gaps filled with 0xFF as in erased flash). validate_image()
+then looks for the usual signs of a truncated download or an image built
+for another chip: the image must fit the target's flash, the initial stack
+pointer must point into its SRAM, and the reset and fault handlers must be
+Thumb addresses inside the image.
+
+A board can also report the digest of the image it runs. query_firmware()
+sends DIGEST_QUERY to its serial port and parses a reply line such as
+"fw_sha256=<64 hex digits>" or "crc32=0x1234ABCD"; a board that does not
+answer within the timeout is simply flashed.
+"""
+import hashlib
+import os
+import re
+import struct
+import time
+import zlib
+
+MAX_HEX_SPAN = 16 << 20  # Larger address ranges are not one flash image (e.g. option bytes far away)
+DIGEST_QUERY = b"fw?\n"
+QUERY_TIMEOUT = 1.0  # Seconds to wait for a board to report its firmware
+
+_CORE_VECTORS = {2: "NMI", 3: "HardFault", 4: "MemManage", 5: "BusFault", 6: "UsageFault",
+                 11: "SVCall", 12: "DebugMon", 14: "PendSV", 15: "SysTick"}
+_SHA256_REPLY = re.compile(r"\b(?:fw_)?sha-?256\s*[=:]\s*([0-9A-Fa-f]{64})\b", re.IGNORECASE)
+_CRC32_REPLY = re.compile(r"\b(?:fw_)?crc-?32\s*[=:]\s*(?:0x)?([0-9A-Fa-f]{8})\b", re.IGNORECASE)
+
+
+class ImageError(ValueError):
+    """The file cannot be read as a firmware image."""
+
+
+class FlashTarget:
+    """Memory map of a microcontroller, as far as image checks need it."""
+
+    def __init__(self, name, flash_base, flash_size, sram_base, sram_size, sector_sizes=(), product_id=None):
+        self.name = name
+        self.flash_base = flash_base
+        self.flash_size = flash_size
+        self.sram_base = sram_base
+        self.sram_size = sram_size
+        self.sector_sizes = tuple(sector_sizes)  # Erase sectors from flash_base up
+        self.product_id = product_id  # As reported by the ROM bootloader's Get ID command
+
+    @property
+    def flash_end(self):
+        return self.flash_base + self.flash_size
+
+    @property
+    def sram_end(self):
+        return self.sram_base + self.sram_size
+
+    def sectors(self, start, end):
+        """Numbers of the erase sectors overlapping the addresses start..end - 1."""
+        numbers = []
+        sector_start = self.flash_base
+        for number, size in enumerate(self.sector_sizes):
+            if sector_start < end and start < sector_start + size:
+                numbers.append(number)
+            sector_start += size
+        return numbers
+
+    def __repr__(self):
+        return f"FlashTarget({self.name!r})"
+
+
+STM32F446 = FlashTarget(
+    "STM32F446",
+    0x0800_0000,
+    512 << 10,
+    0x2000_0000,
+    128 << 10,
+    sector_sizes=[16 << 10] * 4 + [64 << 10] + [128 << 10] * 3,
+    product_id=0x421,
+)
+
+TARGETS = {STM32F446.name: STM32F446}
+
+
+class FirmwareImage:
+    """The bytes a board's flash will hold, starting at base_address."""
+
+    def __init__(self, data, base_address, path=None, format="bin", complete=True):
+        self.data = bytes(data)
+        self.base_address = base_address
+        self.path = path
+        self.format = format
+        self.complete = complete  # False for a .hex file without its end-of-file record
+        self.crc32 = zlib.crc32(self.data)
+        self.sha256 = hashlib.sha256(self.data).hexdigest()
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    @property
+    def end_address(self):
+        return self.base_address + len(self.data)
+
+    def vector(self, number):
+        """Entry `number` of the vector table at the start of the image, or None past its end."""
+        if len(self.data) < 4 * (number + 1):
+            return None
+        return struct.unpack_from("<I", self.data, 4 * number)[0]
+
+    def describe(self):
+        return f"{self.size:,} bytes at 0x{self.base_address:08X}, CRC32 {self.crc32:08X}, SHA-256 {self.sha256[:16]}..."
+
+    def __repr__(self):
+        return f"FirmwareImage({os.path.basename(self.path or '')!r}, {self.size} bytes)"
+
+
+def parse_intel_hex(text):
+    """Returns (base address, data, saw end-of-file record) for Intel HEX text."""
+    segments = []  # (address, bytes) in file order
+    upper = 0  # From type 02 (segment << 4) or 04 (linear << 16) records
+    complete = False
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        if complete:
+            raise ImageError(f"line {number}: data after the end-of-file record")
+        if line[0] != ":":
+            raise ImageError(f"line {number}: not an Intel HEX record")
+        try:
+            record = bytes.fromhex(line[1:])
+        except ValueError:
+            raise ImageError(f"line {number}: invalid hex digits") from None
+        if len(record) < 5 or len(record) != record[0] + 5:
+            raise ImageError(f"line {number}: record length does not match its byte count")
+        if sum(record) & 0xFF:
+            raise ImageError(f"line {number}: checksum mismatch")
+        count, address, kind = record[0], (record[1] << 8) | record[2], record[3]
+        payload = record[4:4 + count]
+        if kind == 0x00:
+            segments.append((upper + address, payload))
+        elif kind == 0x01:
+            complete = True
+        elif kind == 0x02:
+            upper = int.from_bytes(payload, "big") << 4
+        elif kind == 0x04:
+            upper = int.from_bytes(payload, "big") << 16
+        elif kind not in (0x03, 0x05):  # Start addresses say nothing about flash contents
+            raise ImageError(f"line {number}: unknown record type {kind:02X}")
+    if not segments:
+        return 0, b"", complete
+    base = min(address for address, _ in segments)
+    end = max(address + len(payload) for address, payload in segments)
+    if end - base > MAX_HEX_SPAN:
+        raise ImageError(f"records span 0x{base:08X}-0x{end - 1:08X}, too far apart for one flash image")
+    data = bytearray(b"\xff") * (end - base)
+    for address, payload in segments:
+        data[address - base:address - base + len(payload)] = payload
+    return base, bytes(data), complete
+
+
+def load_image(path, target=STM32F446, base_address=None):
+    """Reads a .hex or .bin firmware file; .bin images start at base_address (default: target.flash_base).
+
+    Raises ImageError for malformed files and OSError if the file cannot be read.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    if path.lower().endswith((".hex", ".ihex")):
+        try:
+            text = raw.decode("ascii")
+        except UnicodeDecodeError:
+            raise ImageError("not an Intel HEX file (binary data)") from None
+        base, data, complete = parse_intel_hex(text)
+        return FirmwareImage(data, base, path, "hex", complete)
+    return FirmwareImage(raw, target.flash_base if base_address is None else base_address, path, "bin")
+
+
+def _in_image(image, vector):
+    """True for a Thumb code address (bit 0 set) inside the image."""
+    return bool(vector & 1) and image.base_address <= vector - 1 < image.end_address
+
+
+def validate_image(image, target=STM32F446):
+    """Returns a list of problems (empty when the image looks flashable on target)."""
+    problems = []
+    if not image.complete:
+        problems.append("no end-of-file record; the file is truncated")
+    if not image.size:
+        problems.append("the image is empty")
+        return problems
+    if image.base_address < target.flash_base or image.end_address > target.flash_end:
+        problems.append(
+            f"image spans 0x{image.base_address:08X}-0x{image.end_address - 1:08X}, outside {target.name} "
+            f"flash (0x{target.flash_base:08X}-0x{target.flash_end - 1:08X}, {target.flash_size >> 10} KB)"
+        )
+    if image.size < 4 * 16:
+        problems.append(f"{image.size} bytes is too short for a vector table")
+        return problems
+
+    stack = image.vector(0)
+    if not target.sram_base < stack <= target.sram_end or stack % 4:
+        problems.append(
+            f"initial stack pointer 0x{stack:08X} is not in {target.name} SRAM "
+            f"(0x{target.sram_base:08X}-0x{target.sram_end:08X}); not a {target.name} image?"
+        )
+    reset = image.vector(1)
+    if not reset & 1:
+        problems.append(f"reset handler 0x{reset:08X} is not a Thumb address")
+    elif not _in_image(image, reset):
+        problems.append(
+            f"reset handler 0x{reset - 1:08X} lies outside the image "
+            f"(0x{image.base_address:08X}-0x{image.end_address - 1:08X}); truncated or linked elsewhere?"
+        )
+    bad = [
+        name
+        for number, name in _CORE_VECTORS.items()
+        if image.vector(number) and not _in_image(image, image.vector(number))  # 0 = unused
+    ]
+    if bad:
+        problems.append(f"{', '.join(bad)} handler(s) not Thumb addresses inside the image")
+    return problems
+
+
+def parse_digest_reply(line):
+    """{"sha256": str, "crc32": int} for what a reply line reports (possibly empty)."""
+    reported = {}
+    match = _SHA256_REPLY.search(line)
+    if match:
+        reported["sha256"] = match.group(1).lower()
+    match = _CRC32_REPLY.search(line)
+    if match:
+        reported["crc32"] = int(match.group(1), 16)
+    return reported
+
+
+def reports_image(reported, image):
+    """True if a board's reported digests identify this image (SHA-256 preferred over CRC32)."""
+    if "sha256" in reported:
+        return reported["sha256"] == image.sha256
+    if "crc32" in reported:
+        return reported["crc32"] == image.crc32
+    return False
+
+
+def query_firmware(port, baud_rate=115200, timeout=QUERY_TIMEOUT, query=DIGEST_QUERY, connection=None):
+    """Asks the board on `port` for its firmware digest. Returns the parsed digests or {} if it stays silent.
+
+    `connection` may be an already open pyserial-like object (then it is not closed).
+    """
+    if connection is None:
+        import serial
+
+        with serial.serial_for_url(port, baud_rate, timeout=0.05) as opened:
+            return query_firmware(port, baud_rate, timeout, query, opened)
+    connection.reset_input_buffer()
+    connection.write(query)
+    deadline = time.monotonic() + timeout
+    pending = b""
+    while time.monotonic() < deadline:
+        pending += connection.read(256)
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            reported = parse_digest_reply(line.decode("ascii", "replace"))
+            if reported:
+                return reported
+    return parse_digest_reply(pending.decode("ascii", "replace"))
@@ -0,0 +1,131 @@
+"""Thread-safe application log.
+
+Any thread may call LogBus.log(); nothing touches a widget there. The GUI
+calls drain() from its main loop, which hands each batch of records to every
+registered sink (e.g. both log panes) and, optionally, appends them to a
+rotating JSON-lines file.
+"""
+import datetime
+import json
+import queue
+import threading
+import time
+
+from fr_uploader.capture import RotatingCaptureFile
+
+DEFAULT_LOG_MAX_BYTES = 8 << 20  # 8 MiB per file
+DEFAULT_LOG_BACKUPS = 4
+
+
+class LogRecord:
+    """One log line plus where and when it was logged."""
+
+    __slots__ = ("time", "level", "message", "thread")
+
+    def __init__(self, message, level="info", thread=None, timestamp=None):
+        self.time = time.time() if timestamp is None else timestamp
+        self.level = level
+        self.message = message
+        self.thread = thread or threading.current_thread().name
+
+    def format(self):
+        """"[2024-01-31 12:00:00] message" as shown in the log panes."""
+        stamp = datetime.datetime.fromtimestamp(self.time).strftime("%Y-%m-%d %H:%M:%S")
+        return f"[{stamp}] {self.message}\n"
+
+    def to_json(self):
+        return json.dumps(
+            {"time": round(self.time, 6), "level": self.level, "thread": self.thread, "message": self.message},
+            ensure_ascii=False,
+        )
+
+
+class JsonLinesLog:
+    """Appends records to a rotating JSON-lines file, one object per line."""
+
+    def __init__(self, path, max_bytes=DEFAULT_LOG_MAX_BYTES, backup_count=DEFAULT_LOG_BACKUPS):
+        self.path = path
+        self._file = RotatingCaptureFile(path, max_bytes=max_bytes, backup_count=backup_count)
+
+    def write(self, records):
+        if records:
+            self._file.write("".join(record.to_json() + "\n" for record in records).encode("utf-8"))
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class LogBus:
+    """Queue of log records written by any thread and drained in batches."""
+
+    def __init__(self, max_batch=1000):
+        self.max_batch = max_batch
+        self.file = None  # A JsonLinesLog, or None
+        self.file_error = None
+        self.delivered = 0
+        self.drains = 0
+        self.largest_batch = 0
+        self._queue = queue.SimpleQueue()
+        self._sinks = []
+
+    def add_sink(self, sink):
+        """sink(records) is called from drain() with each batch of LogRecords."""
+        self._sinks.append(sink)
+
+    def log(self, message, level="info"):
+        """Queues a message; safe to call from any thread."""
+        self._queue.put(LogRecord(str(message), level))
+
+    def open_file(self, path, **options):
+        """Starts mirroring records to a JSON-lines file at path."""
+        self.close_file()
+        self.file = JsonLinesLog(path, **options)
+        self.file_error = None
+
+    def close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def drain(self, max_records=None):
+        """Delivers up to max_records queued records (default: max_batch).
+
+        Must be called from the thread that owns the sinks (the Tk main loop).
+        Returns the number of records delivered.
+        """
+        limit = max_records or self.max_batch
+        records = []
+        while len(records) < limit:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not records:
+            return 0
+        if self.file is not None:
+            try:
+                self.file.write(records)
+            except OSError as e:
+                # Stop mirroring rather than fail every following log call
+                self.file_error = e
+                self.close_file()
+        for sink in self._sinks:
+            sink(records)
+        self.delivered += len(records)
+        self.drains += 1
+        self.largest_batch = max(self.largest_batch, len(records))
+        return len(records)
+
+    @property
+    def backlog(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            "posted": self.delivered + self.backlog,
+            "delivered": self.delivered,
+            "drains": self.drains,
+            "largest_batch": self.largest_batch,
+            "backlog": self.backlog,
+        }
@@ -0,0 +1,414 @@
+"""Performance metrics: latency histograms, counters and gauges.
+
+Instrumented code records into the module-level METRICS registry by name,
+e.g. ``with METRICS.timer("serial_process_seconds"):`` or
+``METRICS.count("serial_bytes_in_total", len(data))``. The registry starts
+disabled; then timer() hands back a shared no-op context manager and the
+other recording calls return after one attribute check, so leaving the
+instrumentation in the hot paths costs next to nothing.
+
+Histograms use fixed buckets (LATENCY_BUCKETS by default) so observing is
+a bisect and a few additions under a lock, whatever the number of samples;
+quantiles are interpolated from the buckets. Gauges either hold the last
+value set or call a function when read, which suits queue depths.
+
+A snapshot can be exported as Prometheus text exposition format (version
+0.0.4) or as JSON, written to a file, or served over HTTP by MetricsServer
+for station dashboards to scrape.
+"""
+import bisect
+import json
+import math
+import threading
+import time
+
+# Seconds, 100 µs .. 5 min; covers a Tk callback as well as a whole flash
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+DEFAULT_METRICS_ADDRESS = ("127.0.0.1", 9464)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# name -> (type, help) for every metric the application records
+DESCRIPTIONS = {
+    "serial_read_seconds": ("histogram", "Time to drain the serial reader's buffer into the monitor (Tk thread)"),
+    "serial_process_seconds": ("histogram", "Time to decode and queue one received chunk (Tk thread)"),
+    "serial_bytes_in_total": ("counter", "Bytes received by the serial monitors"),
+    "serial_bytes_out_total": ("counter", "Bytes written to boards by the console send queues"),
+    "console_round_trip_seconds": ("histogram", "Time from writing a script command to the matching reply"),
+    "serial_reader_backlog_bytes": ("gauge", "Bytes waiting in a serial reader's buffer when it was last drained"),
+    "serial_pending_chars": ("gauge", "Characters queued for a serial monitor's next render frame"),
+    "log_messages_total": ("counter", "Messages logged"),
+    "log_queue_depth": ("gauge", "Log records waiting to be shown"),
+    "log_drain_seconds": ("histogram", "Time to deliver one batch of log records to the log panes (Tk thread)"),
+    "tk_event_loop_lag_seconds": ("histogram", "How late a periodic Tk timer ran; time the event loop was busy"),
+    "firmware_download_seconds": ("histogram", "Time to download a release into the firmware store"),
+    "firmware_downloads_total": ("counter", "Release downloads by result"),
+    "firmware_download_bytes_total": ("counter", "Bytes downloaded from release assets"),
+    "firmware_upload_seconds": ("histogram", "Time the uploader backend takes to flash one board"),
+    "firmware_uploads_total": ("counter", "Firmware uploads by result"),
+    "firmware_upload_bytes_total": ("counter", "Firmware image bytes uploaded to boards"),
+}
+
+
+class Counter:
+    """A value that only goes up (events, bytes)."""
+
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def add(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def sample(self):
+        return {"value": self.value}
+
+
+class Gauge:
+    """The last value set, or what `function` returns when the gauge is read."""
+
+    kind = "gauge"
+
+    def __init__(self, function=None):
+        self.value = 0
+        self.function = function
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:  # Whatever it watches may be gone
+                return None
+        return self.value
+
+    def sample(self):
+        return {"value": self.get()}
+
+
+class Histogram:
+    """Counts observations in fixed buckets, plus their count, sum and maximum."""
+
+    kind = "histogram"
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        """Estimates the q-quantile (0..1) by interpolating inside its bucket; None without samples."""
+        with self._lock:
+            counts, count, maximum = list(self.counts), self.count, self.max
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else maximum
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, maximum)
+            seen += bucket_count
+        return maximum
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def sample(self):
+        with self._lock:
+            counts, count, total, maximum = list(self.counts), self.count, self.sum, self.max
+        cumulative = []
+        running = 0
+        for bucket_count in counts:
+            running += bucket_count
+            cumulative.append(running)
+        return {
+            "count": count,
+            "sum": total,
+            "max": maximum,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], cumulative)),
+        }
+
+
+class _Timer:
+    """Context manager that observes its duration into a histogram."""
+
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """Named metrics, each optionally split by labels (e.g. result="ok")."""
+
+    def __init__(self, enabled=False, descriptions=None):
+        self.enabled = enabled
+        self.descriptions = dict(DESCRIPTIONS if descriptions is None else descriptions)
+        self.started = time.time()
+        self._metrics = {}  # (name, ((label, value), ...)) -> metric
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, labels, *args):
+        key = (name, tuple(sorted(labels.items())) if labels else ())
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    kind = self.descriptions.get(name, (cls.kind,))[0]
+                    if kind != cls.kind:
+                        raise ValueError(f"metric {name} is a {kind}, not a {cls.kind}")
+                    metric = self._metrics[key] = cls(*args)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"metric {name} is a {metric.kind}, not a {cls.kind}")
+        return metric
+
+    def counter(self, name, **labels):
+        return self._get(Counter, name, labels)
+
+    def gauge(self, name, function=None, **labels):
+        gauge = self._get(Gauge, name, labels)
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name, buckets=LATENCY_BUCKETS, **labels):
+        return self._get(Histogram, name, labels, buckets)
+
+    # Recording calls: no-ops while the registry is disabled
+
+    def count(self, name, amount=1, **labels):
+        if self.enabled:
+            self.counter(name, **labels).add(amount)
+
+    def set(self, name, value, **labels):
+        if self.enabled:
+            self.gauge(name, **labels).set(value)
+
+    def observe(self, name, value, **labels):
+        if self.enabled:
+            self.histogram(name, **labels).observe(value)
+
+    def timer(self, name, **labels):
+        """with registry.timer(name): ... records the block's duration in seconds."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(name, **labels))
+
+    def reset(self):
+        """Drops recorded values; gauges that read a function keep it."""
+        with self._lock:
+            self._metrics = {key: metric for key, metric in self._metrics.items() if getattr(metric, "function", None)}
+            self.started = time.time()
+
+    def snapshot(self):
+        """{"time", "since", "enabled", "metrics": [{"name", "type", "help", "labels", ...sample}]}."""
+        with self._lock:
+            items = sorted(self._metrics.items(), key=lambda item: item[0])
+        metrics = []
+        for (name, labels), metric in items:
+            entry = {"name": name, "type": metric.kind, "help": self.describe(name), "labels": dict(labels)}
+            entry.update(metric.sample())
+            metrics.append(entry)
+        return {"time": time.time(), "since": self.started, "enabled": self.enabled, "metrics": metrics}
+
+    def describe(self, name):
+        return self.descriptions.get(name, ("", ""))[1]
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix="frm_"):
+        """The snapshot in Prometheus text exposition format, metric names prefixed with `prefix`."""
+        lines = []
+        described = set()
+        for entry in self.snapshot()["metrics"]:
+            name = prefix + entry["name"]
+            if name not in described:
+                described.add(name)
+                if entry["help"]:
+                    lines.append(f"# HELP {name} {_escape_help(entry['help'])}")
+                lines.append(f"# TYPE {name} {entry['type']}")
+            labels = entry["labels"]
+            if entry["type"] == "histogram":
+                for bound, count in entry["buckets"].items():
+                    lines.append(f"{name}_bucket{_labels(labels, le=bound)} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(entry['sum'])}")
+                lines.append(f"{name}_count{_labels(labels)} {entry['count']}")
+            else:
+                lines.append(f"{name}{_labels(labels)} {_number(entry['value'])}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes a snapshot to path: JSON for *.json, Prometheus text otherwise."""
+        text = self.to_json() if path.lower().endswith(".json") else self.to_prometheus()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def _escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + "}"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):  # A gauge that could not be read
+        return "NaN"
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class EventLoopLagProbe:
+    """Measures how late a periodic timer on an event loop runs.
+
+    `scheduler` is anything with Tk's after(ms, callback) and after_cancel(job).
+    A timer due every `interval_ms` that fires late shows how long the loop
+    was busy with other callbacks; each delay is observed into
+    tk_event_loop_lag_seconds while the registry is enabled.
+    """
+
+    def __init__(self, scheduler, registry, interval_ms=100, name="tk_event_loop_lag_seconds"):
+        self.scheduler = scheduler
+        self.registry = registry
+        self.interval_ms = interval_ms
+        self.name = name
+        self.last_lag = 0.0
+        self._due = None
+        self._job = None
+
+    @property
+    def running(self):
+        return self._job is not None
+
+    def start(self):
+        if self._job is None:
+            self._schedule()
+
+    def stop(self):
+        if self._job is not None:
+            self.scheduler.after_cancel(self._job)
+            self._job = None
+
+    def _schedule(self):
+        self._due = time.perf_counter() + self.interval_ms / 1000
+        self._job = self.scheduler.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        self.last_lag = max(0.0, time.perf_counter() - self._due)
+        self.registry.observe(self.name, self.last_lag)
+        self._schedule()
+
+
+class MetricsServer:
+    """Serves a registry over HTTP: /metrics (Prometheus text) and /metrics.json.
+
+    Runs in a daemon thread; binds to localhost unless told otherwise.
+    """
+
+    def __init__(self, registry, host=DEFAULT_METRICS_ADDRESS[0], port=DEFAULT_METRICS_ADDRESS[1]):
+        # Imported here: only needed once someone turns the endpoint on
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path in ("/metrics", "/"):
+                    body, content_type = registry.to_prometheus(), PROMETHEUS_CONTENT_TYPE
+                elif path == "/metrics.json":
+                    body, content_type = registry.to_json(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):  # Scrapes every few seconds would flood stderr
+                pass
+
+        self.registry = registry
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.address = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self):
+        host, port = self.address
+        return f"http://{host}:{port}/metrics"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=1.0)
+
+
+def parse_address(text, default=DEFAULT_METRICS_ADDRESS):
+    """"host:port", ":port" or "port" -> (host, port); raises ValueError."""
+    text = text.strip()
+    host, _, port = text.rpartition(":")
+    return (host or default[0]), int(port or default[1])
+
+
+METRICS = MetricsRegistry()
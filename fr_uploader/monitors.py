@@ -0,0 +1,159 @@
+"""Monitoring several ports at once.
+
+Each PortMonitor owns its reader thread (serial or TCP), ring buffer, decoder
+and counters. MonitorManager.poll() drains every port, splits the data into
+lines stamped with the arrival time of their first byte and merges them
+across ports in time order (heapq.merge over the already sorted per-port
+lines).
+
+Ports are drained one after another, so a line drained from the last port
+may have arrived before lines from the first port that only show up in the
+next poll. The merged view therefore holds back lines stamped after the
+poll started (every chunk stamped before that has been drained by then),
+and lines stamped after the start of a line that is still incomplete on
+some port.
+"""
+import heapq
+import threading
+
+import serial
+
+from fr_uploader.formatting import TextDecoder
+from fr_uploader.serial_reader import SerialReader
+from fr_uploader.timestamps import SessionClock
+
+PARTIAL_LINE_TIMEOUT_NS = 500_000_000  # Show a line without a newline (e.g. a prompt) after 0.5 s
+
+
+class PortMonitor:
+    """One monitored port: its reader plus line assembly and counters."""
+
+    def __init__(self, name, reader, connection=None):
+        self.name = name
+        self.reader = reader
+        self.connection = connection  # Closed with the monitor (serial ports)
+        self.decoder = TextDecoder()
+        self.lines = 0
+        self.errors = 0  # Read, capture and connection errors seen so far
+        self.last_error = None
+        self._partial = ""
+        self._partial_stamp = None
+        self._reported = set()
+
+    def drain(self, now_ns=None):
+        """Returns [(stamp, name, line)] for every line completed since the last call."""
+        lines = []
+        for stamp, data in self.reader.buffer.read_chunks():
+            pieces = self.decoder.decode(data).split("\n")
+            for piece in pieces[:-1]:
+                line_stamp = stamp if self._partial_stamp is None else self._partial_stamp
+                lines.append((line_stamp, self.name, (self._partial + piece).rstrip("\r")))
+                self._partial = ""
+                self._partial_stamp = None
+            if pieces[-1]:
+                if self._partial_stamp is None:
+                    self._partial_stamp = stamp
+                self._partial += pieces[-1]
+        now_ns = SessionClock.now() if now_ns is None else now_ns
+        if self._partial_stamp is not None and now_ns - self._partial_stamp > PARTIAL_LINE_TIMEOUT_NS:
+            lines.append((self._partial_stamp, self.name, self._partial))
+            self._partial = ""
+            self._partial_stamp = None
+        self.lines += len(lines)
+        self._check_errors()
+        return lines
+
+    def _check_errors(self):
+        for error in (self.reader.error, self.reader.sink_error):
+            if error is not None and id(error) not in self._reported:
+                self._reported.add(id(error))
+                self.errors += 1
+                self.last_error = error
+
+    @property
+    def pending_stamp(self):
+        """Arrival time of the incomplete line held back, or None."""
+        return self._partial_stamp
+
+    @property
+    def alive(self):
+        return self.reader.is_alive()
+
+    def close(self):
+        self.reader.stop()
+        if self.connection is not None:
+            self.connection.close()
+
+    def stats(self):
+        stats = self.reader.stats()
+        stats["lines"] = self.lines
+        stats["errors"] = self.errors + stats.get("reconnects", 0)
+        stats["alive"] = self.alive
+        return stats
+
+
+class MonitorManager:
+    """Opens, drains and closes any number of PortMonitors."""
+
+    def __init__(self, log=None):
+        self.monitors = {}  # name -> PortMonitor, in the order they were opened
+        self.log = log or (lambda message: None)
+        self._lock = threading.Lock()
+        self._held = []  # Merged lines waiting for the next poll
+
+    def open_serial(self, port, baud_rate=115200, sink=None):
+        """Opens a serial port (or pyserial URL such as loop://) and starts its reader."""
+        if port in self.monitors:
+            raise ValueError(f"{port} is already being monitored")
+        connection = serial.serial_for_url(port, baud_rate, timeout=0.05)
+        return self.add(PortMonitor(port, SerialReader(connection, sink=sink), connection))
+
+    def open_tcp(self, address, sink=None):
+        """Connects to a UART-over-TCP bridge at "host:port"."""
+        from fr_uploader.tcp_reader import TcpReader, parse_address
+
+        host, port = parse_address(address)
+        reader = TcpReader(host, port, sink=sink, log=self.log)
+        if reader.address in self.monitors:
+            raise ValueError(f"{reader.address} is already being monitored")
+        return self.add(PortMonitor(reader.address, reader))
+
+    def add(self, monitor):
+        with self._lock:
+            self.monitors[monitor.name] = monitor
+        if not monitor.reader.is_alive():
+            monitor.reader.start()
+        return monitor
+
+    def close(self, name):
+        with self._lock:
+            monitor = self.monitors.pop(name, None)
+        if monitor is not None:
+            monitor.close()
+
+    def close_all(self):
+        for name in list(self.monitors):
+            self.close(name)
+        self._held = []
+
+    def poll(self):
+        """Drains every port. Returns ({name: [(stamp, name, line)]}, merged lines in time order)."""
+        now_ns = SessionClock.now()
+        with self._lock:
+            monitors = list(self.monitors.values())
+        per_port = {monitor.name: monitor.drain(now_ns) for monitor in monitors}
+        merged = list(heapq.merge(self._held, *per_port.values(), key=lambda line: line[0]))
+        watermark = now_ns
+        for monitor in monitors:
+            if monitor.pending_stamp is not None:
+                watermark = min(watermark, monitor.pending_stamp - 1)
+        split = len(merged)
+        while split and merged[split - 1][0] > watermark:
+            split -= 1
+        merged, self._held = merged[:split], merged[split:]
+        return per_port, merged
+
+    def stats(self):
+        with self._lock:
+            monitors = list(self.monitors.values())
+        return {monitor.name: monitor.stats() for monitor in monitors}
@@ -0,0 +1,157 @@
+"""Serial port hotplug detection.
+
+PortWatcher enumerates serial ports on a daemon thread once a second
+(or right away when woken) and tells its listeners which ports appeared
+and disappeared. Ports are compared by device name and by board identity
+(USB VID:PID and serial number), so a board that comes back under another
+COM number after a reset is recognised as the same board.
+"""
+import re
+import threading
+
+POLL_INTERVAL = 1.0  # Seconds between scans; comports() is cheap next to a human plugging a cable
+
+
+class PortInfo:
+    """One serial port as seen by a scan."""
+
+    def __init__(self, device, description="", vid=None, pid=None, serial_number=None, location=None):
+        self.device = device
+        self.description = description
+        self.vid = vid
+        self.pid = pid
+        self.serial_number = serial_number
+        self.location = location
+
+    @classmethod
+    def from_list_port(cls, port):
+        """From a serial.tools.list_ports ListPortInfo."""
+        return cls(
+            port.device,
+            port.description or "",
+            getattr(port, "vid", None),
+            getattr(port, "pid", None),
+            getattr(port, "serial_number", None),
+            getattr(port, "location", None),
+        )
+
+    @property
+    def identity(self):
+        """The board behind the port: VID:PID:serial, else VID:PID@USB location, else the device name."""
+        if self.vid is None or self.pid is None:
+            return self.device
+        if self.serial_number:
+            return f"{self.vid:04X}:{self.pid:04X}:{self.serial_number}"
+        return f"{self.vid:04X}:{self.pid:04X}@{self.location or self.device}"
+
+    def _key(self):
+        return (self.device, self.vid, self.pid, self.serial_number, self.location)
+
+    def __eq__(self, other):
+        return isinstance(other, PortInfo) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"PortInfo({self.device!r}, {self.identity!r})"
+
+
+def port_sort_key(device):
+    """Sorts COM2 before COM10 and ttyACM2 before ttyACM10."""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", device)]
+
+
+def diff_ports(old, new):
+    """Returns (added, removed) PortInfo lists between two {device: PortInfo} scans.
+
+    A device name that now belongs to another board counts as removed and added.
+    """
+    added = [info for device, info in new.items() if old.get(device) != info]
+    removed = [info for device, info in old.items() if new.get(device) != info]
+    return added, removed
+
+
+class PortWatcher(threading.Thread):
+    """Scans serial ports in the background and publishes changes.
+
+    Listeners are called as listener(added, removed) on the watcher thread,
+    first with every port found by the initial scan; GUI code must pass the
+    event on to its own thread. `enumerate_ports` defaults to pyserial's
+    comports() (imported on the watcher thread, not at startup).
+    """
+
+    def __init__(self, interval=POLL_INTERVAL, enumerate_ports=None):
+        super().__init__(name="PortWatcher", daemon=True)
+        self.interval = interval
+        self.enumerate_ports = enumerate_ports
+        self.scans = 0
+        self.error = None  # Last enumeration error, if the last scan failed
+        self.listener_error = None
+        self._ports = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+
+    @property
+    def ports(self):
+        """{device: PortInfo} from the latest scan."""
+        with self._lock:
+            return dict(self._ports)
+
+    def devices(self):
+        """Device names from the latest scan, in natural order."""
+        return sorted(self.ports, key=port_sort_key)
+
+    def find(self, identity):
+        """The port currently holding the board with this identity, or None."""
+        for info in self.ports.values():
+            if info.identity == identity:
+                return info
+        return None
+
+    def add_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def scan(self):
+        """Enumerates the ports once and notifies listeners of changes. Returns (added, removed)."""
+        if self.enumerate_ports is None:
+            from serial.tools import list_ports
+
+            self.enumerate_ports = list_ports.comports
+        try:
+            found = {port.device: PortInfo.from_list_port(port) for port in self.enumerate_ports()}
+        except Exception as e:  # A driver hiccup must not kill the watcher
+            self.error = e
+            return [], []
+        self.error = None
+        with self._lock:
+            added, removed = diff_ports(self._ports, found)
+            self._ports = found
+            self.scans += 1
+            listeners = list(self._listeners)
+        if added or removed or self.scans == 1:
+            for listener in listeners:
+                try:
+                    listener(added, removed)
+                except Exception as e:
+                    self.listener_error = e
+        return added, removed
+
+    def wake(self):
+        """Scans right away instead of at the next interval (e.g. a Refresh button)."""
+        self._wake.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.scan()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        self._wake.set()
+        if self.is_alive():
+            self.join(timeout)
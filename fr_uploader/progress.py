@@ -0,0 +1,169 @@
+"""Live progress for uploads: streamed tool output, progress parsing, phase timings."""
+import os
+import queue
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# "45%", "45.5 %" and "[=====>   ] 45%"-style progress output
+PERCENT_PATTERN = re.compile(rb"(\d{1,3}(?:\.\d+)?)\s*%")
+# "12345/67890 bytes" style transfer counters
+BYTES_PATTERN = re.compile(rb"(\d+)\s*/\s*(\d+)\s*bytes", re.IGNORECASE)
+
+
+class UploadTimings:
+    """Wall-clock time spent in each upload phase (e.g. reset, copy, verify)."""
+
+    def __init__(self):
+        self.phases = {}  # name -> seconds, in the order the phases ran
+        self._started = time.monotonic()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.monotonic() - start
+
+    @property
+    def total(self):
+        return time.monotonic() - self._started
+
+    def summary(self):
+        parts = [f"{name} {seconds:.1f} s" for name, seconds in self.phases.items()]
+        return f"{', '.join(parts) or 'no phases'} (total {self.total:.1f} s)"
+
+
+class ProgressReporter:
+    """Turns byte counts or tool output into (percent, KB/s) progress callbacks.
+
+    Callbacks are throttled to one per `interval` seconds, plus the final 100%.
+    """
+
+    def __init__(self, callback, total_bytes=None, interval=0.25):
+        self.callback = callback
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.percent = None
+        self._start = time.monotonic()
+        self._last_report = 0.0
+
+    def update_bytes(self, done, total=None):
+        total = total or self.total_bytes
+        if total:
+            self.total_bytes = total
+            self.update_percent(100.0 * done / total)
+
+    def update_percent(self, percent):
+        percent = min(100.0, max(0.0, percent))
+        self.percent = percent
+        now = time.monotonic()
+        if self.callback is None or (percent < 100.0 and now - self._last_report < self.interval):
+            return
+        self._last_report = now
+        elapsed = now - self._start
+        rate = None
+        if self.total_bytes and elapsed > 0:
+            rate = self.total_bytes * percent / 100.0 / 1024 / elapsed
+        self.callback(percent, rate)
+
+    def feed_line(self, line):
+        """Looks for a transfer counter or a percentage in one line of tool output."""
+        data = line.encode() if isinstance(line, str) else line
+        match = BYTES_PATTERN.search(data)
+        if match:
+            self.update_bytes(int(match.group(1)), int(match.group(2)))
+            return
+        matches = PERCENT_PATTERN.findall(data)
+        if matches:
+            self.update_percent(float(matches[-1]))
+
+
+def format_progress(percent, rate):
+    """Formats a progress callback's arguments as "45% (120.5 KB/s)" ("" before any progress)."""
+    if percent is None:
+        return ""
+    return f"{percent:.0f}%" + (f" ({rate:.1f} KB/s)" if rate else "")
+
+
+def _read_lines(stream, lines):
+    """Pipe reader thread: splits output on CR or LF (progress bars use bare CR)."""
+    pending = b""
+    try:
+        for chunk in iter(lambda: stream.read1(4096), b""):
+            pending += chunk
+            parts = re.split(rb"\r\n|\r|\n", pending)
+            pending = parts.pop()
+            for part in parts:
+                lines.put(part)
+    except (OSError, ValueError):
+        pass  # Pipe closed underneath us after a kill
+    if pending:
+        lines.put(pending)
+    lines.put(None)
+
+
+def kill_process_tree(process):
+    """Kills a process and its children (batch scripts start helpers of their own)."""
+    if process.poll() is not None:
+        return
+    if sys.platform == "win32":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            process.kill()
+    process.wait()
+
+
+def run_streaming(command, on_line, timeout=None, idle_timeout=None):
+    """Runs command, passing every output line (stdout and stderr) to on_line as it arrives.
+
+    A watchdog kills the process tree when it runs longer than timeout or
+    prints nothing for idle_timeout seconds. Returns (returncode, reason),
+    where reason is None or a description of why the watchdog fired.
+    """
+    options = {}
+    if sys.platform == "win32":
+        options["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        options["start_new_session"] = True  # Lets the watchdog kill the whole group
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, **options
+    )
+    lines = queue.Queue()
+    reader = threading.Thread(target=_read_lines, args=(process.stdout, lines), daemon=True)
+    reader.start()
+
+    start = last_output = time.monotonic()
+    reason = None
+    while True:
+        try:
+            line = lines.get(timeout=0.1)
+        except queue.Empty:
+            pass
+        else:
+            if line is None:
+                break
+            last_output = time.monotonic()
+            text = line.decode(errors="replace").rstrip()
+            if text:
+                on_line(text)
+        now = time.monotonic()
+        if timeout is not None and now - start > timeout:
+            reason = f"no result after {timeout:.0f} s"
+        elif idle_timeout is not None and now - last_output > idle_timeout:
+            reason = f"no output for {idle_timeout:.0f} s"
+        if reason:
+            # Children may still hold the pipe open, so the (daemon) reader
+            # thread is left to finish on its own.
+            kill_process_tree(process)
+            return process.wait(), reason
+    process.stdout.close()
+    return process.wait(), reason
@@ -0,0 +1,113 @@
+"""Cached access to the GitHub "latest release" API.
+
+The last response is kept on disk together with its ETag. Within the TTL it
+is served without any request; after that it is revalidated with
+If-None-Match, and GitHub answers 304 Not Modified without counting the call
+against the rate limit. In offline mode the cached release is always served.
+"""
+import json
+import os
+import threading
+import time
+
+RELEASES_API = "https://api.github.com/repos/{repo}/releases/latest"
+DEFAULT_TTL = 300  # seconds
+
+
+class ReleaseError(Exception):
+    """Raised when no release information is available."""
+
+
+class ReleaseCache:
+    """Latest-release metadata for one repository, cached in a JSON file."""
+
+    def __init__(self, path, repo, ttl=DEFAULT_TTL, session=None, api_url=RELEASES_API):
+        self.path = path
+        self.url = api_url.format(repo=repo)
+        self.ttl = ttl
+        self.session = session
+        self.offline = False
+        self.hits = 0  # Served from cache without a request
+        self.misses = 0  # Full 200 responses
+        self.revalidations = 0  # 304 Not Modified
+        self.stale = 0  # Cached data served because the request failed
+        self._lock = threading.Lock()
+        self._entry = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                entry = json.load(f)
+            if "release" in entry and "fetched_at" in entry:
+                return entry
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _save(self):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entry, f)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def fetched_at(self):
+        return self._entry["fetched_at"] if self._entry else None
+
+    def latest(self, force=False):
+        """Returns the latest release JSON, from cache when possible.
+
+        Raises ReleaseError when offline without a cached release, and
+        requests.RequestException when the request fails and nothing is cached.
+        """
+        import requests  # Not at import time: the GUI creates the cache before its window appears
+
+        from fr_uploader.downloads import get_session
+
+        with self._lock:
+            entry = self._entry
+            if entry and (self.offline or (not force and time.time() - entry["fetched_at"] < self.ttl)):
+                self.hits += 1
+                return entry["release"]
+            if self.offline:
+                raise ReleaseError("Offline mode: no cached release information.")
+
+            headers = {"Accept": "application/vnd.github+json"}
+            if entry and entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            try:
+                response = (self.session or get_session()).get(self.url, headers=headers, timeout=5)
+                if response.status_code != 304:
+                    response.raise_for_status()
+            except requests.RequestException:
+                if entry is None:
+                    raise
+                self.stale += 1
+                return entry["release"]
+
+            if response.status_code == 304:
+                self.revalidations += 1
+                entry["fetched_at"] = time.time()
+            else:
+                self.misses += 1
+                entry = {
+                    "etag": response.headers.get("ETag"),
+                    "fetched_at": time.time(),
+                    "release": response.json(),
+                }
+                self._entry = entry
+            try:
+                self._save()
+            except OSError:
+                pass  # The cache is an optimisation; a read-only folder is fine
+            return entry["release"]
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "stale": self.stale,
+        }
@@ -0,0 +1,185 @@
+"""Concurrent flashing of many boards.
+
+The scheduler runs (port, firmware) jobs through a thread pool. Each job is
+retried a configurable number of times, and a BatchReport sums up the batch.
+An optional skip_current(job, log) check runs before the first attempt; a
+board it reports as already running the firmware is left alone.
+The uploader is a backend from fr_uploader.uploaders (or any callable with
+the same signature) and must be able to address every board on its own,
+e.g. by port.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fr_uploader.progress import UploadTimings
+
+PENDING = "pending"
+RUNNING = "running"
+RETRYING = "retrying"
+SUCCEEDED = "ok"
+FAILED = "failed"
+SKIPPED = "current"  # The board already runs the firmware
+
+
+class FlashJob:
+    """One board to flash, plus its live status."""
+
+    def __init__(self, port, firmware):
+        self.port = port
+        self.firmware = firmware
+        self.status = PENDING
+        self.attempts = 0
+        self.started = None
+        self.finished = None
+        self.output = []  # Log lines from every attempt
+        self.error = None
+        self.percent = None  # Progress of the current attempt
+        self.rate = None  # KB/s of the current attempt
+        self.timings = UploadTimings()  # Phase timings of the last attempt
+
+    @property
+    def duration(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def __repr__(self):
+        return f"FlashJob({self.port!r}, {os.path.basename(self.firmware)!r}, {self.status})"
+
+
+class BatchReport:
+    """Outcome of one FlashScheduler.run() call."""
+
+    def __init__(self, jobs, wall_time):
+        self.jobs = jobs
+        self.wall_time = wall_time
+
+    @property
+    def succeeded(self):
+        return [job for job in self.jobs if job.status == SUCCEEDED]
+
+    @property
+    def skipped(self):
+        return [job for job in self.jobs if job.status == SKIPPED]
+
+    @property
+    def failed(self):
+        return [job for job in self.jobs if job.status not in (SUCCEEDED, SKIPPED)]
+
+    def summary(self):
+        """Returns a human readable, multi-line summary."""
+        lines = []
+        for job in self.jobs:
+            line = (
+                f"{job.port:<12} {os.path.basename(job.firmware):<28} {job.status.upper():<7} "
+                f"{job.attempts} attempt(s) {job.duration:6.1f} s"
+            )
+            if job.timings.phases:
+                line += f"  [{job.timings.summary()}]"
+            if job.error:
+                line += f"  ({job.error})"
+            lines.append(line)
+        busy_time = sum(job.duration for job in self.jobs)
+        speedup = busy_time / self.wall_time if self.wall_time > 0 else 0.0
+        skipped = f", {len(self.skipped)} already current" if self.skipped else ""
+        lines.append(
+            f"Flashed {len(self.succeeded)}/{len(self.jobs)} boards{skipped} in {self.wall_time:.1f} s "
+            f"(sum of job times {busy_time:.1f} s, {speedup:.1f}x)"
+        )
+        return "\n".join(lines)
+
+
+class FlashScheduler:
+    """Flashes jobs concurrently with at most max_workers uploads at a time.
+
+    on_progress(job) is called from worker threads whenever a job changes
+    status or logs a line; GUI callers must hand it over to their main loop.
+    """
+
+    def __init__(self, uploader, max_workers=4, retries=1, retry_delay=1.0, on_progress=None, skip_current=None):
+        self.uploader = uploader
+        self.skip_current = skip_current
+        self.max_workers = max(1, max_workers)
+        self.retries = max(0, retries)
+        self.retry_delay = retry_delay
+        self.on_progress = on_progress
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Stops starting new attempts; uploads already running finish."""
+        self._cancelled.set()
+
+    def _notify(self, job):
+        if self.on_progress:
+            self.on_progress(job)
+
+    def _run_job(self, job):
+        job.started = time.monotonic()
+
+        def log(line):
+            job.output.append(line)
+            self._notify(job)
+
+        def progress(percent, rate):
+            job.percent = percent
+            job.rate = rate
+            self._notify(job)
+
+        if self.skip_current is not None and not self._cancelled.is_set():
+            try:
+                current = self.skip_current(job, log)
+            except Exception as e:
+                current = False
+                log(f"Could not check the current firmware: {e}")
+            if current:
+                job.status = SKIPPED
+                job.finished = time.monotonic()
+                self._notify(job)
+                return job
+
+        while job.attempts <= self.retries and not self._cancelled.is_set():
+            job.attempts += 1
+            job.status = RUNNING
+            job.percent = job.rate = None
+            job.timings = UploadTimings()
+            self._notify(job)
+            try:
+                ok = self.uploader(job.firmware, job.port, log, progress=progress, timings=job.timings)
+                job.error = None if ok else "upload failed"
+            except Exception as e:
+                ok = False
+                job.error = str(e)
+                log(f"Error: {e}")
+            if ok:
+                job.status = SUCCEEDED
+                break
+            if job.attempts <= self.retries:
+                job.status = RETRYING
+                self._notify(job)
+                time.sleep(self.retry_delay)
+        else:
+            if self._cancelled.is_set() and job.error is None:
+                job.error = "cancelled"
+        if job.status != SUCCEEDED:
+            job.status = FAILED
+        job.finished = time.monotonic()
+        self._notify(job)
+        return job
+
+    def run(self, jobs):
+        """Flashes all jobs and returns a BatchReport once every job is done.
+
+        Raises ValueError, before flashing anything, when the uploader cannot
+        tell the jobs' ports apart (see UploaderBackend.check_ports).
+        """
+        jobs = list(jobs)
+        check_ports = getattr(self.uploader, "check_ports", None)
+        problem = check_ports([job.port for job in jobs]) if check_ports else None
+        if problem:
+            raise ValueError(problem)
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="flash") as pool:
+            list(pool.map(self._run_job, jobs))
+        return BatchReport(jobs, time.monotonic() - start)
@@ -0,0 +1,141 @@
+"""Bounded scrollback for Tk text widgets.
+
+Works on any widget with the Tk text index API (index/count/delete), so this
+module does not import tkinter itself.
+"""
+import os
+import sys
+
+DEFAULT_MAX_LINES = 10000
+TRIM_FRACTION = 0.1  # Trim an extra 10% so we do not delete on every insert
+
+# Label shown in the GUI -> (max_lines, max_chars)
+SCROLLBACK_CHOICES = {
+    "1,000 lines": (1000, None),
+    "10,000 lines": (10000, None),
+    "100,000 lines": (100000, None),
+    "1 MB": (None, 1 << 20),
+    "10 MB": (None, 10 << 20),
+    "Unlimited": (None, None),
+}
+
+
+class Scrollback:
+    """Keeps a text widget within a line and/or character budget.
+
+    Call appended() after every insert; when the widget grows past a limit,
+    whole lines are removed from the top in one delete.
+    """
+
+    def __init__(self, widget, max_lines=DEFAULT_MAX_LINES, max_chars=None, trim_fraction=TRIM_FRACTION):
+        self.widget = widget
+        self.max_lines = max_lines
+        self.max_chars = max_chars
+        self.trim_fraction = trim_fraction
+        self.chars = 0  # Characters currently held by the widget
+        self.trimmed_lines = 0
+        self.trimmed_chars = 0
+        self.trim_count = 0
+
+    def configure(self, max_lines=None, max_chars=None):
+        """Sets new limits (None means unlimited) and trims right away. Returns lines removed."""
+        self.max_lines = max_lines
+        self.max_chars = max_chars
+        return self.trim()
+
+    def appended(self, text):
+        """Accounts for text that was just inserted and trims if needed. Returns lines removed."""
+        self.chars += len(text)
+        return self.trim()
+
+    def cleared(self):
+        """Resets the size accounting after the widget was emptied."""
+        self.chars = 0
+
+    def line_count(self):
+        return int(self.widget.index("end-1c").split(".")[0])
+
+    def trim(self):
+        """Deletes lines from the top of the widget if it is over budget. Returns lines removed."""
+        drop_lines = 0
+        lines = self.line_count()
+        if self.max_lines and lines > self.max_lines:
+            keep = int(self.max_lines * (1 - self.trim_fraction))
+            drop_lines = lines - keep
+        if self.max_chars and self.chars > self.max_chars:
+            excess = self.chars - int(self.max_chars * (1 - self.trim_fraction))
+            # Round up to the end of the line holding the last excess character
+            line = int(self.widget.index(f"1.0 + {excess} chars").split(".")[0])
+            drop_lines = max(drop_lines, line)
+        if drop_lines <= 0:
+            return 0
+        end = f"{drop_lines + 1}.0"
+        removed = self._count_chars("1.0", end)
+        self.widget.delete("1.0", end)
+        self.chars = max(0, self.chars - removed)
+        self.trimmed_lines += drop_lines
+        self.trimmed_chars += removed
+        self.trim_count += 1
+        return drop_lines
+
+    def _count_chars(self, start, end):
+        result = self.widget.count(start, end, "chars")
+        if isinstance(result, tuple):
+            result = result[0]
+        return result or 0
+
+    def stats(self):
+        return {
+            "lines": self.line_count(),
+            "chars": self.chars,
+            "trimmed_lines": self.trimmed_lines,
+            "trimmed_chars": self.trimmed_chars,
+            "trims": self.trim_count,
+        }
+
+
+def process_memory():
+    """Returns the resident memory of this process in bytes, or None if unknown."""
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return None
+        import resource  # macOS and other Unixes: peak RSS is the best we get cheaply
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+    except Exception:
+        return None
+
+
+def format_size(num_bytes):
+    """Formats a byte count as B/KB/MB/GB."""
+    for unit in ("B", "KB", "MB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
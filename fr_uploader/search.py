@@ -0,0 +1,234 @@
+"""Search and line filters over the serial monitor's scrollback.
+
+LineIndex keeps the text of a view in one string plus an array of line start
+offsets, so a regex runs over the whole scrollback in C and each match is
+mapped to its line with a bisect instead of going through Tk's text search.
+Lines are numbered from 0 at the top of the index (Tk line = index line + 1).
+
+LineFilter applies include/exclude regexes to the stream as it arrives,
+one complete line at a time.
+"""
+import bisect
+import itertools
+import re
+from array import array
+
+
+def compile_pattern(pattern, ignore_case=False):
+    """Compiles a user-supplied regex; raises re.error for a bad pattern."""
+    return re.compile(pattern, re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+
+
+class LineIndex:
+    """Text plus line start offsets, trimmed from the top like a scrollback."""
+
+    def __init__(self):
+        self._text = ""
+        self._tail = []  # Appended text not yet joined into _text
+        self._size = 0  # Absolute offset of the end of the text
+        self._base = 0  # Absolute offset of _text[0]
+        self._starts = array("q", [0])  # Absolute start offset of every line
+        self.dropped = 0  # Lines removed from the top so far; line + dropped is stable across trims
+
+    def __len__(self):
+        """Number of lines, counting the (possibly empty) last line like Tk does."""
+        return len(self._starts)
+
+    @property
+    def chars(self):
+        return self._size - self._base
+
+    def append(self, text):
+        if not text:
+            return
+        pieces = text.split("\n")
+        if len(pieces) > 1:
+            lengths = (len(piece) + 1 for piece in pieces[:-1])
+            # accumulate() yields the initial offset first; that line is already indexed
+            self._starts.extend(itertools.islice(itertools.accumulate(lengths, initial=self._size), 1, None))
+        self._tail.append(text)
+        self._size += len(text)
+
+    def text(self):
+        """The whole indexed text."""
+        if self._tail:
+            self._text += "".join(self._tail)
+            self._tail.clear()
+        return self._text
+
+    def clear(self):
+        self._text = ""
+        self._tail.clear()
+        self._size = self._base = 0
+        self._starts = array("q", [0])
+        self.dropped = 0
+
+    def drop(self, lines):
+        """Removes the first `lines` lines (e.g. after the widget was trimmed)."""
+        if lines <= 0:
+            return
+        lines = min(lines, len(self._starts))
+        self.dropped += lines
+        if lines == len(self._starts):
+            base = self._size
+            self._text = ""
+            self._tail.clear()
+            self._starts = array("q", [base])
+        else:
+            base = self._starts[lines]
+            self._text = self.text()[base - self._base:]
+            del self._starts[:lines]
+        self._base = base
+
+    def limit(self, max_lines=None, max_chars=None, trim_fraction=0.1):
+        """Drops lines from the top once over a limit, like Scrollback.trim(). Returns lines dropped."""
+        drop = 0
+        if max_lines and len(self) > max_lines:
+            drop = len(self) - int(max_lines * (1 - trim_fraction))
+        if max_chars and self.chars > max_chars:
+            excess = self.chars - int(max_chars * (1 - trim_fraction))
+            drop = max(drop, self.line_at(self._base + excess) + 1)
+        self.drop(drop)
+        return drop
+
+    def line_at(self, offset):
+        """Index line holding the absolute text offset."""
+        return bisect.bisect_right(self._starts, offset) - 1
+
+    def line(self, number):
+        """Text of a line, without its newline."""
+        start = self._starts[number] - self._base
+        end = self._starts[number + 1] - 1 - self._base if number + 1 < len(self._starts) else None
+        return self.text()[start:end]
+
+    def _offset(self, line, column=0):
+        line = min(max(line, 0), len(self._starts) - 1)
+        return self._starts[line] - self._base + column
+
+    def _match_position(self, match):
+        """(line, start column, end column) of a match, clipped to its first line."""
+        start = match.start() + self._base
+        line = self.line_at(start)
+        line_start = self._starts[line]
+        line_end = self._starts[line + 1] - 1 if line + 1 < len(self._starts) else self._size
+        return line, start - line_start, min(match.end() + self._base, line_end) - line_start
+
+    def matches(self, regex, first_line=0, last_line=None, limit=None):
+        """[(line, start column, end column)] of matches starting in lines first_line..last_line."""
+        text = self.text()
+        end = None if last_line is None or last_line + 1 >= len(self._starts) else self._offset(last_line + 1)
+        found = []
+        for match in regex.finditer(text, self._offset(first_line), len(text) if end is None else end):
+            if match.end() == match.start():
+                continue  # Empty matches (e.g. "^") highlight nothing
+            found.append(self._match_position(match))
+            if limit is not None and len(found) >= limit:
+                break
+        return found
+
+    def count(self, regex):
+        """Number of non-empty matches in the whole index."""
+        return sum(1 for match in regex.finditer(self.text()) if match.end() > match.start())
+
+    def find(self, regex, line=0, column=0, backwards=False, wrap=True):
+        """Next match after (or, backwards, before) line/column; None if there is none."""
+        text = self.text()
+        position = self._offset(line, column)
+        if not backwards:
+            for start in (position, 0) if wrap else (position,):
+                for match in regex.finditer(text, start):
+                    if match.end() > match.start():
+                        return self._match_position(match)
+            return None
+        # Search backwards one block at a time from the position, then from the end
+        for stop in (position, len(text)) if wrap else (position,):
+            block_end = stop
+            while block_end > 0:
+                block_start = max(0, block_end - (1 << 20))
+                if block_start:
+                    block_start = text.rfind("\n", 0, block_start) + 1  # Whole lines only
+                last = None
+                for match in regex.finditer(text, block_start, stop):
+                    if match.start() >= block_end:
+                        break
+                    if match.end() > match.start():
+                        last = match
+                if last is not None:
+                    return self._match_position(last)
+                block_end = block_start
+        return None
+
+
+class LineFilter:
+    """Passes complete lines that match `include` (if set) and do not match `exclude`.
+
+    feed() holds an incomplete last line back until its newline arrives.
+    """
+
+    def __init__(self, include="", exclude="", ignore_case=False):
+        self.include = compile_pattern(include, ignore_case) if include else None
+        self.exclude = compile_pattern(exclude, ignore_case) if exclude else None
+        self._partial = ""
+        self.lines_seen = 0
+        self.lines_passed = 0
+
+    @property
+    def active(self):
+        return self.include is not None or self.exclude is not None
+
+    def feed(self, text):
+        """Returns the lines of text (with newlines) that pass the filter."""
+        if not self.active:
+            return text
+        block = self._partial + text
+        end = block.rfind("\n") + 1
+        self._partial = block[end:]
+        if not end:
+            return ""
+        block = block[:end]
+        lines = block.count("\n")
+        self.lines_seen += lines
+        if self.include is None:
+            passed = self._per_line(block)
+        else:
+            passed = self._included(block, lines)
+        self.lines_passed += len(passed)
+        return "\n".join(passed) + "\n" if passed else ""
+
+    def _per_line(self, block):
+        include = self.include.search if self.include else None
+        exclude = self.exclude.search if self.exclude else None
+        return [
+            line
+            for line in block[:-1].split("\n")
+            if (include is None or include(line)) and (exclude is None or not exclude(line))
+        ]
+
+    def _included(self, block, lines):
+        """Lines of block (complete lines) that the include pattern matches.
+
+        Searching the whole block and cutting out the lines around each match
+        only does per-line work for matching lines; once more than a quarter of
+        the lines match, testing every line is cheaper and the rest of the
+        block is done that way.
+        """
+        passed = []
+        search = self.include.search
+        exclude = self.exclude.search if self.exclude else None
+        budget = lines // 4 + 1
+        position = 0
+        while True:
+            match = search(block, position)
+            if match is None or match.start() >= len(block):
+                return passed  # A zero-width match at the very end (e.g. "^" or "$"); no line left
+            if len(passed) > budget:
+                return passed + self._per_line(block[block.rfind("\n", 0, match.start()) + 1:])
+            start = block.rfind("\n", 0, match.start()) + 1
+            end = block.find("\n", match.start())  # The block ends with a newline, so there is one
+            line = block[start:end]
+            if exclude is None or not exclude(line):
+                passed.append(line)
+            position = end + 1
+
+    def reset(self):
+        self._partial = ""
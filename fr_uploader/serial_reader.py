@@ -0,0 +1,226 @@
+"""Background serial reader feeding a bounded ring buffer.
+
+The reader thread owns the serial connection while monitoring and only ever
+appends to the ring buffer; the GUI drains the buffer on its own schedule, so
+a busy Tk main loop no longer stalls the port.
+"""
+import threading
+import time
+from collections import deque
+
+import serial
+
+DEFAULT_BUFFER_SIZE = 1 << 20  # 1 MiB, about 40 s of data at 250000 baud
+READ_CHUNK_SIZE = 4096
+
+
+class RingBuffer:
+    """Preallocated, thread-safe byte ring buffer.
+
+    When a write does not fit, the oldest unread bytes are dropped and counted
+    as an overrun instead of blocking the writer. Writes may carry a stamp
+    (e.g. their arrival time), which read_chunks() hands back per chunk.
+
+    With a clock (e.g. time.perf_counter_ns), writes without a stamp are
+    stamped with clock() while the lock is held. A consumer that reads the
+    clock and then calls read_chunks() is then sure to get every chunk
+    stamped before its reading.
+    """
+
+    def __init__(self, capacity=DEFAULT_BUFFER_SIZE, clock=None):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._start = 0  # index of the oldest unread byte
+        self._size = 0
+        self._written = 0  # Total bytes ever written (stream position of the end)
+        self._marks = deque()  # (stream position, stamp) where each stamped write starts
+        self._lock = threading.Lock()
+        self._clock = clock
+        self.overruns = 0  # writes that had to drop unread data
+        self.dropped_bytes = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._size
+
+    def write(self, data, stamp=None):
+        """Appends data, dropping the oldest bytes if the buffer is full."""
+        data = memoryview(data).cast("B")
+        n = len(data)
+        if not n:
+            return
+        cap = self.capacity
+        with self._lock:
+            if stamp is None and self._clock is not None:
+                stamp = self._clock()
+            if stamp is not None:
+                self._marks.append((self._written, stamp))
+            self._written += n
+            if n >= cap:
+                self.overruns += 1
+                self.dropped_bytes += self._size + n - cap
+                self._buf[:] = data[n - cap:]
+                self._start = 0
+                self._size = cap
+                self._drop_marks(self._written - cap)
+                return
+            free = cap - self._size
+            if n > free:
+                drop = n - free
+                self.overruns += 1
+                self.dropped_bytes += drop
+                self._start = (self._start + drop) % cap
+                self._size -= drop
+                self._drop_marks(self._written - n - self._size)
+            end = (self._start + self._size) % cap
+            first = min(n, cap - end)
+            self._buf[end:end + first] = data[:first]
+            if first < n:
+                self._buf[:n - first] = data[first:]
+            self._size += n
+
+    def _take(self, max_bytes):
+        """Removes up to max_bytes; returns (stream position, data). Lock must be held."""
+        n = self._size if max_bytes is None else min(self._size, max_bytes)
+        position = self._written - self._size
+        if not n:
+            return position, b""
+        start = self._start
+        first = min(n, self.capacity - start)
+        out = bytes(self._buf[start:start + first])
+        if first < n:
+            out += bytes(self._buf[:n - first])
+        self._start = (start + n) % self.capacity
+        self._size -= n
+        return position, out
+
+    def _drop_marks(self, position):
+        """Forgets marks before position, keeping the one covering it."""
+        marks = self._marks
+        while len(marks) > 1 and marks[1][0] <= position:
+            marks.popleft()
+
+    def read(self, max_bytes=None):
+        """Removes and returns up to max_bytes (all buffered bytes by default)."""
+        with self._lock:
+            position, out = self._take(max_bytes)
+            self._drop_marks(position + len(out))
+            return out
+
+    def read_chunks(self, max_bytes=None):
+        """Like read(), but returns a list of (stamp, bytes), one per stamped write.
+
+        Bytes written without a stamp are reported with the stamp of the
+        write before them (or None).
+        """
+        with self._lock:
+            position, data = self._take(max_bytes)
+            if not data:
+                return []
+            end = position + len(data)
+            self._drop_marks(position)
+            marks = self._marks
+            chunks = []
+            if not marks or marks[0][0] > position:
+                first_mark = marks[0][0] if marks else end
+                chunks.append((None, data[:min(first_mark, end) - position]))
+            for i, (mark_position, stamp) in enumerate(marks):
+                if mark_position >= end:
+                    break
+                next_position = marks[i + 1][0] if i + 1 < len(marks) else end
+                chunk_start = max(mark_position, position)
+                chunks.append((stamp, data[chunk_start - position:min(next_position, end) - position]))
+            self._drop_marks(end)
+            return [chunk for chunk in chunks if chunk[1]]
+
+    def clear(self):
+        """Discards all buffered bytes."""
+        with self._lock:
+            self._start = 0
+            self._size = 0
+            self._marks.clear()
+
+
+class StreamReader(threading.Thread):
+    """Base for the reader threads: ring buffer, capture sink and counters.
+
+    Subclasses read their connection in run() and pass every chunk to
+    _received(). Fatal read errors are kept in `error` for the GUI to report.
+    Every chunk is stamped with its arrival time from time.perf_counter_ns().
+    If given, `sink` is called with every chunk on the reader thread (e.g. to
+    spill the full stream to disk).
+    """
+
+    def __init__(self, name, buffer_size=DEFAULT_BUFFER_SIZE, sink=None):
+        super().__init__(name=name, daemon=True)
+        self.buffer = RingBuffer(buffer_size, clock=time.perf_counter_ns)
+        self.sink = sink
+        self.bytes_received = 0
+        self.error = None
+        self.sink_error = None
+        self._stop_event = threading.Event()
+        self._rate_bytes = 0
+        self._rate_time = time.monotonic()
+
+    def _received(self, data):
+        self.buffer.write(data)  # Stamped with its arrival time by the buffer
+        self.bytes_received += len(data)
+        if self.sink is not None:
+            try:
+                self.sink(data)
+            except Exception as e:
+                # A full disk should not stop the monitor
+                self.sink = None
+                self.sink_error = e
+
+    def stop(self, timeout=1.0):
+        """Asks the thread to finish and waits for it."""
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    def stats(self):
+        """Returns receive counters; bytes_per_sec covers the time since the last call."""
+        now = time.monotonic()
+        received = self.bytes_received
+        elapsed = now - self._rate_time
+        rate = (received - self._rate_bytes) / elapsed if elapsed > 0 else 0.0
+        self._rate_bytes = received
+        self._rate_time = now
+        return {
+            "bytes_received": received,
+            "bytes_per_sec": rate,
+            "overruns": self.buffer.overruns,
+            "dropped_bytes": self.buffer.dropped_bytes,
+            "buffered": len(self.buffer),
+        }
+
+
+class SerialReader(StreamReader):
+    """Reads an open serial connection on a daemon thread into a RingBuffer.
+
+    The connection should have a short read timeout (e.g. 0.05 s) so that
+    stop() is honoured promptly.
+    """
+
+    def __init__(self, connection, buffer_size=DEFAULT_BUFFER_SIZE, sink=None):
+        super().__init__(f"SerialReader-{getattr(connection, 'port', '?')}", buffer_size, sink)
+        self.connection = connection
+
+    def run(self):
+        conn = self.connection
+        while not self._stop_event.is_set():
+            try:
+                # Block (up to the port timeout) for the first byte, then take
+                # whatever else has already arrived in one call.
+                data = conn.read(min(max(conn.in_waiting, 1), READ_CHUNK_SIZE))
+            except (serial.SerialException, OSError, TypeError) as e:
+                # pyserial raises TypeError/OSError when the port is closed
+                # or unplugged underneath a blocking read.
+                if not self._stop_event.is_set():
+                    self.error = e
+                break
+            if data:
+                self._received(data)
@@ -0,0 +1,81 @@
+"""Startup timing: where the time before the window appears goes.
+
+StartupProfile marks named steps against the moment the process started
+its own code (frm.py takes the time before any other import). With its
+ImportTimer installed it also records every module imported for the first
+time, with the time it took including the modules it imported itself, so
+the report can name the slowest imports.
+"""
+import builtins
+import sys
+import time
+
+
+class ImportTimer:
+    """Times first-time imports by wrapping builtins.__import__ while installed."""
+
+    def __init__(self):
+        self.imports = []  # (module, seconds, depth) in the order the imports finished
+        self._depth = 0
+        self._original = None
+
+    def install(self):
+        if self._original is None:
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+        return self
+
+    def uninstall(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original(name, globals, locals, fromlist, level)
+        self._depth += 1
+        started = time.perf_counter()
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            self._depth -= 1
+            self.imports.append((name, time.perf_counter() - started, self._depth))
+
+    def slowest(self, count=10, depth=0):
+        """The `count` slowest imports made at `depth` (0: by the profiled code itself)."""
+        return sorted((entry for entry in self.imports if entry[2] == depth), key=lambda entry: -entry[1])[:count]
+
+
+class StartupProfile:
+    """Named startup steps, each timed from the previous mark."""
+
+    def __init__(self, started=None, timer=None):
+        self.started = time.perf_counter() if started is None else started
+        self.timer = timer
+        self.steps = []  # (name, seconds)
+        self._last = self.started
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.steps.append((name, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.started
+
+    def summary(self):
+        return f"Started in {self.total:.2f} s"
+
+    def report(self):
+        """A multi-line report of the steps and, with an ImportTimer, the slowest imports."""
+        slowest = self.timer.slowest() if self.timer is not None else []
+        width = max((len(name) for name, *_ in self.steps + slowest), default=0)
+        lines = [f"Startup profile: {self.total * 1000:.0f} ms"]
+        for name, seconds in self.steps:
+            lines.append(f"  {name:<{width}}  {seconds * 1000:7.1f} ms")
+        if slowest:
+            lines.append("Slowest imports (including what they import):")
+            for name, seconds, _ in slowest:
+                lines.append(f"  {name:<{width}}  {seconds * 1000:7.1f} ms")
+        return "\n".join(lines)
@@ -0,0 +1,400 @@
+"""STM32 system memory bootloader over UART (ST application note AN3155).
+
+STM32Bootloader speaks the protocol on an open pyserial port (8 data bits,
+even parity): every command is a byte plus its complement, and each step is
+answered with ACK (0x79) or NACK (0x1F). The bootloader measures the baud
+rate from the first 0x7F it receives and keeps it until the next reset, so
+connect() can only fall back to a lower rate when a reset hook (such as
+dtr_rts_reset) restarts the board in its bootloader between attempts.
+
+flash_image() erases the sectors an image covers, writes it in 256-byte
+frames and, one chunk at a time, reads the chunk back and compares its
+CRC32 with the image. The F446 ROM bootloader has no checksum command, so
+the readback goes over the wire: it doubles the transfer, but proves the
+flash holds the image.
+
+With window > 1, frames are sent back to back and their ACKs collected up
+to `window` frames later, which hides the round trip of USB serial
+adapters. The ROM bootloader reads its UART without a FIFO and can lose
+bytes that arrive while it programs flash, so keep window at 1 for real
+boards unless the link is known to cope.
+"""
+import functools
+import operator
+import struct
+import time
+import zlib
+from collections import deque
+
+from fr_uploader.image import STM32F446
+from fr_uploader.progress import UploadTimings
+
+ACK = 0x79
+NACK = 0x1F
+SYNC = 0x7F
+
+GET = 0x00
+GET_VERSION = 0x01
+GET_ID = 0x02
+READ_MEMORY = 0x11
+GO = 0x21
+WRITE_MEMORY = 0x31
+ERASE = 0x43
+EXTENDED_ERASE = 0x44
+
+BLOCK_SIZE = 256  # Largest read or write frame
+VERIFY_CHUNK = 16 * BLOCK_SIZE  # Bytes written before they are read back and compared
+BAUD_RATES = (115200, 57600, 38400, 19200, 9600)  # Tried highest first
+BITS_PER_BYTE = 11  # Start bit, 8 data bits, even parity, stop bit
+ERASE_TIMEOUT_PER_SECTOR = 4.0  # A 128 KB F446 sector takes up to 2 s
+
+
+class BootloaderError(Exception):
+    """The bootloader did not answer, refused a command, or the flash differs from the image."""
+
+
+def checksum(data):
+    """XOR of all bytes, as the bootloader expects after addresses and data."""
+    return functools.reduce(operator.xor, data, 0)
+
+
+def address_frame(address):
+    frame = struct.pack(">I", address)
+    return frame + bytes([checksum(frame)])
+
+
+def write_frame(address, block):
+    """A whole Write Memory exchange for one block, as sent when nothing waits for the ACKs."""
+    length_and_data = bytes([len(block) - 1]) + block
+    return (
+        bytes([WRITE_MEMORY, WRITE_MEMORY ^ 0xFF])
+        + address_frame(address)
+        + length_and_data
+        + bytes([checksum(length_and_data)])
+    )
+
+
+def read_frame(address, length):
+    """A whole Read Memory request; the bootloader answers with three ACKs and the data."""
+    return (
+        bytes([READ_MEMORY, READ_MEMORY ^ 0xFF])
+        + address_frame(address)
+        + bytes([length - 1, (length - 1) ^ 0xFF])
+    )
+
+
+class STM32Bootloader:
+    """Commands of a bootloader on an open serial connection (call sync() first)."""
+
+    def __init__(self, connection, timeout=1.0, target=STM32F446):
+        self.connection = connection
+        self.timeout = timeout
+        self.target = target
+        self.baud_rate = getattr(connection, "baudrate", None)
+        self.version = None  # Bootloader protocol version, e.g. 0x31
+        self.commands = b""  # Command codes the bootloader supports (from Get)
+        self.retries = 0  # Frames sent again after a NACK
+
+    # --- Framing ---
+    def _read(self, count, timeout=None):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        data = b""
+        while len(data) < count:
+            chunk = self.connection.read(count - len(data))
+            if chunk:
+                data += chunk
+            elif time.monotonic() > deadline:
+                raise BootloaderError(f"no answer from the bootloader ({len(data)} of {count} bytes)")
+        return data
+
+    def _ack(self, what, timeout=None):
+        answer = self._read(1, timeout)[0]
+        if answer == NACK:
+            raise BootloaderError(f"{what} refused (NACK)")
+        if answer != ACK:
+            raise BootloaderError(f"{what}: unexpected answer 0x{answer:02X}")
+
+    def command(self, code):
+        self.connection.write(bytes([code, code ^ 0xFF]))
+        self._ack(f"command 0x{code:02X}")
+
+    # --- Commands ---
+    def sync(self):
+        """Sends 0x7F so the bootloader can measure the baud rate; True once it answers."""
+        self.connection.reset_input_buffer()
+        self.connection.write(bytes([SYNC]))
+        try:
+            return self._read(1)[0] in (ACK, NACK)
+        except BootloaderError:
+            pass
+        # Already synchronised: the 0x7F was taken as a command byte. Complete it
+        # with its complement; an unknown command is answered with NACK.
+        self.connection.write(bytes([SYNC ^ 0xFF]))
+        try:
+            return self._read(1)[0] == NACK
+        except BootloaderError:
+            return False
+
+    def get(self):
+        """Reads the protocol version and the supported command codes."""
+        self.command(GET)
+        count = self._read(1)[0]
+        reply = self._read(count + 1)
+        self._ack("Get")
+        self.version = reply[0]
+        self.commands = reply[1:]
+        return self.version, self.commands
+
+    def get_id(self):
+        """The product ID (0x421 for the STM32F446)."""
+        self.command(GET_ID)
+        count = self._read(1)[0]
+        product_id = int.from_bytes(self._read(count + 1), "big")
+        self._ack("Get ID")
+        return product_id
+
+    def read_memory(self, address, length):
+        if not 0 < length <= BLOCK_SIZE:
+            raise ValueError(f"read length must be 1..{BLOCK_SIZE}")
+        self.command(READ_MEMORY)
+        self.connection.write(address_frame(address))
+        self._ack(f"read address 0x{address:08X}")
+        self.connection.write(bytes([length - 1, (length - 1) ^ 0xFF]))
+        self._ack(f"read length {length}")
+        return self._read(length)
+
+    def write_memory(self, address, block, retries=2):
+        """Writes one block (at most 256 bytes, a multiple of 4), sending it again after a NACK."""
+        for attempt in range(retries + 1):
+            try:
+                self.command(WRITE_MEMORY)
+                self.connection.write(address_frame(address))
+                self._ack(f"write address 0x{address:08X}")
+                length_and_data = bytes([len(block) - 1]) + block
+                self.connection.write(length_and_data + bytes([checksum(length_and_data)]))
+                self._ack(f"write at 0x{address:08X}")
+                return
+            except BootloaderError as e:
+                if "NACK" not in str(e) or attempt == retries:
+                    raise
+                self.retries += 1
+
+    def erase_sectors(self, sectors):
+        """Erases flash sectors by number, with Extended Erase where the bootloader has it."""
+        if not sectors:
+            return
+        timeout = self.timeout + ERASE_TIMEOUT_PER_SECTOR * len(sectors)
+        if EXTENDED_ERASE in self.commands or not self.commands:
+            self.command(EXTENDED_ERASE)
+            frame = struct.pack(f">H{len(sectors)}H", len(sectors) - 1, *sectors)
+        else:
+            self.command(ERASE)
+            frame = bytes([len(sectors) - 1, *sectors])
+        self.connection.write(frame + bytes([checksum(frame)]))
+        self._ack(f"erase of sector(s) {', '.join(map(str, sectors))}", timeout)
+
+    def go(self, address):
+        """Starts the code whose vector table is at address."""
+        self.command(GO)
+        self.connection.write(address_frame(address))
+        self._ack(f"go 0x{address:08X}")
+
+    # --- Pipelined transfers ---
+    def write_blocks(self, address, data, window=1):
+        """Writes data from address in BLOCK_SIZE frames, with up to `window` frames awaiting their ACKs.
+
+        Blocks of erased flash (all 0xFF) are skipped. Returns the number of bytes sent.
+        """
+        frames = []
+        for offset in range(0, len(data), BLOCK_SIZE):
+            block = data[offset:offset + BLOCK_SIZE]
+            block += b"\xff" * (-len(block) % 4)  # Writes are whole words
+            if block.count(0xFF) != len(block):
+                frames.append((address + offset, block))
+        if window <= 1:
+            for block_address, block in frames:
+                self.write_memory(block_address, block)
+            return sum(len(block) for _, block in frames)
+        pending = deque()
+        for block_address, block in frames:
+            if len(pending) >= window:
+                self._collect_write(pending.popleft())
+            self.connection.write(write_frame(block_address, block))
+            pending.append(block_address)
+        while pending:
+            self._collect_write(pending.popleft())
+        return sum(len(block) for _, block in frames)
+
+    def _collect_write(self, address):
+        for step in ("command", "address", "data"):
+            try:
+                self._ack(f"pipelined write at 0x{address:08X} ({step})")
+            except BootloaderError as e:
+                raise BootloaderError(f"{e}; the frames after it are lost, flash again with window=1") from None
+
+    def read_blocks(self, address, length, window=1):
+        """Reads length bytes from address in BLOCK_SIZE requests, up to `window` of them in flight."""
+        requests = [
+            (address + offset, min(BLOCK_SIZE, length - offset)) for offset in range(0, length, BLOCK_SIZE)
+        ]
+        if window <= 1:
+            return b"".join(self.read_memory(block_address, size) for block_address, size in requests)
+        data = []
+        pending = deque()
+        for request in requests:
+            if len(pending) >= window:
+                data.append(self._collect_read(*pending.popleft()))
+            self.connection.write(read_frame(*request))
+            pending.append(request)
+        while pending:
+            data.append(self._collect_read(*pending.popleft()))
+        return b"".join(data)
+
+    def _collect_read(self, address, length):
+        for step in ("command", "address", "length"):
+            self._ack(f"pipelined read at 0x{address:08X} ({step})")
+        return self._read(length)
+
+
+def dtr_rts_reset(connection, settle=0.1):
+    """Restarts the board in its bootloader with stm32flash's usual wiring: RTS drives BOOT0, DTR pulls NRST.
+
+    The line levels depend on the adapter and wiring; pass another reset hook if they differ.
+    """
+    connection.rts = True
+    connection.dtr = True
+    time.sleep(0.05)
+    connection.dtr = False
+    time.sleep(settle)
+    connection.reset_input_buffer()
+
+
+def open_bootloader_port(port, baud_rate):
+    import serial
+
+    return serial.serial_for_url(port, baud_rate, parity=serial.PARITY_EVEN, timeout=0.05)
+
+
+def connect(port, baud_rates=BAUD_RATES, reset=None, timeout=1.0, target=STM32F446, log=print, open_port=None):
+    """Opens port and synchronises at the highest baud rate in baud_rates that passes a link check.
+
+    The check runs Get and Get ID and reads one block twice; any error or
+    difference moves on to the next rate. reset(connection), if given, is
+    called before every attempt. Returns an STM32Bootloader with its
+    connection open; raises BootloaderError if no rate works or the chip is
+    not the target.
+    """
+    open_port = open_port or open_bootloader_port
+    connection = None
+    last_error = None
+    try:
+        for baud_rate in sorted(baud_rates, reverse=True):
+            if connection is None:
+                connection = open_port(port, baud_rate)
+            else:
+                connection.baudrate = baud_rate
+            if reset is not None:
+                reset(connection)
+            bootloader = STM32Bootloader(connection, timeout, target)
+            bootloader.baud_rate = baud_rate
+            try:
+                if not bootloader.sync():
+                    raise BootloaderError("no answer to 0x7F")
+                bootloader.get()
+                product_id = bootloader.get_id()
+                if bootloader.read_memory(target.flash_base, BLOCK_SIZE) != bootloader.read_memory(
+                    target.flash_base, BLOCK_SIZE
+                ):
+                    raise BootloaderError("readback differs between two reads")
+            except BootloaderError as e:
+                last_error = e
+                log(f"Bootloader link at {baud_rate} baud failed: {e}")
+                continue
+            if target.product_id is not None and product_id != target.product_id:
+                raise BootloaderError(
+                    f"product ID 0x{product_id:03X} is not {target.name} (0x{target.product_id:03X})"
+                )
+            log(
+                f"Bootloader v{bootloader.version >> 4}.{bootloader.version & 0xF} on {port} "
+                f"at {baud_rate} baud (product ID 0x{product_id:03X})"
+            )
+            connection = None  # Handed over to the caller
+            return bootloader
+    finally:
+        if connection is not None:
+            connection.close()
+    hint = "" if reset else "; is the board in its bootloader (BOOT0 high during reset)?"
+    raise BootloaderError(f"no working link at {', '.join(map(str, baud_rates))} baud: {last_error}{hint}")
+
+
+class FlashResult:
+    """What flash_image() did, with the time of each phase."""
+
+    def __init__(self, size, baud_rate, timings):
+        self.size = size  # Image bytes
+        self.written = 0  # Bytes sent in write frames (erased blocks are skipped)
+        self.verified = 0  # Bytes read back and compared
+        self.baud_rate = baud_rate
+        self.timings = timings
+
+    def _rate(self, count, phase):
+        seconds = self.timings.phases.get(phase, 0.0)
+        return count / seconds / 1024 if seconds else 0.0
+
+    @property
+    def throughput(self):
+        """Effective KB/s: image bytes over the time spent erasing, writing and verifying."""
+        seconds = sum(self.timings.phases.get(phase, 0.0) for phase in ("erase", "write", "verify"))
+        return self.size / seconds / 1024 if seconds else 0.0
+
+    def summary(self):
+        line_rate = self.baud_rate / BITS_PER_BYTE / 1024 if self.baud_rate else 0.0
+        write_rate = self._rate(self.written, "write")
+        text = f"Flashed {self.size:,} bytes at {self.baud_rate} baud: write {write_rate:.1f} KB/s"
+        if line_rate:
+            text += f" ({write_rate / line_rate:.0%} of the line rate)"
+        if self.verified:
+            text += f", verify {self._rate(self.verified, 'verify'):.1f} KB/s"
+        return f"{text}, {self.throughput:.1f} KB/s effective"
+
+
+def flash_image(bootloader, image, window=1, verify=True, progress=None, log=print, timings=None):
+    """Erases, writes and (chunk by chunk) verifies a FirmwareImage. Returns a FlashResult.
+
+    progress(done, total) counts bytes written plus bytes verified. Raises
+    BootloaderError, naming the first differing address when a readback
+    does not match.
+    """
+    timings = timings or UploadTimings()
+    result = FlashResult(image.size, bootloader.baud_rate, timings)
+    target = bootloader.target
+    sectors = target.sectors(image.base_address, image.end_address)
+    log(f"Erasing sector(s) {', '.join(map(str, sectors))}")
+    with timings.phase("erase"):
+        bootloader.erase_sectors(sectors)
+    total = image.size * (2 if verify else 1)
+    done = 0
+    for offset in range(0, image.size, VERIFY_CHUNK):
+        chunk = image.data[offset:offset + VERIFY_CHUNK]
+        address = image.base_address + offset
+        with timings.phase("write"):
+            result.written += bootloader.write_blocks(address, chunk, window)
+        done += len(chunk)
+        if progress:
+            progress(done, total)
+        if not verify:
+            continue
+        with timings.phase("verify"):
+            readback = bootloader.read_blocks(address, len(chunk), window)
+        result.verified += len(chunk)
+        if zlib.crc32(readback) != zlib.crc32(chunk):
+            first = next(i for i, (a, b) in enumerate(zip(readback, chunk)) if a != b)
+            raise BootloaderError(
+                f"verify failed at 0x{address + first:08X}: wrote 0x{chunk[first]:02X}, read 0x{readback[first]:02X}"
+            )
+        done += len(chunk)
+        if progress:
+            progress(done, total)
+    if bootloader.retries:
+        log(f"{bootloader.retries} frame(s) sent again after a NACK")
+    return result
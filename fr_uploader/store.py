@@ -0,0 +1,227 @@
+"""Content-addressed local firmware store.
+
+Layout under the store root:
+
+    objects/ab/abcd...ef.bin   one blob per unique file, named by its SHA-256
+    releases/<tag>.json        manifest: file name -> sha256, size (and ETag)
+    incoming/                  downloads in progress
+
+Identical files are stored once and shared by every release that contains
+them. The newest `keep_releases` releases are always kept so older firmware
+can be flashed again instantly; beyond that, the oldest releases are evicted
+while the store is over its size budget.
+
+A file is recognised as already stored by the SHA-256 GitHub publishes for
+it. Assets published without one (older releases) are matched by size and
+the ETag of their download URL instead; when the server sends no ETag
+either, they are downloaded again every time.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+DEFAULT_KEEP_RELEASES = 3
+DEFAULT_MAX_BYTES = 256 << 20  # 256 MiB
+
+
+class FirmwareStore:
+    """Blobs and per-release manifests under one root folder."""
+
+    def __init__(self, root, keep_releases=DEFAULT_KEEP_RELEASES, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.keep_releases = keep_releases
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(root, "objects")
+        self.releases_dir = os.path.join(root, "releases")
+        self.incoming_dir = os.path.join(root, "incoming")
+        self._lock = threading.Lock()
+
+    def _ensure_dirs(self):
+        for folder in (self.objects_dir, self.releases_dir, self.incoming_dir):
+            os.makedirs(folder, exist_ok=True)
+
+    # --- Blobs ---
+    def blob_path(self, sha256, name=""):
+        """Path of a blob; the file extension of name is kept (the board's MSD cares)."""
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(self.objects_dir, sha256[:2], sha256 + extension)
+
+    def has_blob(self, sha256, name=""):
+        return bool(sha256) and os.path.exists(self.blob_path(sha256, name))
+
+    def add_blob(self, path, name, sha256=None):
+        """Moves a downloaded file into the store and returns its SHA-256."""
+        if sha256 is None:
+            from fr_uploader.downloads import file_sha256
+
+            sha256 = file_sha256(path).hexdigest()
+        target = self.blob_path(sha256, name)
+        with self._lock:
+            if os.path.exists(target):
+                os.remove(path)  # Already stored by an earlier release
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target)
+        return sha256
+
+    # --- Releases ---
+    def _manifest_path(self, tag):
+        return os.path.join(self.releases_dir, f"{tag}.json")
+
+    def save_release(self, tag, files):
+        """Writes the manifest for tag; files maps file name -> (sha256, size, etag or None)."""
+        self._ensure_dirs()
+        manifest = {
+            "tag": tag,
+            "created": time.time(),
+            "files": {
+                name: {"sha256": sha, "size": size, **({"etag": etag} if etag else {})}
+                for name, (sha, size, etag) in files.items()
+            },
+        }
+        tmp_path = self._manifest_path(tag) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self._manifest_path(tag))
+        return manifest
+
+    def manifest(self, tag):
+        try:
+            with open(self._manifest_path(tag), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def releases(self):
+        """Returns all manifests, newest first."""
+        manifests = []
+        if os.path.isdir(self.releases_dir):
+            for entry in os.listdir(self.releases_dir):
+                if entry.endswith(".json"):
+                    manifest = self.manifest(entry[:-len(".json")])
+                    if manifest:
+                        manifests.append(manifest)
+        manifests.sort(key=lambda m: m.get("created", 0), reverse=True)
+        return manifests
+
+    def find_by_etag(self, name, size, etag):
+        """Returns the sha256 of a stored file that was downloaded with this size and ETag, or None."""
+        for manifest in self.releases():
+            for entry in manifest["files"].values():
+                if entry.get("etag") == etag and entry.get("size") == size and self.has_blob(entry["sha256"], name):
+                    return entry["sha256"]
+        return None
+
+    def resolve(self, name, tag):
+        """Returns the stored path of file `name` in release `tag`, or None."""
+        manifest = self.manifest(tag)
+        if not manifest:
+            return None
+        entry = manifest["files"].get(name)
+        if not entry:
+            return None
+        path = self.blob_path(entry["sha256"], name)
+        return path if os.path.exists(path) else None
+
+    # --- Eviction ---
+    def _referenced(self, manifests):
+        return {self.blob_path(entry["sha256"], name) for m in manifests for name, entry in m["files"].items()}
+
+    def total_size(self):
+        total = 0
+        for folder, _, files in os.walk(self.objects_dir):
+            total += sum(os.path.getsize(os.path.join(folder, f)) for f in files)
+        return total
+
+    def prune(self, protect=()):
+        """Evicts old releases over the size budget and deletes unreferenced blobs.
+
+        Returns the list of evicted release tags. Tags in protect are never evicted.
+        """
+        with self._lock:
+            manifests = self.releases()
+            evicted = []
+
+            def size_of(kept):
+                return sum(os.path.getsize(p) for p in self._referenced(kept) if os.path.exists(p))
+
+            kept = list(manifests)
+            while (
+                len(kept) > self.keep_releases
+                and self.max_bytes is not None
+                and size_of(kept) > self.max_bytes
+            ):
+                # Oldest unprotected release beyond the newest keep_releases
+                candidates = [m for m in kept[self.keep_releases:] if m["tag"] not in protect]
+                if not candidates:
+                    break
+                victim = candidates[-1]
+                kept.remove(victim)
+                os.remove(self._manifest_path(victim["tag"]))
+                evicted.append(victim["tag"])
+
+            referenced = self._referenced(kept)
+            if os.path.isdir(self.objects_dir):
+                for folder, _, files in os.walk(self.objects_dir):
+                    for f in files:
+                        path = os.path.join(folder, f)
+                        if path not in referenced:
+                            os.remove(path)
+            if os.path.isdir(self.incoming_dir):
+                # Keep only partial downloads (.part) so they can be resumed
+                for f in os.listdir(self.incoming_dir):
+                    if not f.endswith(".part"):
+                        path = os.path.join(self.incoming_dir, f)
+                        if os.path.isdir(path):
+                            shutil.rmtree(path, ignore_errors=True)
+                        else:
+                            os.remove(path)
+            return evicted
+
+
+def download_release(store, tag, assets, log=print, **download_options):
+    """Downloads a release into the store, skipping files it already holds.
+
+    Assets whose published SHA-256 is already stored are not downloaded
+    again; assets without one are matched by size and ETag (see above).
+    Returns the new manifest, or None if any download failed.
+    """
+    # Imported here so that flashing from the store does not load requests
+    from fr_uploader.downloads import asset_etag, asset_sha256, download_assets
+
+    store._ensure_dirs()
+    files = {}
+    etags = {}
+    to_fetch = []
+    by_etag = 0
+    for asset in assets:
+        sha256 = asset_sha256(asset)
+        if sha256 is None:
+            etags[asset["name"]] = etag = asset_etag(asset, download_options.get("session"))
+            if etag:
+                sha256 = store.find_by_etag(asset["name"], asset.get("size"), etag)
+                by_etag += sha256 is not None
+        if sha256 is not None and store.has_blob(sha256, asset["name"]):
+            files[asset["name"]] = (sha256, asset.get("size"), etags.get(asset["name"]))
+        else:
+            to_fetch.append(asset)
+    if files:
+        matched = f" ({by_etag} matched by size and ETag, without a published digest)" if by_etag else ""
+        log(f"{len(files)} file(s) unchanged since an earlier release{matched}; reusing stored copies.")
+
+    results = download_assets(to_fetch, store.incoming_dir, log=log, **download_options)
+    if any(isinstance(result, Exception) for result in results.values()):
+        return None
+    for asset in to_fetch:
+        name = asset["name"]
+        path = os.path.join(store.incoming_dir, name)
+        size = os.path.getsize(path)
+        files[name] = (store.add_blob(path, name, results[name]), size, etags.get(name))
+
+    manifest = store.save_release(tag, files)
+    evicted = store.prune(protect=(tag,))
+    if evicted:
+        log(f"Evicted old firmware releases: {', '.join(evicted)}")
+    return manifest
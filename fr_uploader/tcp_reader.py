@@ -0,0 +1,152 @@
+"""TCP monitor transport for UART-over-Wi-Fi bridges.
+
+An asyncio event loop runs on the reader thread and feeds the same RingBuffer
+as the serial reader, so the GUI drains and renders TCP and serial data the
+same way. Lost or refused connections are retried with exponential backoff
+until stop() is called.
+"""
+import asyncio
+
+from fr_uploader.serial_reader import DEFAULT_BUFFER_SIZE, READ_CHUNK_SIZE, StreamReader
+
+DEFAULT_TCP_PORT = 23  # Most serial-to-Wi-Fi bridges use telnet's port
+CONNECT_TIMEOUT = 5.0
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 10.0
+
+
+def parse_address(address, default_port=DEFAULT_TCP_PORT):
+    """Splits "host:port", "host" or "[ipv6]:port" into (host, port).
+
+    Raises ValueError for an empty host or a bad port number.
+    """
+    address = address.strip()
+    if address.startswith("socket://"):
+        address = address[len("socket://"):]
+    if address.startswith("["):
+        host, _, rest = address[1:].partition("]")
+        port = rest[1:] if rest.startswith(":") else ""
+    elif address.count(":") == 1:
+        host, port = address.split(":")
+    else:
+        host, port = address, ""
+    if not host:
+        raise ValueError(f"No host in {address!r}")
+    try:
+        port = int(port) if port else default_port
+    except ValueError:
+        raise ValueError(f"Bad port number in {address!r}") from None
+    if not 0 < port < 65536:
+        raise ValueError(f"Bad port number in {address!r}")
+    return host, port
+
+
+class TcpReader(StreamReader):
+    """Reads a TCP stream on an asyncio loop in a daemon thread into a RingBuffer.
+
+    With reconnect=True, connection failures are logged and retried after
+    RECONNECT_MIN_DELAY, doubling up to RECONNECT_MAX_DELAY; `error` is only
+    set when reconnect is off. `log` is called from the reader thread.
+    """
+
+    def __init__(self, host, port, buffer_size=DEFAULT_BUFFER_SIZE, sink=None, reconnect=True, log=None):
+        super().__init__(f"TcpReader-{host}:{port}", buffer_size, sink)
+        self.host = host
+        self.port = port
+        self.reconnect = reconnect
+        self.log = log or (lambda message: None)
+        self.connected = False
+        self.connects = 0
+        self._loop = None
+        self._task = None
+        self._writer = None
+
+    @property
+    def address(self):
+        return f"{self.host}:{self.port}"
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        try:
+            self._task = loop.create_task(self._run())
+            if self._stop_event.is_set():
+                self._task.cancel()  # stop() came before the loop existed
+            loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.close()
+
+    async def _run(self):
+        delay = RECONNECT_MIN_DELAY
+        while not self._stop_event.is_set():
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), CONNECT_TIMEOUT
+                )
+            except (OSError, asyncio.TimeoutError) as e:
+                if not self.reconnect:
+                    self.error = e
+                    return
+                self.log(f"Cannot connect to {self.address}: {e or 'timed out'}; retrying in {delay:.1f} s.")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+
+            self._writer = writer
+            self.connected = True
+            self.connects += 1
+            if self.connects > 1:
+                self.log(f"Reconnected to {self.address}.")
+            reason = "closed by the remote side"
+            try:
+                while True:
+                    data = await reader.read(READ_CHUNK_SIZE)
+                    if not data:
+                        break
+                    delay = RECONNECT_MIN_DELAY  # Only a working link resets the backoff
+                    self._received(data)
+            except OSError as e:
+                reason = str(e)
+                if not self.reconnect:
+                    self.error = e
+            finally:
+                self.connected = False
+                self._writer = None
+                writer.close()
+            if not self.reconnect:
+                if self.error is None:
+                    self.error = ConnectionError(f"Connection to {self.address} {reason}")
+                return
+            self.log(f"Connection to {self.address} lost ({reason}); reconnecting in {delay:.1f} s.")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def write(self, data):
+        """Sends data if connected; safe to call from any thread. Returns True if queued."""
+        writer = self._writer
+        if writer is None or self._loop is None:
+            return False
+        try:
+            self._loop.call_soon_threadsafe(writer.write, data)
+        except RuntimeError:
+            return False  # Loop already closed
+        return True
+
+    def stop(self, timeout=1.0):
+        """Cancels the connection and waits for the thread to finish."""
+        self._stop_event.set()
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # Loop already closed
+        super().stop(timeout)
+
+    def stats(self):
+        stats = super().stats()
+        stats["connected"] = self.connected
+        stats["reconnects"] = max(0, self.connects - 1)
+        return stats
@@ -0,0 +1,346 @@
+"""Numeric telemetry parsed out of the serial stream.
+
+A TelemetryStage sits after the monitor's byte stream: it decodes chunks,
+splits them into lines stamped with the arrival time of their first byte,
+and hands each line to a parser (PARSERS) that returns {channel: value}.
+Values go into one Channel per name, a pair of fixed-size array('d') ring
+buffers (times and values), so memory stays bounded at any sample rate.
+
+decimate() reduces a channel window to the min and max of each pixel
+column for plotting, and export_csv()/export_parquet() write the channels
+as columns (one row per parsed line).
+"""
+import bisect
+import csv
+import heapq
+import math
+import re
+from array import array
+
+from fr_uploader.formatting import TextDecoder
+
+DEFAULT_CAPACITY = 100_000  # Samples kept per channel (100 s at 1 kHz)
+MAX_CHANNELS = 32  # Further names are ignored, so a garbled stream cannot exhaust memory
+NAN = math.nan
+
+_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+
+
+class TelemetryParser:
+    """Base class for line parsers: parse(line) returns {channel: float} or None."""
+
+    name = ""
+    description = ""
+
+    def parse(self, line):
+        raise NotImplementedError
+
+    def reset(self):
+        """Forgets per-stream state (e.g. a CSV header)."""
+
+
+class KeyValueParser(TelemetryParser):
+    """key=value pairs anywhere in a line ("temp=23.4C current=1.20A").
+
+    Units directly after the number are ignored; keys start with a letter.
+    """
+
+    name = "key=value"
+    description = "key=value pairs, e.g. temp=23.4C current=1.20A"
+    _PAIR = re.compile(rf"\b([A-Za-z_][\w.\-]*)\s*[=:]\s*({_NUMBER})(?![xX][0-9A-Fa-f])")  # Not 0x1F
+
+    def parse(self, line):
+        values = {key: float(value) for key, value in self._PAIR.findall(line)}
+        return values or None
+
+
+class CsvParser(TelemetryParser):
+    """Comma separated numbers, named by a header line when the stream has one."""
+
+    name = "csv"
+    description = "comma separated values, optionally after a header line"
+
+    def __init__(self, delimiter=","):
+        self.delimiter = delimiter
+        self.columns = None
+
+    def parse(self, line):
+        fields = [field.strip() for field in line.split(self.delimiter)]
+        if len(fields) < 2 and not self.columns:
+            return None
+        values = {}
+        for position, field in enumerate(fields):
+            try:
+                value = float(field)
+            except ValueError:
+                continue
+            name = self.columns[position] if self.columns and position < len(self.columns) else f"col{position + 1}"
+            values[name] = value
+        if not values:
+            if len(fields) > 1 and all(fields):
+                self.columns = fields  # A header: no numbers at all
+            return None
+        return values
+
+    def reset(self):
+        self.columns = None
+
+
+PARSERS = {
+    KeyValueParser.name: KeyValueParser,
+    CsvParser.name: CsvParser,
+}
+
+
+def get_parser(name):
+    """Creates the parser called name (see PARSERS)."""
+    return PARSERS[name]()
+
+
+class Channel:
+    """One telemetry channel: ring buffers of sample times (s), values and row numbers.
+
+    Lines in one chunk share its arrival time, so the row number (the parsed
+    line the sample came from) is what lines channels up for export.
+    """
+
+    def __init__(self, name, capacity=DEFAULT_CAPACITY):
+        self.name = name
+        self.capacity = capacity
+        self.times = array("d", [0.0]) * capacity
+        self.values = array("d", [0.0]) * capacity
+        self.rows = array("q", [0]) * capacity
+        self._next = 0  # Position of the next sample
+        self.count = 0  # Samples held (at most capacity)
+        self.total = 0  # Samples ever added
+        self.last = NAN
+
+    def __len__(self):
+        return self.count
+
+    def append(self, time_s, value, row=0):
+        position = self._next
+        self.times[position] = time_s
+        self.values[position] = value
+        self.rows[position] = row
+        self._next = position + 1 if position + 1 < self.capacity else 0
+        if self.count < self.capacity:
+            self.count += 1
+        self.total += 1
+        self.last = value
+
+    def ordered(self, column):
+        """A copy of one of the ring buffers (times, values or rows), oldest first."""
+        if self.count < self.capacity:
+            return column[:self.count]
+        return column[self._next:] + column[:self._next]
+
+    def window(self, since=None):
+        """(times, values) arrays, oldest first, of the samples at or after `since`."""
+        times = self.ordered(self.times)
+        values = self.ordered(self.values)
+        if since is not None:
+            first = bisect.bisect_left(times, since)
+            times, values = times[first:], values[first:]
+        return times, values
+
+    @property
+    def first_time(self):
+        if not self.count:
+            return NAN
+        return self.times[self._next if self.count == self.capacity else 0]
+
+    @property
+    def last_time(self):
+        return self.times[self._next - 1] if self.count else NAN
+
+    def clear(self):
+        self._next = self.count = self.total = 0
+        self.last = NAN
+
+
+class TelemetryStore:
+    """Channels by name, created as their names first appear."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, max_channels=MAX_CHANNELS):
+        self.capacity = capacity
+        self.max_channels = max_channels
+        self.channels = {}
+        self.ignored = 0  # Values dropped because there were already max_channels channels
+        self.row_count = 0
+
+    def add(self, time_s, values):
+        """Adds the values parsed from one line."""
+        row = self.row_count
+        self.row_count += 1
+        channels = self.channels
+        for name, value in values.items():
+            channel = channels.get(name)
+            if channel is None:
+                if len(channels) >= self.max_channels:
+                    self.ignored += 1
+                    continue
+                channel = channels[name] = Channel(name, self.capacity)
+            channel.append(time_s, value, row)
+
+    @property
+    def first_time(self):
+        """Time of the oldest sample held in any channel, or None."""
+        times = [channel.first_time for channel in self.channels.values() if channel.count]
+        return min(times) if times else None
+
+    @property
+    def last_time(self):
+        """Time of the newest sample in any channel, or None."""
+        times = [channel.last_time for channel in self.channels.values() if channel.count]
+        return max(times) if times else None
+
+    def clear(self):
+        self.channels = {}
+        self.ignored = 0
+        self.row_count = 0
+
+    def rows(self, names=None):
+        """Yields (time, {name: value}) for every parsed line still held, oldest first."""
+        names = list(self.channels) if names is None else names
+        streams = []
+        for name in names:
+            channel = self.channels[name]
+            times, values = channel.window()
+            streams.append(zip(channel.ordered(channel.rows), times, [name] * len(times), values))
+        row_number = None
+        row_time = None
+        row = {}
+        for number, time_s, name, value in heapq.merge(*streams, key=lambda sample: sample[0]):
+            if number != row_number:
+                if row:
+                    yield row_time, row
+                row_number = number
+                row_time = time_s
+                row = {}
+            row[name] = value
+        if row:
+            yield row_time, row
+
+
+class TelemetryStage:
+    """Raw chunks -> lines -> parser -> TelemetryStore.
+
+    feed() takes the chunks with their perf_counter_ns() arrival stamps (or
+    any other nanosecond timeline, such as a session capture's); sample
+    times are seconds since the first chunk.
+    """
+
+    def __init__(self, parser, store=None):
+        self.parser = parser
+        self.store = store if store is not None else TelemetryStore()
+        self.decoder = TextDecoder()
+        self.lines = 0
+        self.parsed_lines = 0
+        self._origin_ns = None
+        self._partial = ""
+        self._partial_stamp = None
+
+    def feed(self, data, stamp_ns):
+        if self._origin_ns is None:
+            self._origin_ns = stamp_ns
+        text = self.decoder.decode(data)
+        if not text:
+            return
+        pieces = text.split("\n")
+        if len(pieces) > 1:
+            first = pieces[0]
+            first_stamp = stamp_ns
+            if self._partial_stamp is not None:
+                first = self._partial + first
+                first_stamp = self._partial_stamp
+            self.parse_line(first, first_stamp)
+            for line in pieces[1:-1]:
+                self.parse_line(line, stamp_ns)
+            self._partial = ""
+            self._partial_stamp = None
+        if pieces[-1]:
+            if self._partial_stamp is None:
+                self._partial_stamp = stamp_ns
+            self._partial += pieces[-1]
+
+    def parse_line(self, line, stamp_ns):
+        self.lines += 1
+        values = self.parser.parse(line.rstrip("\r"))
+        if values:
+            self.parsed_lines += 1
+            self.store.add((stamp_ns - self._origin_ns) / 1e9, values)
+
+    def reset(self):
+        """Starts over: new time origin, parser state and decoder (keeps the samples)."""
+        self.decoder.reset()
+        self.parser.reset()
+        self._origin_ns = None
+        self._partial = ""
+        self._partial_stamp = None
+
+
+def decimate(times, values, t0, t1, buckets):
+    """Reduces samples in [t0, t1] to at most two points (min and max) per bucket.
+
+    Returns [(time, value)] in time order; plotting one pixel column per
+    bucket keeps spikes visible however many samples fall into it.
+    """
+    first = bisect.bisect_left(times, t0)
+    last = bisect.bisect_right(times, t1)
+    if last - first <= 2 * buckets:
+        return list(zip(times[first:last], values[first:last]))
+    points = []
+    width = (t1 - t0) / buckets
+    lo = first
+    for bucket in range(1, buckets + 1):
+        hi = last if bucket == buckets else bisect.bisect_left(times, t0 + bucket * width, lo, last)
+        if hi > lo:
+            chunk = values[lo:hi]
+            low = min(chunk)
+            high = max(chunk)
+            i_low = lo + chunk.index(low)
+            i_high = lo + chunk.index(high)
+            if i_low == i_high:
+                points.append((times[i_low], low))
+            elif i_low < i_high:
+                points.append((times[i_low], low))
+                points.append((times[i_high], high))
+            else:
+                points.append((times[i_high], high))
+                points.append((times[i_low], low))
+            lo = hi
+    return points
+
+
+def export_csv(store, path, names=None):
+    """Writes a time_s column plus one column per channel; empty cells where a channel has no sample."""
+    names = list(store.channels) if names is None else names
+    rows = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["time_s"] + names)
+        for time_s, row in store.rows(names):
+            writer.writerow([f"{time_s:.6f}"] + [repr(row[name]) if name in row else "" for name in names])
+            rows += 1
+    return rows
+
+
+def export_parquet(store, path, names=None):
+    """Writes the same table as export_csv() as Parquet. Needs pyarrow."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow)") from None
+
+    names = list(store.channels) if names is None else names
+    times = []
+    columns = {name: [] for name in names}
+    for time_s, row in store.rows(names):
+        times.append(time_s)
+        for name in names:
+            columns[name].append(row.get(name))
+    table = pyarrow.table({"time_s": times, **columns})
+    pyarrow.parquet.write_table(table, path)
+    return len(times)
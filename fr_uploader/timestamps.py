@@ -0,0 +1,84 @@
+"""Per-line timestamps for serial capture.
+
+Arrival times come from time.perf_counter_ns() on the reader thread. A
+SessionClock anchors that counter to wall-clock time once per session, so
+displayed times are wall-clock while deltas between lines keep the
+sub-millisecond resolution of the performance counter.
+"""
+import datetime
+import time
+
+
+class SessionClock:
+    """Maps perf_counter_ns() readings to wall-clock time, anchored at creation.
+
+    Passing both anchors maps another time base instead, e.g. the time
+    offsets stored in a session capture to the wall-clock time it started.
+    """
+
+    def __init__(self, wall_ns=None, perf_ns=None):
+        self.wall_ns = time.time_ns() if wall_ns is None else wall_ns
+        self.perf_ns = time.perf_counter_ns() if perf_ns is None else perf_ns
+
+    @staticmethod
+    def now():
+        return time.perf_counter_ns()
+
+    def to_wall_ns(self, perf_ns):
+        return self.wall_ns + (perf_ns - self.perf_ns)
+
+
+class TimestampFormatter:
+    """Formats arrival times as "HH:MM:SS.ffffff (+delta ms) -> ".
+
+    The HH:MM:SS part is rebuilt only when the second changes.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._second = None
+        self._second_text = ""
+        self._previous_ns = None
+
+    def format(self, perf_ns):
+        wall_ns = self.clock.to_wall_ns(perf_ns)
+        second, fraction_ns = divmod(wall_ns, 1_000_000_000)
+        if second != self._second:
+            self._second = second
+            self._second_text = datetime.datetime.fromtimestamp(second).strftime("%H:%M:%S")
+        if self._previous_ns is None:
+            delta_ms = 0.0
+        else:
+            delta_ms = (perf_ns - self._previous_ns) / 1e6
+        self._previous_ns = perf_ns
+        return f"{self._second_text}.{fraction_ns // 1000:06d} (+{delta_ms:.3f} ms) -> "
+
+
+class LineTimestamper:
+    """Prefixes every line with the arrival time of the chunk that started it.
+
+    Keeps track of whether the previous chunk ended mid-line, so a line split
+    across reads gets exactly one timestamp.
+    """
+
+    def __init__(self, formatter):
+        self.formatter = formatter
+        self.at_line_start = True
+
+    def stamp(self, text, perf_ns):
+        if not text:
+            return text
+        out = []
+        for i, piece in enumerate(text.split("\n")):
+            if i:
+                out.append("\n")
+                self.at_line_start = True
+            if piece:
+                if self.at_line_start:
+                    out.append(self.formatter.format(perf_ns))
+                    self.at_line_start = False
+                out.append(piece)
+        return "".join(out)
+
+    def reset(self):
+        self.at_line_start = True
@@ -0,0 +1,401 @@
+"""Firmware uploader backends.
+
+A backend is called as `backend(firmware_path, port, log, progress=None,
+timings=None)` and returns True on success. `log` receives human readable
+output lines as they happen, `progress(percent, kb_per_sec)` receives
+progress updates (kb_per_sec may be None), and `timings` (an UploadTimings)
+records how long the reset, copy and verify phases took. `check()` returns
+an error message when the backend cannot run on this machine, and
+`check_ports(ports)` one when it cannot flash all of those ports in one
+batch: only backends that reach the board behind the given port
+(`addresses_port`) can flash several boards at once.
+
+- BatchScriptUploader runs win/massStorageCopy.bat (Windows only).
+- MassStorageUploader copies the image onto the board's USB mass-storage
+  volume (NODE_F446ZE) directly from Python, on any OS.
+- SerialBootloaderUploader programs the board through the STM32 ROM
+  bootloader on its UART and verifies the flash by reading it back.
+"""
+import glob
+import os
+import string
+import sys
+import time
+
+from fr_uploader.progress import ProgressReporter, UploadTimings, run_streaming
+
+DEFAULT_TARGET = "NODE_F446ZE"
+BATCH_SCRIPT = os.path.join("win", "massStorageCopy.bat")
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class UploaderBackend:
+    """Base class for uploader backends."""
+
+    name = ""
+    description = ""
+    board_running = True  # The board runs its firmware when an upload starts, so it can report its digest
+    addresses_port = True  # upload() writes to the board behind `port`, not just to any board it finds
+    accepts_base_address = False  # A .bin can be written somewhere other than the start of flash (base_address)
+
+    def check(self):
+        """Returns None if the backend can be used, otherwise the reason it cannot."""
+        return None
+
+    def check_ports(self, ports):
+        """Returns None if the backend can flash all of ports in one batch, otherwise the reason it cannot."""
+        if len(set(ports)) > 1 and not self.addresses_port:
+            return (
+                f"The {self.name} upload method cannot tell boards apart by port, so it can flash only one "
+                "board at a time. Flash the ports one by one, or pick a method that addresses the port."
+            )
+        return None
+
+    def upload(self, firmware_path, port, log=print, progress=None, timings=None):
+        raise NotImplementedError
+
+    def __call__(self, firmware_path, port, log=print, progress=None, timings=None):
+        return self.upload(firmware_path, port, log, progress=progress, timings=timings)
+
+
+class BatchScriptUploader(UploaderBackend):
+    """Runs massStorageCopy.bat (or a stand-in).
+
+    script may be a path or a command list (e.g. [sys.executable, "stub.py"]),
+    which is how tests and benchmarks replace the real Windows tool. The
+    script is passed -P <port> but copies to the first NODE_F446ZE drive it
+    finds, so it does not address the port; a stand-in that does can say so
+    with addresses_port=True.
+    """
+
+    name = "batch"
+    description = "massStorageCopy.bat"
+
+    def __init__(
+        self, script=BATCH_SCRIPT, target=DEFAULT_TARGET, timeout=180.0, idle_timeout=60.0, addresses_port=False
+    ):
+        self.script = script
+        self.target = target
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.addresses_port = addresses_port
+
+    @property
+    def command(self):
+        if isinstance(self.script, str):
+            return [os.path.abspath(self.script)]
+        return list(self.script)
+
+    def check(self):
+        if isinstance(self.script, str) and not os.path.exists(self.script):
+            return f"Batch file not found: {os.path.abspath(self.script)}. Ensure it exists."
+        return None
+
+    def upload(self, firmware_path, port, log=print, progress=None, timings=None):
+        timings = timings or UploadTimings()
+        reporter = ProgressReporter(progress, total_bytes=os.path.getsize(firmware_path))
+
+        def on_line(line):
+            log(line)
+            reporter.feed_line(line)
+
+        # The script finds the volume, copies and waits for the copy in one go
+        with timings.phase("copy"):
+            returncode, reason = run_streaming(
+                self.command + ["-I", firmware_path, "-O", self.target, "-P", port],
+                on_line,
+                timeout=self.timeout,
+                idle_timeout=self.idle_timeout,
+            )
+        if reason:
+            log(f"Upload killed by watchdog: {reason}.")
+            return False
+        if returncode == 0:
+            reporter.update_percent(100.0)
+        return returncode == 0
+
+
+def volume_labels(target):
+    """Labels the board may use: NODE_F446ZE and its short form NOD_F446ZE."""
+    labels = [target]
+    if target.startswith("NODE_"):
+        labels.append(target.replace("E_", "_", 1))
+    return labels
+
+
+class MassStorageUploader(UploaderBackend):
+    """Copies the firmware onto the board's mass-storage volume.
+
+    The ST-LINK programs the flash once the file is written, then drops the
+    file (usually by re-mounting the volume). A FAIL.TXT on the volume
+    afterwards means programming failed.
+
+    mount_roots limits the volume search to <root>/<label> folders, e.g. a
+    temporary directory standing in for the mounted board.
+    """
+
+    name = "mass-storage"
+    description = "Native mass-storage copy"
+
+    def __init__(self, target=DEFAULT_TARGET, mount_roots=None, timeout=60.0, poll_interval=0.2, settle_time=1.0):
+        self.target = target
+        self.mount_roots = mount_roots
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time  # How long the volume must look done before we trust it
+
+    @property
+    def addresses_port(self):
+        # Only on Linux is a serial port matched to its board's volume (by USB serial number)
+        return self.mount_roots is None and sys.platform.startswith("linux")
+
+    # --- Volume detection ---
+    def find_volumes(self, port=None):
+        """Returns the mount points that may be the board's volume.
+
+        On Linux the volume of the board behind `port` (matched by USB serial
+        number) is the only candidate when it is found. Otherwise every
+        volume with the board's label is, and more than one means the board
+        cannot be told apart from the others.
+        """
+        labels = volume_labels(self.target)
+        if self.mount_roots is not None:
+            return [
+                os.path.join(root, label)
+                for root in self.mount_roots
+                for label in labels
+                if os.path.isdir(os.path.join(root, label))
+            ]
+        if sys.platform == "win32":
+            return _find_windows_volumes(labels)
+        if sys.platform.startswith("linux"):
+            volume = _find_linux_volume_for_port(port) if port else None
+            return [volume] if volume else _find_linux_volumes(labels)
+        return [  # macOS names a second volume with the same label "<label> 1"
+            path
+            for path in glob.glob("/Volumes/*")
+            if os.path.basename(path) in labels or os.path.basename(path).rsplit(" ", 1)[0] in labels
+        ]
+
+    def find_volume(self, port=None):
+        """Returns the mount point of the board's volume, or None if there is none or several."""
+        volumes = self.find_volumes(port)
+        return volumes[0] if len(volumes) == 1 else None
+
+    # --- Upload ---
+    def upload(self, firmware_path, port, log=print, progress=None, timings=None):
+        timings = timings or UploadTimings()
+        with timings.phase("reset"):
+            volumes = self.find_volumes(port)
+        if not volumes:
+            log(f"{self.target} not found. Please ensure the device is correctly connected.")
+            return False
+        if len(volumes) > 1:
+            log(
+                f"Found {len(volumes)} {self.target} volumes ({', '.join(volumes)}) and cannot tell which "
+                f"one is the board on {port}. Connect one board at a time."
+            )
+            return False
+        volume = volumes[0]
+        destination = os.path.join(volume, os.path.basename(firmware_path))
+        total = os.path.getsize(firmware_path)
+        reporter = ProgressReporter(progress, total_bytes=total)
+        log(f"Copying {os.path.basename(firmware_path)} ({total} bytes) to {volume}")
+        with timings.phase("copy"):
+            with open(firmware_path, "rb") as src, open(destination, "wb") as dst:
+                copied = 0
+                for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b""):
+                    dst.write(chunk)
+                    copied += len(chunk)
+                    reporter.update_bytes(copied)
+                dst.flush()
+                os.fsync(dst.fileno())
+        with timings.phase("verify"):
+            return self.wait_for_completion(volume, destination, log)
+
+    def wait_for_completion(self, volume, destination, log=print):
+        """Waits until the board has taken the file, then checks for FAIL.TXT."""
+        deadline = time.monotonic() + self.timeout
+        remounted = False
+        done_since = None
+        while time.monotonic() < deadline:
+            if not os.path.isdir(volume):
+                remounted = True  # Volume went away while the board programs itself
+                done_since = None
+            elif not os.path.exists(destination):
+                done_since = done_since or time.monotonic()
+                fail_file = os.path.join(volume, "FAIL.TXT")
+                if os.path.exists(fail_file):
+                    try:
+                        with open(fail_file, "r", errors="replace") as f:
+                            reason = f.read().strip()
+                    except OSError:
+                        reason = "unknown error"
+                    log(f"Programming failed: {reason}")
+                    return False
+                if time.monotonic() - done_since < self.settle_time:
+                    time.sleep(self.poll_interval)
+                    continue
+                log(f"Upload complete on {self.target} ({volume})" + (" after re-mount" if remounted else ""))
+                return True
+            time.sleep(self.poll_interval)
+        log(f"Timed out after {self.timeout:.0f} s waiting for {self.target} to finish programming.")
+        return False
+
+
+class SerialBootloaderUploader(UploaderBackend):
+    """Flashes through the STM32 ROM bootloader on the board's serial port (AN3155).
+
+    The board must be in its bootloader (BOOT0 high during reset), or be
+    wired so that reset="dtr-rts" (or any reset(connection) callable) puts
+    it there. .hex images are written at their own addresses, a .bin at
+    base_address (default: the start of flash).
+    """
+
+    name = "uart-bootloader"
+    description = "STM32 UART bootloader"
+    board_running = False  # Already in the bootloader; stray bytes would upset its baud detection
+    accepts_base_address = True
+
+    def __init__(
+        self,
+        baud_rates=None,
+        window=1,
+        verify=True,
+        start=True,
+        reset=None,
+        timeout=1.0,
+        open_port=None,
+        base_address=None,
+    ):
+        self.base_address = base_address  # Where a .bin goes (default: the start of flash)
+        self.baud_rates = baud_rates
+        self.window = window
+        self.verify = verify
+        self.start = start  # Run the new firmware when done
+        self.reset = reset
+        self.timeout = timeout
+        self.open_port = open_port
+
+    def upload(self, firmware_path, port, log=print, progress=None, timings=None):
+        from fr_uploader.image import ImageError, load_image
+        from fr_uploader.stm32boot import BAUD_RATES, BootloaderError, connect, dtr_rts_reset, flash_image
+
+        timings = timings or UploadTimings()
+        try:
+            image = load_image(firmware_path, base_address=self.base_address)
+        except ImageError as e:
+            log(f"Invalid firmware image: {e}")
+            return False
+        reporter = ProgressReporter(progress, total_bytes=image.size * (2 if self.verify else 1))
+        reset = dtr_rts_reset if self.reset == "dtr-rts" else self.reset
+        try:
+            with timings.phase("reset"):
+                bootloader = connect(
+                    port, self.baud_rates or BAUD_RATES, reset, self.timeout, log=log, open_port=self.open_port
+                )
+            try:
+                result = flash_image(
+                    bootloader, image, self.window, self.verify, reporter.update_bytes, log, timings
+                )
+                if self.start:
+                    bootloader.go(image.base_address)
+            finally:
+                bootloader.connection.close()
+        except BootloaderError as e:
+            log(f"Bootloader error: {e}")
+            return False
+        log(result.summary())
+        return True
+
+
+def _find_windows_volumes(labels):
+    import ctypes
+
+    wanted = {label.upper() for label in labels}
+    buffer = ctypes.create_unicode_buffer(261)
+    drives = ctypes.windll.kernel32.GetLogicalDrives()
+    volumes = []
+    for i, letter in enumerate(string.ascii_uppercase):
+        if not drives & (1 << i):
+            continue
+        root = f"{letter}:\\"
+        if ctypes.windll.kernel32.GetVolumeInformationW(root, buffer, len(buffer), None, None, None, None, 0):
+            if buffer.value.upper() in wanted:
+                volumes.append(root)
+    return volumes
+
+
+def _linux_mounts():
+    """Returns {device: mount point} from /proc/mounts."""
+    mounts = {}
+    try:
+        with open("/proc/mounts", "r") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2:
+                    # /proc/mounts escapes spaces and friends as octal
+                    mounts[fields[0]] = fields[1].encode().decode("unicode_escape")
+    except OSError:
+        pass
+    return mounts
+
+
+def _find_linux_volumes(labels):
+    mounts = _linux_mounts()
+    volumes = []
+    for label in labels:
+        link = os.path.join("/dev/disk/by-label", label)
+        if os.path.exists(link):
+            mount_point = mounts.get(os.path.realpath(link))
+            if mount_point:
+                volumes.append(mount_point)
+    # Auto-mounters name the mount point after the label (with a suffix for a second one)
+    for mount_point in mounts.values():
+        name = os.path.basename(mount_point)
+        if mount_point not in volumes and (name in labels or name.rstrip("0123456789") in labels):
+            volumes.append(mount_point)
+    return volumes
+
+
+def _find_linux_volume_for_port(port):
+    """Finds the volume of the same USB device as a serial port, via its serial number."""
+    try:
+        from serial.tools import list_ports
+
+        serial_number = next((p.serial_number for p in list_ports.comports() if p.device == port), None)
+    except Exception:
+        return None
+    if not serial_number:
+        return None
+    mounts = _linux_mounts()
+    for link in glob.glob(f"/dev/disk/by-id/usb-*{serial_number}*"):
+        device = os.path.realpath(link)
+        if device in mounts:
+            return mounts[device]
+    return None
+
+
+UPLOADER_BACKENDS = {
+    BatchScriptUploader.name: BatchScriptUploader,
+    MassStorageUploader.name: MassStorageUploader,
+    SerialBootloaderUploader.name: SerialBootloaderUploader,
+}
+
+
+def default_backend_name():
+    """The batch script on Windows (when present), the native copy elsewhere."""
+    if sys.platform == "win32" and os.path.exists(BATCH_SCRIPT):
+        return BatchScriptUploader.name
+    return MassStorageUploader.name
+
+
+def get_uploader(name=None, **options):
+    """Creates the uploader backend called name (default: default_backend_name()).
+
+    An UploaderBackend instance is returned as it is, so callers can pass a
+    backend they configured themselves (e.g. a stand-in for the batch script).
+    """
+    if isinstance(name, UploaderBackend):
+        return name
+    return UPLOADER_BACKENDS[name or default_backend_name()](**options)
@@ -1,111 +1,211 @@
+import sys
+import time
+
+STARTED = time.perf_counter()  # Before any other import, for the startup profile
+
+if __name__ == "__main__" and "--profile-startup" in sys.argv:
+    # `python frm.py --profile-startup` prints where the time before the first frame goes
+    sys.argv.remove("--profile-startup")
+    from fr_uploader.startup import ImportTimer
+
+    import_timer = ImportTimer().install()
+else:
+    import_timer = None
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Command line mode (e.g. `python frm.py flash --port COM3 --config IT-CAN-BTS`):
+    # dispatch before Tkinter and the GUI are loaded
+    from fr_uploader.cli import main
+
+    sys.exit(main())
+
 import os
-import subprocess
-import requests
-import serial.tools.list_ports
-import webbrowser
 from threading import Thread
-from packaging import version
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
 import serial
 import datetime
-import importlib  # GitHub Repo Info
-
-GITHUB_REPO = "farmrobo-dev/FR_Firmware_Uploader"
-FIRMWARE_FOLDER = "bin"
-LOCAL_VERSION_FILE = os.path.join(FIRMWARE_FOLDER, "version.txt")
+import queue
+import re
+from fr_uploader import firmware
+from fr_uploader.capture import (
+    SESSION_EXTENSION,
+    CaptureReplay,
+    RotatingCaptureFile,
+    SessionCapture,
+    SessionRecorder,
+)
+from fr_uploader.console import (
+    HISTORY_FILE,
+    LINE_ENDINGS,
+    CommandHistory,
+    MacroBook,
+    ResponseBuffer,
+    ScriptError,
+    ScriptRunner,
+    SendQueue,
+    parse_script,
+)
+from fr_uploader.formatting import HexFormatter, TextDecoder
+from fr_uploader.logbus import LogBus
+from fr_uploader.metrics import DEFAULT_METRICS_ADDRESS, METRICS, EventLoopLagProbe, MetricsServer, parse_address
+from fr_uploader.monitors import MonitorManager
+from fr_uploader.ports import PortWatcher
+from fr_uploader.progress import format_progress
+from fr_uploader.scrollback import SCROLLBACK_CHOICES, Scrollback, format_size, process_memory
+from fr_uploader.search import LineFilter, LineIndex, compile_pattern
+from fr_uploader.serial_reader import SerialReader
+from fr_uploader.startup import StartupProfile
+from fr_uploader.telemetry import (
+    PARSERS,
+    TelemetryStage,
+    TelemetryStore,
+    decimate,
+    export_csv,
+    export_parquet,
+    get_parser,
+)
+from fr_uploader.timestamps import LineTimestamper, SessionClock, TimestampFormatter
+from fr_uploader.uploaders import UPLOADER_BACKENDS, default_backend_name, get_uploader
+
+SERIAL_DRAIN_INTERVAL_MS = 30  # How often the GUI drains the reader's ring buffer
+SERIAL_STATS_INTERVAL_MS = 1000
+SERIAL_RENDER_INTERVAL_MS = 33  # Coalesce serial output into at most ~30 inserts per second
+SERIAL_PENDING_LIMIT = 4 << 20  # Max characters kept for a hidden tab before its backlog is cut
+LOG_SCROLLBACK_LINES = 5000
+PLOT_INTERVAL_MS = 100  # Telemetry plot redraw
+PLOT_WINDOWS = {"5 s": 5.0, "10 s": 10.0, "60 s": 60.0, "All": None}
+PLOT_COLORS = ("#1f77b4", "#d62728", "#2ca02c", "#ff7f0e", "#9467bd", "#8c564b")
+SEARCH_DELAY_MS = 150  # Wait for a pause in typing before searching
+SEARCH_HIGHLIGHT_LIMIT = 2000  # Matches highlighted at once (only the visible lines are)
+LOG_DRAIN_INTERVAL_MS = 50
+METRICS_LAG_INTERVAL_MS = 100  # Event-loop lag probe period while metrics are collected
+RECONNECT_RETRY_MS = 2000  # While waiting for a board, retry opening it this often if its port is listed
+DEFAULT_TCP_ADDRESS = "192.168.4.1:23"  # Usual address of a Wi-Fi UART bridge in access point mode
+LOG_FILE = os.path.join("logs", "fr_uploader.jsonl")
+CAPTURE_FOLDER = "captures"  # Recorded serial sessions
+FLOW_CONTROL = {"None": {}, "RTS/CTS": {"rtscts": True}, "XON/XOFF": {"xonxoff": True}}
+
+startup_profile = StartupProfile(STARTED, import_timer)
+startup_profile.mark("imports")
+
+release_cache = firmware.default_release_cache()
+firmware_store = firmware.default_store()
+log_bus = LogBus()
+command_history = CommandHistory(HISTORY_FILE)  # Shared by both serial monitors
+macro_book = MacroBook()
+startup_profile.mark("release cache and firmware store")
 
 
 # --- Helper Functions ---
+def log_message(message):
+    """Logs a message to every log pane; safe to call from any thread."""
+    log_bus.log(message)
+    METRICS.count("log_messages_total")
+
+
+def show_log_records(records):
+    """Log bus sink: one insert per pane for the whole batch."""
+    text = "".join(record.format() for record in records)
+    for log_text, scrollback in ((log_text_tab1, log_scrollback_tab1), (log_text_tab2, log_scrollback_tab2)):
+        log_text.insert(tk.END, text)
+        scrollback.appended(text)
+        log_text.see(tk.END)
+
+
+def drain_log_bus():
+    """Delivers queued log records on the Tk main loop."""
+    with METRICS.timer("log_drain_seconds"):
+        log_bus.drain()
+    if log_bus.file_error:
+        error, log_bus.file_error = log_bus.file_error, None
+        log_file_var.set(False)
+        log_message(f"Stopped writing the log file after an error: {error}")
+    root.after(LOG_DRAIN_INTERVAL_MS, drain_log_bus)
+
+
+def toggle_log_file():
+    """Mirrors the log to a rotating JSON-lines file while enabled."""
+    if log_file_var.get():
+        try:
+            log_bus.open_file(LOG_FILE)
+        except OSError as e:
+            log_file_var.set(False)
+            log_message(f"Error opening log file: {e}")
+            return
+        log_message(f"Writing the log to {os.path.abspath(LOG_FILE)}")
+    else:
+        log_bus.close_file()
+
+
 def get_local_version():
     """Reads the local firmware version from file."""
-    try:
-        if os.path.exists(LOCAL_VERSION_FILE):
-            with open(LOCAL_VERSION_FILE, "r") as f:
-                return f.read().strip()
-    except Exception as e:
-        log_message(f"Error reading local version: {e}")
-        return "v0.0.0"
-    return "v0.0.0"
+    return firmware.get_local_version(log_message)
 
 
 def get_latest_firmware_version():
-    """Fetches the latest firmware version and assets from GitHub."""
-    url = f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        release_data = response.json()
-        return release_data.get("tag_name", "v1.0.0"), release_data.get("assets", [])
-    except requests.RequestException as e:
-        log_message(f"Network error getting latest version: {e}")
-        return "v0.0.0", []
-
-
-def download_firmware(assets):
-    """Downloads firmware files from the provided asset list."""
-    download_folder = FIRMWARE_FOLDER
-    if not os.path.exists(download_folder):
-        try:
-            os.makedirs(download_folder)
-        except OSError as e:
-            log_message(f"Error creating download folder: {e}")
-            return
+    """Fetches the latest firmware version and assets from GitHub (through the release cache)."""
+    return firmware.get_latest_firmware_version(release_cache, log_message)
 
-    for asset in assets:
-        asset_url = asset["browser_download_url"]
-        file_name = os.path.join(download_folder, asset["name"])
-        try:
-            response = requests.get(asset_url, timeout=10)
-            response.raise_for_status()
-            with open(file_name, "wb") as f:
-                f.write(response.content)
-            log_message(f"Downloaded {file_name}")
-        except requests.RequestException as e:
-            log_message(f"Failed to download {asset_url}: {e}")
 
+def toggle_offline_mode():
+    """Serves release information only from the on-disk cache while enabled."""
+    release_cache.offline = offline_var.get()
+    if release_cache.offline:
+        log_message("Offline mode enabled: using the last known release information.")
+    else:
+        log_message("Offline mode disabled.")
 
-def upload_firmware(firmware_path, com_port, serial_monitor=None):  # Pass SerialMonitor instance
-    """Uploads the provided firmware to the device, handling permission errors."""
-    if not com_port:
-        log_message("Error: Please select a COM port.")
-        return
 
-    script_path = os.path.abspath(os.path.join("win", "massStorageCopy.bat"))
-    if not os.path.exists(script_path):
-        log_message(f"Batch file not found: {script_path}. Ensure it exists.")
-        return
+def update_release_cache_label():
+    stats = release_cache.stats()
+    text = (
+        f"Release cache: {stats['hits']} hits, {stats['misses']} misses, "
+        f"{stats['revalidations']} revalidated"
+    )
+    if release_cache.fetched_at:
+        fetched = datetime.datetime.fromtimestamp(release_cache.fetched_at).strftime("%Y-%m-%d %H:%M:%S")
+        text += f" (checked {fetched})"
+    release_cache_label.config(text=text)
 
-    if not os.path.exists(firmware_path):
-        log_message(f"Firmware file not found: {firmware_path}. Ensure it exists.")
-        return
 
-    upload_command = [script_path, "-I", firmware_path, "-O", "NODE_F446ZE", "-P", com_port]
+def resolve_firmware_path(firmware_file):
+    """Finds a firmware file in the selected stored release, falling back to the flat bin/ folder (logged)."""
+    return firmware.resolve_firmware_path(firmware_store, firmware_file, release_dropdown.get(), log_message)
+
+
+def refresh_release_list():
+    """Lists the releases held in the firmware store (newest first) for rollback."""
+    tags = [manifest["tag"] for manifest in firmware_store.releases()]
+    release_dropdown["values"] = tags
+    local_version = get_local_version()
+    if release_dropdown.get() not in tags:
+        release_dropdown.set(local_version if local_version in tags else (tags[0] if tags else ""))
 
-    try:
-        log_message(f"Uploading firmware from: {firmware_path} to {com_port}")
 
+def upload_firmware(firmware_path, com_port, serial_monitor=None, force=False, base_address=None):
+    """Uploads the provided firmware to the device, pausing the serial monitor meanwhile."""
+    if not com_port:
+        log_message("Error: Please select a COM port.")
+        return
+
+    show_upload_progress(0, None)
+    try:
         # Stop Serial Monitoring Temporarily
         if serial_monitor and serial_monitor.is_monitoring:
             serial_monitor.stop_monitoring()
             log_message("Temporarily stopped serial monitoring for upload.")
 
-        result = subprocess.run(upload_command, capture_output=True, text=True)
-
-        if result.returncode == 0:
-            log_message("Firmware uploaded successfully.")
-
-        else:
-            log_message(f"Upload failed. Error: {result.stderr}")
-
-    except FileNotFoundError:
-        log_message(f"File not found: {firmware_path}. Please ensure the file exists.")
-    except PermissionError as e:
-        log_message(
-            f"PermissionError: Could not open port '{com_port}'. Access is denied.  Close any other applications using this port and try again. Error: {e}"
+        firmware.upload_firmware(
+            firmware_path,
+            com_port,
+            upload_method_var.get(),
+            log=log_message,
+            progress=show_upload_progress,
+            skip_current=skip_current_var.get(),
+            force=force,
+            base_address=base_address,
         )
-    except Exception as e:
-        log_message(f"An unexpected error occurred during upload: {e}")
 
     finally:
         # Restart Serial Monitoring (if it was running)
@@ -116,11 +216,8 @@ def upload_firmware(firmware_path, com_port, serial_monitor=None):  # Pass Seria
 
 def upload_selected_firmware_threaded():
     """Uploads the firmware based on the dropdown selections."""
-    r1_temp = r1_temp_dropdown.get()
-    r1_tools = r1_tools_dropdown.get()
-    r1_actuator = r1_actuator_dropdown.get()
-    firmware_file = f"R1-{r1_temp}-{r1_tools}-{r1_actuator}.bin"
-    firmware_path = os.path.abspath(os.path.join("bin", firmware_file))
+    firmware_path = selected_firmware_path()
+    firmware_file = selected_firmware_file()
 
     active_tab = notebook.index(notebook.select())
     if active_tab == 0:
@@ -137,7 +234,8 @@ def upload_selected_firmware_threaded():
         log_message(f"Firmware file not found: {firmware_file}")
         return
 
-    log_message(f"Selected Firmware: {firmware_file}")
+    from_store = firmware_path.startswith(os.path.abspath(firmware_store.objects_dir) + os.sep)
+    log_message(f"Selected Firmware: {firmware_file} ({release_dropdown.get() if from_store else 'bin folder'})")
     thread = Thread(
         target=lambda: upload_firmware(firmware_path, com_port, serial_monitor)
     )  # Pass SerialMonitor instance
@@ -146,49 +244,45 @@ def upload_selected_firmware_threaded():
 
 def check_for_updates():
     """Checks for updates on GitHub and updates the UI."""
-    latest_version, assets = get_latest_firmware_version()
-    local_version = get_local_version()
-    if latest_version == "v0.0.0":
-        log_message("No internet connection. Skipping update check.")
-        return
-    if version.parse(latest_version) > version.parse(local_version):
-        log_message(f"New firmware available: {latest_version}.")
+    _, latest_version, newer = firmware.check_for_update(release_cache, log_message)
+    if newer:
         latest_version_label.config(text=f"Latest release: {latest_version}")
         download_button.config(state=tk.NORMAL)
-    else:
-        log_message("Firmware is up to date.")
+    update_release_cache_label()
 
 
 def download_latest_release():
     """Downloads the latest firmware release in a separate thread."""
 
     def download_thread():
-        latest_version, assets = get_latest_firmware_version()
-        if latest_version == "v0.0.0":
-            log_message("No internet connection. Cannot download firmware.")
-            return
-        download_firmware(assets)
-        try:
-            with open(LOCAL_VERSION_FILE, "w") as f:
-                f.write(latest_version)
-        except Exception as e:
-            log_message(f"Error writing local version file: {e}")
-            return
-        log_message("Downloaded Successfully.")
+        if firmware.download_latest_release(release_cache, firmware_store, log_message):
+            root.after(0, refresh_release_list)
 
     thread = Thread(target=download_thread)
     thread.start()
 
 
 def refresh_com_ports():
-    """Refreshes the list of available COM ports in both the main dropdown and the SerialMonitor."""
-    com_ports = [port.device for port in serial.tools.list_ports.comports()]
-
-    # Update SerialMonitor's COM port dropdowns
-    serial_monitor_tab1.update_com_ports(com_ports)
-    serial_monitor_tab2.update_com_ports(com_ports)
-
-    log_message("COM ports refreshed in all locations.")
+    """Asks the port watcher for a scan now; the port lists update when it reports back."""
+    port_watcher.wake()
+    log_message("Scanning COM ports...")
+
+
+def on_ports_changed(added, removed, first_scan=False):
+    """Applies a PortWatcher event on the GUI thread: port lists, log and auto-reconnect."""
+    devices = port_watcher.devices()
+    for monitor in (serial_monitor_tab1, serial_monitor_tab2):
+        monitor.update_com_ports(devices)
+    multi_port_monitor.update_ports(devices)
+    if first_scan:
+        log_message(f"Found {len(devices)} COM port(s): {', '.join(devices) or 'none'}")
+    else:
+        for info in removed:
+            log_message(f"Port {info.device} removed ({info.identity}).")
+        for info in added:
+            log_message(f"Port {info.device} connected ({info.identity}).")
+    for monitor in (serial_monitor_tab1, serial_monitor_tab2):
+        monitor.ports_changed(added, removed)
 
 
 def refresh_local_data():
@@ -196,6 +290,7 @@ def refresh_local_data():
     log_message("Refreshing local data...")
     local_version = get_local_version()
     current_version_label.config(text=f"Current Firmware Version: {local_version}")
+    refresh_release_list()
     log_message("Local data refreshed.")
 
 
@@ -227,13 +322,281 @@ def upload_custom_firmware_threaded():
     if not firmware_path:
         log_message("Error: Please select a custom firmware file.")
         return
+    base_address = parse_base_address()
+    if base_address is None:
+        return
+
+    # Validate here so a refused image can still be flashed on purpose (e.g. linked somewhere unexpected)
+    force = False
+    if os.path.exists(firmware_path):
+        problems = []
+        if firmware.check_firmware_image(firmware_path, problems.append, base_address=base_address) is None:
+            for line in problems:
+                log_message(line)
+            force = messagebox.askyesno(
+                "Custom Upload", "\n".join(problems[:-1]) + "\n\nFlash this image anyway?", icon="warning"
+            )
+            if not force:
+                log_message("Upload cancelled.")
+                return
+            log_message("Flashing anyway, as confirmed.")
 
     thread = Thread(
-        target=lambda: upload_firmware(firmware_path, com_port, serial_monitor)
+        target=lambda: upload_firmware(firmware_path, com_port, serial_monitor, force, base_address)
     )  # Pass SerialMonitor instance
     thread.start()
 
 
+def parse_base_address():
+    """The Custom Upload tab's base address for .bin files, or None (after logging why) if it is not a number."""
+    try:
+        return int(base_address_var.get().strip(), 0)
+    except ValueError:
+        log_message(f"Error: {base_address_var.get()!r} is not an address; enter e.g. 0x08008000.")
+        return None
+
+
+def selected_firmware_file():
+    """Returns the firmware file name matching the dropdown selections."""
+    return firmware.firmware_file_name(
+        f"{r1_temp_dropdown.get()}-{r1_tools_dropdown.get()}-{r1_actuator_dropdown.get()}"
+    )
+
+
+def selected_firmware_path():
+    """Returns the path of the selected firmware in the selected release."""
+    return resolve_firmware_path(selected_firmware_file())
+
+
+def show_upload_progress(percent, rate):
+    """Progress callback for single uploads; called from the upload thread."""
+    root.after(0, lambda: (upload_progress_var.set(percent), upload_progress_text.set(format_progress(percent, rate))))
+
+
+def open_batch_upload():
+    """Opens the batch upload window for flashing several boards at once."""
+    BatchUploadDialog(root, selected_firmware_path())
+
+
+# --- Batch Upload ---
+class BatchUploadDialog(tk.Toplevel):
+    """Flashes one firmware to several COM ports concurrently."""
+
+    def __init__(self, parent, firmware_path, *args, **kwargs):
+        super().__init__(parent, *args, **kwargs)
+        self.title("Batch Upload")
+        self.scheduler = None
+        self.events = queue.Queue()  # (job, None) progress updates or (None, report) when done
+
+        # Firmware
+        ttk.Label(self, text="Firmware:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        self.firmware_path = tk.StringVar(value=firmware_path)
+        ttk.Entry(self, textvariable=self.firmware_path, width=60).grid(
+            row=0, column=1, columnspan=3, sticky=tk.W + tk.E, padx=5, pady=5
+        )
+        ttk.Button(self, text="Browse", command=self.browse_firmware, width=10).grid(
+            row=0, column=4, sticky=tk.W, padx=5, pady=5
+        )
+
+        # Ports
+        ttk.Label(self, text="Ports:").grid(row=1, column=0, sticky=tk.NW, padx=5, pady=5)
+        self.port_listbox = tk.Listbox(self, selectmode=tk.MULTIPLE, height=8, exportselection=False)
+        self.port_listbox.grid(row=1, column=1, rowspan=4, sticky=tk.NSEW, padx=5, pady=5)
+        for device in port_watcher.devices():
+            self.port_listbox.insert(tk.END, device)
+        self.port_listbox.select_set(0, tk.END)
+
+        # Concurrency and retries
+        ttk.Label(self, text="Concurrent Uploads:").grid(row=1, column=2, sticky=tk.W, padx=5, pady=5)
+        self.workers_spinbox = ttk.Spinbox(self, from_=1, to=32, width=5)
+        self.workers_spinbox.grid(row=1, column=3, sticky=tk.W, padx=5, pady=5)
+        self.workers_spinbox.set(4)
+        ttk.Label(self, text="Retries:").grid(row=2, column=2, sticky=tk.W, padx=5, pady=5)
+        self.retries_spinbox = ttk.Spinbox(self, from_=0, to=5, width=5)
+        self.retries_spinbox.grid(row=2, column=3, sticky=tk.W, padx=5, pady=5)
+        self.retries_spinbox.set(1)
+
+        # Macro run on every board that flashed (or already ran the firmware), all boards at once
+        ttk.Label(self, text="Then Run Macro:").grid(row=3, column=2, sticky=tk.W, padx=5, pady=5)
+        self.macro_dropdown = ttk.Combobox(self, values=[""] + macro_book.names(), state="readonly", width=16)
+        self.macro_dropdown.grid(row=3, column=3, sticky=tk.W, padx=5, pady=5)
+        self.line_ending_dropdown = ttk.Combobox(self, values=list(LINE_ENDINGS), state="readonly", width=5)
+        self.line_ending_dropdown.grid(row=3, column=4, sticky=tk.W, padx=5, pady=5)
+        self.line_ending_dropdown.set("LF")
+        self.script_results = queue.Queue()  # {port: ScriptResult or exception} when the test run is done
+
+        self.start_button = ttk.Button(self, text="Start", command=self.start, width=15)
+        self.start_button.grid(row=4, column=2, sticky=tk.W + tk.E, padx=5, pady=5)
+        self.cancel_button = ttk.Button(self, text="Cancel", command=self.cancel, width=15, state=tk.DISABLED)
+        self.cancel_button.grid(row=4, column=3, sticky=tk.W + tk.E, padx=5, pady=5)
+
+        # Per-job progress
+        columns = ("status", "progress", "attempts", "time", "output")
+        self.job_tree = ttk.Treeview(self, columns=columns, height=10)
+        self.job_tree.heading("#0", text="Port")
+        self.job_tree.column("#0", width=100)
+        for column, width in zip(columns, (80, 120, 70, 70, 400)):
+            self.job_tree.heading(column, text=column.capitalize())
+            self.job_tree.column(column, width=width, stretch=column == "output")
+        self.job_tree.grid(row=5, column=0, columnspan=5, sticky=tk.NSEW, padx=5, pady=5)
+
+        self.summary_label = ttk.Label(self, text="")
+        self.summary_label.grid(row=6, column=0, columnspan=5, sticky=tk.W, padx=5, pady=5)
+
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(5, weight=1)
+
+    def browse_firmware(self):
+        filename = filedialog.askopenfilename(
+            parent=self,
+            title="Select Firmware File",
+            filetypes=(("Firmware Files", "*.bin;*.hex;*.ino.bin"), ("All files", "*.*")),
+        )
+        if filename:
+            self.firmware_path.set(filename)
+
+    def start(self):
+        """Starts flashing all selected ports in a background thread."""
+        firmware_path = self.firmware_path.get()
+        ports = [self.port_listbox.get(i) for i in self.port_listbox.curselection()]
+        if not ports:
+            messagebox.showerror("Batch Upload", "Select at least one port.", parent=self)
+            return
+        if not os.path.exists(firmware_path):
+            messagebox.showerror("Batch Upload", f"Firmware file not found: {firmware_path}", parent=self)
+            return
+        uploader = get_uploader(upload_method_var.get())
+        problem = uploader.check() or uploader.check_ports(ports)
+        if problem:
+            messagebox.showerror("Batch Upload", problem, parent=self)
+            return
+        base_address = parse_base_address()
+        if base_address is None:
+            return
+        image = firmware.check_firmware_image(firmware_path, log_message, base_address=base_address)
+        if image is None or not firmware.place_image(uploader, image, log_message):
+            messagebox.showerror("Batch Upload", "The firmware image cannot be flashed; see the log.", parent=self)
+            return
+        skip_current = None
+        if skip_current_var.get() and uploader.board_running:
+            skip_current = lambda job, log: firmware.board_runs_image(image, job.port, log)  # noqa: E731
+
+        from fr_uploader.scheduler import FlashJob, FlashScheduler
+
+        # The uploader needs exclusive access to each port
+        for monitor in (serial_monitor_tab1, serial_monitor_tab2):
+            if monitor.is_monitoring and monitor.port_dropdown.get() in ports:
+                monitor.stop_monitoring()
+
+        jobs = [FlashJob(port, firmware_path) for port in ports]
+        self.job_tree.delete(*self.job_tree.get_children())
+        for job in jobs:
+            self.job_tree.insert("", tk.END, iid=job.port, text=job.port, values=(job.status, "", 0, "", ""))
+        self.scheduler = FlashScheduler(
+            uploader,
+            max_workers=int(self.workers_spinbox.get()),
+            retries=int(self.retries_spinbox.get()),
+            on_progress=lambda job: self.events.put((job, None)),
+            skip_current=skip_current,
+        )
+        self.start_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.summary_label.config(text=f"Flashing {len(jobs)} board(s)...")
+        log_message(f"Batch upload of {os.path.basename(firmware_path)} to {', '.join(ports)} started.")
+        Thread(target=lambda: self.events.put((None, self.scheduler.run(jobs))), daemon=True).start()
+        self.after(100, self.poll_events)
+
+    def cancel(self):
+        if self.scheduler:
+            self.scheduler.cancel()
+            self.summary_label.config(text="Cancelling: waiting for running uploads to finish...")
+
+    def poll_events(self):
+        """Applies progress updates from the worker threads on the Tk main loop."""
+        report = None
+        updated = {}
+        while True:
+            try:
+                job, result = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                updated[job.port] = job
+            else:
+                report = result
+        for job in updated.values():
+            last_line = job.output[-1] if job.output else ""
+            self.job_tree.item(
+                job.port,
+                values=(job.status, format_progress(job.percent, job.rate), job.attempts, f"{job.duration:.1f} s", last_line),
+            )
+        if report is None:
+            self.after(100, self.poll_events)
+            return
+        for job in report.jobs:
+            self.job_tree.item(
+                job.port,
+                values=(
+                    job.status,
+                    format_progress(job.percent, job.rate),
+                    job.attempts,
+                    f"{job.duration:.1f} s",
+                    job.error or job.timings.summary(),
+                ),
+            )
+        self.summary_label.config(text=report.summary().splitlines()[-1])
+        log_message("Batch upload finished:\n" + report.summary())
+        self.cancel_button.config(state=tk.DISABLED)
+        self.scheduler = None
+        ready = [job.port for job in report.jobs if job not in report.failed]
+        if ready and self.macro_dropdown.get():
+            self.run_test_macro(ready)
+        else:
+            self.start_button.config(state=tk.NORMAL)
+
+    def run_test_macro(self, ports):
+        """Runs the selected macro on the flashed boards, all at once, on a worker thread."""
+        from fr_uploader.console import run_script_on_ports
+
+        name = self.macro_dropdown.get()
+        try:
+            steps = parse_script(macro_book.get(name) or "")
+        except ScriptError as e:
+            log_message(f"Macro {name}: {e}")
+            self.start_button.config(state=tk.NORMAL)
+            return
+        line_ending = LINE_ENDINGS[self.line_ending_dropdown.get()]
+        self.summary_label.config(text=f"Running macro {name} on {len(ports)} board(s)...")
+        for port in ports:
+            self.job_tree.set(port, "status", "testing")
+        Thread(
+            target=lambda: self.script_results.put(
+                run_script_on_ports(steps, ports, line_ending=line_ending, log=log_message, max_workers=len(ports))
+            ),
+            daemon=True,
+        ).start()
+        self.after(100, lambda: self.poll_script_results(name))
+
+    def poll_script_results(self, name):
+        try:
+            results = self.script_results.get_nowait()
+        except queue.Empty:
+            self.after(100, lambda: self.poll_script_results(name))
+            return
+        passed = 0
+        for port, result in results.items():
+            if isinstance(result, Exception):
+                status, output = "error", str(result)
+            else:
+                passed += result.ok
+                status, output = ("pass" if result.ok else "FAIL"), result.summary()
+            self.job_tree.set(port, "status", status)
+            self.job_tree.set(port, "output", output)
+            log_message(f"{port}: macro {name} {status}: {output}")
+        self.summary_label.config(text=f"Macro {name}: {passed}/{len(results)} board(s) passed.")
+        self.start_button.config(state=tk.NORMAL)
+
+
 # --- Serial Monitor Implementation ---
 class SerialMonitor(ttk.Frame):
     def __init__(self, parent, log_text_widget, all_log_texts, *args, **kwargs):  # Added log_text_widget
@@ -243,8 +606,28 @@ class SerialMonitor(ttk.Frame):
         self.log_text = log_text_widget  # Store the log text widget
         self.parent = parent
         self.all_log_texts = all_log_texts  # Store references to all log text widgets
-        self.receiving_data = False  # Control flag to prevent flickering
+        self.reader = None  # Background SerialReader while monitoring
+        self._read_job = None
+        self._stats_job = None
+        self._pending_output = []  # Text queued for the next render frame
+        self._pending_chars = 0
+        self._render_job = None
+        self.capture = None  # RotatingCaptureFile while "Capture to File" is on
+        self.recorder = None  # SessionRecorder of the current session while "Record Sessions" is on
+        self.replay = None  # CaptureReplay while a session capture is replayed
+        self._replay_job = None
         self.auto_scroll = True # Enables autoscroll by default
+        self.history = LineIndex()  # Unfiltered scrollback, re-filtered when the filter changes
+        self.view_index = LineIndex()  # Mirrors serial_text line for line, for searching
+        self.line_filter = LineFilter()
+        self.search_regex = None
+        self._current_match = None  # (line + view_index.dropped, start column, end column)
+        self._search_job = None
+        self._highlight_job = None
+        self.send_queue = None  # SendQueue writing to the port while monitoring
+        self.script_runner = None  # ScriptRunner while a script or macro runs
+        self.script_responses = None  # ResponseBuffer the running script's expects wait on
+        self.script_decoder = TextDecoder()  # Text for the script, whatever the view mode
 
         # --- Configuration Frame ---
         config_frame = ttk.Frame(self)
@@ -262,28 +645,41 @@ class SerialMonitor(ttk.Frame):
         )
         self.monitor_mode_dropdown.grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
         self.monitor_mode_dropdown.set("serial")
+        self.monitor_mode_dropdown.bind("<<ComboboxSelected>>", lambda event: self.apply_monitor_mode())
 
         # View Mode
         ttk.Label(config_frame, text="View Mode:").grid(row=0, column=2, sticky=tk.W, padx=5, pady=5)
         self.view_mode = tk.StringVar(value="text")
         self.view_mode_dropdown = ttk.Combobox(
             config_frame,
-            values=["text", "hex"],
+            values=["text", "hex", "xxd"],
             textvariable=self.view_mode,
             state="readonly",
             width=5,
         )
         self.view_mode_dropdown.grid(row=0, column=3, sticky=tk.W, padx=5, pady=5)
         self.view_mode_dropdown.set("text")
+        self.view_mode_dropdown.bind("<<ComboboxSelected>>", lambda event: self.reset_formatters())
+        self.text_decoder = TextDecoder()
+        self.hex_formatter = HexFormatter()
+        self.dump_formatter = HexFormatter(layout="xxd")
+        self.timestamper = LineTimestamper(TimestampFormatter(SessionClock()))
 
         # Port Selection
-        ttk.Label(config_frame, text="Port:").grid(row=0, column=4, sticky=tk.W, padx=5, pady=5)
-        self.port_list = [port.device for port in serial.tools.list_ports.comports()]
+        self.port_label = ttk.Label(config_frame, text="Port:")
+        self.port_label.grid(row=0, column=4, sticky=tk.W, padx=5, pady=5)
+        self.port_list = port_watcher.devices()  # Filled in by the watcher's first scan
         self.port_dropdown = ttk.Combobox(config_frame, values=self.port_list, state="readonly", width=8)
         self.port_dropdown.grid(row=0, column=5, sticky=tk.W, padx=5, pady=5)
         if self.port_list:
             self.port_dropdown.set(self.port_list[0])
 
+        # Host:port of a UART-over-TCP bridge, shown instead of the port in tcp mode
+        self.tcp_address = tk.StringVar(value=DEFAULT_TCP_ADDRESS)
+        self.tcp_address_entry = ttk.Entry(config_frame, textvariable=self.tcp_address, width=20)
+        self.tcp_address_entry.grid(row=0, column=5, sticky=tk.W, padx=5, pady=5)
+        self.tcp_address_entry.grid_remove()
+
         # Baud Rate
         ttk.Label(config_frame, text="Baud Rate:").grid(row=0, column=6, sticky=tk.W, padx=5, pady=5)
         self.baud_rates = [300, 1200, 2400, 4800, 9600, 19200, 38400, 57600, 74800, 115200, 230400, 250000]
@@ -292,6 +688,10 @@ class SerialMonitor(ttk.Frame):
         )
         self.baud_rate_dropdown.grid(row=0, column=7, sticky=tk.W, padx=5, pady=5)
         self.baud_rate_dropdown.set(115200)
+        self.connection_name = ""  # Port or host:port being monitored
+        self.board_identity = None  # VID:PID:serial of the board being monitored
+        self.awaiting_board = None  # Identity of a lost board to reconnect to
+        self._reconnect_job = None
 
         # Timestamp
         self.timestamp_var = tk.BooleanVar(value=False)
@@ -307,16 +707,61 @@ class SerialMonitor(ttk.Frame):
         self.line_ending_dropdown.grid(row=0, column=10, sticky=tk.W, padx=5, pady=5)
         self.line_ending_dropdown.set("None")
 
+        # Flow control, applied when the serial port is opened
+        ttk.Label(config_frame, text="Flow:").grid(row=0, column=11, sticky=tk.W, padx=5, pady=5)
+        self.flow_control_dropdown = ttk.Combobox(
+            config_frame, values=list(FLOW_CONTROL), state="readonly", width=9
+        )
+        self.flow_control_dropdown.grid(row=0, column=12, sticky=tk.W, padx=5, pady=5)
+        self.flow_control_dropdown.set("None")
+
+        # Scrollback limit
+        ttk.Label(config_frame, text="Scrollback:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        self.scrollback_dropdown = ttk.Combobox(
+            config_frame, values=list(SCROLLBACK_CHOICES), state="readonly", width=12
+        )
+        self.scrollback_dropdown.grid(row=1, column=1, columnspan=2, sticky=tk.W, padx=5, pady=5)
+        self.scrollback_dropdown.set("10,000 lines")
+        self.scrollback_dropdown.bind("<<ComboboxSelected>>", lambda event: self.apply_scrollback_limit())
+
+        # Spill the full stream to disk so trimmed output is not lost
+        self.capture_var = tk.BooleanVar(value=False)
+        self.capture_check = ttk.Checkbutton(
+            config_frame, text="Capture to File", variable=self.capture_var, command=self.toggle_capture
+        )
+        self.capture_check.grid(row=1, column=3, columnspan=2, sticky=tk.W, padx=5, pady=5)
+
+        # Record every session (timestamped chunks) for replay
+        self.record_var = tk.BooleanVar(value=False)
+        self.record_check = ttk.Checkbutton(
+            config_frame, text="Record Sessions", variable=self.record_var, command=self.toggle_recording
+        )
+        self.record_check.grid(row=1, column=5, columnspan=2, sticky=tk.W, padx=5, pady=5)
+
+        # Reopen the board when it comes back after a reset, even under another port name
+        self.auto_reconnect_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(config_frame, text="Auto-Reconnect", variable=self.auto_reconnect_var).grid(
+            row=1, column=7, columnspan=2, sticky=tk.W, padx=5, pady=5
+        )
+
+        self.scrollback_label = ttk.Label(config_frame, text="")
+        self.scrollback_label.grid(row=1, column=9, columnspan=2, sticky=tk.W, padx=5, pady=5)
+
         # Text Area for Serial Output
         self.serial_text = scrolledtext.ScrolledText(self, wrap=tk.NONE, width=80, height=20, state=tk.DISABLED)  # wrap=tk.NONE for single line
         # Disable initially
+        self.scrollback = Scrollback(self.serial_text)
+        self.apply_scrollback_limit()
 
         # Add horizontal scrollbar
         self.x_scrollbar = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.serial_text.xview)
         self.y_scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.serial_text.yview) # Add the Y scrollbar
 
         # Configure scrollbars to work together
-        self.serial_text.configure(xscrollcommand=self.x_scrollbar.set, yscrollcommand=self.y_scrollbar.set)
+        self.serial_text.configure(xscrollcommand=self.x_scrollbar.set, yscrollcommand=self.on_text_scroll)
+        self.serial_text.tag_configure("search_match", background="yellow")
+        self.serial_text.tag_configure("search_current", background="orange")
+        self.serial_text.tag_raise("search_current")
 
 
         # Buttons Frame (for Start Monitoring, Refresh Ports, Clear)
@@ -339,59 +784,400 @@ class SerialMonitor(ttk.Frame):
         self.autoscroll_check = ttk.Checkbutton(buttons_frame, text="Autoscroll", variable=self.autoscroll_var, command=self.toggle_autoscroll)
         self.autoscroll_check.grid(row=0, column=3, padx=5, pady=5, sticky=tk.W)
 
+        self.open_capture_button = ttk.Button(
+            buttons_frame, text="Open Capture...", command=self.open_capture, width=15
+        )
+        self.open_capture_button.grid(row=0, column=4, padx=5, pady=5, sticky=tk.W + tk.E)
+
+        # Receive statistics (throughput and ring buffer overruns)
+        self.stats_label = ttk.Label(buttons_frame, text="")
+        self.stats_label.grid(row=0, column=5, padx=5, pady=5, sticky=tk.W)
+
         buttons_frame.grid_columnconfigure(0, weight=1)
         buttons_frame.grid_columnconfigure(1, weight=1)
         buttons_frame.grid_columnconfigure(2, weight=1)
         buttons_frame.grid_columnconfigure(3, weight=1)
 
+        # Send line (Up/Down browse the history), macros and test scripts
+        send_frame = ttk.Frame(self)
+        ttk.Label(send_frame, text="Send:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=2)
+        self.send_var = tk.StringVar()
+        self.send_entry = ttk.Entry(send_frame, textvariable=self.send_var, width=40)
+        self.send_entry.grid(row=0, column=1, sticky=tk.W + tk.E, padx=5, pady=2)
+        self.send_entry.bind("<Return>", lambda event: self.send_line())
+        self.send_entry.bind("<Up>", lambda event: self.send_var.set(command_history.previous(self.send_var.get())))
+        self.send_entry.bind("<Down>", lambda event: self.send_var.set(command_history.next()))
+        ttk.Button(send_frame, text="Send", command=self.send_line).grid(row=0, column=2, padx=5, pady=2)
+        ttk.Label(send_frame, text="Macro:").grid(row=0, column=3, sticky=tk.W, padx=5, pady=2)
+        self.macro_dropdown = ttk.Combobox(send_frame, state="readonly", width=16)
+        self.macro_dropdown.config(postcommand=lambda: self.macro_dropdown.config(values=macro_book.names()))
+        self.macro_dropdown.grid(row=0, column=4, sticky=tk.W, padx=5, pady=2)
+        ttk.Button(send_frame, text="Run Macro", command=self.run_macro).grid(row=0, column=5, padx=5, pady=2)
+        ttk.Button(send_frame, text="Edit Macros...", command=self.edit_macros).grid(row=0, column=6, padx=5, pady=2)
+        ttk.Button(send_frame, text="Run Script...", command=self.run_script_file).grid(row=0, column=7, padx=5, pady=2)
+        self.stop_script_button = ttk.Button(
+            send_frame, text="Stop Script", command=self.stop_script, state=tk.DISABLED
+        )
+        self.stop_script_button.grid(row=0, column=8, padx=5, pady=2)
+        send_frame.grid_columnconfigure(1, weight=1)
+
+        # Search and line filters (regular expressions)
+        search_frame = ttk.Frame(self)
+        ttk.Label(search_frame, text="Find:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=2)
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=30)
+        self.search_entry.grid(row=0, column=1, sticky=tk.W + tk.E, padx=5, pady=2)
+        self.search_entry.bind("<Return>", lambda event: self.find_next())
+        self.search_entry.bind("<Shift-Return>", lambda event: self.find_next(backwards=True))
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        self.match_case_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            search_frame, text="Match Case", variable=self.match_case_var, command=self.update_search
+        ).grid(row=0, column=2, sticky=tk.W, padx=5, pady=2)
+        ttk.Button(search_frame, text="Previous", command=lambda: self.find_next(backwards=True)).grid(
+            row=0, column=3, padx=5, pady=2
+        )
+        ttk.Button(search_frame, text="Next", command=self.find_next).grid(row=0, column=4, padx=5, pady=2)
+        self.search_label = ttk.Label(search_frame, text="")
+        self.search_label.grid(row=0, column=5, columnspan=2, sticky=tk.W, padx=5, pady=2)
+
+        ttk.Label(search_frame, text="Include:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=2)
+        self.include_var = tk.StringVar()
+        include_entry = ttk.Entry(search_frame, textvariable=self.include_var, width=30)
+        include_entry.grid(row=1, column=1, sticky=tk.W + tk.E, padx=5, pady=2)
+        include_entry.bind("<Return>", lambda event: self.apply_filter())
+        ttk.Label(search_frame, text="Exclude:").grid(row=1, column=2, sticky=tk.E, padx=5, pady=2)
+        self.exclude_var = tk.StringVar()
+        exclude_entry = ttk.Entry(search_frame, textvariable=self.exclude_var, width=30)
+        exclude_entry.grid(row=1, column=3, columnspan=2, sticky=tk.W + tk.E, padx=5, pady=2)
+        exclude_entry.bind("<Return>", lambda event: self.apply_filter())
+        ttk.Button(search_frame, text="Apply Filter", command=self.apply_filter).grid(row=1, column=5, padx=5, pady=2)
+        ttk.Button(search_frame, text="Clear Filter", command=self.clear_filter).grid(row=1, column=6, padx=5, pady=2)
+        search_frame.grid_columnconfigure(1, weight=1)
+        search_frame.grid_columnconfigure(3, weight=1)
+
 
         # Pack widgets in the correct order
         self.x_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
         self.y_scrollbar.pack(side=tk.RIGHT, fill=tk.Y) # Add this line
         buttons_frame.pack(fill=tk.X, pady=5)
+        send_frame.pack(fill=tk.X)
+        search_frame.pack(fill=tk.X)
         self.serial_text.pack(padx=5, pady=5, fill=tk.BOTH, expand=True)
-        self.serial_text.configure(xscrollcommand=self.x_scrollbar.set, yscrollcommand=self.y_scrollbar.set)  # Configure the scrollbar
+        self.serial_text.configure(xscrollcommand=self.x_scrollbar.set, yscrollcommand=self.on_text_scroll)  # Configure the scrollbar
+
+        # Output queued while this monitor's tab was hidden is rendered once it is shown
+        self.bind_all("<<NotebookTabChanged>>", lambda event: self.schedule_render(), add="+")
+
+    def apply_monitor_mode(self):
+        """Shows the port and baud rate for serial, or the host:port entry for tcp."""
+        if self.monitor_mode.get() == "tcp":
+            self.port_label.config(text="Host:Port:")
+            self.port_dropdown.grid_remove()
+            self.tcp_address_entry.grid()
+            self.baud_rate_dropdown.config(state=tk.DISABLED)
+        else:
+            self.port_label.config(text="Port:")
+            self.tcp_address_entry.grid_remove()
+            self.port_dropdown.grid()
+            self.baud_rate_dropdown.config(state="readonly")
 
     def toggle_autoscroll(self):
         self.auto_scroll = self.autoscroll_var.get() # Updates the autoscroll flag
 
     def clear_serial_text(self):
         """Clears the serial monitor text area."""
+        self._pending_output.clear()
+        self._pending_chars = 0
         self.serial_text.config(state=tk.NORMAL)  # Enable temporarily to clear
         self.serial_text.delete("1.0", tk.END)
         self.serial_text.config(state=tk.DISABLED)  # Disable again
+        self.scrollback.cleared()
+        self.history.clear()
+        self.view_index.clear()
+        self.line_filter.reset()
+        self._current_match = None
+        self.update_scrollback_stats()
+
+    def apply_scrollback_limit(self):
+        """Applies the scrollback limit selected in the dropdown."""
+        max_lines, max_chars = SCROLLBACK_CHOICES[self.scrollback_dropdown.get()]
+        state = self.serial_text.cget("state")
+        self.serial_text.config(state=tk.NORMAL)
+        self.view_index.drop(self.scrollback.configure(max_lines=max_lines, max_chars=max_chars))
+        self.serial_text.config(state=state)
+        self.history.limit(max_lines, max_chars)
+        self.update_scrollback_stats()
+
+    def update_scrollback_stats(self):
+        """Shows scrollback size, trimming statistics and process memory."""
+        stats = self.scrollback.stats()
+        text = (
+            f"Lines: {stats['lines']:,} ({format_size(stats['chars'])}) | "
+            f"Trimmed: {stats['trimmed_lines']:,} lines in {stats['trims']} trims"
+        )
+        if self.line_filter.active:
+            text += f" | Filter passed {self.line_filter.lines_passed:,} of {self.line_filter.lines_seen:,} lines"
+        memory = process_memory()
+        if memory is not None:
+            text += f" | Memory: {format_size(memory)}"
+        if self.capture:
+            text += f" | Captured: {format_size(self.capture.bytes_written)}"
+        if self.recorder:
+            text += f" | Recorded: {format_size(self.recorder.bytes_written)}"
+        self.scrollback_label.config(text=text)
+
+    def toggle_capture(self):
+        """Starts or stops spilling the raw serial stream to a rotating capture file."""
+        if self.capture_var.get():
+            filename = filedialog.asksaveasfilename(
+                title="Capture Serial Stream To",
+                defaultextension=".bin",
+                filetypes=(("Capture Files", "*.bin"), ("All files", "*.*")),
+            )
+            if not filename:
+                self.capture_var.set(False)
+                return
+            try:
+                self.capture = RotatingCaptureFile(filename)
+            except OSError as e:
+                self.log_message(f"Error opening capture file: {e}")
+                self.capture_var.set(False)
+                return
+            self.update_reader_sink()
+            self.log_message(f"Capturing serial stream to {filename}")
+        elif self.capture:
+            capture, self.capture = self.capture, None
+            self.update_reader_sink()
+            capture.close()
+            self.log_message(
+                f"Stopped capture ({format_size(capture.bytes_written)} written, "
+                f"{capture.rotations} rotations)."
+            )
+        self.update_scrollback_stats()
+
+    def write_sinks(self, data):
+        """Reader sink (runs on the reader thread): raw capture and session recording."""
+        capture, recorder = self.capture, self.recorder
+        if capture:
+            capture.write(data)
+        if recorder:
+            recorder.write(data)
+
+    def update_reader_sink(self):
+        if self.reader:
+            self.reader.sink = self.write_sinks if (self.capture or self.recorder) else None
+
+    def start_recording(self):
+        """Records the current session to captures/<port>-<date>-<time>.frcap."""
+        name = "".join(c if c.isalnum() else "_" for c in self.connection_name).strip("_") or "session"
+        started = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(CAPTURE_FOLDER, f"{name}-{started}{SESSION_EXTENSION}")
+        try:
+            self.recorder = SessionRecorder(path, clock=self.timestamper.formatter.clock)
+        except OSError as e:
+            self.log_message(f"Error opening session capture: {e}")
+            self.record_var.set(False)
+            return
+        self.update_reader_sink()
+        self.log_message(f"Recording session to {os.path.abspath(path)}")
+
+    def stop_recording(self):
+        if self.recorder:
+            recorder, self.recorder = self.recorder, None
+            self.update_reader_sink()
+            recorder.close()
+            self.log_message(
+                f"Recorded {format_size(recorder.bytes_written)} in {recorder.frames:,} frames to {recorder.path}"
+            )
+
+    def toggle_recording(self):
+        """Starts or stops recording right away when a session is running."""
+        if not self.is_monitoring:
+            return  # Takes effect when monitoring starts
+        if self.record_var.get():
+            self.start_recording()
+        else:
+            self.stop_recording()
+
+    def open_capture(self):
+        """Opens a session capture in the capture viewer."""
+        filename = filedialog.askopenfilename(
+            title="Open Session Capture",
+            initialdir=CAPTURE_FOLDER if os.path.isdir(CAPTURE_FOLDER) else None,
+            filetypes=(("Session Captures", f"*{SESSION_EXTENSION}"), ("All files", "*.*")),
+        )
+        if not filename:
+            return
+        try:
+            capture = SessionCapture(filename)
+        except (OSError, ValueError) as e:
+            self.log_message(f"Error opening capture: {e}")
+            return
+        CaptureViewer(self, capture)
 
-    def refresh_ports(self):
-        """Refreshes the list of available COM ports."""
-        com_ports = [port.device for port in serial.tools.list_ports.comports()]
-        self.update_com_ports(com_ports)
+    def start_replay(self, capture, offset=None, speed=1.0):
+        """Feeds a session capture through process_data, paced like the original (or at full speed)."""
+        if self.is_monitoring:
+            self.log_message("Stop monitoring before replaying a capture.")
+            return False
+        self.stop_replay()
+        self.reset_formatters()
+        self.timestamper = LineTimestamper(TimestampFormatter(capture.clock()))  # Original arrival times
+        telemetry_panel.new_stream(self)
+        self.replay = CaptureReplay(capture, offset, speed)
+        self._replay_started = time.perf_counter()
+        pace = "full speed" if speed is None else f"{speed:g}x"
+        self.log_message(f"Replaying {os.path.basename(capture.path)} at {pace}.")
+        self._replay_job = self.after(SERIAL_DRAIN_INTERVAL_MS, self.replay_step)
+        return True
+
+    def replay_step(self):
+        self._replay_job = None
+        if not self.replay:
+            return
+        for time_ns, data in self.replay.due():
+            self.process_data(data, time_ns)
+        if self.replay.done:
+            elapsed = time.perf_counter() - self._replay_started
+            self.log_message(
+                f"Replay finished: {format_size(self.replay.bytes_replayed)} in "
+                f"{self.replay.frames_replayed:,} frames, {elapsed:.2f} s."
+            )
+            self.replay = None
+            return
+        self._replay_job = self.after(SERIAL_DRAIN_INTERVAL_MS, self.replay_step)
+
+    def stop_replay(self):
+        if self._replay_job is not None:
+            self.after_cancel(self._replay_job)
+            self._replay_job = None
+        if self.replay:
+            self.log_message("Replay stopped.")
+            self.replay = None
 
     def refresh_ports_all(self):
-        """Refreshes the COM ports in both the dropdown and the combobox in the SerialMonitor."""
-        refresh_com_ports()  # Refresh the main COM port dropdown
-        self.refresh_ports()  # Refresh the SerialMonitor's COM port dropdown
+        """Rescans the COM ports now; every port list updates when the scan reports back."""
+        refresh_com_ports()
 
     def toggle_monitoring(self):
-        if self.is_monitoring:
+        if self.awaiting_board:
+            self.cancel_reconnect()
+        elif self.is_monitoring:
             self.stop_monitoring()
         else:
             self.start_monitoring()
 
+    def ports_changed(self, added, removed):
+        """Reacts to hotplug events: a removed monitored port, or the awaited board coming back."""
+        if self.is_monitoring and self.monitor_mode.get() == "serial":
+            if any(info.device == self.connection_name for info in removed):
+                self.log_message(f"{self.connection_name} was removed.")
+                self.connection_lost()
+                return
+        if self.awaiting_board:
+            for info in added:
+                if info.identity == self.awaiting_board:
+                    self.reconnect(info.device)
+                    return
+
+    def connection_lost(self):
+        """Stops monitoring and, with Auto-Reconnect on, waits for the same board to come back."""
+        identity = self.board_identity if self.monitor_mode.get() == "serial" else None
+        self.stop_monitoring()
+        if not (identity and self.auto_reconnect_var.get()):
+            return
+        self.awaiting_board = identity
+        self.start_stop_button.config(text="Cancel Reconnect")
+        self.log_message(f"Waiting for board {identity} to come back...")
+        port_watcher.wake()
+        self._reconnect_job = self.after(RECONNECT_RETRY_MS, self.retry_reconnect)
+
+    def retry_reconnect(self):
+        """Retries a board that is listed but could not be opened yet (e.g. still booting)."""
+        self._reconnect_job = None
+        if not self.awaiting_board:
+            return
+        info = port_watcher.find(self.awaiting_board)
+        if info is not None:
+            self.reconnect(info.device)
+        if self.awaiting_board and self._reconnect_job is None:
+            self._reconnect_job = self.after(RECONNECT_RETRY_MS, self.retry_reconnect)
+
+    def reconnect(self, device):
+        identity = self.awaiting_board
+        self.awaiting_board = None
+        if self._reconnect_job is not None:
+            self.after_cancel(self._reconnect_job)
+            self._reconnect_job = None
+        self.monitor_mode.set("serial")
+        self.port_dropdown.set(device)
+        self.log_message(f"Board {identity} is back on {device}; reconnecting.")
+        self.start_monitoring()
+        if not self.is_monitoring:
+            self.awaiting_board = identity  # Try again on the next event or retry
+            self.start_stop_button.config(text="Cancel Reconnect")
+            if self._reconnect_job is None:
+                self._reconnect_job = self.after(RECONNECT_RETRY_MS, self.retry_reconnect)
+
+    def cancel_reconnect(self):
+        if self._reconnect_job is not None:
+            self.after_cancel(self._reconnect_job)
+            self._reconnect_job = None
+        self.log_message(f"Stopped waiting for board {self.awaiting_board}.")
+        self.awaiting_board = None
+        self.start_stop_button.config(text="Start Monitoring")
+
     def start_monitoring(self):
-        """Starts monitoring the serial port."""
-        port_name = self.port_dropdown.get()
-        baud_rate = int(self.baud_rate_dropdown.get())
+        """Starts monitoring the serial port or TCP bridge."""
+        if self.is_monitoring:
+            return
+        self.stop_replay()
+        sink = self.write_sinks if self.capture else None
         try:
-            self.serial_connection = serial.Serial(port_name, baud_rate, timeout=0.05)  # Reduced timeout
+            if self.monitor_mode.get() == "tcp":
+                from fr_uploader.tcp_reader import TcpReader, parse_address  # asyncio only when needed
+
+                try:
+                    host, port = parse_address(self.tcp_address.get())
+                except ValueError as e:
+                    self.log_message(f"Error: {e}")
+                    return
+                # The reader connects (and reconnects) on its own event loop
+                self.reader = TcpReader(host, port, sink=sink, log=self.log_message)
+                self.connection_name = self.reader.address
+                write = self.reader.write  # False until connected; the send queue retries
+                message = f"Monitoring TCP bridge {self.connection_name}."
+            else:
+                port_name = self.port_dropdown.get()
+                baud_rate = int(self.baud_rate_dropdown.get())
+                self.serial_connection = serial.Serial(
+                    port_name, baud_rate, timeout=0.05, **FLOW_CONTROL[self.flow_control_dropdown.get()]
+                )
+                self.reader = SerialReader(self.serial_connection, sink=sink)
+                write = self.serial_connection.write
+                self.connection_name = port_name
+                info = port_watcher.ports.get(port_name)
+                self.board_identity = info.identity if info else None
+                message = f"Monitoring serial port {port_name} at {baud_rate} baud."
+            self.reader.start()
+            self.send_queue = SendQueue(write, name=f"send-{self.connection_name}")
+            self.reset_formatters()
+            self.timestamper = LineTimestamper(TimestampFormatter(SessionClock()))  # Anchor to this session
+            telemetry_panel.new_stream(self)
+            if self.record_var.get():
+                self.start_recording()
             self.is_monitoring = True
-            self.receiving_data = False
             self.start_stop_button.config(text="Stop Monitoring")
-            self.log_message(f"Monitoring serial port {port_name} at {baud_rate} baud.")
+            self.monitor_mode_dropdown.config(state=tk.DISABLED)
+            self.flow_control_dropdown.config(state=tk.DISABLED)
+            self.log_message(message)
 
             # Disable scrollbar during monitoring
             # self.x_scrollbar.config(command="")
             self.serial_text.config(state=tk.NORMAL) #enable text before monitoring
-            self.read_serial_data()
+            self._read_job = self.after(SERIAL_DRAIN_INTERVAL_MS, self.read_serial_data)
+            self._stats_job = self.after(SERIAL_STATS_INTERVAL_MS, self.update_stats)
 
         except serial.SerialException as e:
             self.log_message(f"Error opening serial port: {e}")
@@ -399,13 +1185,38 @@ class SerialMonitor(ttk.Frame):
             self.log_message(f"An unexpected error occurred: {e}")
 
     def stop_monitoring(self):
-        """Stops monitoring the serial port."""
-        if self.serial_connection:
+        """Stops monitoring the serial port or TCP bridge."""
+        if self.is_monitoring:
             try:
                 self.is_monitoring = False
                 self.start_stop_button.config(text="Start Monitoring")
-                self.serial_connection.close()
-                self.log_message(f"---- Closed the serial port {self.port_dropdown.get()} ----")
+                self.monitor_mode_dropdown.config(state="readonly")
+                self.flow_control_dropdown.config(state="readonly")
+                self.stop_script()
+                if self.send_queue:
+                    self.send_queue.stop()
+                    self.send_queue = None
+                for job in (self._read_job, self._stats_job):
+                    if job is not None:
+                        self.after_cancel(job)
+                self._read_job = self._stats_job = None
+                if self.reader:
+                    self.reader.stop()
+                    # Show whatever arrived before the port was closed
+                    for stamp, data in self.reader.buffer.read_chunks():
+                        self.process_data(data, stamp)
+                    if self.reader.sink_error is not None:
+                        self.log_message(f"Capture stopped after a write error: {self.reader.sink_error}")
+                    self.reader = None
+                if self.capture:
+                    self.capture.flush()
+                self.stop_recording()
+                if self.serial_connection:
+                    self.serial_connection.close()
+                    self.serial_connection = None
+                    self.log_message(f"---- Closed the serial port {self.connection_name} ----")
+                else:
+                    self.log_message(f"---- Disconnected from {self.connection_name} ----")
 
                 # Enable scrollbar after stopping monitoring
                 # self.x_scrollbar.config(command=self.serial_text.xview)
@@ -417,65 +1228,322 @@ class SerialMonitor(ttk.Frame):
             self.log_message("Serial port is not open.")
 
     def read_serial_data(self):
-        """Reads data from the serial port and updates the text area."""
-        if self.is_monitoring and self.serial_connection:
+        """Drains the bytes collected by the reader thread and updates the text area."""
+        self._read_job = None
+        if not (self.is_monitoring and self.reader):
+            return
+        if METRICS.enabled:
+            METRICS.set("serial_reader_backlog_bytes", len(self.reader.buffer), port=self.connection_name)
+        with METRICS.timer("serial_read_seconds"):
+            for stamp, data in self.reader.buffer.read_chunks():
+                self.process_data(data, stamp)
+        if self.reader.error is not None:
+            self.log_message(f"Error reading from {self.connection_name}: {self.reader.error}")
+            self.connection_lost()
+            return
+        self._read_job = self.after(SERIAL_DRAIN_INTERVAL_MS, self.read_serial_data)
+
+    def update_stats(self):
+        """Shows the reader's throughput and overrun counters."""
+        self._stats_job = None
+        if not (self.is_monitoring and self.reader):
+            return
+        stats = self.reader.stats()
+        text = (
+            f"Rx: {stats['bytes_per_sec'] / 1024:.1f} KB/s | "
+            f"Overruns: {stats['overruns']} ({stats['dropped_bytes']} B dropped)"
+        )
+        if "connected" in stats:
+            text += f" | {'Connected' if stats['connected'] else 'Connecting...'}, {stats['reconnects']} reconnects"
+        if self.send_queue:
+            text += f" | Tx: {self.send_queue.bytes_sent} B"
+            if self.send_queue.pending:
+                text += f" ({self.send_queue.pending} B queued)"
+        self.stats_label.config(text=text)
+        self.update_scrollback_stats()
+        self._stats_job = self.after(SERIAL_STATS_INTERVAL_MS, self.update_stats)
+
+    def process_data(self, data, stamp=None):
+        """Processes the received data based on the view mode.
+
+        stamp is the perf_counter_ns() arrival time recorded by the reader thread.
+        """
+        METRICS.count("serial_bytes_in_total", len(data))
+        with METRICS.timer("serial_process_seconds"):
+            view_mode = self.view_mode.get()
             try:
-                if not self.receiving_data:
-                    self.receiving_data = True
-                    data = self.serial_connection.read(self.serial_connection.in_waiting)
-                    if data:
-                        self.process_data(data)
-                    self.receiving_data = False
-            except serial.SerialException as e:
-                self.log_message(f"Error reading from serial port: {e}")
-                self.stop_monitoring()
+                telemetry_panel.feed(self, data, stamp)
+                if self.script_responses is not None:
+                    self.script_responses.feed(self.script_decoder.decode(data))
+                text = ""
+                if view_mode == "text":
+                    text = self.text_decoder.decode(data)
+                elif view_mode == "hex":
+                    text = self.hex_formatter.format(data)
+                    if self.timestamp_var.get():
+                        text += "\n"  # One timestamped line per received chunk
+                elif view_mode == "xxd":
+                    text = self.dump_formatter.format(data)
+
+                if self.timestamp_var.get():
+                    text = self.timestamper.stamp(text, stamp if stamp is not None else SessionClock.now())
+
+                # Queue the text for all serial text widgets; each renders on its own frame timer
+                for log_text in self.all_log_texts:
+                    log_text.queue_output(text)
             except Exception as e:
-                self.log_message(f"An unexpected error occurred: {e}")
-                self.stop_monitoring()
-        self.after(10, self.read_serial_data)  # Faster polling
+                self.log_message(f"Error processing received data: {e}")
+
+    def reset_formatters(self):
+        """Drops decoder state and restarts hex offsets (new session or view mode)."""
+        self.text_decoder.reset()
+        self.hex_formatter.reset()
+        self.dump_formatter.reset()
+        self.timestamper.reset()
+
+    def queue_output(self, text):
+        """Queues text for the next render frame instead of inserting it right away."""
+        if text:
+            self._pending_output.append(text)
+            self._pending_chars += len(text)
+            if self._pending_chars > SERIAL_PENDING_LIMIT:
+                # A hidden tab would only trim this on render anyway; keep the newest part
+                backlog = "".join(self._pending_output)[-SERIAL_PENDING_LIMIT // 2:]
+                self._pending_output = [backlog]
+                self._pending_chars = len(backlog)
+            self.schedule_render()
+
+    def schedule_render(self):
+        """Schedules a render frame unless one is already pending."""
+        if self._render_job is None and self._pending_output:
+            self._render_job = self.after(SERIAL_RENDER_INTERVAL_MS, self.render_output)
+
+    def render_output(self):
+        """Flushes all queued text into the serial text area with a single insert."""
+        self._render_job = None
+        if not self._pending_output or not self.winfo_viewable():
+            return  # Hidden tabs catch up on <<NotebookTabChanged>>
+        text = "".join(self._pending_output)
+        self._pending_output.clear()
+        self._pending_chars = 0
+        self.history.append(text)
+        self.history.limit(self.scrollback.max_lines, self.scrollback.max_chars)
+        text = self.line_filter.feed(text)
+        if not text:
+            return
+        self.serial_text.config(state=tk.NORMAL) #enable
+        self.serial_text.insert(tk.END, text)
+        self.view_index.append(text)
+        self.view_index.drop(self.scrollback.appended(text))
+        if self.auto_scroll:
+            self.serial_text.see(tk.END)  # Autoscroll to the end
+        self.serial_text.config(state=tk.DISABLED) #disable
+        self.schedule_highlight()
+
+    def schedule_search(self):
+        """Searches once typing pauses for SEARCH_DELAY_MS."""
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(SEARCH_DELAY_MS, self.update_search)
+
+    def update_search(self):
+        """Compiles the find pattern, counts its matches and highlights the visible ones."""
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+            self._search_job = None
+        self._current_match = None
+        self.serial_text.tag_remove("search_current", "1.0", tk.END)
+        pattern = self.search_var.get()
+        self.search_regex = None
+        if pattern:
+            try:
+                self.search_regex = compile_pattern(pattern, ignore_case=not self.match_case_var.get())
+            except re.error as e:
+                self.search_label.config(text=f"Bad pattern: {e}")
+        if self.search_regex is not None:
+            started = time.perf_counter()
+            count = self.view_index.count(self.search_regex)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.search_label.config(text=f"{count:,} matches in {len(self.view_index):,} lines ({elapsed_ms:.0f} ms)")
+        elif not pattern:
+            self.search_label.config(text="")
+        self.highlight_matches()
+
+    def find_next(self, backwards=False):
+        """Jumps to the next (or previous) match and stops autoscroll so it stays in view."""
+        if self._search_job is not None or self.search_regex is None:
+            self.update_search()
+        if self.search_regex is None:
+            return
+        if self._current_match and self._current_match[0] >= self.view_index.dropped:
+            line, start, end = self._current_match
+            line -= self.view_index.dropped
+            column = start if backwards else end
+        else:
+            line, column = self.first_visible_line(), 0
+        found = self.view_index.find(self.search_regex, line, column, backwards=backwards)
+        self.serial_text.tag_remove("search_current", "1.0", tk.END)
+        if found is None:
+            self._current_match = None
+            self.search_label.config(text="No matches")
+            return
+        line, start, end = found
+        self._current_match = (line + self.view_index.dropped, start, end)
+        self.autoscroll_var.set(False)
+        self.toggle_autoscroll()
+        self.serial_text.tag_add("search_current", f"{line + 1}.{start}", f"{line + 1}.{end}")
+        self.serial_text.see(f"{line + 1}.{start}")
+        self.highlight_matches()
+
+    def first_visible_line(self):
+        """Index line at the top of the serial text area."""
+        return int(self.serial_text.index("@0,0").split(".")[0]) - 1
+
+    def on_text_scroll(self, first, last):
+        self.y_scrollbar.set(first, last)
+        self.schedule_highlight()
+
+    def schedule_highlight(self):
+        if self._highlight_job is None and self.search_regex is not None:
+            self._highlight_job = self.after_idle(self.highlight_matches)
+
+    def highlight_matches(self):
+        """Tags the matches on the visible lines only; the index finds them without Tk's search."""
+        self._highlight_job = None
+        self.serial_text.tag_remove("search_match", "1.0", tk.END)
+        if self.search_regex is None:
+            return
+        first = self.first_visible_line()
+        last = int(self.serial_text.index(f"@0,{self.serial_text.winfo_height()}").split(".")[0]) - 1
+        for line, start, end in self.view_index.matches(self.search_regex, first, last, SEARCH_HIGHLIGHT_LIMIT):
+            self.serial_text.tag_add("search_match", f"{line + 1}.{start}", f"{line + 1}.{end}")
 
-    def process_data(self, data):
-        """Processes the received data based on the view mode."""
-        view_mode = self.view_mode.get()
+    def apply_filter(self):
+        """Applies the include/exclude patterns to the scrollback and to new data."""
         try:
-            text = ""
-            if view_mode == "text":
-                try:
-                    text = data.decode("utf-8", errors="replace")
-                except UnicodeDecodeError as e:
-                    self.log_message(f"Unicode Decode Error: {e}")
-                    text = "[ERROR: Could not decode data]"
-            elif view_mode == "hex":
-                hex_data = " ".join([f"{x:02X}" for x in data])
-                text = hex_data
-
-            if self.timestamp_var.get():
-                timestamp = datetime.datetime.now().strftime("%H:%M:%S.%f")[:-3]
-                text = f"{timestamp} -> {text}"  # Modified timestamp format
-
-            # Update all serial text widgets
-            for log_text in self.all_log_texts:
-                log_text.serial_text.config(state=tk.NORMAL) #enable
-                log_text.serial_text.insert(tk.END, text)
-                if self.auto_scroll:
-                    log_text.serial_text.see(tk.END)  # Autoscroll to the end
-                log_text.serial_text.config(state=tk.DISABLED) #disable
-            # self.serial_text.insert(tk.END, text)
-            # self.serial_text.see(tk.END)
-        except Exception as e:
-            self.log_message(f"Error processing received data: {e}")
+            line_filter = LineFilter(
+                self.include_var.get(), self.exclude_var.get(), ignore_case=not self.match_case_var.get()
+            )
+        except re.error as e:
+            self.log_message(f"Bad filter pattern: {e}")
+            return
+        self.line_filter = line_filter
+        self.rebuild_view()
+
+    def clear_filter(self):
+        self.include_var.set("")
+        self.exclude_var.set("")
+        self.apply_filter()
+
+    def rebuild_view(self):
+        """Re-renders the unfiltered history through the current filter."""
+        text = self.line_filter.feed(self.history.text())
+        self.serial_text.config(state=tk.NORMAL)
+        self.serial_text.delete("1.0", tk.END)
+        self.serial_text.insert(tk.END, text)
+        self.scrollback.cleared()
+        self.view_index.clear()
+        self.view_index.append(text)
+        self.view_index.drop(self.scrollback.appended(text))
+        if self.auto_scroll:
+            self.serial_text.see(tk.END)
+        self.serial_text.config(state=tk.DISABLED)
+        self.update_search()
+        self.update_scrollback_stats()
 
     def update_com_ports(self, com_ports):
-        """Updates the COM port list in the dropdown."""
+        """Updates the COM port list in the dropdown, keeping the selected port if it is still there."""
         self.port_list = com_ports
         self.port_dropdown["values"] = self.port_list
-        if self.port_list and self.port_dropdown["values"]:
+        if self.port_list and self.port_dropdown.get() not in self.port_list and not self.is_monitoring:
             self.port_dropdown.set(self.port_list[0])
 
     def log_message(self, message):
         """Logs a message to the log text widget."""
         log_message(message)  # Use the main log_message function
 
+    def line_ending(self):
+        return LINE_ENDINGS[self.line_ending_dropdown.get()]
+
+    def send_line(self):
+        """Queues the send entry's text, plus the selected line ending, for the port."""
+        command = self.send_var.get()
+        if not (self.is_monitoring and self.send_queue):
+            self.log_message("Start monitoring before sending.")
+            return
+        if self.send_queue.error is not None:
+            self.log_message(f"Cannot send to {self.connection_name}: {self.send_queue.error}")
+            return
+        if not self.send_queue.send(command + self.line_ending()):
+            self.log_message(f"Send queue full ({self.send_queue.pending} B waiting); not sent.")
+            return
+        command_history.add(command)
+        self.send_var.set("")
+
+    def run_macro(self):
+        name = self.macro_dropdown.get()
+        if not name or macro_book.get(name) is None:
+            self.log_message("Select a macro to run.")
+            return
+        self.start_script(macro_book.get(name), f"macro {name}")
+
+    def edit_macros(self):
+        MacroEditor(self, self.macro_dropdown.get() or None, self.send_var.get())
+
+    def run_script_file(self):
+        filename = filedialog.askopenfilename(
+            title="Run Test Script", filetypes=(("Scripts", "*.txt"), ("All files", "*.*"))
+        )
+        if not filename:
+            return
+        try:
+            with open(filename, "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError as e:
+            self.log_message(f"Cannot read {filename}: {e}")
+            return
+        self.start_script(text, os.path.basename(filename))
+
+    def start_script(self, text, title):
+        """Runs a script (see fr_uploader.console) against the monitored port on a worker thread."""
+        if not (self.is_monitoring and self.send_queue):
+            self.log_message("Start monitoring before running a script.")
+            return
+        if self.script_runner is not None:
+            self.log_message("A script is already running.")
+            return
+        try:
+            steps = parse_script(text)
+        except ScriptError as e:
+            self.log_message(f"{title}: {e}")
+            return
+        self.script_decoder = TextDecoder()
+        self.script_responses = ResponseBuffer()
+        prefix = f"[{self.connection_name}] "
+        runner = ScriptRunner(
+            steps, self.send_queue, self.script_responses, self.line_ending(), lambda text: log_message(prefix + text)
+        )
+        self.script_runner = runner
+        self.stop_script_button.config(state=tk.NORMAL)
+        self.log_message(f"{prefix}Running {title} ({len(steps)} steps).")
+
+        def run():
+            result = runner.run()
+            self.after(0, lambda: self.script_finished(runner, title, result))
+
+        Thread(target=run, daemon=True).start()
+
+    def stop_script(self):
+        if self.script_runner is not None:
+            self.script_runner.stop()
+
+    def script_finished(self, runner, title, result):
+        if self.script_runner is runner:
+            self.script_runner = None
+            self.script_responses = None
+            self.stop_script_button.config(state=tk.DISABLED)
+        self.log_message(f"[{self.connection_name}] {title} {'passed' if result.ok else 'FAILED'}: {result.summary()}")
+
     def start_serial_monitoring(self):
         """Starts the serial monitor on the active tab."""
         active_tab = notebook.index(notebook.select())
@@ -485,6 +1553,709 @@ class SerialMonitor(ttk.Frame):
             serial_monitor_tab2.start_monitoring()
 
 
+# --- Macro Editor ---
+class MacroEditor(tk.Toplevel):
+    """Creates, edits and deletes the macros shared by the serial monitors."""
+
+    def __init__(self, monitor, name=None, command=""):
+        super().__init__(monitor)
+        self.title("Macros")
+        self.monitor = monitor
+
+        ttk.Label(self, text="Macro:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        self.name_var = tk.StringVar(value=name or "")
+        self.name_dropdown = ttk.Combobox(self, textvariable=self.name_var, values=macro_book.names(), width=30)
+        self.name_dropdown.grid(row=0, column=1, sticky=tk.W + tk.E, padx=5, pady=5)
+        self.name_dropdown.bind("<<ComboboxSelected>>", lambda event: self.load())
+
+        ttk.Label(
+            self,
+            text="One command per line; also: expect <regex>, timeout <seconds>, wait <seconds>, # comment",
+        ).grid(row=1, column=0, columnspan=2, sticky=tk.W, padx=5)
+        self.script_text = scrolledtext.ScrolledText(self, wrap=tk.NONE, width=60, height=12)
+        self.script_text.grid(row=2, column=0, columnspan=2, sticky=tk.NSEW, padx=5, pady=5)
+
+        buttons = ttk.Frame(self)
+        buttons.grid(row=3, column=0, columnspan=2, sticky=tk.E, padx=5, pady=5)
+        ttk.Button(buttons, text="Save", command=self.save).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Delete", command=self.delete).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Run", command=self.run).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Close", command=self.destroy).pack(side=tk.LEFT, padx=5)
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(2, weight=1)
+
+        if name:
+            self.load()
+        elif command:
+            self.script_text.insert("1.0", command + "\n")
+
+    def script(self):
+        return self.script_text.get("1.0", tk.END).strip() + "\n"
+
+    def load(self):
+        self.script_text.delete("1.0", tk.END)
+        self.script_text.insert("1.0", macro_book.get(self.name_var.get()) or "")
+
+    def save(self):
+        name = self.name_var.get().strip()
+        if not name:
+            messagebox.showerror("Macros", "Enter a name for the macro.", parent=self)
+            return
+        try:
+            macro_book.set(name, self.script())
+        except (ScriptError, OSError) as e:
+            messagebox.showerror("Macros", f"Cannot save {name}: {e}", parent=self)
+            return
+        self.name_dropdown.config(values=macro_book.names())
+        self.monitor.macro_dropdown.set(name)
+
+    def delete(self):
+        name = self.name_var.get().strip()
+        if macro_book.get(name) is None:
+            return
+        try:
+            macro_book.remove(name)
+        except OSError as e:
+            messagebox.showerror("Macros", f"Cannot delete {name}: {e}", parent=self)
+            return
+        self.name_dropdown.config(values=macro_book.names())
+        self.name_var.set("")
+        self.script_text.delete("1.0", tk.END)
+        if self.monitor.macro_dropdown.get() == name:
+            self.monitor.macro_dropdown.set("")
+
+    def run(self):
+        self.monitor.start_script(self.script(), self.name_var.get().strip() or "macro")
+
+
+# --- Session Capture Viewer ---
+class CaptureViewer(tk.Toplevel):
+    """Browses a session capture and replays it into a serial monitor."""
+
+    PREVIEW_BYTES = 64 << 10  # Shown from the selected point onwards
+    SPEEDS = {"1x": 1.0, "10x": 10.0, "100x": 100.0, "Max": None}
+
+    def __init__(self, monitor, capture):
+        super().__init__(monitor)
+        self.monitor = monitor
+        self.capture = capture
+        self.offset = None  # File offset of the frame at the slider position
+        self._seek_job = None
+        self.title(f"Session Capture - {os.path.basename(capture.path)}")
+        self.geometry("900x500")
+
+        started = datetime.datetime.fromtimestamp(capture.start_wall_ns / 1e9).strftime("%Y-%m-%d %H:%M:%S")
+        ttk.Label(
+            self,
+            text=(
+                f"Started {started} | {capture.duration_ns / 1e9:.1f} s | "
+                f"{format_size(capture.total_bytes)} in {capture.frame_count:,} frames"
+            ),
+        ).pack(fill=tk.X, padx=10, pady=(10, 0))
+
+        controls = ttk.Frame(self)
+        controls.pack(fill=tk.X, padx=10, pady=5)
+        controls.columnconfigure(1, weight=1)
+        ttk.Label(controls, text="Position:").grid(row=0, column=0, sticky=tk.W, padx=5)
+        self.position_var = tk.DoubleVar(value=0.0)
+        self.position_scale = ttk.Scale(
+            controls,
+            from_=0.0,
+            to=max(capture.duration_ns / 1e9, 0.001),
+            variable=self.position_var,
+            command=lambda value: self.schedule_seek(),
+        )
+        self.position_scale.grid(row=0, column=1, sticky=tk.W + tk.E, padx=5)
+        self.position_label = ttk.Label(controls, text="0.000 s", width=12)
+        self.position_label.grid(row=0, column=2, sticky=tk.W, padx=5)
+        ttk.Label(controls, text="Speed:").grid(row=0, column=3, sticky=tk.W, padx=5)
+        self.speed_dropdown = ttk.Combobox(controls, values=list(self.SPEEDS), state="readonly", width=6)
+        self.speed_dropdown.set("1x")
+        self.speed_dropdown.grid(row=0, column=4, sticky=tk.W, padx=5)
+        ttk.Button(controls, text="Replay from Here", command=self.replay).grid(row=0, column=5, padx=5)
+        ttk.Button(controls, text="Stop Replay", command=monitor.stop_replay).grid(row=0, column=6, padx=5)
+
+        self.preview = scrolledtext.ScrolledText(self, wrap=tk.WORD, height=20)
+        self.preview.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.seek()
+
+    def schedule_seek(self):
+        """Coalesces slider motion into one seek per idle period."""
+        if self._seek_job is None:
+            self._seek_job = self.after_idle(self.seek)
+
+    def seek(self):
+        self._seek_job = None
+        seconds = self.position_var.get()
+        self.position_label.config(text=f"{seconds:.3f} s")
+        self.offset = self.capture.seek_time(int(seconds * 1e9))
+        decoder = TextDecoder()
+        timestamper = LineTimestamper(TimestampFormatter(self.capture.clock()))
+        parts = []
+        size = 0
+        for _, time_ns, data in self.capture.frames(self.offset):
+            parts.append(timestamper.stamp(decoder.decode(data), time_ns))
+            size += len(data)
+            if size >= self.PREVIEW_BYTES:
+                break
+        self.preview.config(state=tk.NORMAL)
+        self.preview.delete("1.0", tk.END)
+        self.preview.insert(tk.END, "".join(parts))
+        self.preview.config(state=tk.DISABLED)
+
+    def replay(self):
+        self.monitor.start_replay(self.capture, self.offset, self.SPEEDS[self.speed_dropdown.get()])
+
+    def close(self):
+        if self.monitor.replay and self.monitor.replay.capture is self.capture:
+            self.monitor.stop_replay()
+        self.capture.close()
+        self.destroy()
+
+
+# --- Multi-Port Monitor ---
+class MultiPortMonitor(ttk.Frame):
+    """Monitors several ports at once: one view per port plus a merged, time-ordered view."""
+
+    def __init__(self, parent, *args, **kwargs):
+        super().__init__(parent, *args, **kwargs)
+        self.manager = MonitorManager(log=log_message)
+        self.clock = SessionClock()
+        self.merged_formatter = TimestampFormatter(self.clock)
+        self.views = {}  # name -> (tab frame, text widget, Scrollback, TimestampFormatter)
+        self._poll_job = None
+        self._stats_job = None
+
+        # --- Port selection ---
+        controls = ttk.Frame(self)
+        controls.pack(fill=tk.X, pady=5)
+        ttk.Label(controls, text="Serial Ports:").grid(row=0, column=0, sticky=tk.NW, padx=5, pady=5)
+        self.port_listbox = tk.Listbox(controls, selectmode=tk.MULTIPLE, height=4, exportselection=False)
+        self.port_listbox.grid(row=0, column=1, rowspan=2, sticky=tk.W + tk.E, padx=5, pady=5)
+        ttk.Label(controls, text="Baud Rate:").grid(row=0, column=2, sticky=tk.W, padx=5, pady=5)
+        self.baud_rate_dropdown = ttk.Combobox(
+            controls, values=[9600, 19200, 38400, 57600, 115200, 230400, 250000], state="readonly", width=8
+        )
+        self.baud_rate_dropdown.grid(row=0, column=3, sticky=tk.W, padx=5, pady=5)
+        self.baud_rate_dropdown.set(115200)
+        ttk.Button(controls, text="Open Selected", command=self.open_selected, width=15).grid(
+            row=0, column=4, sticky=tk.W + tk.E, padx=5, pady=5
+        )
+        ttk.Button(controls, text="Refresh Ports", command=refresh_com_ports, width=15).grid(
+            row=0, column=5, sticky=tk.W + tk.E, padx=5, pady=5
+        )
+        ttk.Label(controls, text="TCP Host:Port:").grid(row=1, column=2, sticky=tk.W, padx=5, pady=5)
+        self.tcp_address = tk.StringVar(value=DEFAULT_TCP_ADDRESS)
+        ttk.Entry(controls, textvariable=self.tcp_address, width=20).grid(row=1, column=3, sticky=tk.W, padx=5, pady=5)
+        ttk.Button(controls, text="Open TCP", command=self.open_tcp, width=15).grid(
+            row=1, column=4, sticky=tk.W + tk.E, padx=5, pady=5
+        )
+        ttk.Button(controls, text="Close Selected", command=self.close_selected, width=15).grid(
+            row=1, column=5, sticky=tk.W + tk.E, padx=5, pady=5
+        )
+        ttk.Button(controls, text="Close All", command=self.close_all, width=15).grid(
+            row=1, column=6, sticky=tk.W + tk.E, padx=5, pady=5
+        )
+        controls.grid_columnconfigure(1, weight=1)
+
+        # --- Per-port statistics ---
+        columns = ("status", "rate", "received", "lines", "overruns", "dropped", "errors")
+        headings = ("Status", "Rx", "Received", "Lines", "Overruns", "Dropped", "Errors")
+        self.stats_tree = ttk.Treeview(self, columns=columns, height=4)
+        self.stats_tree.heading("#0", text="Port")
+        self.stats_tree.column("#0", width=160)
+        for column, heading, width in zip(columns, headings, (220, 90, 90, 80, 80, 80, 60)):
+            self.stats_tree.heading(column, text=heading)
+            self.stats_tree.column(column, width=width, anchor=tk.W)
+        self.stats_tree.pack(fill=tk.X, padx=5, pady=5)
+
+        # --- Views: merged first, then one per port ---
+        self.views_notebook = ttk.Notebook(self)
+        self.views_notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        _, self.merged_text, self.merged_scrollback = self.add_view("Merged")
+
+        self.update_ports(port_watcher.devices())
+
+    def add_view(self, title):
+        frame = ttk.Frame(self.views_notebook)
+        self.views_notebook.add(frame, text=title)
+        text = scrolledtext.ScrolledText(frame, wrap=tk.NONE, width=80, height=20, state=tk.DISABLED)
+        text.pack(fill=tk.BOTH, expand=True)
+        return frame, text, Scrollback(text)
+
+    def update_ports(self, devices):
+        """Lists the ports, keeping the selection of those still present."""
+        selected = {self.port_listbox.get(index) for index in self.port_listbox.curselection()}
+        self.port_listbox.delete(0, tk.END)
+        for index, device in enumerate(devices):
+            self.port_listbox.insert(tk.END, device)
+            if device in selected:
+                self.port_listbox.select_set(index)
+
+    def open_selected(self):
+        baud_rate = int(self.baud_rate_dropdown.get())
+        for index in self.port_listbox.curselection():
+            port = self.port_listbox.get(index)
+            try:
+                self.manager.open_serial(port, baud_rate)
+            except (serial.SerialException, ValueError) as e:
+                log_message(f"Error opening {port}: {e}")
+                continue
+            self.opened(port)
+            log_message(f"Monitoring serial port {port} at {baud_rate} baud (multi-port).")
+
+    def open_tcp(self):
+        try:
+            monitor = self.manager.open_tcp(self.tcp_address.get())
+        except ValueError as e:
+            log_message(f"Error: {e}")
+            return
+        self.opened(monitor.name)
+        log_message(f"Monitoring TCP bridge {monitor.name} (multi-port).")
+
+    def opened(self, name):
+        frame, text, scrollback = self.add_view(name)
+        self.views[name] = (frame, text, scrollback, TimestampFormatter(self.clock))
+        self.stats_tree.insert("", tk.END, iid=name, text=name, values=("open",))
+        if self._poll_job is None:
+            self._poll_job = self.after(SERIAL_DRAIN_INTERVAL_MS, self.poll)
+            self._stats_job = self.after(SERIAL_STATS_INTERVAL_MS, self.update_stats)
+
+    def close_port(self, name):
+        self.manager.close(name)
+        frame, _, _, _ = self.views.pop(name)  # The tab; text.master is ScrolledText's own inner frame
+        self.views_notebook.forget(frame)
+        frame.destroy()
+        self.stats_tree.delete(name)
+        log_message(f"---- Closed {name} (multi-port) ----")
+
+    def close_selected(self):
+        for name in self.stats_tree.selection():
+            self.close_port(name)
+
+    def close_all(self):
+        for name in list(self.views):
+            self.close_port(name)
+
+    def poll(self):
+        """Drains all ports and appends to the per-port and merged views."""
+        self._poll_job = None
+        if not self.views:
+            return
+        per_port, merged = self.manager.poll()
+        for name, lines in per_port.items():
+            if lines and name in self.views:
+                _, text, scrollback, formatter = self.views[name]
+                self.append(text, scrollback, "".join(f"{formatter.format(stamp)}{line}\n" for stamp, _, line in lines))
+        if merged:
+            format_stamp = self.merged_formatter.format
+            self.append(
+                self.merged_text,
+                self.merged_scrollback,
+                "".join(f"{format_stamp(stamp)}[{name}] {line}\n" for stamp, name, line in merged),
+            )
+        self._poll_job = self.after(SERIAL_DRAIN_INTERVAL_MS, self.poll)
+
+    @staticmethod
+    def append(text_widget, scrollback, text):
+        text_widget.config(state=tk.NORMAL)
+        text_widget.insert(tk.END, text)
+        scrollback.appended(text)
+        text_widget.see(tk.END)
+        text_widget.config(state=tk.DISABLED)
+
+    def update_stats(self):
+        """Shows per-port throughput and error counters."""
+        self._stats_job = None
+        if not self.views:
+            return
+        for name, stats in self.manager.stats().items():
+            monitor = self.manager.monitors.get(name)
+            if monitor is None or not self.stats_tree.exists(name):
+                continue
+            if monitor.last_error is not None:
+                status = f"error: {monitor.last_error}"
+            elif not stats["alive"]:
+                status = "closed"
+            elif stats.get("connected") is False:
+                status = "connecting..."
+            else:
+                status = "open"
+            self.stats_tree.item(
+                name,
+                values=(
+                    status,
+                    f"{stats['bytes_per_sec'] / 1024:.1f} KB/s",
+                    format_size(stats["bytes_received"]),
+                    f"{stats['lines']:,}",
+                    stats["overruns"],
+                    format_size(stats["dropped_bytes"]),
+                    stats["errors"],
+                ),
+            )
+        self._stats_job = self.after(SERIAL_STATS_INTERVAL_MS, self.update_stats)
+
+
+# --- Telemetry ---
+class TelemetryPanel(ttk.Frame):
+    """Parses numeric channels out of one serial monitor's stream and plots them live.
+
+    The serial monitors hand every received chunk to feed(); only the monitor
+    selected as the source is parsed, and nothing is parsed while the parser
+    is "Off". The plot redraws every PLOT_INTERVAL_MS with each channel
+    decimated to two points per pixel column.
+    """
+
+    def __init__(self, parent, *args, **kwargs):
+        super().__init__(parent, *args, **kwargs)
+        self.store = TelemetryStore()
+        self.stage = None  # TelemetryStage while a parser is selected
+        self.sources = {}  # Source name -> SerialMonitor, see add_source()
+        self._plot_items = {}  # channel name -> canvas line item
+        self._plot_job = None
+        self._channels_job = None
+        self._last_rows = 0
+        self.redraw_ms = 0.0
+
+        controls = ttk.Frame(self)
+        controls.pack(fill=tk.X, pady=5)
+        ttk.Label(controls, text="Parser:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        self.parser_dropdown = ttk.Combobox(controls, values=["Off"] + list(PARSERS), state="readonly", width=10)
+        self.parser_dropdown.grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
+        self.parser_dropdown.set("Off")
+        self.parser_dropdown.bind("<<ComboboxSelected>>", lambda event: self.set_parser())
+        ttk.Label(controls, text="Window:").grid(row=0, column=2, sticky=tk.W, padx=5, pady=5)
+        self.window_dropdown = ttk.Combobox(controls, values=list(PLOT_WINDOWS), state="readonly", width=6)
+        self.window_dropdown.grid(row=0, column=3, sticky=tk.W, padx=5, pady=5)
+        self.window_dropdown.set("10 s")
+        ttk.Button(controls, text="Clear", command=self.clear, width=10).grid(row=0, column=4, padx=5, pady=5)
+        ttk.Button(controls, text="Export CSV...", command=lambda: self.export("csv"), width=15).grid(
+            row=0, column=5, padx=5, pady=5
+        )
+        ttk.Button(controls, text="Export Parquet...", command=lambda: self.export("parquet"), width=15).grid(
+            row=0, column=6, padx=5, pady=5
+        )
+        ttk.Label(controls, text="Source:").grid(row=0, column=7, sticky=tk.W, padx=5, pady=5)
+        self.source_dropdown = ttk.Combobox(controls, state="readonly", width=18)
+        self.source_dropdown.grid(row=0, column=8, sticky=tk.W, padx=5, pady=5)
+        self.source_dropdown.bind("<<ComboboxSelected>>", lambda event: self.restart())
+        self.stats_label = ttk.Label(controls, text="")
+        self.stats_label.grid(row=0, column=9, sticky=tk.W, padx=5, pady=5)
+
+        body = ttk.PanedWindow(self, orient=tk.HORIZONTAL)
+        body.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        columns = ("last", "min", "max", "samples")
+        self.channel_tree = ttk.Treeview(body, columns=columns, selectmode="extended")
+        self.channel_tree.heading("#0", text="Channel")
+        self.channel_tree.column("#0", width=120)
+        for column in columns:
+            self.channel_tree.heading(column, text=column.capitalize())
+            self.channel_tree.column(column, width=80, anchor=tk.E)
+        self.canvas = tk.Canvas(body, background="white", highlightthickness=0)
+        body.add(self.channel_tree, weight=1)
+        body.add(self.canvas, weight=3)
+        ttk.Label(self, text="Select channels to plot (up to six); with none selected the first six are shown.").pack(
+            anchor=tk.W, padx=5
+        )
+
+    def set_parser(self):
+        name = self.parser_dropdown.get()
+        if name == "Off":
+            self.stage = None
+            return
+        self.stage = TelemetryStage(get_parser(name), self.store)
+        if self._plot_job is None:
+            self._plot_job = self.after(PLOT_INTERVAL_MS, self.redraw)
+        if self._channels_job is None:
+            self._channels_job = self.after(SERIAL_STATS_INTERVAL_MS, self.update_channels)
+
+    def add_source(self, name, monitor):
+        """Offers a serial monitor as a source; the first one added is selected."""
+        self.sources[name] = monitor
+        self.source_dropdown.config(values=list(self.sources))
+        if not self.source_dropdown.get():
+            self.source_dropdown.set(name)
+
+    def is_source(self, monitor):
+        return self.sources.get(self.source_dropdown.get()) is monitor
+
+    def feed(self, monitor, data, stamp=None):
+        """Parses a chunk received by monitor if it is the source (called on the GUI thread)."""
+        if self.stage is not None and self.is_source(monitor):
+            self.stage.feed(data, stamp if stamp is not None else SessionClock.now())
+
+    def new_stream(self, monitor):
+        """A new session or replay starts on monitor: if it is the source, start over."""
+        if self.is_source(monitor):
+            self.restart()
+
+    def restart(self):
+        """Drops the old samples and restarts the time axis."""
+        if self.stage is not None:
+            self.stage.reset()
+        self.clear()
+
+    def clear(self):
+        self.store.clear()
+        self._last_rows = 0
+        self.canvas.delete("all")
+        self._plot_items = {}
+        self.channel_tree.delete(*self.channel_tree.get_children())
+
+    def update_channels(self):
+        """Refreshes the channel list (last, min, max and sample count) once per second."""
+        self._channels_job = None
+        if self.stage is None:
+            return
+        for name, channel in self.store.channels.items():
+            if not channel.count:
+                continue
+            values = channel.ordered(channel.values)
+            if not self.channel_tree.exists(name):
+                self.channel_tree.insert("", tk.END, iid=name, text=name)
+            self.channel_tree.item(
+                name, values=(f"{channel.last:g}", f"{min(values):g}", f"{max(values):g}", f"{channel.total:,}")
+            )
+        rate = (self.store.row_count - self._last_rows) * 1000 / SERIAL_STATS_INTERVAL_MS
+        self._last_rows = self.store.row_count
+        self.stats_label.config(
+            text=f"{rate:,.0f} lines/s parsed | {len(self.store.channels)} channels | Redraw {self.redraw_ms:.1f} ms"
+        )
+        self._channels_job = self.after(SERIAL_STATS_INTERVAL_MS, self.update_channels)
+
+    def redraw(self):
+        """Draws the selected channels over the chosen time window."""
+        self._plot_job = None
+        if self.stage is None:
+            return
+        if self.winfo_viewable():
+            started = time.perf_counter()
+            self.draw()
+            self.redraw_ms = (time.perf_counter() - started) * 1000
+        self._plot_job = self.after(PLOT_INTERVAL_MS, self.redraw)
+
+    def draw(self):
+        canvas = self.canvas
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        end = self.store.last_time
+        canvas.delete("axis")
+        if width < 100 or height < 60 or end is None:
+            return
+        names = [name for name in self.channel_tree.selection() if name in self.store.channels]
+        names = (names or list(self.store.channels))[:len(PLOT_COLORS)]
+        span = PLOT_WINDOWS[self.window_dropdown.get()]
+        start = end - span if span else self.store.first_time
+        if end <= start:
+            start = end - 1.0
+        left, top, right, bottom = 70, 10, width - 10, height - 25
+        series = {}
+        for name in names:
+            times, values = self.store.channels[name].window(start)
+            series[name] = decimate(times, values, start, end, right - left)
+        all_values = [value for points in series.values() for _, value in points]
+        if not all_values:
+            return
+        low, high = min(all_values), max(all_values)
+        if high == low:
+            low, high = low - 1, high + 1
+        x_scale = (right - left) / (end - start)
+        y_scale = (bottom - top) / (high - low)
+
+        for name in list(self._plot_items):
+            if name not in series:
+                canvas.delete(self._plot_items.pop(name))
+        for position, (name, points) in enumerate(series.items()):
+            coords = []
+            for time_s, value in points:
+                coords.append(left + (time_s - start) * x_scale)
+                coords.append(bottom - (value - low) * y_scale)
+            if len(coords) == 2:
+                coords += coords  # A single sample still needs two points
+            item = self._plot_items.get(name)
+            if item is None:
+                item = self._plot_items[name] = canvas.create_line(0, 0, 0, 0)
+            if coords:
+                canvas.coords(item, *coords)
+            canvas.itemconfig(item, fill=PLOT_COLORS[position])
+            canvas.create_text(
+                left + 8 + 110 * position, top + 8, text=name, anchor=tk.W, fill=PLOT_COLORS[position], tags="axis"
+            )
+
+        canvas.create_rectangle(left, top, right, bottom, outline="gray", tags="axis")
+        for fraction in (0.0, 0.5, 1.0):
+            y = bottom - fraction * (bottom - top)
+            canvas.create_text(left - 5, y, text=f"{low + fraction * (high - low):.4g}", anchor=tk.E, tags="axis")
+        canvas.create_text(left, bottom + 5, text=f"{start:.1f} s", anchor=tk.NW, tags="axis")
+        canvas.create_text(right, bottom + 5, text=f"{end:.1f} s", anchor=tk.NE, tags="axis")
+
+    def export(self, kind):
+        """Writes the held samples of every channel as CSV or Parquet."""
+        if not self.store.channels:
+            log_message("No telemetry to export.")
+            return
+        extension = ".csv" if kind == "csv" else ".parquet"
+        filename = filedialog.asksaveasfilename(
+            title="Export Telemetry",
+            defaultextension=extension,
+            filetypes=((f"{kind.upper()} Files", f"*{extension}"), ("All files", "*.*")),
+        )
+        if not filename:
+            return
+        try:
+            rows = export_csv(self.store, filename) if kind == "csv" else export_parquet(self.store, filename)
+        except (OSError, ImportError) as e:
+            log_message(f"Error exporting telemetry: {e}")
+            return
+        log_message(f"Exported {rows:,} telemetry rows to {filename}")
+
+
+class DiagnosticsPanel(ttk.Frame):
+    """Shows the performance metrics (see fr_uploader.metrics) and exports or serves them.
+
+    Nothing is recorded until "Collect Metrics" is on; then the table refreshes
+    once per second while the tab is visible and the event-loop lag probe runs.
+    """
+
+    def __init__(self, parent, *args, **kwargs):
+        super().__init__(parent, *args, **kwargs)
+        self.lag_probe = EventLoopLagProbe(self, METRICS, METRICS_LAG_INTERVAL_MS)
+        self.server = None  # MetricsServer while "Serve" is on
+        self._refresh_job = None
+
+        controls = ttk.Frame(self)
+        controls.pack(fill=tk.X, pady=5)
+        self.enabled_var = tk.BooleanVar(value=METRICS.enabled)
+        ttk.Checkbutton(controls, text="Collect Metrics", variable=self.enabled_var, command=self.toggle).grid(
+            row=0, column=0, sticky=tk.W, padx=5, pady=5
+        )
+        ttk.Button(controls, text="Reset", command=self.reset, width=10).grid(row=0, column=1, padx=5, pady=5)
+        ttk.Button(controls, text="Export Prometheus...", command=lambda: self.export("prometheus"), width=20).grid(
+            row=0, column=2, padx=5, pady=5
+        )
+        ttk.Button(controls, text="Export JSON...", command=lambda: self.export("json"), width=15).grid(
+            row=0, column=3, padx=5, pady=5
+        )
+        ttk.Label(controls, text="Serve at:").grid(row=0, column=4, sticky=tk.W, padx=5, pady=5)
+        self.address_entry = ttk.Entry(controls, width=18)
+        self.address_entry.insert(0, "{}:{}".format(*DEFAULT_METRICS_ADDRESS))
+        self.address_entry.grid(row=0, column=5, sticky=tk.W, padx=5, pady=5)
+        self.serve_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(controls, text="Serve /metrics", variable=self.serve_var, command=self.toggle_server).grid(
+            row=0, column=6, sticky=tk.W, padx=5, pady=5
+        )
+        self.status_label = ttk.Label(controls, text="Metrics are off.")
+        self.status_label.grid(row=0, column=7, sticky=tk.W, padx=5, pady=5)
+
+        columns = ("labels", "value", "p50", "p95", "p99", "max")
+        self.metric_tree = ttk.Treeview(self, columns=columns)
+        self.metric_tree.heading("#0", text="Metric")
+        self.metric_tree.column("#0", width=240)
+        for column in columns:
+            self.metric_tree.heading(column, text=column.capitalize() if column[0] != "p" else column)
+            self.metric_tree.column(column, width=160 if column == "labels" else 90, anchor=tk.E)
+        self.metric_tree.heading("value", text="Value / Count")
+        self.metric_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        ttk.Label(self, text="Latencies are in milliseconds; percentiles are estimated from histogram buckets.").pack(
+            anchor=tk.W, padx=5
+        )
+
+    def toggle(self):
+        METRICS.enabled = self.enabled_var.get()
+        if METRICS.enabled:
+            self.lag_probe.start()
+            self.refresh()
+        else:
+            self.lag_probe.stop()
+            self.status_label.config(text="Metrics are off.")
+
+    def reset(self):
+        METRICS.reset()
+        self.metric_tree.delete(*self.metric_tree.get_children())
+        self.refresh()
+
+    def refresh(self):
+        """Redraws the table once per second while metrics are collected."""
+        if self._refresh_job is not None:
+            self.after_cancel(self._refresh_job)
+        self._refresh_job = None
+        if not METRICS.enabled:
+            return
+        if self.winfo_viewable():
+            self.show(METRICS.snapshot())
+        self._refresh_job = self.after(SERIAL_STATS_INTERVAL_MS, self.refresh)
+
+    def show(self, snapshot):
+        for entry in snapshot["metrics"]:
+            labels = ", ".join(f"{key}={value}" for key, value in entry["labels"].items())
+            iid = f"{entry['name']}|{labels}"
+            if entry["type"] == "histogram":
+                values = (labels, f"{entry['count']:,}", *(format_ms(entry[key]) for key in ("p50", "p95", "p99", "max")))
+            else:
+                value = entry["value"]
+                values = (labels, "-" if value is None else f"{value:,}", "", "", "", "")
+            if not self.metric_tree.exists(iid):
+                self.metric_tree.insert("", tk.END, iid=iid, text=entry["name"])
+            self.metric_tree.item(iid, values=values)
+        text = f"Collecting for {format_duration(snapshot['time'] - snapshot['since'])}"
+        text += f" | Event loop lag {self.lag_probe.last_lag * 1000:.1f} ms"
+        if self.server:
+            text += f" | Serving {self.server.url}"
+        self.status_label.config(text=text)
+
+    def export(self, kind):
+        extension = ".json" if kind == "json" else ".prom"
+        filename = filedialog.asksaveasfilename(
+            title="Export Metrics",
+            defaultextension=extension,
+            filetypes=(("JSON Files" if kind == "json" else "Prometheus Text", f"*{extension}"), ("All files", "*.*")),
+        )
+        if not filename:
+            return
+        try:
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write(METRICS.to_json() if kind == "json" else METRICS.to_prometheus())
+        except OSError as e:
+            log_message(f"Error exporting metrics: {e}")
+            return
+        log_message(f"Exported metrics to {filename}")
+
+    def toggle_server(self):
+        """Starts or stops the HTTP endpoint that dashboards scrape."""
+        if self.serve_var.get():
+            try:
+                host, port = parse_address(self.address_entry.get())
+                self.server = MetricsServer(METRICS, host, port)
+            except (ValueError, OSError) as e:
+                self.serve_var.set(False)
+                log_message(f"Cannot serve metrics at {self.address_entry.get()}: {e}")
+                return
+            log_message(f"Serving metrics at {self.server.url}")
+            if not self.enabled_var.get():
+                self.enabled_var.set(True)
+                self.toggle()
+        elif self.server:
+            server, self.server = self.server, None
+            server.close()
+            log_message("Stopped serving metrics.")
+
+    def close(self):
+        self.lag_probe.stop()
+        if self.server:
+            self.server.close()
+            self.server = None
+
+
+def format_ms(seconds):
+    return "" if seconds is None else f"{seconds * 1000:,.2f}"
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
 # --- GUI Setup ---
 root = tk.Tk()
 root.title("FR Firmware Uploader")
@@ -495,6 +2266,13 @@ style = ttk.Style()
 style.configure("TButton", padding=5, relief="flat")
 style.configure("TLabel", padding=5)
 style.configure("TCombobox", padding=5)
+startup_profile.mark("window")
+
+# Port hotplug events; started with the main loop, the lists fill in after its first scan
+port_watcher = PortWatcher()
+port_watcher.add_listener(
+    lambda added, removed: root.after(0, on_ports_changed, added, removed, port_watcher.scans == 1)
+)
 
 # UI Elements
 notebook = ttk.Notebook(root)
@@ -516,7 +2294,7 @@ notebook.add(tab1, text="FarmRobo Firmware")
 main_content_tab1, right_side_tab1 = create_tab_with_right_side(tab1)
 
 # Configure grid layout for main_content_tab1
-for i in range(13):
+for i in range(15):
     main_content_tab1.grid_rowconfigure(i, weight=0)
 main_content_tab1.grid_columnconfigure(0, weight=1)
 main_content_tab1.grid_columnconfigure(1, weight=1)
@@ -539,6 +2317,11 @@ log_label_tab2.pack()
 log_text_tab2 = scrolledtext.ScrolledText(right_side_tab2, wrap=tk.WORD, width=60, height=5)
 log_text_tab2.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
 
+# Keep the log panes bounded as well
+log_scrollback_tab1 = Scrollback(log_text_tab1, max_lines=LOG_SCROLLBACK_LINES)
+log_scrollback_tab2 = Scrollback(log_text_tab2, max_lines=LOG_SCROLLBACK_LINES)
+log_bus.add_sink(show_log_records)
+
 # Serial Monitor and Log in right_side_tab1 (Instantiate before other UI elements)
 # Before you instantiate the SerialMonitor, create a list of all serial_text widgets.
 all_log_texts = []
@@ -551,6 +2334,33 @@ serial_monitor_tab2.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
 all_log_texts.append(serial_monitor_tab1)
 all_log_texts.append(serial_monitor_tab2)
+startup_profile.mark("firmware tabs and serial monitors")
+
+# Tab 3: Multi-Port Monitor
+tab3 = ttk.Frame(notebook)
+notebook.add(tab3, text="Multi-Port Monitor")
+multi_port_monitor = MultiPortMonitor(tab3)
+multi_port_monitor.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+startup_profile.mark("multi-port monitor")
+
+# Tab 4: Telemetry parsed from one of the serial monitors
+tab4 = ttk.Frame(notebook)
+notebook.add(tab4, text="Telemetry")
+telemetry_panel = TelemetryPanel(tab4)
+telemetry_panel.add_source("FarmRobo Firmware", serial_monitor_tab1)
+telemetry_panel.add_source("Custom Upload", serial_monitor_tab2)
+telemetry_panel.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+startup_profile.mark("telemetry")
+
+# Tab 5: Performance metrics
+tab5 = ttk.Frame(notebook)
+notebook.add(tab5, text="Diagnostics")
+diagnostics_panel = DiagnosticsPanel(tab5)
+diagnostics_panel.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+METRICS.gauge("log_queue_depth", lambda: log_bus.backlog)
+for name, monitor in (("tab1", serial_monitor_tab1), ("tab2", serial_monitor_tab2)):
+    METRICS.gauge("serial_pending_chars", lambda monitor=monitor: monitor._pending_chars, monitor=name)
+startup_profile.mark("diagnostics")
 
 # Current Firmware Version
 current_version = get_local_version()
@@ -573,10 +2383,15 @@ download_button = ttk.Button(
 )
 download_button.grid(row=2, column=0, sticky=tk.W + tk.E, padx=10, pady=5)
 
+# Offline Mode (serve the cached release information only)
+offline_var = tk.BooleanVar(value=False)
+offline_check = ttk.Checkbutton(main_content_tab1, text="Offline Mode", variable=offline_var, command=toggle_offline_mode)
+offline_check.grid(row=2, column=1, sticky=tk.W, padx=10, pady=5)
+
 # R1-TEMP Dropdowns
 r1_temp_label = ttk.Label(main_content_tab1, text="R1-TEMP:")
 r1_temp_label.grid(row=3, column=0, sticky=tk.W + tk.E, padx=10, pady=5)
-r1_temp_options = ["IT", "ET"]
+r1_temp_options = firmware.CONFIG_OPTIONS["R1-TEMP"]
 r1_temp_dropdown = ttk.Combobox(main_content_tab1, values=r1_temp_options, state="readonly")
 r1_temp_dropdown.grid(row=4, column=0, sticky=tk.W + tk.E, padx=10, pady=5)
 r1_temp_dropdown.set("IT")
@@ -584,7 +2399,7 @@ r1_temp_dropdown.set("IT")
 # R1-TOOLS Dropdowns
 r1_tools_label = ttk.Label(main_content_tab1, text="R1-TOOLS:")
 r1_tools_label.grid(row=5, column=0, sticky=tk.W + tk.E, padx=10, pady=5)
-r1_tools_options = ["CAN", "THR"]
+r1_tools_options = firmware.CONFIG_OPTIONS["R1-TOOLS"]
 r1_tools_dropdown = ttk.Combobox(main_content_tab1, values=r1_tools_options, state="readonly")
 r1_tools_dropdown.grid(row=6, column=0, sticky=tk.W + tk.E, padx=10, pady=5)
 r1_tools_dropdown.set("CAN")
@@ -592,21 +2407,65 @@ r1_tools_dropdown.set("CAN")
 # R1-ACTUATOR Dropdowns
 r1_actuator_label = ttk.Label(main_content_tab1, text="R1-ACTUATOR:")
 r1_actuator_label.grid(row=7, column=0, sticky=tk.W + tk.E, padx=10, pady=5)
-r1_actuator_options = ["BTS", "CYT"]
+r1_actuator_options = firmware.CONFIG_OPTIONS["R1-ACTUATOR"]
 r1_actuator_dropdown = ttk.Combobox(main_content_tab1, values=r1_actuator_options, state="readonly")
 r1_actuator_dropdown.grid(row=8, column=0, sticky=tk.W + tk.E, padx=10, pady=5)
 r1_actuator_dropdown.set("BTS")
 
+# Firmware Release (any release kept in the firmware store can be flashed again)
+release_label = ttk.Label(main_content_tab1, text="Firmware Release:")
+release_label.grid(row=9, column=0, sticky=tk.W + tk.E, padx=10, pady=5)
+release_dropdown = ttk.Combobox(main_content_tab1, state="readonly")
+release_dropdown.grid(row=10, column=0, sticky=tk.W + tk.E, padx=10, pady=5)
+refresh_release_list()
+
 # Upload Latest Firmware Button
 upload_button = ttk.Button(
     main_content_tab1, text="Upload Selected Firmware", command=upload_selected_firmware_threaded, width=15
 )
 upload_button.grid(row=11, column=0, sticky=tk.W + tk.E, padx=10, pady=5)
 
+# Upload Method (shared by both tabs and the batch upload window)
+upload_method_var = tk.StringVar(value=default_backend_name())
+upload_method_label = ttk.Label(main_content_tab1, text="Upload Method:")
+upload_method_label.grid(row=9, column=1, sticky=tk.W + tk.E, padx=10, pady=5)
+upload_method_dropdown = ttk.Combobox(
+    main_content_tab1, values=list(UPLOADER_BACKENDS), textvariable=upload_method_var, state="readonly"
+)
+upload_method_dropdown.grid(row=10, column=1, sticky=tk.W + tk.E, padx=10, pady=5)
+
+# Skip boards that report they already run the image (shared by both tabs and the batch upload window)
+skip_current_var = tk.BooleanVar(value=True)
+ttk.Checkbutton(main_content_tab1, text="Skip Boards Already Running It", variable=skip_current_var).grid(
+    row=15, column=0, columnspan=2, sticky=tk.W, padx=10, pady=5
+)
+
+# Upload Progress (shared by both tabs)
+upload_progress_var = tk.DoubleVar(value=0)
+upload_progress_text = tk.StringVar(value="")
+ttk.Progressbar(main_content_tab1, variable=upload_progress_var, maximum=100).grid(
+    row=14, column=0, sticky=tk.W + tk.E, padx=10, pady=5
+)
+ttk.Label(main_content_tab1, textvariable=upload_progress_text).grid(row=14, column=1, sticky=tk.W, padx=10, pady=5)
+
+# Batch Upload Button
+batch_upload_button = ttk.Button(main_content_tab1, text="Batch Upload...", command=open_batch_upload, width=15)
+batch_upload_button.grid(row=11, column=1, sticky=tk.W + tk.E, padx=10, pady=5)
+
 # Latest Version Message
 latest_version_label = ttk.Label(main_content_tab1, text="Latest release: Unknown")
 latest_version_label.grid(row=12, column=0, sticky=tk.W + tk.E, padx=10, pady=5)
 
+# Log File (JSON lines, rotated)
+log_file_var = tk.BooleanVar(value=False)
+log_file_check = ttk.Checkbutton(main_content_tab1, text="Log to File", variable=log_file_var, command=toggle_log_file)
+log_file_check.grid(row=12, column=1, sticky=tk.W, padx=10, pady=5)
+
+# Release cache statistics
+release_cache_label = ttk.Label(main_content_tab1, text="")
+release_cache_label.grid(row=13, column=0, columnspan=2, sticky=tk.W + tk.E, padx=10, pady=5)
+update_release_cache_label()
+
 # Custom Firmware Path
 custom_firmware_path = tk.StringVar()
 custom_firmware_label = ttk.Label(main_content_tab2, text="Custom Firmware File:")
@@ -615,31 +2474,37 @@ custom_firmware_entry = ttk.Entry(main_content_tab2, textvariable=custom_firmwar
 custom_firmware_entry.pack(pady=5, padx=10)
 browse_button = ttk.Button(main_content_tab2, text="Browse", command=browse_firmware_file, width=15)
 browse_button.pack(pady=5)
+ttk.Label(main_content_tab2, text="Upload Method:").pack(pady=5)
+ttk.Combobox(
+    main_content_tab2, values=list(UPLOADER_BACKENDS), textvariable=upload_method_var, state="readonly"
+).pack(pady=5)
+ttk.Checkbutton(main_content_tab2, text="Skip Boards Already Running It", variable=skip_current_var).pack(pady=5)
+ttk.Label(main_content_tab2, text="Base Address (.bin):").pack(pady=5)
+base_address_var = tk.StringVar(value="0x08000000")  # Where a raw .bin is linked; also used by Batch Upload
+ttk.Entry(main_content_tab2, textvariable=base_address_var, width=14).pack(pady=5)
 
 # Upload Custom Firmware Button
 upload_custom_button = ttk.Button(
     main_content_tab2, text="Upload Custom Firmware", command=upload_custom_firmware_threaded, width=25)
 upload_custom_button.pack(pady=5)
+ttk.Progressbar(main_content_tab2, variable=upload_progress_var, maximum=100).pack(pady=5, padx=10, fill=tk.X)
+ttk.Label(main_content_tab2, textvariable=upload_progress_text).pack(pady=5)
 
 notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+startup_profile.mark("firmware controls")
 
 
-def log_message(message):
-    """Logs a message to the text area in the GUI based on the active tab."""
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_message_with_timestamp = f"[{timestamp}] {message}\n"
-    active_tab = notebook.index(notebook.select())
-    if active_tab == 0:
-        log_text_tab1.insert(tk.END, log_message_with_timestamp)
-        log_text_tab1.see(tk.END)
-        tab1.update_idletasks()
-    elif active_tab == 1:
-        log_text_tab2.insert(tk.END, log_message_with_timestamp)
-        log_text_tab2.see(tk.END)
-        tab2.update_idletasks()
-    else:
-        print("No active tab to log to.")
-
+def finish_startup():
+    """Runs once the main loop is up: logs the startup time, with the full profile when asked for one."""
+    root.update_idletasks()
+    startup_profile.mark("first frame")
+    if import_timer is None:
+        log_message(startup_profile.summary())
+        return
+    import_timer.uninstall()
+    report = startup_profile.report()
+    print(report, flush=True)
+    log_message(report)
 
 
 # --- Main ---
@@ -661,6 +2526,8 @@ if __name__ == "__main__":
 
                 subprocess.check_call(["pip", "install", "pyserial"])
                 print("Serial module installed successfully.")
+                import importlib
+
                 serial = importlib.import_module("serial")  # Reload the module
                 messagebox.showinfo(
                     "Success",
@@ -682,4 +2549,10 @@ if __name__ == "__main__":
             )
 
     log_text = scrolledtext.ScrolledText(root, wrap=tk.WORD, width=100, height=5)
-    root.mainloop()
\ No newline at end of file
+    drain_log_bus()
+    port_watcher.start()
+    root.after(0, finish_startup)
+    root.mainloop()
+    port_watcher.stop()
+    diagnostics_panel.close()
+    log_bus.close_file()
\ No newline at end of file